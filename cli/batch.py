@@ -0,0 +1,412 @@
+"""
+Headless Batch Provisioning
+===========================
+
+Runs every setup step for many projects at once from a manifest instead of
+prompting. The manifest is JSON (or YAML when PyYAML is installed):
+
+    {
+      "defaults": {
+        "polar": {"environment": "sandbox"},
+        "resend": {"from_email": "onboarding@resend.dev"}
+      },
+      "projects": [
+        {
+          "project_name": "acme-portal",
+          "repo_url": "https://github.com/acme/acme-portal",
+          "polar": {
+            "organization_slug": "acme-org",
+            "pro_product_id": "...",
+            "business_product_id": "...",
+            "access_token": "polar_oat_...",
+            "webhook_secret": "..."
+          },
+          "clerk": {"publishable_key": "pk_test_...", "secret_key": "sk_test_...", "webhook_secret": "whsec_..."},
+          "resend": {"api_key": "re_...", "from_name": "Acme", "reply_to": "support@acme.com"},
+          "sentry": {"dsn": "https://...ingest.sentry.io/..."}
+        }
+      ]
+    }
+
+Each project gets its own directory under the output directory with `.env`,
+`.env.preview`, `.env.prod` and the final progress file, and a `batch-report.json` summary is
+written next to them. A `polar` section with only an `access_token` (and
+optionally `environment`) gets its products and webhook created or found
+through the Polar API instead. A project without `repo_url` but with a
+`github` section (`token`, optionally `organization`) gets the template
+forked under its name; all forks made with one token and organization share
+one client and one poller, so dozens of them stay within GitHub's rate
+limits. When a ProgressStore is given, progress is recorded there
+after every step so failed projects can be found by the step they stopped at.
+"""
+
+import os
+import json
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field, asdict
+from typing import Dict, List, Optional
+
+from console import Colors, print_success, print_error, print_info
+from progress import PROGRESS_FILE, ServiceConfig, SetupProgress
+from tracing import span, propagate
+from scheduler import Step, StepScheduler, setup_steps, resume_step
+from envfiles import DEVELOPMENT, PREVIEW, PRODUCTION, ensure_cron_secret, write_env_files
+from validation import (
+    normalize_project_name, validate_github_url, is_github_token, is_clerk_publishable_key, is_clerk_secret_key,
+    is_clerk_webhook_secret, is_polar_token, is_resend_api_key, is_sentry_dsn,
+)
+
+logger = logging.getLogger(__name__)
+
+REPORT_FILE = "batch-report.json"
+DEFAULT_WORKERS = 8
+POLAR_DASHBOARD_URLS = {
+    'sandbox': "https://sandbox.polar.sh/dashboard",
+    'production': "https://polar.sh/dashboard",
+}
+
+# Without these, a Polar access token is used to find or create the products and webhook
+POLAR_PROVISIONED_KEYS = ('organization_slug', 'pro_product_id', 'business_product_id', 'webhook_secret')
+
+class ManifestError(Exception):
+    """Raised when a manifest or one of its projects is invalid"""
+
+def load_manifest(path: str) -> List[Dict]:
+    """Load a manifest and return one spec per project with defaults applied"""
+    with open(path, 'r') as f:
+        if path.endswith(('.yaml', '.yml')):
+            try:
+                import yaml
+            except ImportError:
+                raise ManifestError("YAML manifests require PyYAML (pip install pyyaml)")
+            data = yaml.safe_load(f)
+        else:
+            data = json.load(f)
+
+    if not isinstance(data, dict) or not isinstance(data.get('projects'), list):
+        raise ManifestError("Manifest must contain a 'projects' list")
+
+    defaults = data.get('defaults') or {}
+    specs = []
+    seen = set()
+    for raw in data['projects']:
+        spec = project_spec(raw, defaults)
+        if spec['project_name'] in seen:
+            raise ManifestError(f"Duplicate project name: {spec['project_name']}")
+        seen.add(spec['project_name'])
+        specs.append(spec)
+    return specs
+
+def project_spec(raw: Dict, defaults: Optional[Dict] = None) -> Dict:
+    """One project's spec with the defaults applied and its name normalized"""
+    if not isinstance(raw, dict):
+        raise ManifestError("A project must be an object")
+    defaults = defaults or {}
+    spec = {**defaults, **raw}
+    # Service sections are merged one level deep so defaults can be partial
+    for section, values in defaults.items():
+        if isinstance(values, dict) and isinstance(raw.get(section), dict):
+            spec[section] = {**values, **raw[section]}
+
+    name = normalize_project_name(spec.get('project_name', ''))
+    if not name:
+        raise ManifestError(f"Invalid project name: {spec.get('project_name')!r}")
+    spec['project_name'] = name
+    return spec
+
+def needs_polar_provisioning(spec: Dict) -> bool:
+    """Whether a project gives a Polar token but leaves the products or webhook to be created"""
+    polar = spec.get('polar') or {}
+    if not isinstance(polar, dict) or not polar.get('access_token'):
+        return False
+    return not all(polar.get(key) for key in POLAR_PROVISIONED_KEYS)
+
+def needs_github_fork(spec: Dict) -> bool:
+    """Whether a project gives a GitHub token instead of an already forked repository"""
+    github = spec.get('github') or {}
+    return not spec.get('repo_url') and isinstance(github, dict) and bool(github.get('token'))
+
+@dataclass
+class ProjectResult:
+    """Outcome of provisioning one project"""
+    project_name: str
+    status: str
+    output_dir: str
+    duration: float
+    completed_services: List[str] = field(default_factory=list)
+    error: str = ""
+
+class HeadlessSetup:
+    """Runs the setup steps for one project from its manifest spec"""
+
+    def __init__(self, spec: Dict, output_dir: str, store=None, session=None, verifier=None, forks=None):
+        self.spec = spec
+        self.output_dir = output_dir
+        self.store = store
+        self.session = session
+        self.verifier = verifier
+        # (token, organization) -> ForkManager, shared across the projects of a batch
+        self.forks = forks
+        self.progress = SetupProgress(project_name=spec['project_name'])
+        self.total_steps = 8
+
+    def build_steps(self) -> List[Step]:
+        """Setup graph for this project, plus credential verification when enabled"""
+        steps = setup_steps({
+            'github': self.step_1_github,
+            'vercel': self.step_2_vercel,
+            'neon': self.step_3_neon,
+            'polar': self.step_4_polar,
+            'clerk': self.step_5_clerk,
+            'resend': self.step_6_resend,
+            'sentry': self.step_7_sentry,
+            'vercel-env': self.step_8_vercel_env_vars,
+        })
+        if self.verifier:
+            # Verification only needs the credentials, so it overlaps with the Vercel push
+            steps.append(Step('verify', self.total_steps + 1, self.verify_credentials,
+                              ('polar_credentials', 'clerk_credentials', 'resend_credentials', 'sentry_credentials')))
+        return steps
+
+    def run(self) -> SetupProgress:
+        """Execute every step and write the env files"""
+        steps = self.build_steps()
+        if self.store:
+            self.store.save(self.progress)
+
+        def complete(step: Step):
+            self.progress.completed_steps.append(step.name)
+            self.progress.current_step = min(resume_step(steps, self.progress.completed_steps), self.total_steps + 1)
+            if self.store:
+                self.store.save(self.progress)
+
+        StepScheduler(steps, on_complete=complete).run()
+
+        write_env_files(self.progress, self.output_dir, (DEVELOPMENT,))
+        with open(os.path.join(self.output_dir, PROGRESS_FILE), 'w') as f:
+            json.dump(self.progress.to_dict(), f, indent=2)
+        return self.progress
+
+    def section(self, name: str) -> Dict:
+        values = self.spec.get(name) or {}
+        if not isinstance(values, dict):
+            raise ManifestError(f"'{name}' must be an object")
+        return values
+
+    def require(self, section: str, key: str, check=None) -> str:
+        value = str(self.section(section).get(key, '')).strip()
+        if not value:
+            raise ManifestError(f"Missing {section}.{key}")
+        if check and not check(value):
+            raise ManifestError(f"Invalid format for {section}.{key}")
+        return value
+
+    def step_1_github(self):
+        repo_url = str(self.spec.get('repo_url', '')).strip()
+        if needs_github_fork(self.spec):
+            token = self.require('github', 'token', is_github_token)
+            organization = str(self.section('github').get('organization', '')).strip()
+            repo_url = self.fork_manager(token, organization).fork(self.progress.project_name).repo_url
+        if not validate_github_url(repo_url, self.progress.project_name):
+            raise ManifestError("Invalid repository URL or name doesn't match project name")
+        self.progress.api_keys['github_repo_url'] = repo_url
+        self.progress.completed_services.append('github')
+
+    def fork_manager(self, token: str, organization: str):
+        if self.forks:
+            return self.forks(token, organization)
+        from githubsetup import ForkManagerPool
+        return ForkManagerPool(self.session).get(token, organization)
+
+    def step_2_vercel(self):
+        project_url = f"https://{self.progress.project_name}.vercel.app"
+        self.progress.service_configs['vercel'] = {
+            'name': 'Vercel Project',
+            'url': project_url,
+            'credentials': {
+                'project_url': project_url
+            }
+        }
+        self.progress.completed_services.append('vercel')
+
+    def step_3_neon(self):
+        # The database is attached through the Vercel integration, nothing to collect
+        self.progress.completed_services.append('neon')
+
+    def step_4_polar(self):
+        environment = self.section('polar').get('environment', 'sandbox')
+        if environment not in POLAR_DASHBOARD_URLS:
+            raise ManifestError("polar.environment must be 'sandbox' or 'production'")
+        if needs_polar_provisioning(self.spec):
+            from polarsetup import CATALOG_CACHE_FILE, provision_polar
+            provision_polar(self.progress, self.require('polar', 'access_token', is_polar_token), environment,
+                            session=self.session, cache_path=os.path.join(self.output_dir, CATALOG_CACHE_FILE))
+            self.progress.completed_services.append('polar')
+            return
+
+        dashboard_url = POLAR_DASHBOARD_URLS[environment]
+        org_slug = self.require('polar', 'organization_slug')
+
+        service_config = ServiceConfig(
+            name="Polar Billing",
+            url=f"{dashboard_url}/{org_slug}",
+            credentials={
+                "organization_slug": org_slug,
+                "pro_product_id": self.require('polar', 'pro_product_id'),
+                "business_product_id": self.require('polar', 'business_product_id'),
+                "environment": environment,
+                "dashboard_url": f"{dashboard_url}/{org_slug}"
+            },
+            webhook_urls=[f"https://{self.progress.project_name}.vercel.app/api/billing/webhook"]
+        )
+        self.progress.service_configs['polar'] = service_config.to_dict()
+        self.progress.api_keys['polar_access_token'] = self.require('polar', 'access_token', is_polar_token)
+        self.progress.api_keys['polar_webhook_secret'] = self.require('polar', 'webhook_secret')
+        self.progress.completed_services.append('polar')
+
+    def step_5_clerk(self):
+        self.progress.api_keys['clerk_publishable_key'] = self.require('clerk', 'publishable_key', is_clerk_publishable_key)
+        self.progress.api_keys['clerk_secret_key'] = self.require('clerk', 'secret_key', is_clerk_secret_key)
+        self.progress.api_keys['clerk_webhook_secret'] = self.require('clerk', 'webhook_secret', is_clerk_webhook_secret)
+        self.progress.completed_services.append('clerk')
+
+    def step_6_resend(self):
+        resend = self.section('resend')
+        self.progress.api_keys['resend_api_key'] = self.require('resend', 'api_key', is_resend_api_key)
+        self.progress.api_keys['resend_from_email'] = resend.get('from_email') or "onboarding@resend.dev"
+        self.progress.api_keys['resend_from_name'] = (
+            resend.get('from_name') or self.progress.project_name.replace('-', ' ').title()
+        )
+        if resend.get('reply_to'):
+            self.progress.api_keys['resend_reply_to'] = resend['reply_to']
+        self.progress.completed_services.append('resend')
+
+    def step_7_sentry(self):
+        self.progress.api_keys['sentry_dsn'] = self.require('sentry', 'dsn', is_sentry_dsn)
+        self.progress.completed_services.append('sentry')
+
+    def step_8_vercel_env_vars(self):
+        ensure_cron_secret(self.progress)
+        write_env_files(self.progress, self.output_dir, (PREVIEW, PRODUCTION))
+
+        vercel = self.section('vercel')
+        if vercel.get('token'):
+            from envpush import push_progress
+            self.progress.api_keys['vercel_token'] = vercel['token']
+            if vercel.get('team_id'):
+                self.progress.service_configs['vercel']['credentials']['team_id'] = vercel['team_id']
+            push_progress(self.progress, vercel['token'], vercel.get('team_id', ''), session=self.session)
+        self.progress.completed_services.append('vercel-env')
+
+    def verify_credentials(self):
+        failed = [f"{r.service}.{r.check}: {r.status}" for r in self.verifier.verify(self.progress) if not r.ok]
+        if failed:
+            raise ManifestError(f"Credential verification failed ({', '.join(failed)})")
+
+class BatchProvisioner:
+    """Provisions every project of a manifest in a worker pool"""
+
+    def __init__(self, manifest_path: str, output_dir: str, workers: int = DEFAULT_WORKERS, verify: bool = False,
+                 store=None):
+        self.manifest_path = manifest_path
+        self.output_dir = output_dir
+        self.workers = max(1, workers)
+        self.store = store
+        self.verify = verify
+        self.session = None
+        self.verifier = None
+        self.forks = None
+
+    def run(self) -> List[ProjectResult]:
+        """Provision all projects and write the summary report"""
+        specs = load_manifest(self.manifest_path)
+        # Only load the HTTP stack when some project calls a provider API
+        if self.verify or any((spec.get('vercel') or {}).get('token') or needs_polar_provisioning(spec)
+                              or needs_github_fork(spec) for spec in specs):
+            from services import create_session
+            # One pooled session shared by every worker keeps provider connections warm
+            self.session = create_session()
+        if self.verify:
+            from verify import CredentialVerifier
+            self.verifier = CredentialVerifier(self.session)
+        if any(needs_github_fork(spec) for spec in specs):
+            from githubsetup import ForkManagerPool
+            self.forks = ForkManagerPool(self.session)
+        print_info(f"Provisioning {len(specs)} projects with {min(self.workers, len(specs) or 1)} workers...")
+
+        results = []
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = [pool.submit(propagate(self.provision), spec) for spec in specs]
+            for future in as_completed(futures):
+                result = future.result()
+                results.append(result)
+                if result.status == 'ok':
+                    print_success(f"{result.project_name}: provisioned in {result.duration:.2f}s")
+                else:
+                    print_error(f"{result.project_name}: {result.error}")
+
+        results.sort(key=lambda r: r.project_name)
+        self.write_report(results)
+        self.print_summary(results)
+        return results
+
+    def provision(self, spec: Dict) -> ProjectResult:
+        """Provision a single project, capturing any failure in the result"""
+        started = time.monotonic()
+        project_dir = os.path.join(self.output_dir, spec['project_name'])
+        setup = None
+        try:
+            os.makedirs(project_dir, exist_ok=True)
+            setup = HeadlessSetup(spec, project_dir, self.store, self.session, self.verifier,
+                                  self.forks.get if self.forks else None)
+            with span('provision', **{'kosuke.project': spec['project_name']}):
+                progress = setup.run()
+            return ProjectResult(
+                project_name=spec['project_name'],
+                status='ok',
+                output_dir=project_dir,
+                duration=time.monotonic() - started,
+                completed_services=list(progress.completed_services),
+            )
+        except Exception as e:
+            if not isinstance(e, ManifestError):
+                logger.exception(f"Provisioning {spec['project_name']} failed")
+            return ProjectResult(
+                project_name=spec['project_name'],
+                status='failed',
+                output_dir=project_dir,
+                duration=time.monotonic() - started,
+                completed_services=list(setup.progress.completed_services) if setup else [],
+                error=str(e),
+            )
+
+    def write_report(self, results: List[ProjectResult]) -> str:
+        """Write the JSON summary report"""
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = os.path.join(self.output_dir, REPORT_FILE)
+        report = {
+            'manifest': os.path.abspath(self.manifest_path),
+            'total': len(results),
+            'succeeded': sum(1 for r in results if r.status == 'ok'),
+            'failed': sum(1 for r in results if r.status != 'ok'),
+            'projects': [asdict(r) for r in results],
+        }
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+        return path
+
+    def print_summary(self, results: List[ProjectResult]):
+        """Print a summary table of the batch run"""
+        print("\n" + "="*80)
+        print(f"{Colors.HEADER}{Colors.BOLD}📊 BATCH PROVISIONING SUMMARY{Colors.ENDC}")
+        print("="*80)
+        width = max([len(r.project_name) for r in results] + [7])
+        for r in results:
+            color = Colors.OKGREEN if r.status == 'ok' else Colors.FAIL
+            detail = r.output_dir if r.status == 'ok' else r.error
+            print(f"   {r.project_name:<{width}}  {color}{r.status:<6}{Colors.ENDC}  {r.duration:6.2f}s  {detail}")
+        succeeded = sum(1 for r in results if r.status == 'ok')
+        print(f"\n{Colors.BOLD}{succeeded}/{len(results)} projects provisioned{Colors.ENDC}")
+        print_info(f"Report written to {os.path.join(self.output_dir, REPORT_FILE)}")
@@ -0,0 +1,465 @@
+#!/usr/bin/env python3
+"""
+Performance checks for the setup CLI.
+
+    python benchmarks.py run                  # time the hot paths and compare with the baseline
+    python benchmarks.py run --save-baseline  # record the current timings as the baseline
+    python benchmarks.py run --check          # as run, but a missing baseline is a failure (for CI)
+    python benchmarks.py run -k progress      # only benchmarks whose name contains "progress"
+    python benchmarks.py startup              # fail if a cheap subcommand blows its startup budget
+
+`run` times each benchmark as the best of several repeats and fails when one is
+slower than its baseline by more than the tolerance (DEFAULT_TOLERANCE, or
+--tolerance). Baselines are machine specific, so record them on the machine
+that runs the comparison. Without a baseline `run` only prints the timings,
+unless --check is given, which turns that into a failure so CI cannot pass
+without comparing anything.
+
+`status` and `render-env` are called from scripts many times a day, so the
+time from loading main.py to exiting is held to STARTUP_BUDGET_MS (best of
+STARTUP_RUNS fresh interpreters, excluding the interpreter's own start), and
+they must not import any of HEAVY_MODULES. The CLI's bytecode is compiled
+first, as an installed copy has it after its first run; with stale or
+missing .pyc files (PYTHONDONTWRITEBYTECODE) every run would recompile.
+"""
+
+import gc
+import os
+import sys
+import json
+import time
+import argparse
+import builtins
+import platform
+import tempfile
+import subprocess
+from contextlib import contextmanager, redirect_stdout
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+CLI_DIR = os.path.dirname(os.path.abspath(__file__))
+MAIN = os.path.join(CLI_DIR, "main.py")
+BASELINE_FILE = os.path.join(CLI_DIR, "benchmark-baseline.json")
+
+DEFAULT_TOLERANCE = 0.25
+REPEATS = 5
+MIN_REPEAT_TIME = 0.05
+
+STARTUP_BUDGET_MS = 40.0
+STARTUP_RUNS = 15
+CHEAP_COMMANDS = (
+    ('status', '--json'),
+    ('render-env',),
+)
+HEAVY_MODULES = ('requests', 'urllib3', 'sqlite3', 'concurrent.futures', 'wizard', 'scheduler', 'services')
+
+SAMPLE_PROGRESS = {
+    'current_step': 5,
+    'project_name': 'bench-app',
+    'completed_services': ['github', 'vercel', 'neon', 'polar'],
+    'completed_steps': ['github', 'vercel', 'neon', 'polar'],
+    'api_keys': {
+        'github_repo_url': 'https://github.com/bench/bench-app',
+        'polar_access_token': 'polar_oat_bench',
+        'polar_webhook_secret': 'bench-secret',
+    },
+    'service_configs': {
+        'vercel': {'name': 'Vercel Project', 'url': 'https://bench-app.vercel.app',
+                   'credentials': {'project_url': 'https://bench-app.vercel.app'}},
+    },
+}
+
+_PROBE = """
+import sys, json, time, runpy
+started = time.perf_counter()
+sys.path.insert(0, {cli_dir!r})
+sys.argv = [{main!r}] + {args!r}
+try:
+    runpy.run_path({main!r}, run_name='__main__')
+except SystemExit:
+    pass
+elapsed = (time.perf_counter() - started) * 1000
+print(json.dumps([elapsed, sorted(m for m in {heavy!r} if m in sys.modules)]), file=sys.stderr)
+"""
+
+def seed_workdir(path: str):
+    """Write a saved setup for the commands to work on"""
+    from progress import PROGRESS_FILE
+    with open(os.path.join(path, PROGRESS_FILE), 'w') as f:
+        json.dump(SAMPLE_PROGRESS, f)
+
+def probe(args: Tuple[str, ...], cwd: str) -> Tuple[float, List[str]]:
+    """Run main.py with args in a fresh interpreter, returning its run time in ms and heavy imports"""
+    code = _PROBE.format(cli_dir=CLI_DIR, main=MAIN, args=list(args), heavy=HEAVY_MODULES)
+    result = subprocess.run([sys.executable, '-c', code], cwd=cwd, capture_output=True, text=True)
+    elapsed, modules = json.loads(result.stderr.strip().splitlines()[-1])
+    return elapsed, modules
+
+def measure_startup(runs: int = STARTUP_RUNS) -> Dict[str, Tuple[float, List[str]]]:
+    """Best run time and heavy imports of each cheap command"""
+    import compileall
+    compileall.compile_dir(CLI_DIR, maxlevels=0, quiet=1)
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        seed_workdir(workdir)
+        for args in CHEAP_COMMANDS:
+            samples = [probe(args, workdir) for _ in range(runs)]
+            results[' '.join(args)] = (min(s[0] for s in samples), samples[-1][1])
+    return results
+
+def check_startup(budget_ms: float = STARTUP_BUDGET_MS) -> Tuple[bool, List[str]]:
+    """Check every cheap command against the budget and the heavy module list"""
+    failures = []
+    for command, (elapsed, modules) in measure_startup().items():
+        print(f"   {command:<16} {elapsed:6.1f}ms (budget {budget_ms:.0f}ms)")
+        if elapsed > budget_ms:
+            failures.append(f"{command} took {elapsed:.1f}ms")
+        if modules:
+            failures.append(f"{command} imports {', '.join(modules)}")
+    return not failures, failures
+
+WIZARD_ANSWERS = (
+    ('Resume previous setup', 'n'),
+    ('Enter your project name', 'bench-app'),
+    ('Fork the template automatically', 'n'),
+    ('forked repository URL', 'https://github.com/bench/bench-app'),
+    ('Follow the deployment', 'n'),
+    ('Vercel project dashboard URL', 'https://vercel.com/bench/bench-app'),
+    ('sandbox environment', 'y'),
+    ('products and webhook automatically', 'n'),
+    ('organization slug', 'bench-org'),
+    ('Pro Plan Product ID', 'prod_pro_bench'),
+    ('Business Plan Product ID', 'prod_business_bench'),
+    ('Polar API token', 'polar_oat_bench'),
+    ('Polar Webhook Signing Secret', 'polar_whsec_bench'),
+    ('Clerk Publishable Key', 'pk_test_bench'),
+    ('Clerk Secret Key', 'sk_test_bench'),
+    ('Clerk Webhook Signing Secret', 'whsec_bench'),
+    ('Resend API key', 're_bench'),
+    ('Sentry DSN', 'https://key@o1.ingest.sentry.io/1'),
+    ('Push the variables to Vercel', 'n'),
+    ('Probe the deployment', 'n'),
+)
+MAX_WIZARD_PROMPTS = 200
+
+@dataclass
+class BenchmarkResult:
+    """Best time per call of one benchmark"""
+    name: str
+    seconds: float
+    baseline: Optional[float] = None
+
+    @property
+    def change(self) -> Optional[float]:
+        if not self.baseline:
+            return None
+        return self.seconds / self.baseline - 1
+
+_benchmarks: Dict[str, Callable] = {}
+
+def benchmark(name: str):
+    """Register a benchmark: a function that prepares state and returns the callable to time"""
+    def register(setup: Callable) -> Callable:
+        _benchmarks[name] = setup
+        return setup
+    return register
+
+def full_progress(extra_keys: int = 0, extra_configs: int = 0):
+    """A completed setup, optionally padded to fleet-scale size"""
+    from progress import SetupProgress
+    progress = SetupProgress(
+        current_step=9,
+        project_name='bench-app',
+        completed_services=['github', 'vercel', 'neon', 'polar', 'clerk', 'resend', 'sentry', 'vercel-env'],
+        completed_steps=['github', 'vercel', 'neon', 'polar', 'clerk', 'resend', 'sentry', 'vercel-env'],
+        api_keys={
+            'github_repo_url': 'https://github.com/bench/bench-app',
+            'polar_access_token': 'polar_oat_bench',
+            'polar_webhook_secret': 'polar_whsec_bench',
+            'clerk_publishable_key': 'pk_test_bench',
+            'clerk_secret_key': 'sk_test_bench',
+            'clerk_webhook_secret': 'whsec_bench',
+            'resend_api_key': 're_bench',
+            'resend_from_email': 'onboarding@resend.dev',
+            'resend_from_name': 'Bench App',
+            'sentry_dsn': 'https://key@o1.ingest.sentry.io/1',
+            'cron_secret': 'Y3Jvbi1zZWNyZXQtYmVuY2g=',
+        },
+        service_configs={
+            'vercel': {'name': 'Vercel Project', 'url': 'https://bench-app.vercel.app',
+                       'credentials': {'project_url': 'https://bench-app.vercel.app'}},
+            'polar': {'name': 'Polar Billing', 'url': 'https://sandbox.polar.sh/dashboard/bench-org',
+                      'credentials': {'organization_slug': 'bench-org', 'pro_product_id': 'prod_pro_bench',
+                                      'business_product_id': 'prod_business_bench', 'environment': 'sandbox'},
+                      'webhook_urls': ['https://bench-app.vercel.app/api/billing/webhook']},
+        },
+    )
+    for i in range(extra_keys):
+        progress.api_keys[f'extra_key_{i}'] = f'value-{i:06d}'
+    for i in range(extra_configs):
+        progress.service_configs[f'extra_service_{i}'] = {
+            'name': f'Service {i}', 'url': f'https://service-{i}.example.com',
+            'credentials': {'id': str(i), 'token': f'token-{i:06d}'}, 'webhook_urls': [],
+        }
+    return progress
+
+@contextmanager
+def quiet():
+    """Discard console output while timing"""
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        yield
+
+@benchmark('progress.save_large')
+def bench_progress_save(workdir: str):
+    from progress import ProgressJournal, ProgressManager
+    ProgressManager.use_backend(ProgressJournal(os.path.join(workdir, 'p.json'), os.path.join(workdir, 'p.journal')))
+    progress = full_progress(extra_keys=5000, extra_configs=500)
+    ProgressManager.save_progress(progress)
+    counter = iter(range(10 ** 9))
+
+    def run():
+        # One changed field per save, like a step finishing
+        progress.api_keys['extra_key_0'] = f'changed-{next(counter)}'
+        ProgressManager.save_progress(progress)
+    return run
+
+@benchmark('progress.load_large')
+def bench_progress_load(workdir: str):
+    from progress import ProgressJournal, ProgressManager
+    snapshot, journal = os.path.join(workdir, 'p.json'), os.path.join(workdir, 'p.journal')
+    writer = ProgressJournal(snapshot, journal)
+    progress = full_progress(extra_keys=5000, extra_configs=500)
+    writer.save(progress)
+    writer.compact(progress)
+    for i in range(200):
+        progress.api_keys[f'extra_key_{i}'] = f'changed-{i}'
+        writer.save(progress)
+    writer.flush()
+
+    def run():
+        ProgressManager.use_backend(ProgressJournal(snapshot, journal))
+        ProgressManager.load_progress()
+    return run
+
+@benchmark('env.generate_env_file')
+def bench_generate_env_file(workdir: str):
+    from wizard import InteractiveSetup
+    setup = InteractiveSetup.__new__(InteractiveSetup)
+    setup.progress = full_progress()
+
+    def run():
+        with quiet():
+            setup.generate_env_file()
+    return run
+
+@benchmark('env.generate_env_prod_file')
+def bench_generate_env_prod_file(workdir: str):
+    from wizard import InteractiveSetup
+    setup = InteractiveSetup.__new__(InteractiveSetup)
+    setup.progress = full_progress()
+
+    def run():
+        with quiet():
+            setup.generate_env_prod_file()
+    return run
+
+@benchmark('env.render_all')
+def bench_render_all(workdir: str):
+    from envfiles import ENVIRONMENTS, get_renderer
+    progress = full_progress()
+    renderer = get_renderer()
+    return lambda: renderer.render_all(progress, ENVIRONMENTS)
+
+@benchmark('validation.github_url_x1000')
+def bench_validate_github_url(workdir: str):
+    from validation import validate_github_url
+    cases = [(f'https://github.com/owner-{i}/project-{i}' + ('/' if i % 3 else ''), f'project-{i}')
+             for i in range(500)]
+    cases += [(f'https://gitlab.com/owner/project-{i}', f'project-{i}') for i in range(250)]
+    cases += [(f'https://github.com/owner/project-{i}', f'other-{i}') for i in range(250)]
+
+    def run():
+        for url, name in cases:
+            validate_github_url(url, name)
+    return run
+
+@benchmark('validation.project_name_x1000')
+def bench_normalize_project_name(workdir: str):
+    from validation import normalize_project_name
+    names = [f'  My Awesome_App {i}!! -- v{i % 7}  ' for i in range(1000)]
+
+    def run():
+        for name in names:
+            normalize_project_name(name)
+    return run
+
+@benchmark('wizard.scripted_run')
+def bench_wizard(workdir: str):
+    from progress import ProgressJournal, ProgressManager
+    from wizard import InteractiveSetup
+
+    def answer(prompt: str = '') -> str:
+        answer.calls += 1
+        if answer.calls > MAX_WIZARD_PROMPTS:
+            raise RuntimeError(f"Scripted wizard is stuck at: {prompt!r}")
+        for fragment, value in WIZARD_ANSWERS:
+            if fragment in prompt:
+                return value
+        return ''
+
+    def run():
+        answer.calls = 0
+        ProgressManager.use_backend(ProgressJournal())
+        original = builtins.input
+        builtins.input = answer
+        try:
+            with quiet():
+                InteractiveSetup().start()
+        finally:
+            builtins.input = original
+    return run
+
+def time_benchmark(fn: Callable, repeats: int = REPEATS) -> float:
+    """Best seconds per call, calling often enough per repeat to be measurable"""
+    # Like timeit, keep the collector from landing in random repeats
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return _best_time_per_call(fn, repeats)
+    finally:
+        if enabled:
+            gc.enable()
+
+def _best_time_per_call(fn: Callable, repeats: int) -> float:
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - started
+        if elapsed >= MIN_REPEAT_TIME or number >= 10 ** 6:
+            break
+        number *= 2 if elapsed == 0 else max(2, min(10, int(MIN_REPEAT_TIME / elapsed) + 1))
+
+    best = elapsed / number
+    for _ in range(repeats - 1):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, (time.perf_counter() - started) / number)
+    return best
+
+def run_benchmarks(pattern: str = '', repeats: int = REPEATS) -> List[BenchmarkResult]:
+    """Run every registered benchmark whose name contains pattern, each in its own working directory"""
+    from progress import ProgressManager, get_backend
+
+    results = []
+    cwd = os.getcwd()
+    backend = get_backend()
+    for name, setup in _benchmarks.items():
+        if pattern not in name:
+            continue
+        with tempfile.TemporaryDirectory() as workdir:
+            os.chdir(workdir)
+            try:
+                results.append(BenchmarkResult(name, time_benchmark(setup(workdir), repeats)))
+            finally:
+                os.chdir(cwd)
+                ProgressManager.use_backend(backend)
+    return results
+
+def load_baseline(path: str) -> Dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def save_baseline(path: str, results: List[BenchmarkResult]):
+    """Merge results into the baseline file"""
+    baseline = load_baseline(path)
+    baseline['python'] = platform.python_version()
+    baseline['machine'] = platform.machine()
+    baseline.setdefault('results', {}).update({r.name: r.seconds for r in results})
+    with open(path, 'w') as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+
+def _format_time(seconds: float) -> str:
+    if seconds >= 1:
+        return f"{seconds:.2f}s"
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.2f}ms"
+    return f"{seconds * 1e6:.1f}µs"
+
+def print_results(results: List[BenchmarkResult], tolerance: float):
+    from console import Colors
+    width = max([len(r.name) for r in results] + [9])
+    print(f"\n{Colors.BOLD}{'benchmark':<{width}}  {'time':>10}  {'baseline':>10}  change{Colors.ENDC}")
+    for r in results:
+        baseline = _format_time(r.baseline) if r.baseline else '-'
+        change = r.change
+        if change is None:
+            label = ''
+        else:
+            color = Colors.FAIL if change > tolerance else Colors.OKGREEN if change < -tolerance else Colors.ENDC
+            label = f"{color}{change:+.1%}{Colors.ENDC}"
+        print(f"{r.name:<{width}}  {_format_time(r.seconds):>10}  {baseline:>10}  {label}")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Setup CLI benchmarks")
+    parser.add_argument('command', choices=['run', 'startup'])
+    parser.add_argument('-k', '--filter', default='', help="Only run benchmarks whose name contains this")
+    parser.add_argument('--baseline', default=BASELINE_FILE, help="Baseline file to compare with")
+    parser.add_argument('--save-baseline', action='store_true', help="Record these timings as the baseline")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed slowdown over the baseline as a fraction (default: 0.25)")
+    parser.add_argument('--check', action='store_true',
+                        help="Fail when there is no baseline to compare with, instead of only warning")
+    parser.add_argument('--repeats', type=int, default=REPEATS, help="Repeats per benchmark; the best is kept")
+    return parser.parse_args(argv)
+
+def main():
+    sys.path.insert(0, CLI_DIR)
+    from console import print_success, print_error, print_warning, print_info
+
+    args = parse_args()
+    if args.command == 'startup':
+        ok, failures = check_startup()
+        for failure in failures:
+            print_error(failure)
+        if ok:
+            print_success("Startup budget met")
+        sys.exit(0 if ok else 1)
+
+    results = run_benchmarks(args.filter, args.repeats)
+    if not results:
+        print_error(f"No benchmark matches '{args.filter}'")
+        sys.exit(2)
+
+    baseline = load_baseline(args.baseline)
+    for r in results:
+        r.baseline = baseline.get('results', {}).get(r.name)
+    print_results(results, args.tolerance)
+
+    if args.save_baseline:
+        save_baseline(args.baseline, results)
+        print_info(f"Baseline saved to {args.baseline}")
+        return
+    if not baseline:
+        if args.check:
+            print_error(f"No baseline at {args.baseline} to check against; record one on this machine "
+                        "with --save-baseline first")
+            sys.exit(1)
+        print_warning("No baseline yet; run with --save-baseline to record one")
+        return
+    if baseline.get('python') != platform.python_version():
+        print_warning(f"Baseline was recorded on Python {baseline.get('python')}")
+
+    regressed = [r for r in results if r.change is not None and r.change > args.tolerance]
+    for r in regressed:
+        print_error(f"{r.name} regressed {r.change:+.1%} (tolerance {args.tolerance:.0%})")
+    if regressed:
+        sys.exit(1)
+    print_success(f"No regressions beyond {args.tolerance:.0%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,577 @@
+"""
+Scenario load engine for the authenticated billing API routes.
+
+Virtual users run journeys such as browse -> status -> checkout -> upgrade
+against a running app, with think times between the steps. Journeys arrive
+open-loop (Poisson arrivals at a fixed rate), so a slow app builds a backlog
+instead of quietly lowering the load. The rate can be split over several
+worker processes. Each route gets a latency histogram with log-spaced buckets,
+which add up across processes, and error rates.
+
+Nothing live is needed:
+
+- The engine serves a stub of the Clerk Backend API and of Polar on one
+  local port.
+- Clerk session tokens are signed with a local RSA key, and the app verifies
+  them without network through CLERK_JWT_KEY.
+- `stub_env` lists what the app must be started with, and `--app-command`
+  starts it that way.
+- Virtual users are the `seed-db` users (user_seed_<n>), so the seeded
+  subscriptions are what status, upgrade and cancel act on.
+
+Signing needs the cryptography package (pip install cryptography).
+"""
+
+import os
+import json
+import math
+import time
+import base64
+import random
+import shlex
+import signal
+import logging
+import threading
+import subprocess
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+import requests
+
+from console import Colors, print_info, print_warning
+from seeder import clerk_user_id, polar_subscription
+
+logger = logging.getLogger(__name__)
+
+STUB_KEY_FILE = ".kosuke-loadtest-key.pem"
+STUB_PORT = 8124
+STUB_FRONTEND_API = "stub.clerk.accounts.dev"
+DEFAULT_RATE = 5.0
+DEFAULT_DURATION = 60.0
+DEFAULT_CONCURRENCY = 256
+REQUEST_TIMEOUT = (3.05, 30)
+# Histogram buckets: 10 per decade from 0.1ms, the last one catching everything above 100s
+BUCKETS_PER_DECADE = 10
+BUCKET_FLOOR_MS = 0.1
+BUCKET_COUNT = 6 * BUCKETS_PER_DECADE + 1
+
+class LoadTestError(Exception):
+    """Raised when a load test cannot be set up"""
+
+@dataclass(frozen=True)
+class JourneyStep:
+    """One request of a journey, followed by a think time (mean seconds)"""
+    method: str
+    path: str
+    body: Optional[Dict] = None
+    think: float = 1.0
+
+def _steps(*steps: Tuple) -> List[JourneyStep]:
+    return [JourneyStep(*step) for step in steps]
+
+_STATUS = ('GET', '/api/billing/subscription-status')
+DEFAULT_JOURNEYS: Dict[str, List[JourneyStep]] = {
+    'browse': _steps(('GET', '/', None, 3.0), ('GET', '/home', None, 5.0), _STATUS),
+    'checkout': _steps(('GET', '/home', None, 3.0), _STATUS, ('GET', '/api/billing/can-subscribe', None, 4.0),
+                       ('POST', '/api/billing/create-checkout', {'tier': 'pro'})),
+    'upgrade': _steps(('GET', '/home', None, 3.0), _STATUS, ('POST', '/api/billing/create-checkout', {'tier': 'pro'}, 5.0),
+                      ('POST', '/api/billing/upgrade-subscription', {'tier': 'business'})),
+    'cancel': _steps(_STATUS + (None, 6.0), ('POST', '/api/billing/cancel-subscription')),
+}
+DEFAULT_MIX = {'browse': 6.0, 'checkout': 2.0, 'upgrade': 1.0, 'cancel': 1.0}
+
+def load_scenarios(path: str) -> Tuple[Dict[str, List[JourneyStep]], Dict[str, float]]:
+    """Journeys and mix from a JSON or YAML file: {"journeys": {name: [step, ...]}, "mix": {name: weight}}"""
+    with open(path, 'r') as f:
+        if path.endswith(('.yaml', '.yml')):
+            try:
+                import yaml
+            except ImportError:
+                raise LoadTestError("YAML scenarios require PyYAML (pip install pyyaml)")
+            data = yaml.safe_load(f)
+        else:
+            data = json.load(f)
+    try:
+        journeys = {name: [JourneyStep(**step) for step in steps] for name, steps in data['journeys'].items()}
+    except (KeyError, TypeError) as e:
+        raise LoadTestError(f"Invalid scenario file {path}: {e}")
+    mix = {name: float(weight) for name, weight in (data.get('mix') or dict.fromkeys(journeys, 1.0)).items()}
+    return journeys, mix
+
+class LatencyHistogram:
+    """Counts per log-spaced latency bucket; histograms from different processes just add up"""
+
+    def __init__(self, counts: Optional[List[int]] = None):
+        self.counts = list(counts) if counts else [0] * BUCKET_COUNT
+
+    @staticmethod
+    def upper_ms(index: int) -> float:
+        return BUCKET_FLOOR_MS * 10 ** ((index + 1) / BUCKETS_PER_DECADE)
+
+    def add(self, ms: float):
+        index = int(math.log10(max(ms, BUCKET_FLOOR_MS) / BUCKET_FLOOR_MS) * BUCKETS_PER_DECADE)
+        self.counts[min(index, BUCKET_COUNT - 1)] += 1
+
+    def merge(self, other: 'LatencyHistogram'):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts)
+
+    def percentile(self, p: float) -> float:
+        """Upper bound of the bucket holding the nearest-rank percentile"""
+        rank = max(1, math.ceil(p / 100 * self.total))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= rank:
+                return self.upper_ms(index)
+        return 0.0
+
+    def buckets(self) -> List[Tuple[float, int]]:
+        """(upper bound in ms, count) of the non-empty buckets"""
+        return [(round(self.upper_ms(i), 3), count) for i, count in enumerate(self.counts) if count]
+
+@dataclass
+class RouteStats:
+    """Outcomes of one route ("POST /api/billing/create-checkout")"""
+    route: str
+    histogram: LatencyHistogram = field(default_factory=LatencyHistogram)
+    statuses: Dict[str, int] = field(default_factory=dict)
+
+    def record(self, status: str, ms: float):
+        self.histogram.add(ms)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    def merge(self, other: 'RouteStats'):
+        self.histogram.merge(other.histogram)
+        for status, count in other.statuses.items():
+            self.statuses[status] = self.statuses.get(status, 0) + count
+
+    def count(self, predicate) -> int:
+        return sum(n for status, n in self.statuses.items() if predicate(status))
+
+    def summary(self, seconds: float) -> Dict:
+        total = self.histogram.total
+        errors = self.count(lambda s: not s.isdigit() or int(s) >= 500)
+        rejected = self.count(lambda s: s.isdigit() and 400 <= int(s) < 500)
+        return {
+            'route': self.route,
+            'requests': total,
+            'rate': round(total / seconds, 2) if seconds else 0.0,
+            'error_rate': round(errors / total, 4) if total else 0.0,
+            'rejected_rate': round(rejected / total, 4) if total else 0.0,
+            'statuses': dict(sorted(self.statuses.items())),
+            'p50_ms': round(self.histogram.percentile(50), 2),
+            'p90_ms': round(self.histogram.percentile(90), 2),
+            'p99_ms': round(self.histogram.percentile(99), 2),
+            'histogram': self.histogram.buckets(),
+        }
+
+def _b64url(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+def _crypto():
+    try:
+        from cryptography.hazmat.primitives import hashes, serialization
+        from cryptography.hazmat.primitives.asymmetric import padding, rsa
+    except ImportError:
+        raise LoadTestError("Stubbed Clerk sessions require cryptography (pip install cryptography)")
+    return hashes, serialization, padding, rsa
+
+def load_signing_key(path: str = STUB_KEY_FILE) -> bytes:
+    """PEM private key for session tokens, created on first use and reused so the app's env stays valid"""
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        pass
+    _, serialization, _, rsa = _crypto()
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                            serialization.NoEncryption())
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(pem)
+    return pem
+
+class SessionSigner:
+    """Mints Clerk-shaped RS256 session tokens for any user id"""
+
+    def __init__(self, private_pem: bytes, authorized_party: str, lifetime: float = 3600.0):
+        hashes, serialization, padding, _ = _crypto()
+        self._key = serialization.load_pem_private_key(private_pem, password=None)
+        self._sign = lambda data: self._key.sign(data, padding.PKCS1v15(), hashes.SHA256())
+        self.authorized_party = authorized_party.rstrip('/')
+        self.lifetime = lifetime
+        self._tokens: Dict[str, Tuple[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def public_pem(self) -> str:
+        _, serialization, _, _ = _crypto()
+        return self._key.public_key().public_bytes(serialization.Encoding.PEM,
+                                                   serialization.PublicFormat.SubjectPublicKeyInfo).decode('ascii')
+
+    def token(self, user_id: str) -> str:
+        now = time.time()
+        with self._lock:
+            cached = self._tokens.get(user_id)
+            if cached and cached[1] - now > 60:
+                return cached[0]
+        header = {'alg': 'RS256', 'typ': 'JWT', 'kid': 'ins_loadtest'}
+        claims = {
+            'azp': self.authorized_party, 'iss': f"https://{STUB_FRONTEND_API}", 'sub': user_id,
+            'sid': f"sess_{user_id}", 'iat': int(now) - 5, 'nbf': int(now) - 5, 'exp': int(now + self.lifetime),
+        }
+        signing_input = (f"{_b64url(json.dumps(header, separators=(',', ':')).encode())}."
+                         f"{_b64url(json.dumps(claims, separators=(',', ':')).encode())}")
+        token = f"{signing_input}.{_b64url(self._sign(signing_input.encode('ascii')))}"
+        with self._lock:
+            self._tokens[user_id] = (token, now + self.lifetime)
+        return token
+
+def stub_env(stub_url: str, public_pem: str) -> Dict[str, str]:
+    """Variables that point the app's Clerk and Polar clients at the stubs"""
+    publishable = base64.b64encode(f"{STUB_FRONTEND_API}$".encode('ascii')).decode('ascii').rstrip('=')
+    return {
+        'CLERK_JWT_KEY': public_pem.strip(),
+        'CLERK_API_URL': stub_url,
+        'CLERK_SECRET_KEY': "sk_test_loadtest",
+        'NEXT_PUBLIC_CLERK_PUBLISHABLE_KEY': f"pk_test_{publishable}",
+        'POLAR_API_URL': stub_url,
+        'POLAR_ACCESS_TOKEN': "polar_oat_loadtest",
+    }
+
+def _millis(moment: datetime) -> int:
+    return int(moment.timestamp() * 1000)
+
+def clerk_user(user_id: str) -> Dict:
+    """A Clerk Backend API user, matching the seed-db row for user_seed_<n> ids"""
+    index = user_id.rsplit('_', 1)[-1]
+    created = _millis(datetime.now(timezone.utc) - timedelta(days=30))
+    email_id = f"idn_{index}"
+    return {
+        'object': 'user', 'id': user_id, 'external_id': None, 'username': None,
+        'first_name': "Seed", 'last_name': f"User {index}", 'image_url': f"https://img.clerk.com/seed/{index}",
+        'has_image': False, 'primary_email_address_id': email_id, 'primary_phone_number_id': None,
+        'primary_web3_wallet_id': None, 'password_enabled': True, 'two_factor_enabled': False,
+        'totp_enabled': False, 'backup_code_enabled': False, 'banned': False, 'locked': False,
+        'email_addresses': [{
+            'object': 'email_address', 'id': email_id, 'email_address': f"seed-{index}@example.com",
+            'verification': {'status': 'verified', 'strategy': 'email_code', 'attempts': None, 'expire_at': None},
+            'linked_to': [],
+        }],
+        'phone_numbers': [], 'web3_wallets': [], 'external_accounts': [], 'saml_accounts': [],
+        'public_metadata': {}, 'private_metadata': {}, 'unsafe_metadata': {},
+        'created_at': created, 'updated_at': created, 'last_sign_in_at': created, 'last_active_at': created,
+    }
+
+def polar_checkout(number: int, request: Dict) -> Dict:
+    """A Polar checkout session as returned by POST /v1/checkouts/"""
+    now = datetime.now(timezone.utc)
+    products = request.get('products') or [request.get('product_id') or "prod_loadtest"]
+    secret = f"polar_c_loadtest_{number}"
+    return {
+        'id': f"chk_loadtest_{number}", 'created_at': now.isoformat(), 'modified_at': None,
+        'status': 'open', 'client_secret': secret, 'url': f"https://sandbox.polar.sh/checkout/{secret}",
+        'expires_at': (now + timedelta(hours=1)).isoformat(), 'success_url': request.get('success_url', ''),
+        'embed_origin': None, 'amount': 2000, 'discount_amount': 0, 'net_amount': 2000, 'tax_amount': None,
+        'total_amount': 2000, 'currency': 'usd', 'product_id': products[0], 'product_price_id': f"{products[0]}_price",
+        'discount_id': None, 'allow_discount_codes': True, 'require_billing_address': False,
+        'is_discount_applicable': True, 'is_free_product_price': False, 'is_payment_required': True,
+        'is_payment_setup_required': True, 'is_payment_form_required': True, 'customer_id': None,
+        'is_business_customer': False, 'customer_name': None, 'customer_email': request.get('customer_email'),
+        'customer_ip_address': None, 'customer_billing_name': None, 'customer_billing_address': None,
+        'customer_tax_id': None, 'payment_processor': 'stripe', 'payment_processor_metadata': {},
+        'metadata': request.get('metadata') or {}, 'customer_metadata': {}, 'external_customer_id': None,
+        'custom_field_data': {}, 'attached_custom_fields': [], 'subscription_id': None, 'discount': None,
+        'products': [], 'product': None, 'product_price': None,
+    }
+
+class StubServices:
+    """Clerk Backend API and Polar stubs on one local port, counting the calls they answer"""
+
+    def __init__(self, port: int = STUB_PORT, latency: float = 0.0):
+        self.latency = latency
+        self.calls: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and body are written separately; without this, keep-alive calls wait out delayed ACKs
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                self.answer('GET')
+
+            def do_POST(self):
+                self.answer('POST')
+
+            def do_PATCH(self):
+                self.answer('PATCH')
+
+            def do_DELETE(self):
+                self.answer('DELETE')
+
+            def answer(self, method: str):
+                length = int(self.headers.get('Content-Length') or 0)
+                try:
+                    request = json.loads(self.rfile.read(length)) if length else {}
+                except ValueError:
+                    request = {}
+                path = self.path.split('?', 1)[0].rstrip('/')
+                code, body, name = stub.route(method, path, request)
+                with stub._lock:
+                    stub.calls[name] = stub.calls.get(name, 0) + 1
+                if stub.latency:
+                    time.sleep(stub.latency)
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        self._thread = None
+        self._checkouts = 0
+
+    def route(self, method: str, path: str, request: Dict) -> Tuple[int, Dict, str]:
+        """(status, body, call name) for one stub request"""
+        parts = path.strip('/').split('/')
+        if method == 'GET' and len(parts) == 3 and parts[:2] == ['v1', 'users']:
+            return 200, clerk_user(parts[2]), 'clerk users.get'
+        if len(parts) == 3 and parts[:2] == ['v1', 'subscriptions']:
+            subscription = polar_subscription(parts[2])
+            if method == 'PATCH':
+                subscription.update(request)
+            elif method == 'DELETE':
+                now = datetime.now(timezone.utc).isoformat()
+                subscription.update(status='canceled', canceled_at=now, ended_at=now)
+            return 200, subscription, f"polar subscriptions.{method.lower()}"
+        if method == 'POST' and parts == ['v1', 'checkouts']:
+            with self._lock:
+                self._checkouts += 1
+                number = self._checkouts
+            return 201, polar_checkout(number, request), 'polar checkouts.create'
+        return 404, {'detail': 'Not found'}, f"unhandled {method} {path}"
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='stub-services', daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+@dataclass
+class LoadSpec:
+    """One worker's share of the load; plain data so it can be sent to a worker process"""
+    app_url: str
+    journeys: Dict[str, List[Dict]]
+    mix: Dict[str, float]
+    rate: float = DEFAULT_RATE
+    duration: float = DEFAULT_DURATION
+    concurrency: int = DEFAULT_CONCURRENCY
+    users: int = 1000
+    think_scale: float = 1.0
+    seed: int = 0
+    private_pem: bytes = b""
+
+class JourneyRunner:
+    """Starts journeys at Poisson arrival times and records every request"""
+
+    def __init__(self, spec: LoadSpec, session: Optional[requests.Session] = None):
+        from services import create_session
+        self.spec = spec
+        self.journeys = {name: [JourneyStep(**step) for step in steps] for name, steps in spec.journeys.items()}
+        unknown = sorted(set(spec.mix) - set(self.journeys))
+        if unknown:
+            raise LoadTestError(f"Unknown journeys in the mix: {', '.join(unknown)}")
+        self.signer = SessionSigner(spec.private_pem, spec.app_url)
+        self.session = session or create_session(spec.concurrency)
+        self.random = random.Random(spec.seed)
+        self.routes: Dict[str, RouteStats] = {}
+        self.outcomes: Dict[str, Dict[str, int]] = {}
+        self.max_lag = 0.0
+        self._lock = threading.Lock()
+
+    def arrivals(self) -> List[Tuple[float, str, str, int]]:
+        """(offset, journey, user id, seed) of every journey, drawn up front"""
+        names = list(self.spec.mix)
+        weights = [self.spec.mix[name] for name in names]
+        arrivals, offset = [], 0.0
+        while True:
+            offset += self.random.expovariate(self.spec.rate)
+            if offset >= self.spec.duration:
+                return arrivals
+            arrivals.append((offset, self.random.choices(names, weights)[0],
+                             clerk_user_id(self.random.randrange(self.spec.users)), self.random.getrandbits(32)))
+
+    def run(self) -> Dict:
+        plan = self.arrivals()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.spec.concurrency) as pool:
+            for offset, journey, user_id, seed in plan:
+                scheduled = started + offset
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                pool.submit(self.journey, journey, user_id, seed, scheduled)
+        return {
+            'seconds': time.perf_counter() - started,
+            'max_lag': self.max_lag,
+            'routes': {route: {'counts': stats.histogram.counts, 'statuses': stats.statuses}
+                       for route, stats in self.routes.items()},
+            'journeys': self.outcomes,
+        }
+
+    def journey(self, name: str, user_id: str, seed: int, scheduled: float):
+        rng = random.Random(seed)
+        # A journey waiting for a free thread is the app falling behind, so it counts toward the first request
+        self.max_lag = max(self.max_lag, time.perf_counter() - scheduled)
+        headers = {'Authorization': f"Bearer {self.signer.token(user_id)}"}
+        outcome = 'completed'
+        for number, step in enumerate(self.journeys[name]):
+            sent = scheduled if number == 0 else time.perf_counter()
+            try:
+                response = self.session.request(step.method, f"{self.spec.app_url}{step.path}", json=step.body,
+                                                headers=headers, timeout=REQUEST_TIMEOUT, allow_redirects=False)
+                status = str(response.status_code)
+            except requests.RequestException as e:
+                status = type(e).__name__
+            self.record(f"{step.method} {step.path}", status, (time.perf_counter() - sent) * 1000)
+            if not status.isdigit() or int(status) >= 500:
+                # Users give up after an error
+                outcome = 'aborted'
+                break
+            if step.think and number < len(self.journeys[name]) - 1:
+                mean = step.think * self.spec.think_scale
+                time.sleep(min(rng.expovariate(1 / mean), 5 * mean) if mean > 0 else 0)
+        with self._lock:
+            counts = self.outcomes.setdefault(name, {})
+            counts[outcome] = counts.get(outcome, 0) + 1
+
+    def record(self, route: str, status: str, ms: float):
+        with self._lock:
+            self.routes.setdefault(route, RouteStats(route)).record(status, ms)
+
+def run_worker(spec: LoadSpec) -> Dict:
+    """Entry point of a worker process"""
+    return JourneyRunner(spec).run()
+
+def run_load(spec: LoadSpec, processes: int = 1) -> Dict:
+    """Run the load in-process or split over worker processes, returning the merged report"""
+    if processes <= 1:
+        results = [run_worker(spec)]
+    else:
+        import multiprocessing
+        shares = [LoadSpec(**{**asdict(spec), 'rate': spec.rate / processes, 'seed': spec.seed * 1000 + i,
+                              'concurrency': max(1, spec.concurrency // processes)})
+                  for i in range(processes)]
+        # Spawned rather than forked, since the parent runs the stub server's threads
+        with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('spawn')) as pool:
+            results = list(pool.map(run_worker, shares))
+
+    routes: Dict[str, RouteStats] = {}
+    journeys: Dict[str, Dict[str, int]] = {}
+    for result in results:
+        for route, data in result['routes'].items():
+            routes.setdefault(route, RouteStats(route)).merge(
+                RouteStats(route, LatencyHistogram(data['counts']), data['statuses']))
+        for name, counts in result['journeys'].items():
+            for outcome, n in counts.items():
+                journeys.setdefault(name, {})[outcome] = journeys.get(name, {}).get(outcome, 0) + n
+    seconds = max(result['seconds'] for result in results)
+    total = RouteStats('all')
+    for stats in routes.values():
+        total.merge(stats)
+    return {
+        'app_url': spec.app_url,
+        'target_rate': spec.rate,
+        'processes': max(1, processes),
+        'duration_s': round(seconds, 3),
+        'max_schedule_lag_ms': round(max(result['max_lag'] for result in results) * 1000, 2),
+        'journeys': journeys,
+        'routes': [routes[route].summary(seconds) for route in sorted(routes)],
+        'total': total.summary(seconds),
+    }
+
+class AppProcess:
+    """Runs the app with the stub environment for the length of a load test"""
+
+    def __init__(self, command: str, env: Dict[str, str], url: str, ready_timeout: float = 120.0):
+        self.command = command
+        self.env = env
+        self.url = url
+        self.ready_timeout = ready_timeout
+        self.process = None
+
+    def __enter__(self):
+        from probe import Backoff, is_up
+        self.process = subprocess.Popen(shlex.split(self.command), env={**os.environ, **self.env},
+                                        start_new_session=True)
+        deadline = time.monotonic() + self.ready_timeout
+        backoff = Backoff()
+        while True:
+            if self.process.poll() is not None:
+                raise LoadTestError(f"`{self.command}` exited with status {self.process.returncode}")
+            try:
+                if is_up(requests.get(self.url, timeout=5, allow_redirects=False).status_code):
+                    return self
+            except requests.RequestException:
+                pass
+            if time.monotonic() > deadline:
+                self.__exit__()
+                raise LoadTestError(f"The app did not answer at {self.url} within {self.ready_timeout:.0f}s")
+            backoff.wait()
+
+    def __exit__(self, *exc):
+        if self.process and self.process.poll() is None:
+            # The command may be a wrapper such as npm, so stop its whole process group
+            os.killpg(self.process.pid, signal.SIGTERM)
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                os.killpg(self.process.pid, signal.SIGKILL)
+
+def print_stub_env(env: Dict[str, str]):
+    """Print the stub variables as shell exports"""
+    for key, value in env.items():
+        print(f"export {key}={shlex.quote(value)}")
+
+def print_load_report(report: Dict, stub_calls: Optional[Dict[str, int]] = None):
+    """Print the per-route latency and error table, journey outcomes and stub traffic"""
+    print(f"\n{Colors.BOLD}{'route':<44} {'reqs':>6} {'err%':>6} {'4xx%':>6} {'p50':>9} {'p90':>9} "
+          f"{'p99':>9}  statuses{Colors.ENDC}")
+    for row in report['routes'] + [report['total']]:
+        color = Colors.BOLD if row is report['total'] else (Colors.FAIL if row['error_rate'] else '')
+        statuses = ', '.join(f"{status}×{n}" for status, n in row['statuses'].items())
+        print(f"{color}{row['route']:<44} {row['requests']:>6} {row['error_rate']:>6.1%} {row['rejected_rate']:>6.1%} "
+              f"{row['p50_ms']:>7.1f}ms {row['p90_ms']:>7.1f}ms {row['p99_ms']:>7.1f}ms  {statuses}"
+              f"{Colors.ENDC if color else ''}")
+    outcomes = ', '.join(f"{name} {counts.get('completed', 0)}/{sum(counts.values())}"
+                         for name, counts in sorted(report['journeys'].items()))
+    print_info(f"Journeys completed: {outcomes}")
+    print_info(f"{report['total']['requests']} requests in {report['duration_s']:.1f}s from "
+               f"{report['processes']} process(es); latencies are histogram bucket upper bounds")
+    if report['max_schedule_lag_ms'] > 100:
+        print_info(f"Journeys started up to {report['max_schedule_lag_ms']:.0f}ms late; "
+                   "raise --concurrency or --processes")
+    if any(row['statuses'].get('401') for row in report['routes']):
+        print_warning("The app rejected the stub sessions (401); start it with the variables from --print-env")
+    if stub_calls:
+        print_info("Stub calls: " + ', '.join(f"{name} {n}" for name, n in sorted(stub_calls.items())))
@@ -0,0 +1,836 @@
+"""
+Argument parsing and the commands behind main.py.
+
+Each command imports the subsystems it needs when it runs, so `status` and
+`render-env` never load the HTTP stack or the wizard.
+"""
+
+import sys
+import argparse
+
+TOTAL_STEPS = 8
+
+def load_saved_progress():
+    """Saved setup progress, or None after printing why it is missing"""
+    from console import print_error
+    from progress import ProgressManager
+
+    progress = ProgressManager.load_progress()
+    if not progress:
+        print_error("No saved setup found")
+    return progress
+
+def show_status(args) -> bool:
+    """Print the saved setup's progress, or query the project store when filters are given"""
+    if args.store or args.step is not None or args.with_service or args.without_service:
+        return list_projects(args)
+
+    import json
+    from console import Colors, print_info
+
+    progress = load_saved_progress()
+    if not progress:
+        return False
+    if args.json:
+        print(json.dumps({
+            'project_name': progress.project_name,
+            'current_step': progress.current_step,
+            'completed_steps': progress.completed_steps,
+            'completed_services': progress.completed_services,
+        }))
+        return True
+
+    step = min(progress.current_step, TOTAL_STEPS)
+    state = "complete" if progress.current_step > TOTAL_STEPS else f"at step {step}/{TOTAL_STEPS}"
+    print(f"{Colors.BOLD}{progress.project_name or '(unnamed project)'}{Colors.ENDC} {state}")
+    print_info(f"Completed steps: {', '.join(progress.completed_steps) or 'none'}")
+    print_info(f"Configured services: {', '.join(progress.completed_services) or 'none'}")
+    return True
+
+def verify_saved_progress(args=None) -> bool:
+    """Verify the credentials of the saved setup against the provider APIs"""
+    import time
+    from console import print_info
+    from verify import CredentialVerifier, print_results
+
+    progress = load_saved_progress()
+    if not progress:
+        return False
+
+    print_info(f"Verifying credentials for {progress.project_name}...")
+    started = time.monotonic()
+    results = CredentialVerifier().verify(progress)
+    print_results(results, time.monotonic() - started)
+    return all(r.ok for r in results)
+
+def list_projects(args) -> bool:
+    """Query the project store"""
+    import time
+    from store import ProgressStore, print_projects
+
+    store = ProgressStore(args.store)
+    started = time.monotonic()
+    projects = store.query(step=args.step, with_service=args.with_service, without_service=args.without_service)
+    print_projects(projects, time.monotonic() - started)
+    return True
+
+def render_env(args) -> bool:
+    """Regenerate env files from the saved setup, or from the project store with --store/--project"""
+    if args.store or args.project:
+        return render_env_files(args)
+
+    from console import print_success, print_info
+    from progress import ProgressManager
+    from envfiles import ensure_cron_secret, write_env_files
+
+    progress = load_saved_progress()
+    if not progress:
+        return False
+    if ensure_cron_secret(progress):
+        ProgressManager.save_progress(progress)
+    written = write_env_files(progress, args.output_dir or '.')
+    changed = [path for path, was_written in written.items() if was_written]
+    if changed:
+        print_success(f"Wrote {', '.join(changed)}")
+    else:
+        print_info("Env files are already up to date")
+    return True
+
+def render_env_files(args) -> bool:
+    """Regenerate env files for projects in the project store, skipping unchanged files"""
+    import os
+    import time
+    from console import print_success, print_error
+    from envfiles import write_env_files
+    from store import ProgressStore
+    from validation import normalize_project_name
+
+    store = ProgressStore(args.store)
+    if args.project:
+        names = [normalize_project_name(args.project)]
+    else:
+        names = [p.project_name for p in store.query()]
+
+    output_dir = args.output_dir or 'projects'
+    started = time.monotonic()
+    written = unchanged = 0
+    for name in names:
+        progress = store.load(name)
+        if not progress:
+            print_error(f"Project not found: {name}")
+            return False
+        project_dir = os.path.join(output_dir, name)
+        os.makedirs(project_dir, exist_ok=True)
+        for changed in write_env_files(progress, project_dir).values():
+            written += changed
+            unchanged += not changed
+    print_success(f"Rendered {len(names)} projects in {time.monotonic() - started:.2f}s "
+                  f"({written} files written, {unchanged} unchanged)")
+    return True
+
+def push_env(args) -> bool:
+    """Push the saved setup's variables to Vercel"""
+    import os
+    import requests
+    from console import print_error
+    from envpush import push_progress, print_push_result
+    from services import ServiceError
+
+    progress = load_saved_progress()
+    if not progress:
+        return False
+    token = progress.api_keys.get('vercel_token') or os.environ.get('VERCEL_TOKEN')
+    if not token:
+        print_error("No Vercel token saved; set VERCEL_TOKEN")
+        return False
+    team_id = progress.service_configs.get('vercel', {}).get('credentials', {}).get('team_id', '')
+
+    try:
+        result = push_progress(progress, token, os.environ.get('VERCEL_TEAM_ID', team_id), force=args.force)
+    except (ServiceError, requests.RequestException) as e:
+        print_error(f"Push failed: {e}")
+        return False
+    print_push_result(result)
+    return True
+
+def provision_manifest(args) -> bool:
+    """Provision every project of a manifest without prompting"""
+    from console import print_error
+    from batch import BatchProvisioner, ManifestError
+    from store import ProgressStore
+
+    try:
+        results = BatchProvisioner(args.manifest, args.output_dir or 'projects', args.workers, verify=args.verify,
+                                   store=ProgressStore(args.store)).run()
+    except (OSError, ValueError, ManifestError) as e:
+        print_error(f"Batch provisioning failed: {e}")
+        return False
+    return all(r.status == 'ok' for r in results)
+
+def webhook_load(args) -> bool:
+    """Fire signed webhook deliveries at a running app and report latency per event type"""
+    import os
+    import json
+    from console import print_error, print_info
+    from progress import ProgressManager
+    from webhookload import (
+        POLAR_TEMPLATES, WebhookLoadGenerator, build_sources, parse_event_mix, print_report,
+    )
+
+    # Secrets come from the flags, then the environment, then the saved setup
+    saved = ProgressManager.load_progress()
+    saved_keys = saved.api_keys if saved else {}
+    polar_secret = args.polar_secret or os.environ.get('POLAR_WEBHOOK_SECRET') or saved_keys.get('polar_webhook_secret', '')
+    clerk_secret = args.clerk_secret or os.environ.get('CLERK_WEBHOOK_SECRET') or saved_keys.get('clerk_webhook_secret', '')
+    mix = parse_event_mix(args.events) if args.events else dict.fromkeys(POLAR_TEMPLATES, 1.0)
+
+    try:
+        generator = WebhookLoadGenerator(args.url, build_sources(polar_secret, clerk_secret, args.templates), mix,
+                                         rate=args.rate, concurrency=args.concurrency,
+                                         invalid_ratio=args.invalid_ratio, seed=args.seed)
+    except (OSError, ValueError) as e:
+        print_error(f"Cannot start the load: {e}")
+        return False
+    total = args.requests or int(args.duration * args.rate)
+    print_info(f"Sending {total} webhooks to {args.url} at {args.rate:g}/s with up to {args.concurrency} in flight...")
+    report = generator.run(args.duration, args.requests)
+    print_report(report)
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+        print_info(f"Report written to {args.report}")
+    return True
+
+def seed_db(args) -> bool:
+    """Stream synthetic rows into the app's tables"""
+    from console import print_error, print_info
+    from database import DatabaseError, database_url
+    from seeder import SeedError, SeedSpec, seed_database, print_seed_result
+
+    spec = SeedSpec(users=args.users, subscribed_ratio=args.subscribed_ratio,
+                    activity_per_user=args.activity_per_user, stale_ratio=args.stale_ratio,
+                    max_age_hours=args.max_age_hours, age_distribution=args.age_distribution, seed=args.seed)
+    print_info(f"Seeding {spec.users:,} users...")
+    try:
+        loads = seed_database(database_url(args.database_url), spec, truncate=args.truncate)
+    except (SeedError, DatabaseError) as e:
+        print_error(str(e))
+        return False
+    print_seed_result(loads)
+    return True
+
+def sync_bench(args) -> bool:
+    """Call the sync cron of a running app against a mock Polar and report its throughput"""
+    import os
+    import requests
+    from console import print_error
+    from database import DatabaseError, database_url
+    from seeder import SeedError, benchmark_sync, print_sync_result
+
+    progress = None if args.cron_secret or os.environ.get('CRON_SECRET') else load_saved_progress()
+    cron_secret = args.cron_secret or os.environ.get('CRON_SECRET') or (progress.api_keys.get('cron_secret') if progress else '')
+    if not cron_secret:
+        print_error("No CRON_SECRET; pass --cron-secret or run render-env to generate one")
+        return False
+    try:
+        result = benchmark_sync(args.url, cron_secret, database_url(args.database_url), calls=args.calls,
+                                polar_port=args.polar_port, polar_latency=args.polar_latency / 1000)
+    except (SeedError, DatabaseError, requests.RequestException) as e:
+        print_error(f"Sync benchmark failed: {e}")
+        return False
+    print_sync_result(result)
+    return True
+
+def reconcile(args) -> bool:
+    """Diff the saved setup's Polar subscriptions against its database, optionally fixing it"""
+    import requests
+    from console import print_error
+    from database import DatabaseError, database_url
+    from reconcile import ReconcileError, reconcile_progress, print_report
+    from services import ServiceError
+
+    progress = load_saved_progress()
+    if not progress:
+        return False
+    try:
+        report = reconcile_progress(progress, database_url(args.database_url), window=args.window, apply=args.apply)
+    except (ReconcileError, DatabaseError, ServiceError, requests.RequestException) as e:
+        print_error(f"Reconciliation failed: {e}")
+        return False
+    print_report(report, args.apply)
+    return True
+
+def selected_projects(args):
+    """([(progress, env file directory)], save function) for the store projects or the saved setup"""
+    import os
+    from console import print_error
+
+    if not (args.store or args.project):
+        from progress import ProgressManager
+        progress = load_saved_progress()
+        return ([(progress, args.output_dir or '.')] if progress else []), ProgressManager.save_progress
+
+    from store import ProgressStore
+    from validation import normalize_project_name
+    store = ProgressStore(args.store)
+    names = [normalize_project_name(args.project)] if args.project else [p.project_name for p in store.query()]
+    output_dir = args.output_dir or 'projects'
+    projects = []
+    for name in names:
+        progress = store.load(name)
+        if not progress:
+            print_error(f"Project not found: {name}")
+            return [], store.save
+        projects.append((progress, os.path.join(output_dir, name)))
+    return projects, store.save
+
+def drift(args) -> bool:
+    """Check the env files and Vercel environments of the saved setup or store projects for drift"""
+    import json
+    from dataclasses import asdict
+    from drift import check_projects, print_drift
+
+    projects, _ = selected_projects(args)
+    if not projects:
+        return False
+    results = check_projects(projects, args.workers, args.cache, remote=not args.local_only)
+    if args.json:
+        print(json.dumps([asdict(result) for result in results], indent=2))
+    else:
+        print_drift(results)
+    return all(result.clean for result in results)
+
+def rotate(args) -> bool:
+    """Rotate CRON_SECRET and the Polar webhook secret of the saved setup or store projects"""
+    from console import print_error
+    from rotate import ROTATABLE, RotationSettings, print_rotation_results, rotate_projects
+
+    secrets = tuple(name.strip() for name in args.secrets.split(',') if name.strip())
+    unknown = set(secrets) - set(ROTATABLE)
+    if unknown:
+        print_error(f"Unknown secrets: {', '.join(sorted(unknown))} (choose from {', '.join(ROTATABLE)})")
+        return False
+    projects, save = selected_projects(args)
+    if not projects:
+        return False
+    settings = RotationSettings(secrets, args.app_url, args.deploy_timeout, args.verify_timeout,
+                                args.vercel_rate, args.polar_rate)
+    results = rotate_projects(projects, save, settings, args.workers, rollback=args.rollback)
+    print_rotation_results(results)
+    return all(result.ok for result in results)
+
+def probe(args) -> bool:
+    """Wait for deployments to answer and report cold and warm latency of their key routes"""
+    from urllib.parse import urlsplit
+    from probe import PROBE_ROUTES, keep_warm, print_probe_report, probe_projects
+
+    if args.store or args.project:
+        projects, _ = selected_projects(args)
+        names = [progress.project_name for progress, _ in projects]
+    elif '{project}' not in args.url:
+        # A fixed URL such as a local server is reported under its host
+        names = [urlsplit(args.url).netloc.replace(':', '-')]
+    else:
+        progress = load_saved_progress()
+        names = [progress.project_name] if progress else []
+    if not names:
+        return False
+
+    routes = tuple(path.strip() for path in args.routes.split(',')) if args.routes else PROBE_ROUTES
+    targets = [(name, args.url.format(project=name)) for name in names]
+    results = probe_projects(targets, routes, args.samples, args.ready_timeout, args.workers, args.report_dir)
+    for report, previous in results:
+        print_probe_report(report, previous)
+    if args.keep_warm > 0:
+        up = [(report.project, report.url) for report, _ in results if not report.error]
+        keep_warm(up, args.keep_warm * 60, args.warm_interval, routes)
+    return all(not report.error for report, _ in results)
+
+def billing_load(args) -> bool:
+    """Run billing journeys against the app with Clerk and Polar stubbed locally"""
+    import os
+    import json
+    from contextlib import ExitStack
+    from dataclasses import asdict
+    from console import print_error, print_info
+    from envfiles import read_env_file
+    from webhookload import parse_event_mix
+    from billingload import (
+        DEFAULT_JOURNEYS, DEFAULT_MIX, AppProcess, LoadSpec, LoadTestError, SessionSigner, StubServices,
+        load_scenarios, load_signing_key, print_load_report, print_stub_env, run_load, stub_env,
+    )
+
+    app_env = read_env_file(args.env_file) if os.path.exists(args.env_file) else {}
+    app_url = (args.app_url or app_env.get('NEXT_PUBLIC_APP_URL') or "http://localhost:3000").rstrip('/')
+    try:
+        private_pem = load_signing_key()
+        env = stub_env(f"http://127.0.0.1:{args.stub_port}", SessionSigner(private_pem, app_url).public_pem())
+        if args.print_env:
+            print_stub_env(env)
+            return True
+        journeys, mix = load_scenarios(args.scenarios) if args.scenarios else (DEFAULT_JOURNEYS, DEFAULT_MIX)
+    except (LoadTestError, OSError, ValueError) as e:
+        print_error(f"Cannot start the load: {e}")
+        return False
+    if args.mix:
+        mix = parse_event_mix(args.mix)
+
+    spec = LoadSpec(app_url, {name: [asdict(step) for step in steps] for name, steps in journeys.items()}, mix,
+                    rate=args.rate, duration=args.duration, concurrency=args.concurrency, users=args.users,
+                    think_scale=args.think_scale, seed=args.seed, private_pem=private_pem)
+    try:
+        with ExitStack() as stack:
+            stub = stack.enter_context(StubServices(args.stub_port))
+            if args.app_command:
+                print_info(f"Starting `{args.app_command}` with the stub environment...")
+                stack.enter_context(AppProcess(args.app_command, {**app_env, **env}, app_url))
+            print_info(f"Starting {args.rate:g} journeys/s against {app_url} for {args.duration:g}s "
+                       f"from {args.processes} process(es)...")
+            report = run_load(spec, args.processes)
+    except (LoadTestError, OSError) as e:
+        print_error(f"Load test failed: {e}")
+        return False
+    report['stub_calls'] = stub.calls
+    print_load_report(report, stub.calls)
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+        print_info(f"Report written to {args.report}")
+    return report['total']['error_rate'] == 0
+
+def daemon(args) -> bool:
+    """Serve provisioning jobs over a local HTTP port or Unix socket until stopped"""
+    from console import print_error
+    from daemon import ProvisioningDaemon, load_token, serve
+    from store import ProgressStore
+
+    try:
+        token = load_token(args.token_file)
+        serve(ProvisioningDaemon(ProgressStore(args.store), args.output_dir or 'projects', args.workers,
+                                 args.queue_size, token), args.port, args.socket)
+    except OSError as e:
+        print_error(f"Daemon failed: {e}")
+        return False
+    return True
+
+def template_sync(args) -> bool:
+    """Check the forks of the saved setup or store projects against the upstream template"""
+    import os
+    import json
+    from dataclasses import asdict
+    from console import print_error, print_warning
+    from templatesync import SyncError, SyncState, TemplateCache, TemplateSync, print_sync_results
+
+    projects, _ = selected_projects(args)
+    forks = [(progress.project_name, progress.api_keys['github_repo_url'])
+             for progress, _ in projects if progress.api_keys.get('github_repo_url')]
+    skipped = len(projects) - len(forks)
+    if skipped:
+        print_warning(f"{skipped} projects have no GitHub repository yet and were skipped")
+    if not forks:
+        return False
+
+    from wizard import KOSUKE_REPO_URL, KOSUKE_REPO_OWNER
+    state = SyncState(args.state)
+    try:
+        results = TemplateSync(TemplateCache(args.upstream or f"{KOSUKE_REPO_URL}.git", args.cache, args.branch),
+                               state, args.workers, args.remote).run(forks)
+    except SyncError as e:
+        print_error(f"Template sync failed: {e}")
+        return False
+
+    if args.open_prs:
+        import requests
+        from services import GitHubService, ServiceError
+        from templatesync import open_pull_requests
+        token = os.environ.get('GITHUB_TOKEN')
+        if not token:
+            print_error("Set GITHUB_TOKEN to open pull requests")
+            return False
+        try:
+            open_pull_requests(results, GitHubService(token), KOSUKE_REPO_OWNER, args.branch, state)
+        except (ServiceError, requests.RequestException) as e:
+            print_error(f"Opening pull requests failed: {e}")
+    if args.json:
+        print(json.dumps([asdict(result) for result in results], indent=2))
+    else:
+        print_sync_results(results)
+    return not any(result.status == 'error' for result in results)
+
+def migrate(args) -> bool:
+    """Apply the pending Drizzle migrations to one or many databases"""
+    import json
+    import time
+    from dataclasses import asdict
+    from console import print_error
+    from database import database_url
+    from migrations import (MIGRATIONS_DIR, MigrationError, load_migrations, migrate_databases,
+                            database_name, print_migration_results, read_database_list)
+
+    try:
+        migrations = load_migrations(args.migrations or MIGRATIONS_DIR)
+        databases = read_database_list(args.databases) if args.databases else []
+    except MigrationError as e:
+        print_error(str(e))
+        return False
+    databases += [(database_name(url), url) for url in args.database_url or []]
+    if not databases:
+        url = database_url()
+        databases = [(database_name(url), url)]
+
+    started = time.monotonic()
+    results = migrate_databases(databases, migrations, args.workers, args.dry_run)
+    if args.json:
+        print(json.dumps([asdict(result) for result in results], indent=2))
+    else:
+        print_migration_results(results, time.monotonic() - started)
+    return all(result.status in ('up-to-date', 'migrated', 'pending') for result in results)
+
+def run_wizard(args, resume=None) -> bool:
+    """Run the interactive setup, tracked in the project store when --project is given"""
+    import logging
+    from console import print_error, print_info
+    from progress import ProgressManager
+    from validation import normalize_project_name
+
+    project_name = ""
+    if args.project:
+        from store import ProgressStore, StoreBackend
+        project_name = normalize_project_name(args.project)
+        ProgressManager.use_backend(StoreBackend(ProgressStore(args.store), project_name))
+
+    if args.import_env:
+        from envimport import import_env_files, print_env_import
+        result = import_env_files(args.import_env, project_name)
+        if not result.files:
+            print_error(f"No env files found in {args.import_env}")
+            return False
+        print_env_import(result)
+        # The imported progress replaces any saved one and is resumed from the first missing step
+        ProgressManager.save_progress(result.progress)
+        resume = True
+
+    # A transcript replaces the keyboard: --record notes the answers, --replay feeds them back
+    from contextlib import nullcontext
+    prompter, transcript_errors = None, ()
+    seed = args.seed
+    if args.record or args.replay:
+        from transcript import Recorder, Replayer, Transcript, TranscriptError, answering, output_fingerprints
+        transcript_errors = (TranscriptError,)
+        if args.replay:
+            try:
+                transcript = Transcript.load(args.replay)
+            except (OSError, ValueError, TypeError, TranscriptError) as e:
+                print_error(f"Cannot read the transcript: {e}")
+                return False
+            seed = transcript.seed if seed is None else seed
+            prompter = Replayer(transcript, args.speed)
+        else:
+            prompter = Recorder(seed)
+
+    from wizard import InteractiveSetup
+    try:
+        setup = InteractiveSetup(project_name)
+        if resume and not (setup.progress.current_step > 1 or setup.progress.completed_steps):
+            print_error("No saved setup to resume")
+            return False
+        with answering(prompter, seed) if prompter else nullcontext():
+            setup.start(resume)
+        if args.replay:
+            prompter.finish()
+        
+    except KeyboardInterrupt:
+        print_error("\nSetup cancelled by user")
+        print_info("Progress has been saved. Run the script again to resume.")
+        return False
+    except transcript_errors as e:
+        print_error(f"Replay of {args.replay} failed: {e}")
+        return False
+    except Exception as e:
+        print_error(f"Setup failed: {e}")
+        logging.getLogger(__name__).exception("Setup error")
+        print_info("Progress has been saved. Run the script again to resume.")
+        return False
+    finally:
+        if args.record:
+            prompter.transcript.outputs = output_fingerprints()
+            prompter.transcript.save(args.record)
+            print_info(f"Transcript of {len(prompter.transcript.exchanges)} prompts written to {args.record}")
+    if args.replay:
+        return check_replay_outputs(prompter.transcript, seed)
+    return True
+
+def check_replay_outputs(transcript, seed) -> bool:
+    """Compare the env files of a replay with the ones the recording wrote"""
+    from console import print_error, print_info, print_success
+    from transcript import changed_outputs
+
+    if not transcript.outputs:
+        print_success(f"Replayed {len(transcript.exchanges)} prompts (no env files recorded to compare)")
+        return True
+    if seed is None or seed != transcript.seed:
+        print_success(f"Replayed {len(transcript.exchanges)} prompts")
+        print_info("Env files not compared: CRON_SECRET is only reproducible with the seed of the recording")
+        return True
+    changed = changed_outputs(transcript.outputs)
+    if changed:
+        print_error(f"Env files differ from the recording: {', '.join(changed)}")
+        return False
+    print_success(f"Replayed {len(transcript.exchanges)} prompts; env files match the recording")
+    return True
+
+COMMANDS = {
+    'status': show_status,
+    'render-env': render_env,
+    'verify': verify_saved_progress,
+    'resume': lambda args: run_wizard(args, resume=True),
+    'wizard': run_wizard,
+    'webhook-load': webhook_load,
+    'seed-db': seed_db,
+    'sync-bench': sync_bench,
+    'reconcile': reconcile,
+    'drift': drift,
+    'rotate': rotate,
+    'probe': probe,
+    'billing-load': billing_load,
+    'daemon': daemon,
+    'template-sync': template_sync,
+    'migrate': migrate,
+}
+
+def parse_args(argv=None):
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Kosuke Template setup")
+    parser.add_argument('--manifest', help="Provision every project in a JSON/YAML manifest without prompting")
+    parser.add_argument('--workers', type=int, default=8, help="Projects provisioned in parallel (with --manifest)")
+    parser.add_argument('--output-dir', help="Where per-project env files are written (default: projects)")
+    parser.add_argument('--verify', action='store_true',
+                        help="Verify credentials against the provider APIs (the saved setup, or each manifest project)")
+    parser.add_argument('--push-env', action='store_true',
+                        help="Push the saved setup's variables to Vercel (token from the setup or $VERCEL_TOKEN)")
+    parser.add_argument('--force', action='store_true', help="Also rewrite sensitive variables (with --push-env)")
+    parser.add_argument('--store', help="Project store database (default: $KOSUKE_PROGRESS_DB or .kosuke-projects.db)")
+    parser.add_argument('--project', help="Track this setup in the project store under this name")
+    parser.add_argument('--list-projects', action='store_true', help="List projects in the project store")
+    parser.add_argument('--render-env', action='store_true',
+                        help="Regenerate env files for every project in the store (or --project) under --output-dir")
+    parser.add_argument('--step', type=int, help="Only projects currently at this step (with --list-projects)")
+    parser.add_argument('--with-service', help="Only projects that completed this service (with --list-projects)")
+    parser.add_argument('--without-service', help="Only projects missing this service (with --list-projects)")
+    parser.add_argument('--trace', metavar='FILE',
+                        help="Append a JSON-lines span per step, HTTP call, file write and progress save "
+                             "(default: $KOSUKE_TRACE_FILE)")
+    parser.add_argument('--profile', metavar='FILE',
+                        help="Write a cProfile dump to FILE and wall-clock folded stacks to FILE.folded")
+
+    # Subcommand options share their names with the flags above; SUPPRESS keeps a
+    # subcommand from resetting a value given before it
+    commands = parser.add_subparsers(dest='command', metavar='command')
+    status = commands.add_parser('status', help="Show the saved setup's progress")
+    status.add_argument('--json', action='store_true', help="Print machine-readable JSON")
+    status.add_argument('--store', default=argparse.SUPPRESS, help="List projects in this project store instead")
+    status.add_argument('--step', type=int, default=argparse.SUPPRESS, help="Only store projects at this step")
+    status.add_argument('--with-service', default=argparse.SUPPRESS, help="Only store projects with this service")
+    status.add_argument('--without-service', default=argparse.SUPPRESS, help="Only store projects missing this service")
+    render = commands.add_parser('render-env', help="Regenerate env files from the saved setup")
+    render.add_argument('--output-dir', default=argparse.SUPPRESS, help="Where env files are written")
+    render.add_argument('--store', default=argparse.SUPPRESS, help="Render every project in this project store")
+    render.add_argument('--project', default=argparse.SUPPRESS, help="Render only this project from the store")
+    commands.add_parser('verify', help="Verify the saved credentials against the provider APIs")
+    for name, help_text in (('resume', "Resume the saved setup without asking"),
+                            ('wizard', "Run the interactive setup")):
+        wizard = commands.add_parser(name, help=help_text)
+        wizard.add_argument('--project', default=argparse.SUPPRESS, help="Track this setup in the project store")
+        wizard.add_argument('--store', default=argparse.SUPPRESS, help="Project store database")
+        transcripts = wizard.add_mutually_exclusive_group()
+        transcripts.add_argument('--record', metavar='FILE', help="Write every prompt and answer to a transcript")
+        transcripts.add_argument('--replay', metavar='FILE', help="Answer the prompts from a transcript")
+        wizard.add_argument('--import-env', nargs='?', const='.', metavar='DIR',
+                            help="Rebuild the setup from the .env files in DIR (default: .) and skip the steps "
+                                 "they cover")
+        wizard.add_argument('--speed', type=float, default=0.0,
+                            help="Replay pace as a multiple of the recorded answer times (default: 0, no waiting)")
+        wizard.add_argument('--seed', type=int,
+                            help="Seed the generated CRON_SECRET, for reproducible env files (never for real setups)")
+    load = commands.add_parser('webhook-load', help="Fire signed Polar/Clerk webhooks at a running app")
+    load.add_argument('--url', default="http://localhost:3000", help="App base URL (default: http://localhost:3000)")
+    load.add_argument('--rate', type=float, default=50.0, help="Deliveries per second, sent on schedule (default: 50)")
+    load.add_argument('--duration', type=float, default=10.0, help="Seconds to send for (default: 10)")
+    load.add_argument('--requests', type=int, help="Send exactly this many deliveries instead")
+    load.add_argument('--concurrency', type=int, default=32, help="Deliveries in flight at most (default: 32)")
+    load.add_argument('--events', help="Weighted event mix, e.g. subscription.updated=5,user.created=1 "
+                                       "(default: every Polar event equally)")
+    load.add_argument('--invalid-ratio', type=float, default=0.0,
+                      help="Share of Polar deliveries sent with a wrong signature")
+    load.add_argument('--templates', help="Directory of <event type>.json payload templates")
+    load.add_argument('--polar-secret', help="Polar webhook secret (default: $POLAR_WEBHOOK_SECRET or the saved setup)")
+    load.add_argument('--clerk-secret', help="Clerk webhook secret (default: $CLERK_WEBHOOK_SECRET or the saved setup)")
+    load.add_argument('--seed', type=int, help="Random seed for the event mix")
+    load.add_argument('--report', help="Also write the report as JSON to this file")
+    seed = commands.add_parser('seed-db', help="Fill the local Postgres with synthetic users and subscriptions")
+    seed.add_argument('--database-url', help="Postgres URL (default: $POSTGRES_URL or the local docker database)")
+    seed.add_argument('--users', type=int, default=10000, help="Users to create (default: 10000)")
+    seed.add_argument('--subscribed-ratio', type=float, default=0.7, help="Share of users with a subscription")
+    seed.add_argument('--activity-per-user', type=float, default=5.0, help="Average activity log rows per user")
+    seed.add_argument('--stale-ratio', type=float, default=0.5,
+                      help="Share of subscriptions last synced more than 6 hours ago")
+    seed.add_argument('--max-age-hours', type=float, default=720.0, help="Oldest stale subscription (default: 720)")
+    seed.add_argument('--age-distribution', choices=('uniform', 'exponential'), default='uniform',
+                      help="How stale ages are spread between 6 hours and --max-age-hours")
+    seed.add_argument('--seed', type=int, default=0, help="Random seed (same seed, same data)")
+    seed.add_argument('--truncate', action='store_true', help="Empty the tables first")
+    bench = commands.add_parser('sync-bench', help="Measure the subscription sync cron against a mock Polar")
+    bench.add_argument('--url', default="http://localhost:3000", help="App base URL (default: http://localhost:3000)")
+    bench.add_argument('--database-url', help="Postgres URL (default: $POSTGRES_URL or the local docker database)")
+    bench.add_argument('--cron-secret', help="CRON_SECRET of the app (default: $CRON_SECRET or the saved setup)")
+    bench.add_argument('--calls', type=int, default=3, help="Cron calls to make (default: 3)")
+    bench.add_argument('--polar-port', type=int, default=8123,
+                       help="Port of the mock Polar API; start the app with POLAR_API_URL=http://127.0.0.1:PORT")
+    bench.add_argument('--polar-latency', type=float, default=0.0, help="Mock Polar response delay in ms")
+    recon = commands.add_parser('reconcile', help="Diff Polar subscriptions against the database")
+    recon.add_argument('--database-url', help="Postgres URL (default: $POSTGRES_URL or the local docker database)")
+    recon.add_argument('--window', type=int, default=4, help="Polar pages fetched in parallel (default: 4)")
+    recon.add_argument('--apply', action='store_true', help="Write the fixes in batched upserts")
+    check = commands.add_parser('drift', help="Compare env files and Vercel with the saved setup, by fingerprint")
+    check.add_argument('--store', default=argparse.SUPPRESS, help="Check every project in this project store")
+    check.add_argument('--project', default=argparse.SUPPRESS, help="Check only this project from the store")
+    check.add_argument('--output-dir', default=argparse.SUPPRESS,
+                       help="Where the env files are (default: . for the saved setup, projects for the store)")
+    check.add_argument('--workers', type=int, default=argparse.SUPPRESS, help="Projects checked in parallel")
+    check.add_argument('--cache', default=".kosuke-drift-cache.json",
+                       help="Fingerprint cache for incremental re-checks (default: .kosuke-drift-cache.json)")
+    check.add_argument('--local-only', action='store_true', help="Only check the env files, not Vercel")
+    check.add_argument('--json', action='store_true', help="Print machine-readable JSON")
+    rotation = commands.add_parser('rotate', help="Rotate CRON_SECRET and the Polar webhook secret")
+    rotation.add_argument('--store', default=argparse.SUPPRESS, help="Rotate every project in this project store")
+    rotation.add_argument('--project', default=argparse.SUPPRESS, help="Rotate only this project from the store")
+    rotation.add_argument('--output-dir', default=argparse.SUPPRESS,
+                          help="Where the env files are (default: . for the saved setup, projects for the store)")
+    rotation.add_argument('--workers', type=int, default=argparse.SUPPRESS, help="Projects rotated in parallel")
+    rotation.add_argument('--secrets', default="cron,polar", help="Secrets to rotate (default: cron,polar)")
+    rotation.add_argument('--rollback', action='store_true',
+                          help="Restore the CRON_SECRET from before the last rotation instead")
+    rotation.add_argument('--app-url', default="https://{project}.vercel.app",
+                          help="Deployed app URL verified after the rotation (default: https://{project}.vercel.app)")
+    rotation.add_argument('--vercel-rate', type=float, default=10.0, help="Vercel API calls per second (default: 10)")
+    rotation.add_argument('--polar-rate', type=float, default=3.0, help="Polar API calls per second (default: 3)")
+    rotation.add_argument('--deploy-timeout', type=float, default=600.0,
+                          help="Seconds to wait for each redeployment (default: 600)")
+    rotation.add_argument('--verify-timeout', type=float, default=60.0,
+                          help="Seconds to wait for the new secret to be live (default: 60)")
+    warmup = commands.add_parser('probe', help="Wait for a deploy and report cold-start and warm latency per route")
+    warmup.add_argument('--store', default=argparse.SUPPRESS, help="Probe every project in this project store")
+    warmup.add_argument('--project', default=argparse.SUPPRESS, help="Probe only this project from the store")
+    warmup.add_argument('--url', default="https://{project}.vercel.app",
+                        help="App URL, {project} is replaced (default: https://{project}.vercel.app)")
+    warmup.add_argument('--routes', help="Comma-separated paths (default: /, /home, "
+                                         "/api/billing/subscription-status, /api/cron/sync-subscriptions)")
+    warmup.add_argument('--samples', type=int, default=10, help="Warm requests per route (default: 10)")
+    warmup.add_argument('--ready-timeout', type=float, default=300.0,
+                        help="Seconds to wait for the deployment to answer (default: 300)")
+    warmup.add_argument('--workers', type=int, default=argparse.SUPPRESS, help="Projects probed in parallel")
+    warmup.add_argument('--report-dir', default=".kosuke-probe",
+                        help="Where <project>.json reports are kept and compared (default: .kosuke-probe)")
+    warmup.add_argument('--keep-warm', type=float, default=0.0, metavar='MINUTES',
+                        help="Keep hitting the routes for this many minutes afterwards")
+    warmup.add_argument('--warm-interval', type=float, default=240.0,
+                        help="Seconds between keep-warm rounds (default: 240)")
+    journeys = commands.add_parser('billing-load',
+                                   help="Run billing user journeys against the app with stubbed Clerk and Polar")
+    journeys.add_argument('--env-file', default=".env", help="The app's env file, for its URL (default: .env)")
+    journeys.add_argument('--app-url', help="App base URL (default: NEXT_PUBLIC_APP_URL or http://localhost:3000)")
+    journeys.add_argument('--app-command', help="Start the app with this command and the stub environment, "
+                                                "e.g. 'npm run dev'")
+    journeys.add_argument('--print-env', action='store_true',
+                          help="Print the variables pointing the app at the stubs, then exit")
+    journeys.add_argument('--stub-port', type=int, default=8124, help="Port of the Clerk and Polar stubs (default: 8124)")
+    journeys.add_argument('--rate', type=float, default=5.0, help="Journeys started per second (default: 5)")
+    journeys.add_argument('--duration', type=float, default=60.0, help="Seconds to start journeys for (default: 60)")
+    journeys.add_argument('--processes', type=int, default=1, help="Worker processes sharing the rate (default: 1)")
+    journeys.add_argument('--concurrency', type=int, default=256,
+                          help="Journeys in progress at most, across processes (default: 256)")
+    journeys.add_argument('--users', type=int, default=10000,
+                          help="Virtual users, the first N seed-db users (default: 10000)")
+    journeys.add_argument('--mix', help="Weighted journey mix, e.g. browse=6,checkout=2,upgrade=1,cancel=1")
+    journeys.add_argument('--scenarios', help="JSON/YAML file of journeys and their mix")
+    journeys.add_argument('--think-scale', type=float, default=1.0, help="Multiplier on think times (0 disables)")
+    journeys.add_argument('--seed', type=int, default=0, help="Random seed for arrivals, journeys and users")
+    journeys.add_argument('--report', help="Also write the report as JSON to this file")
+    serve = commands.add_parser('daemon', help="Serve provision, verify and render jobs over a local API")
+    listen = serve.add_mutually_exclusive_group()
+    listen.add_argument('--port', type=int, default=8787, help="Loopback HTTP port (default: 8787)")
+    listen.add_argument('--socket', help="Listen on this Unix socket instead")
+    serve.add_argument('--workers', type=int, default=argparse.SUPPRESS, help="Jobs run in parallel (default: 8)")
+    serve.add_argument('--queue-size', type=int, default=256,
+                       help="Jobs waiting at most before submissions are refused (default: 256)")
+    serve.add_argument('--token-file', default=".kosuke-daemon-token",
+                       help="Bearer token clients must send, created mode 0600 if missing "
+                            "(default: .kosuke-daemon-token)")
+    serve.add_argument('--store', default=argparse.SUPPRESS, help="Project store the jobs read and write")
+    serve.add_argument('--output-dir', default=argparse.SUPPRESS,
+                       help="Where per-project env files are written (default: projects)")
+    sync = commands.add_parser('template-sync', help="Check every fork against the upstream template")
+    sync.add_argument('--store', default=argparse.SUPPRESS, help="Check every project in this project store")
+    sync.add_argument('--project', default=argparse.SUPPRESS, help="Check only this project from the store")
+    sync.add_argument('--workers', type=int, default=argparse.SUPPRESS, help="Forks fetched and checked in parallel")
+    sync.add_argument('--upstream', help="Upstream git URL or path (default: the kosuke-template repository)")
+    sync.add_argument('--branch', default="main", help="Branch compared on both sides (default: main)")
+    sync.add_argument('--remote', default="{url}.git",
+                      help="Fork git URL from its GitHub URL; {url}, {owner} and {repo} are replaced "
+                           "(default: {url}.git), e.g. /srv/git/{repo}.git")
+    sync.add_argument('--cache', default=".kosuke-template-cache.git",
+                      help="Shared bare repository (default: .kosuke-template-cache.git)")
+    sync.add_argument('--state', default=".kosuke-template-sync.json",
+                      help="Results by commit, for incremental runs (default: .kosuke-template-sync.json)")
+    sync.add_argument('--open-prs', action='store_true',
+                      help="Open a pull request from upstream in forks that merge cleanly ($GITHUB_TOKEN)")
+    sync.add_argument('--json', action='store_true', help="Print machine-readable JSON")
+    apply = commands.add_parser('migrate', help="Apply pending Drizzle migrations to many databases concurrently")
+    apply.add_argument('--database-url', action='append',
+                       help="Postgres URL, repeatable (default: $POSTGRES_URL or the local docker database)")
+    apply.add_argument('--databases', help="File of Postgres URLs, one per line, each optionally after a name")
+    apply.add_argument('--workers', type=int, default=argparse.SUPPRESS, help="Databases migrated in parallel")
+    apply.add_argument('--migrations', help="Drizzle migrations folder (default: lib/db/migrations)")
+    apply.add_argument('--dry-run', action='store_true', help="Report pending migrations without applying them")
+    apply.add_argument('--json', action='store_true', help="Print machine-readable JSON")
+    parser.set_defaults(json=False, import_env=None, record=None, replay=None, speed=0.0, seed=None)
+    return parser.parse_args(argv)
+
+def dispatch(args) -> bool:
+    """Run the selected command, returning whether it succeeded"""
+    if args.command:
+        return COMMANDS[args.command](args)
+
+    # Flag forms kept for existing scripts
+    if args.list_projects:
+        return list_projects(args)
+    if args.render_env:
+        return render_env_files(args)
+    if args.manifest:
+        return provision_manifest(args)
+    if args.verify:
+        return verify_saved_progress()
+    if args.push_env:
+        return push_env(args)
+    return run_wizard(args)
+
+def main():
+    """Main function"""
+    import logging
+    import tracing
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    args = parse_args()
+    tracing.configure(args.trace)
+
+    name = args.command or ('manifest' if args.manifest else 'wizard')
+    with tracing.span(f"kosuke {name}", **{'kosuke.command': name}) as root:
+        if args.profile:
+            with tracing.Profiler(args.profile):
+                ok = dispatch(args)
+        else:
+            ok = dispatch(args)
+        root.set('kosuke.ok', ok)
+    if args.profile:
+        from console import print_info
+        print_info(f"Profile written to {args.profile} and {args.profile}.folded")
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,48 @@
+"""
+Console helpers shared by the interactive wizard and the headless commands.
+"""
+
+from typing import Callable, Optional
+
+from tracing import span, HUMAN
+
+# Replaces the keyboard when set, e.g. by a transcript replay
+_prompter: Optional[Callable[[str], str]] = None
+
+class Colors:
+    """Console colors for better UX"""
+    HEADER = '\033[95m'
+    OKBLUE = '\033[94m'
+    OKCYAN = '\033[96m'
+    OKGREEN = '\033[92m'
+    WARNING = '\033[93m'
+    FAIL = '\033[91m'
+    ENDC = '\033[0m'
+    BOLD = '\033[1m'
+    UNDERLINE = '\033[4m'
+
+def print_success(message: str):
+    print(f"{Colors.OKGREEN}✅ {message}{Colors.ENDC}")
+
+def print_error(message: str):
+    print(f"{Colors.FAIL}❌ {message}{Colors.ENDC}")
+
+def print_warning(message: str):
+    print(f"{Colors.WARNING}⚠️  {message}{Colors.ENDC}")
+
+def print_info(message: str):
+    print(f"{Colors.OKCYAN}ℹ️  {message}{Colors.ENDC}")
+
+def print_step(step: int, total: int, title: str):
+    print(f"\n{Colors.HEADER}{Colors.BOLD}📍 Step {step}/{total}: {title}{Colors.ENDC}")
+    print("=" * 60)
+
+def ask(prompt: str = "") -> str:
+    """Read a line from the user, traced as time spent waiting on a human"""
+    with span('prompt', HUMAN):
+        return (_prompter or input)(prompt)
+
+def use_prompter(prompter: Optional[Callable[[str], str]] = None):
+    """Answer ask() with this function instead of the keyboard (None restores the keyboard)"""
+    global _prompter
+    _prompter = prompter
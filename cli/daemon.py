@@ -0,0 +1,415 @@
+"""
+Long-running provisioning daemon with a local job API.
+
+Every `python main.py` run pays for interpreter startup and imports, a new
+session with a TLS handshake to every provider, and loading the project's
+progress. The daemon pays once. It keeps one pooled session, so provider
+connections stay open between jobs. It also keeps the credential verifier,
+the GitHub fork managers and the projects it has loaded, and runs jobs from a
+bounded queue on a fixed pool of workers.
+
+Jobs are submitted over HTTP on 127.0.0.1 or over a Unix socket:
+
+    POST /jobs              {"kind": "provision", "project": {...a manifest project...}, "defaults": {...}}
+                            {"kind": "verify", "project": "acme-portal"}
+                            {"kind": "render", "project": "acme-portal"}
+    GET  /jobs/<id>?wait=5  the job, after waiting up to 5 seconds for it to finish
+    GET  /health            workers, queue depth and cached projects
+
+POST answers 202 with the job, or 503 with Retry-After when the queue is
+full. Jobs of one project run one at a time, in order: while one runs, the
+project's other jobs wait in its own queue rather than on a worker, so a
+burst for one project does not hold up the others. A loaded project is reused
+while its `updated_at` in the project store is unchanged, so changes made by
+other processes are picked up. A provision job for a project already in the
+store is refused unless it sets "overwrite": true.
+
+Jobs carry API keys. Binding to loopback does not keep out a web page in the
+operator's browser, which can still POST to 127.0.0.1. So every request needs
+the bearer token from a file only its owner can read (DEFAULT_TOKEN_FILE,
+created on first start). Requests with an Origin header, a Host other than
+the loopback names, or a body that is not application/json are refused. The
+socket is only accessible to its owner.
+"""
+
+import os
+import hmac
+import json
+import uuid
+import time
+import queue
+import signal
+import socket
+import logging
+import secrets
+import threading
+import socketserver
+from collections import OrderedDict, deque
+from dataclasses import asdict, dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Deque, Dict, Optional, Set, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from batch import HeadlessSetup, ManifestError, project_spec
+from console import Colors, print_info
+from envfiles import write_env_files
+from githubsetup import ForkManagerPool
+from progress import SetupProgress
+from services import create_session
+from store import ProgressStore
+from tracing import span
+from validation import normalize_project_name
+from verify import CredentialVerifier
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 8787
+DEFAULT_WORKERS = 8
+DEFAULT_QUEUE_SIZE = 256
+# Finished jobs kept for GET /jobs/<id>; the oldest are dropped first
+MAX_FINISHED_JOBS = 1000
+MAX_WAIT = 60.0
+JOB_KINDS = ('provision', 'verify', 'render')
+DEFAULT_TOKEN_FILE = ".kosuke-daemon-token"
+LOOPBACK_HOSTS = ('127.0.0.1', 'localhost', '[::1]')
+
+class JobError(Exception):
+    """Raised when a submitted job is invalid"""
+
+class JobConflict(JobError):
+    """Raised when a provision job would replace a stored project without asking to"""
+
+def load_token(path: str = DEFAULT_TOKEN_FILE) -> str:
+    """The API token in path, created readable by its owner only on first use"""
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        if os.stat(path).st_mode & 0o077:
+            raise OSError(f"{path} is readable by other users; chmod 600 it")
+        with open(path) as f:
+            token = f.read().strip()
+        if not token:
+            raise OSError(f"{path} is empty")
+        return token
+    token = secrets.token_urlsafe(32)
+    with os.fdopen(fd, 'w') as f:
+        f.write(token + '\n')
+    return token
+
+@dataclass
+class Job:
+    """One unit of work and its outcome"""
+    id: str
+    kind: str
+    project: str
+    payload: Dict = field(repr=False)
+    status: str = 'queued'  # queued, running, ok or failed
+    result: Any = None
+    error: str = ""
+    submitted_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    done: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    def to_dict(self) -> Dict:
+        # The payload holds API keys and is never sent back
+        return {name: getattr(self, name) for name in ('id', 'kind', 'project', 'status', 'result', 'error',
+                                                        'submitted_at', 'started_at', 'finished_at')}
+
+class ProvisioningDaemon:
+    """Runs provision, verify and render jobs on warm, shared clients"""
+
+    def __init__(self, store: ProgressStore, output_dir: str = 'projects', workers: int = DEFAULT_WORKERS,
+                 queue_size: int = DEFAULT_QUEUE_SIZE, token: str = ""):
+        self.store = store
+        self.output_dir = output_dir
+        self.workers = max(1, workers)
+        # Each job may run several provider calls at once
+        self.session = create_session(self.workers * 4)
+        self.verifier = CredentialVerifier(self.session)
+        self.forks = ForkManagerPool(self.session)
+        self.token = token
+        self.capacity = queue_size
+        # Jobs ready for any worker; a busy project's later jobs wait in its backlog instead
+        self.queue: queue.Queue = queue.Queue()
+        self.jobs: 'OrderedDict[str, Job]' = OrderedDict()
+        self.handlers = {'provision': self.provision, 'verify': self.verify, 'render': self.render}
+        self._projects: Dict[str, Tuple[float, SetupProgress]] = {}
+        self._busy: Set[str] = set()
+        self._backlog: Dict[str, Deque[Job]] = {}
+        self._lock = threading.Lock()
+        self._threads = []
+        self.running = 0
+        self.waiting = 0
+
+    def start(self):
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"daemon-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 30.0):
+        """Finish the queued jobs, then stop the workers"""
+        for _ in self._threads:
+            self.queue.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+        self.session.close()
+
+    def submit(self, body: Dict) -> Job:
+        """Queue a job, raising JobError when it is invalid and queue.Full when the daemon is at capacity"""
+        if not isinstance(body, dict) or body.get('kind') not in JOB_KINDS:
+            raise JobError(f"'kind' must be one of {', '.join(JOB_KINDS)}")
+        project = body.get('project')
+        if body['kind'] == 'provision':
+            try:
+                body = {**body, 'project': project_spec(project, body.get('defaults'))}
+            except ManifestError as e:
+                raise JobError(str(e))
+            name = body['project']['project_name']
+            if body.get('overwrite') is not True and self.store.updated_at(name) is not None:
+                raise JobConflict(f"Project {name} is already in the store; set \"overwrite\": true to replace it")
+        else:
+            name = normalize_project_name(project) if isinstance(project, str) else ""
+            if not name:
+                raise JobError("'project' must be a project name")
+        job = Job(uuid.uuid4().hex, body['kind'], name, body)
+        with self._lock:
+            if self.waiting >= self.capacity:
+                raise queue.Full
+            self.waiting += 1
+            self.jobs[job.id] = job
+            self._forget_finished()
+        self.queue.put(job)
+        return job
+
+    def job(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def health(self) -> Dict:
+        with self._lock:
+            return {'workers': self.workers, 'running': self.running, 'queued': self.waiting,
+                    'capacity': self.capacity, 'jobs': len(self.jobs), 'projects': len(self._projects)}
+
+    def _forget_finished(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.done.is_set()]
+        for job_id in finished[:max(0, len(self.jobs) - MAX_FINISHED_JOBS)]:
+            del self.jobs[job_id]
+
+    def _work(self):
+        while True:
+            job = self.queue.get()
+            if job is None:
+                return
+            with self._lock:
+                if job.project in self._busy:
+                    # Runs after the project's current job, on the worker running that one
+                    self._backlog.setdefault(job.project, deque()).append(job)
+                    continue
+                self._busy.add(job.project)
+            while job:
+                self._run(job)
+                job = self._next(job.project)
+
+    def _next(self, project: str) -> Optional[Job]:
+        """The project's next waiting job, or None once it has none and is no longer busy"""
+        with self._lock:
+            backlog = self._backlog.get(project)
+            if backlog:
+                return backlog.popleft()
+            self._backlog.pop(project, None)
+            self._busy.discard(project)
+            return None
+
+    def _run(self, job: Job):
+        job.status, job.started_at = 'running', time.time()
+        with self._lock:
+            self.waiting -= 1
+            self.running += 1
+        try:
+            with span(f"daemon {job.kind}", **{'kosuke.project': job.project, 'kosuke.job': job.id}):
+                job.result = self.handlers[job.kind](job)
+            job.status = 'ok'
+        except Exception as e:
+            if not isinstance(e, (ManifestError, JobError)):
+                logger.exception(f"Job {job.id} ({job.kind} {job.project}) failed")
+            job.status, job.error = 'failed', str(e)
+        finally:
+            job.finished_at = time.time()
+            with self._lock:
+                self.running -= 1
+            job.done.set()
+
+    def project(self, name: str) -> SetupProgress:
+        """A project's progress, from memory while the store has nothing newer"""
+        updated_at = self.store.updated_at(name)
+        if updated_at is None:
+            raise JobError(f"Project not found: {name}")
+        with self._lock:
+            cached = self._projects.get(name)
+        if cached and cached[0] == updated_at:
+            return cached[1]
+        progress = self.store.load(name)
+        with self._lock:
+            self._projects[name] = (updated_at, progress)
+        return progress
+
+    def provision(self, job: Job) -> Dict:
+        spec = job.payload['project']
+        # Checked again here: an earlier job of the same project may have created it since submission
+        if job.payload.get('overwrite') is not True and self.store.updated_at(job.project) is not None:
+            raise JobConflict(f"Project {job.project} is already in the store; set \"overwrite\": true to replace it")
+        project_dir = os.path.join(self.output_dir, job.project)
+        os.makedirs(project_dir, exist_ok=True)
+        verifier = self.verifier if job.payload.get('verify') else None
+        progress = HeadlessSetup(spec, project_dir, self.store, self.session, verifier, self.forks.get).run()
+        with self._lock:
+            self._projects[job.project] = (self.store.updated_at(job.project), progress)
+        return {'output_dir': project_dir, 'completed_services': list(progress.completed_services)}
+
+    def verify(self, job: Job) -> Dict:
+        results = self.verifier.verify(self.project(job.project))
+        return {'ok': all(r.ok for r in results), 'results': [asdict(r) for r in results]}
+
+    def render(self, job: Job) -> Dict:
+        progress = self.project(job.project)
+        project_dir = os.path.join(self.output_dir, job.project)
+        os.makedirs(project_dir, exist_ok=True)
+        written = write_env_files(progress, project_dir)
+        return {'output_dir': project_dir, 'written': [path for path, changed in written.items() if changed],
+                'unchanged': [path for path, changed in written.items() if not changed]}
+
+class _Handler(BaseHTTPRequestHandler):
+    """The job API; the daemon is attached to the server"""
+
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately; without this, delayed ACKs add ~40ms per response
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+    def address_string(self) -> str:
+        # Unix socket clients have no address
+        return self.client_address[0] if self.client_address else 'unix'
+
+    def _send(self, status: int, body: Dict, headers: Optional[Dict[str, str]] = None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _refused(self) -> bool:
+        """Answer and return True unless the request comes from a local client holding the token"""
+        daemon: ProvisioningDaemon = self.server.daemon
+        if self.headers.get('Origin') is not None:
+            # Browsers always send Origin on cross-site POSTs; local tools never need it
+            self._send(403, {'error': "requests from web pages are not accepted"})
+            return True
+        host = (self.headers.get('Host') or 'localhost').lower()
+        if host.rsplit(':', 1)[0] not in LOOPBACK_HOSTS and host not in LOOPBACK_HOSTS:
+            self._send(403, {'error': f"host {host} is not a loopback name"})
+            return True
+        scheme, _, token = (self.headers.get('Authorization') or '').partition(' ')
+        if scheme.lower() != 'bearer' or not hmac.compare_digest(token.strip().encode(), daemon.token.encode()):
+            self._send(401, {'error': "missing or wrong bearer token"}, {'WWW-Authenticate': 'Bearer'})
+            return True
+        return False
+
+    def do_POST(self):
+        daemon: ProvisioningDaemon = self.server.daemon
+        # Read first, so a refused request does not leave its body on a keep-alive connection
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        if self._refused():
+            return
+        if urlsplit(self.path).path != '/jobs':
+            return self._send(404, {'error': "not found"})
+        if self.headers.get_content_type() != 'application/json':
+            return self._send(415, {'error': "Content-Type must be application/json"})
+        try:
+            job = daemon.submit(json.loads(body or b'null'))
+        except JobConflict as e:
+            return self._send(409, {'error': str(e)})
+        except (ValueError, JobError) as e:
+            return self._send(400, {'error': str(e)})
+        except queue.Full:
+            return self._send(503, {'error': "job queue is full"}, {'Retry-After': '1'})
+        self._send(202, job.to_dict(), {'Location': f"/jobs/{job.id}"})
+
+    def do_GET(self):
+        daemon: ProvisioningDaemon = self.server.daemon
+        if self._refused():
+            return
+        url = urlsplit(self.path)
+        if url.path == '/health':
+            return self._send(200, daemon.health())
+        if url.path.startswith('/jobs/'):
+            job = daemon.job(url.path[len('/jobs/'):])
+            if not job:
+                return self._send(404, {'error': "no such job"})
+            try:
+                wait = float(parse_qs(url.query).get('wait', ['0'])[0])
+            except ValueError:
+                return self._send(400, {'error': "'wait' must be a number of seconds"})
+            if wait > 0:
+                job.done.wait(min(wait, MAX_WAIT))
+            return self._send(200, job.to_dict())
+        self._send(404, {'error': "not found"})
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def server_bind(self):
+        # Created accessible to the owner only, since jobs carry API keys
+        umask = os.umask(0o177)
+        try:
+            super().server_bind()
+        finally:
+            os.umask(umask)
+
+def create_server(daemon: ProvisioningDaemon, port: int = DEFAULT_PORT, socket_path: Optional[str] = None):
+    """The job API server on a Unix socket, or on a loopback port"""
+    if not daemon.token:
+        raise OSError("The daemon needs an API token")
+    if socket_path:
+        if os.path.exists(socket_path):
+            probe = socket.socket(socket.AF_UNIX)
+            try:
+                probe.connect(socket_path)
+            except OSError:
+                os.unlink(socket_path)  # left behind by a daemon that did not stop cleanly
+            else:
+                raise OSError(f"A daemon is already listening on {socket_path}")
+            finally:
+                probe.close()
+        server = _UnixHTTPServer(socket_path, _Handler)
+    else:
+        server = ThreadingHTTPServer(('127.0.0.1', port), _Handler)
+    server.daemon = daemon
+    return server
+
+def serve(daemon: ProvisioningDaemon, port: int = DEFAULT_PORT, socket_path: Optional[str] = None):
+    """Run the daemon until interrupted or terminated, then finish the queued jobs"""
+    server = create_server(daemon, port, socket_path)
+    daemon.start()
+    where = socket_path or f"http://127.0.0.1:{server.server_address[1]}"
+    print_info(f"Provisioning daemon listening on {Colors.OKBLUE}{where}{Colors.ENDC} "
+               f"with {daemon.workers} workers")
+
+    def terminate(signum, frame):
+        raise KeyboardInterrupt
+    signal.signal(signal.SIGTERM, terminate)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print_info("Stopping: finishing queued jobs...")
+    finally:
+        server.server_close()
+        if socket_path and os.path.exists(socket_path):
+            os.unlink(socket_path)
+        daemon.stop()
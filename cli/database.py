@@ -0,0 +1,28 @@
+"""
+Postgres access for the commands that work on the app's own database.
+
+Needs psycopg 3 (pip install "psycopg[binary]"), which is only imported when a
+command actually connects.
+"""
+
+import os
+
+from envfiles import LOCAL_DATABASE_URL
+
+class DatabaseError(Exception):
+    """Raised when the app's database cannot be reached"""
+
+def database_url(explicit: str = "") -> str:
+    """The given URL, then $POSTGRES_URL, then the local development database"""
+    return explicit or os.environ.get('POSTGRES_URL') or LOCAL_DATABASE_URL
+
+def connect(url: str, **kwargs):
+    """Open a psycopg connection, with a clear error when the driver is missing"""
+    try:
+        import psycopg
+    except ImportError:
+        raise DatabaseError('Postgres access requires psycopg 3 (pip install "psycopg[binary]")')
+    try:
+        return psycopg.connect(url, **kwargs)
+    except psycopg.Error as e:
+        raise DatabaseError(f"Cannot connect to Postgres: {e}")
@@ -0,0 +1,238 @@
+"""
+Follow a Vercel deployment until it is ready or has failed.
+
+With an API token the wizard no longer waits for someone to press Enter
+once the dashboard shows the build finished. The build log arrives through
+the deployment's event stream (`/v3/deployments/<id>/events?follow=1`), which
+stays open until the build ends, and the final state is then read from the
+deployment. When the stream is unavailable or drops, the state is polled
+instead: every second at first, backing off to ten seconds while it does not
+change, and back to a second as soon as it does.
+
+The report splits the wait into queued and building time from the
+deployment's timestamps, and the build into the clone, install, build and
+deploy phases marked in the Vercel build log. The tests' MockVercelServer
+(tests/conftest.py) serves a deployment and its event stream locally; point
+KOSUKE_VERCEL_API_URL at it to run offline.
+"""
+
+import re
+import json
+import time
+import logging
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+import requests
+
+from console import Colors
+from services import VercelService
+
+logger = logging.getLogger(__name__)
+
+FINAL_STATES = ('READY', 'ERROR', 'CANCELED')
+DEPLOY_TIMEOUT = 900.0
+POLL_MIN = 1.0
+POLL_MAX = 10.0
+POLL_BACKOFF = 1.5
+# A build can go quiet for a while; after this long without a line the stream is given up for polling
+STREAM_READ_TIMEOUT = 60
+# Lines of the Vercel build log that start each phase
+LOG_PHASES = (
+    ('clone', re.compile(r'^Cloning ')),
+    ('install', re.compile(r'^Installing dependencies')),
+    ('build', re.compile(r'^Running "(?!vercel build")[^"]*build')),
+    ('deploy', re.compile(r'^Deploying outputs')),
+)
+
+class DeploymentError(Exception):
+    """Raised when there is no deployment to follow"""
+
+@dataclass
+class DeploymentReport:
+    """How a deployment ended and where its time went"""
+    deployment_id: str
+    url: str = ""
+    state: str = ""
+    seconds: float = 0.0
+    queued: Optional[float] = None
+    building: Optional[float] = None
+    phases: List[Tuple[str, float]] = field(default_factory=list)
+    error_message: str = ""
+    streamed: bool = False
+    polls: int = 0
+    log_lines: int = 0
+
+    @property
+    def ready(self) -> bool:
+        return self.state == 'READY'
+
+def _seconds_between(start: Optional[int], end: Optional[int]) -> Optional[float]:
+    if not start or not end or end < start:
+        return None
+    return (end - start) / 1000
+
+def log_phases(lines: List[Tuple[int, str]], ended_at: Optional[int]) -> List[Tuple[str, float]]:
+    """(phase, seconds) for each phase marked in a build log of (milliseconds, text) lines"""
+    starts: List[Tuple[str, int]] = []
+    for created, text in lines:
+        for phase, marker in LOG_PHASES:
+            if marker.match(text) and phase not in dict(starts):
+                starts.append((phase, created))
+    phases = []
+    for index, (phase, started) in enumerate(starts):
+        ended = starts[index + 1][1] if index + 1 < len(starts) else ended_at
+        seconds = _seconds_between(started, ended)
+        if seconds is not None:
+            phases.append((phase, seconds))
+    return phases
+
+class DeploymentWatcher:
+    """Follows deployments of one Vercel account through the event stream, polling when it fails"""
+
+    def __init__(self, vercel: VercelService, echo: Optional[Callable[[str], None]] = None,
+                 timeout: float = DEPLOY_TIMEOUT):
+        self.vercel = vercel
+        self.echo = echo
+        self.timeout = timeout
+
+    def wait_for_new(self, project: str, since: int, target: str = 'production') -> Dict:
+        """The first deployment of a project created after `since` (milliseconds), once one exists"""
+        deadline = time.monotonic() + self.timeout
+        interval = POLL_MIN
+        while True:
+            deployment = self.vercel.latest_deployment(project, target, state=None, since=since)
+            if deployment:
+                return deployment
+            if time.monotonic() > deadline:
+                raise DeploymentError(f"No deployment of {project} started within {self.timeout:.0f}s")
+            time.sleep(interval)
+            interval = min(POLL_MAX, interval * POLL_BACKOFF)
+
+    def follow(self, deployment: Dict) -> DeploymentReport:
+        """Stream a deployment's build log until it ends, and report how it went"""
+        started = time.monotonic()
+        deadline = started + self.timeout
+        deployment_id = deployment.get('uid') or deployment.get('id')
+        report = DeploymentReport(deployment_id, deployment.get('url', ""))
+        lines: List[Tuple[int, str]] = []
+
+        report.streamed = self._stream(deployment_id, lines, deadline)
+        deployment = self.vercel.get_deployment(deployment_id)
+        if self._state(deployment) not in FINAL_STATES:
+            deployment = self._poll(deployment, deadline, report)
+        if not lines:
+            # Polled, so the phases come from the finished log
+            lines = self._fetch_log(deployment_id)
+
+        report.state = self._state(deployment)
+        report.url = deployment.get('url', report.url)
+        report.seconds = time.monotonic() - started
+        report.error_message = deployment.get('errorMessage') or ""
+        ready_at = deployment.get('ready') or (lines[-1][0] if lines else None)
+        report.queued = _seconds_between(deployment.get('createdAt'), deployment.get('buildingAt'))
+        report.building = _seconds_between(deployment.get('buildingAt'), ready_at)
+        report.phases = log_phases(lines, ready_at)
+        report.log_lines = len(lines)
+        return report
+
+    @staticmethod
+    def _state(deployment: Dict) -> str:
+        return deployment.get('readyState') or deployment.get('state') or ""
+
+    def _stream(self, deployment_id: str, lines: List[Tuple[int, str]], deadline: float) -> bool:
+        """Read the followed event stream to its end, returning whether it got there"""
+        try:
+            response = self.vercel.deployment_events(deployment_id, timeout=(3.05, STREAM_READ_TIMEOUT))
+        except requests.RequestException as e:
+            logger.debug("Deployment event stream unavailable: %s", e)
+            return False
+        try:
+            if response.status_code != 200:
+                logger.debug("Deployment event stream answered %s", response.status_code)
+                return False
+            for raw in response.iter_lines():
+                if raw:
+                    self._event(json.loads(raw), lines)
+                if time.monotonic() > deadline:
+                    return False
+            return True
+        except (requests.RequestException, ValueError) as e:
+            logger.debug("Deployment event stream dropped: %s", e)
+            return False
+        finally:
+            response.close()
+
+    def _event(self, event: Dict, lines: List[Tuple[int, str]]):
+        payload = event.get('payload') or {}
+        text = payload.get('text', event.get('text'))
+        if event.get('type') in ('stdout', 'stderr', 'command') and text is not None:
+            created = event.get('created') or payload.get('date') or int(time.time() * 1000)
+            for line in str(text).splitlines() or [""]:
+                lines.append((created, line))
+                if self.echo:
+                    self.echo(line)
+
+    def _poll(self, deployment: Dict, deadline: float, report: DeploymentReport) -> Dict:
+        """Poll until the deployment reaches a final state, backing off while it does not change"""
+        interval = POLL_MIN
+        state = self._state(deployment)
+        while state not in FINAL_STATES:
+            if time.monotonic() > deadline:
+                raise DeploymentError(f"Deployment {report.deployment_id} still {state} after "
+                                      f"{self.timeout:.0f}s")
+            time.sleep(interval)
+            deployment = self.vercel.get_deployment(report.deployment_id)
+            report.polls += 1
+            previous, state = state, self._state(deployment)
+            if state != previous:
+                interval = POLL_MIN
+                if self.echo:
+                    self.echo(f"Deployment is {state}")
+            else:
+                interval = min(POLL_MAX, interval * POLL_BACKOFF)
+        return deployment
+
+    def _fetch_log(self, deployment_id: str) -> List[Tuple[int, str]]:
+        lines: List[Tuple[int, str]] = []
+        try:
+            response = self.vercel.deployment_events(deployment_id, follow=False)
+            if response.status_code == 200:
+                echo, self.echo = self.echo, None
+                try:
+                    for event in response.json():
+                        self._event(event, lines)
+                finally:
+                    self.echo = echo
+        except (requests.RequestException, ValueError) as e:
+            logger.debug("Deployment build log unavailable: %s", e)
+        return lines
+
+def follow_deployment(vercel: VercelService, deployment: Dict,
+                      echo: Optional[Callable[[str], None]] = None) -> DeploymentReport:
+    """Follow one deployment to its end"""
+    return DeploymentWatcher(vercel, echo).follow(deployment)
+
+def redeploy_latest(vercel: VercelService, project: str) -> Dict:
+    """Rebuild the project's latest production deployment, ready or not, so it picks up new variables"""
+    latest = vercel.latest_deployment(project, state=None)
+    if not latest:
+        raise DeploymentError(f"{project} has no production deployment to rebuild")
+    return vercel.redeploy(project, latest.get('uid') or latest.get('id'))
+
+def echo_log_line(line: str):
+    """Print one build log line, indented and dimmed"""
+    print(f"   {Colors.OKCYAN}│{Colors.ENDC} {line}")
+
+def print_deployment_report(report: DeploymentReport):
+    """Print how the deployment ended and how long each phase took"""
+    color = Colors.OKGREEN if report.ready else Colors.FAIL
+    how = "streamed" if report.streamed else f"polled {report.polls} times"
+    print(f"\n{Colors.BOLD}🚀 Deployment {report.url or report.deployment_id}:{Colors.ENDC} "
+          f"{color}{report.state}{Colors.ENDC} after {report.seconds:.1f}s ({how})")
+    timings = [('queued', report.queued), ('building', report.building)]
+    for name, seconds in timings + [(f"  {phase}", seconds) for phase, seconds in report.phases]:
+        if seconds is not None:
+            print(f"   {name:<12} {seconds:7.1f}s")
+    if report.error_message:
+        print(f"   {Colors.FAIL}{report.error_message}{Colors.ENDC}")
@@ -0,0 +1,279 @@
+"""
+Config drift detection between the saved setup, the env files and Vercel.
+
+The saved setup is the source of truth: the env registry says which variables
+each environment should have and what their values are. Every side is reduced
+to fingerprints, a keyed hash of each variable's name and value, so a report
+can say what differs without printing a value:
+
+- the .env, .env.preview and .env.prod files of each project
+- the preview and production environments of the Vercel project of the same name
+
+Projects are checked concurrently, and the result is the minimal change plan
+per side: the variables to add, update or remove. Re-checks are incremental.
+A file whose size and modification time have not changed is not read again.
+Vercel variables are listed without their values, and only the ones whose
+updatedAt changed since the last check are decrypted. The cache holds
+fingerprints and the salt they were made with, never values.
+"""
+
+import os
+import hmac
+import json
+import hashlib
+import secrets
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+import requests
+
+from console import Colors, print_info
+from envfiles import ENV_FILES, ENV_VARS_BY_NAME, PREVIEW, PRODUCTION, get_renderer, read_env_file
+from envpush import desired_env, vercel_client
+from progress import SetupProgress
+from services import ServiceError, VercelService, create_session
+from tracing import propagate, span
+
+logger = logging.getLogger(__name__)
+
+DRIFT_CACHE_FILE = ".kosuke-drift-cache.json"
+FINGERPRINT_LENGTH = 12
+DRIFT_WORKERS = 8
+# Past this many variables to decrypt, one decrypted listing is cheaper than a request each
+DECRYPT_ONE_BY_ONE = 5
+REMOTE_TARGETS = (PREVIEW, PRODUCTION)
+# Sensitive Vercel variables cannot be read back, so their value cannot be compared
+UNREADABLE = 'unreadable'
+
+@dataclass
+class Change:
+    """One step of the plan bringing a side back in line with the saved setup"""
+    target: str  # env file name or vercel:<environment>
+    key: str  # empty when the whole file is missing
+    action: str  # create (the whole file), add, update or remove
+    expected: str = ""  # fingerprints, never values
+    actual: str = ""
+
+@dataclass
+class ProjectDrift:
+    """Drift of one project's env files and Vercel environments"""
+    project: str
+    changes: List[Change] = field(default_factory=list)
+    unreadable: List[str] = field(default_factory=list)
+    unmanaged: List[str] = field(default_factory=list)  # Vercel variables the registry does not declare
+    remote_checked: bool = False
+    reused: int = 0  # files and variables whose fingerprint came from the cache
+    error: str = ""
+
+    @property
+    def clean(self) -> bool:
+        return not self.changes and not self.error
+
+class DriftCache:
+    """Fingerprints from earlier checks, per project, in a local JSON file"""
+
+    def __init__(self, path: str = DRIFT_CACHE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+        self.salt = data.get('salt') or secrets.token_hex(16)
+        self.projects: Dict[str, Dict] = data.get('projects', {})
+
+    def fingerprint(self, key: str, value: str) -> str:
+        # Keyed with the salt so short values cannot be looked up in a precomputed table
+        digest = hmac.new(self.salt.encode('utf-8'), f"{key}={value}".encode('utf-8'), hashlib.sha256)
+        return digest.hexdigest()[:FINGERPRINT_LENGTH]
+
+    def fingerprints(self, values: Dict[str, str]) -> Dict[str, str]:
+        return {key: self.fingerprint(key, value) for key, value in values.items()}
+
+    def get(self, project: str) -> Dict:
+        with self._lock:
+            return self.projects.get(project, {})
+
+    def put(self, project: str, entry: Dict):
+        with self._lock:
+            self.projects[project] = entry
+
+    def save(self):
+        with self._lock:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump({'salt': self.salt, 'projects': self.projects}, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+
+def diff(target: str, expected: Dict[str, str], actual: Dict[str, str],
+         removable: Callable[[str], bool] = lambda key: True) -> List[Change]:
+    """Changes turning the actual fingerprints into the expected ones"""
+    changes = []
+    for key in sorted(expected.keys() | actual.keys()):
+        want, have = expected.get(key), actual.get(key)
+        if have is None:
+            changes.append(Change(target, key, 'add', expected=want))
+        elif want is None:
+            if removable(key):
+                changes.append(Change(target, key, 'remove', actual=have))
+        elif have != UNREADABLE and have != want:
+            changes.append(Change(target, key, 'update', expected=want, actual=have))
+    return changes
+
+def _targets(entry: Dict) -> List[str]:
+    target = entry.get('target') or []
+    return [target] if isinstance(target, str) else list(target)
+
+def _misplaced(target: str) -> Callable[[str], bool]:
+    # Only registry variables that do not belong in this environment are removed;
+    # anything else in Vercel was added by hand or by an integration
+    return lambda key: key in ENV_VARS_BY_NAME and target not in ENV_VARS_BY_NAME[key].environments
+
+class DriftChecker:
+    """Compares one project's env files and Vercel environments with its saved setup"""
+
+    def __init__(self, cache: DriftCache, vercel: Optional[VercelService] = None):
+        self.cache = cache
+        self.vercel = vercel
+
+    def check(self, progress: SetupProgress, project_dir: str) -> ProjectDrift:
+        drift = ProjectDrift(progress.project_name)
+        cached = self.cache.get(progress.project_name)
+        entry = {'files': {}, 'remote': cached.get('remote', {})}
+
+        renderer = get_renderer()
+        for environment, file_name in ENV_FILES.items():
+            actual = self._file_fingerprints(os.path.join(project_dir, file_name), cached.get('files', {}),
+                                             entry['files'], drift)
+            if actual is None:
+                drift.changes.append(Change(file_name, '', 'create'))
+                continue
+            expected = self.cache.fingerprints(renderer.values(progress, environment))
+            drift.changes.extend(diff(file_name, expected, actual))
+
+        if self.vercel is not None:
+            remote = self._remote_fingerprints(progress.project_name, entry, drift)
+            desired = desired_env(progress, REMOTE_TARGETS)
+            for target in REMOTE_TARGETS:
+                expected = {key: self.cache.fingerprint(key, values[target])
+                            for key, values in desired.items() if target in values}
+                actual = remote.get(target, {})
+                drift.changes.extend(diff(f"vercel:{target}", expected, actual, _misplaced(target)))
+                drift.unreadable.extend(f"{target} {key}" for key in sorted(expected)
+                                        if actual.get(key) == UNREADABLE)
+            drift.unmanaged = sorted({key for values in remote.values() for key in values
+                                      if key not in ENV_VARS_BY_NAME})
+            drift.remote_checked = True
+
+        self.cache.put(progress.project_name, entry)
+        return drift
+
+    def _file_fingerprints(self, path: str, cached: Dict, files: Dict, drift: ProjectDrift) -> Optional[Dict]:
+        """Fingerprints of an env file, re-read only when its size or modification time changed"""
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        key = os.path.abspath(path)
+        stamp = [stat.st_mtime_ns, stat.st_size]
+        previous = cached.get(key)
+        if previous and previous['stamp'] == stamp:
+            drift.reused += 1
+            fingerprints = previous['fingerprints']
+        else:
+            fingerprints = self.cache.fingerprints(read_env_file(path))
+        files[key] = {'stamp': stamp, 'fingerprints': fingerprints}
+        return fingerprints
+
+    def _remote_fingerprints(self, project: str, entry: Dict, drift: ProjectDrift) -> Dict[str, Dict[str, str]]:
+        """{target: {key: fingerprint}}, decrypting only the variables changed since the last check"""
+        cached = entry['remote']
+        # Branch-specific preview values are not managed by the setup
+        listing = [env for env in self.vercel.list_env(project, decrypt=False) if not env.get('gitBranch')]
+        fingerprints = {}
+        stale = []
+        for env in listing:
+            previous = cached.get(env['id'])
+            if env.get('type') == 'sensitive':
+                fingerprints[env['id']] = UNREADABLE
+            elif env.get('type') == 'plain':
+                fingerprints[env['id']] = self.cache.fingerprint(env['key'], env.get('value', ''))
+            elif previous and env.get('updatedAt') and previous['updated_at'] == env['updatedAt']:
+                fingerprints[env['id']] = previous['fingerprint']
+                drift.reused += 1
+            else:
+                stale.append(env)
+
+        if len(stale) > DECRYPT_ONE_BY_ONE:
+            values = {env['id']: env.get('value', '') for env in self.vercel.list_env(project)}
+        else:
+            values = {env['id']: self.vercel.get_env(project, env['id']).get('value', '') for env in stale}
+        for env in stale:
+            fingerprints[env['id']] = self.cache.fingerprint(env['key'], values.get(env['id'], ''))
+
+        entry['remote'] = {env['id']: {'updated_at': env.get('updatedAt'), 'fingerprint': fingerprints[env['id']]}
+                           for env in listing}
+        by_target: Dict[str, Dict[str, str]] = {}
+        for env in listing:
+            for target in _targets(env):
+                by_target.setdefault(target, {})[env['key']] = fingerprints[env['id']]
+        return by_target
+
+def check_projects(projects: List[Tuple[SetupProgress, str]], workers: int = DRIFT_WORKERS,
+                   cache_path: str = DRIFT_CACHE_FILE, remote: bool = True) -> List[ProjectDrift]:
+    """Check (progress, project directory) pairs concurrently, in the given order"""
+    cache = DriftCache(cache_path)
+    workers = max(1, min(workers, len(projects)))
+    session = create_session(workers) if remote else None
+
+    def check(progress: SetupProgress, project_dir: str) -> ProjectDrift:
+        with span('drift check', **{'kosuke.project': progress.project_name}):
+            vercel = vercel_client(progress, session) if remote else None
+            try:
+                return DriftChecker(cache, vercel).check(progress, project_dir)
+            except (ServiceError, requests.RequestException, OSError) as e:
+                logger.debug("Drift check of %s failed", progress.project_name, exc_info=True)
+                return ProjectDrift(progress.project_name, error=str(e))
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(propagate(check), progress, project_dir) for progress, project_dir in projects]
+        results = [future.result() for future in futures]
+    cache.save()
+    return results
+
+def print_drift(results: List[ProjectDrift]):
+    """Print the change plan of every project that drifted, fingerprints only"""
+    for result in results:
+        if result.error:
+            print(f"\n{Colors.FAIL}✗ {result.project}: {result.error}{Colors.ENDC}")
+            continue
+        mark = f"{Colors.OKGREEN}✓" if result.clean else f"{Colors.WARNING}!"
+        where = "files and Vercel" if result.remote_checked else "files only, no Vercel token"
+        print(f"\n{mark} {result.project}{Colors.ENDC} ({where}, {len(result.changes)} changes)")
+        for change in result.changes:
+            if change.action == 'create':
+                print(f"   {change.target:<18} {Colors.WARNING}create{Colors.ENDC}  (file missing)")
+                continue
+            fingerprints = {'add': change.expected, 'remove': change.actual,
+                            'update': f"{change.actual} -> {change.expected}"}[change.action]
+            print(f"   {change.target:<18} {Colors.WARNING}{change.action:<6}{Colors.ENDC}  "
+                  f"{change.key}  {Colors.OKCYAN}{fingerprints}{Colors.ENDC}")
+        if result.unreadable:
+            print_info(f"Sensitive in Vercel, only checked for presence: {', '.join(result.unreadable)}")
+        if result.unmanaged:
+            print_info(f"Not managed by the setup: {', '.join(result.unmanaged)}")
+
+    drifted = [r for r in results if r.changes]
+    failed = [r for r in results if r.error]
+    print(f"\n{Colors.BOLD}{len(results)} projects checked: {len(results) - len(drifted) - len(failed)} in sync, "
+          f"{len(drifted)} drifted, {len(failed)} failed{Colors.ENDC}")
+    if any(c.target in ENV_FILES.values() for r in drifted for c in r.changes):
+        print_info("Env files: run `python main.py render-env` to rewrite them from the saved setup")
+    if any(c.target.startswith('vercel:') and c.action != 'remove' for r in drifted for c in r.changes):
+        print_info("Vercel: run `python main.py --push-env` to add and update the variables")
+    if any(c.target.startswith('vercel:') and c.action == 'remove' for r in drifted for c in r.changes):
+        print_info("Vercel: delete the variables planned for removal in the project settings")
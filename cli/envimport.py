@@ -0,0 +1,204 @@
+"""
+Rebuild setup progress from a project's existing env files.
+
+Saved progress is cleared once the wizard completes, so an already set up
+project would otherwise go through all eight steps again. Its .env,
+.env.preview and .env.prod files still hold almost everything the wizard
+collected. The env registry says where each variable's value came from, and
+importing runs that mapping backwards into `api_keys` and `service_configs`.
+Values equal to the registry default are skipped, since they are the
+placeholders written for missing answers. Values the wizard would have
+rejected are skipped too. When files disagree, deployed values win over local
+ones, and the disagreement is reported.
+
+A step counts as completed when everything it collects was imported:
+
+- the GitHub repository comes from the `origin` remote of the directory
+- the Neon database from a POSTGRES_URL in a deployed env file (as written by
+  `vercel env pull`)
+- the Vercel environment variables step (8) always runs again, so the
+  variables end up in Vercel
+"""
+
+import os
+import re
+import subprocess
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List
+
+from console import Colors, print_info, print_warning
+from envfiles import (
+    DEVELOPMENT, ENV_FILES, ENV_VARS_BY_NAME, LOCAL_DATABASE_URL, PREVIEW, PRODUCTION, read_env_file,
+)
+from progress import ServiceConfig, SetupProgress
+from scheduler import SETUP_GRAPH, resume_step, setup_steps
+from validation import (
+    is_clerk_publishable_key, is_clerk_secret_key, is_clerk_webhook_secret, is_polar_token, is_resend_api_key,
+    is_sentry_dsn, normalize_project_name, validate_github_url,
+)
+
+# Deployed values are what the app actually runs with
+IMPORT_ORDER = (PRODUCTION, PREVIEW, DEVELOPMENT)
+
+# Variables a step collects; the step is complete when all of them were imported
+STEP_VARIABLES = {
+    'vercel': ('NEXT_PUBLIC_APP_URL',),
+    'polar': ('POLAR_ORGANIZATION_ID', 'POLAR_PRO_PRODUCT_ID', 'POLAR_BUSINESS_PRODUCT_ID',
+              'POLAR_ACCESS_TOKEN', 'POLAR_WEBHOOK_SECRET'),
+    'clerk': ('NEXT_PUBLIC_CLERK_PUBLISHABLE_KEY', 'CLERK_SECRET_KEY', 'CLERK_WEBHOOK_SECRET'),
+    'resend': ('RESEND_API_KEY',),
+    'sentry': ('NEXT_PUBLIC_SENTRY_DSN',),
+}
+
+# The checks the wizard applies to the same answers
+VALIDATORS: Dict[str, Callable[[str], bool]] = {
+    'NEXT_PUBLIC_CLERK_PUBLISHABLE_KEY': is_clerk_publishable_key,
+    'CLERK_SECRET_KEY': is_clerk_secret_key,
+    'CLERK_WEBHOOK_SECRET': is_clerk_webhook_secret,
+    'POLAR_ACCESS_TOKEN': is_polar_token,
+    'RESEND_API_KEY': is_resend_api_key,
+    'NEXT_PUBLIC_SENTRY_DSN': is_sentry_dsn,
+    'NEXT_PUBLIC_APP_URL': lambda value: value.startswith('https://'),
+    'POLAR_ENVIRONMENT': lambda value: value in ('sandbox', 'production'),
+}
+
+POLAR_DASHBOARDS = {'sandbox': "https://sandbox.polar.sh/dashboard", 'production': "https://polar.sh/dashboard"}
+_VERCEL_APP = re.compile(r'^https://([a-z0-9-]+)\.vercel\.app/?$')
+_GITHUB_REMOTE = re.compile(r'^(?:https://github\.com/|git@github\.com:|ssh://git@github\.com/)'
+                            r'([^/]+)/([^/]+?)(?:\.git)?/?$')
+
+@dataclass
+class EnvImport:
+    """Progress rebuilt from env files, and how each value was found"""
+    progress: SetupProgress
+    files: List[str] = field(default_factory=list)
+    imported: Dict[str, str] = field(default_factory=dict)  # variable -> file it was taken from
+    conflicts: List[str] = field(default_factory=list)  # variables whose files disagree
+    rejected: List[str] = field(default_factory=list)  # values the wizard would not accept
+    unmanaged: List[str] = field(default_factory=list)  # not rendered in that file, dropped when it is rewritten
+    missing: Dict[str, List[str]] = field(default_factory=dict)  # step -> variables it still needs
+
+def github_remote(directory: str) -> str:
+    """https URL of the directory's GitHub `origin` remote, or ''"""
+    try:
+        url = subprocess.run(['git', '-C', directory, 'remote', 'get-url', 'origin'], capture_output=True,
+                             text=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+    match = _GITHUB_REMOTE.match(url)
+    return f"https://github.com/{match.group(1)}/{match.group(2)}" if match else ""
+
+def _store(progress: SetupProgress, source: str, value: str):
+    group, key = source.split('.', 1)
+    if group == 'api_keys':
+        progress.api_keys[key] = value
+    else:
+        progress.service_configs.setdefault(group, {}).setdefault('credentials', {})[key] = value
+
+def import_env_files(directory: str = '.', project_name: str = "") -> EnvImport:
+    """Rebuild progress from the env files in a directory, marking the steps they cover as completed"""
+    files: Dict[str, Dict[str, str]] = {}
+    for environment in IMPORT_ORDER:
+        path = os.path.join(directory, ENV_FILES[environment])
+        if os.path.exists(path):
+            files[environment] = read_env_file(path)
+    result = EnvImport(SetupProgress(), [ENV_FILES[environment] for environment in files])
+    progress = result.progress
+
+    for name, var in ENV_VARS_BY_NAME.items():
+        if not var.source:
+            continue
+        found = {}
+        for environment, values in files.items():
+            value = values.get(name, "").strip()
+            # Fixed values are not answers, and defaults are placeholders for missing ones
+            if (environment not in var.environments or var.fixed(environment) is not None
+                    or not value or value == var.placeholder(environment)):
+                continue
+            if name in VALIDATORS and not VALIDATORS[name](value):
+                result.rejected.append(f"{name} in {ENV_FILES[environment]}")
+                continue
+            found.setdefault(value, environment)
+        if not found:
+            continue
+        value, environment = next(iter(found.items()))
+        if len(found) > 1:
+            result.conflicts.append(name)
+        _store(progress, var.source, value)
+        result.imported[name] = ENV_FILES[environment]
+
+    # `vercel env pull` adds system variables that nobody maintains by hand
+    result.unmanaged = sorted({f"{key} ({ENV_FILES[environment]})" for environment, values in files.items()
+                               for key in values if not key.startswith(('VERCEL', 'TURBO', 'NX_'))
+                               and environment not in getattr(ENV_VARS_BY_NAME.get(key), 'environments', ())})
+
+    project_url = progress.service_configs.get('vercel', {}).get('credentials', {}).get('project_url', "")
+    repo_url = github_remote(directory)
+    if not project_name:
+        match = _VERCEL_APP.match(project_url)
+        project_name = match.group(1) if match else repo_url.rsplit('/', 1)[-1]
+    progress.project_name = normalize_project_name(project_name)
+
+    completed = []
+    if repo_url and progress.project_name and validate_github_url(repo_url, progress.project_name):
+        progress.api_keys['github_repo_url'] = repo_url
+        completed.append('github')
+    else:
+        result.missing['github'] = ["a GitHub origin remote named after the project"]
+    deployed_databases = [values.get('POSTGRES_URL', "") for environment, values in files.items()
+                          if environment != DEVELOPMENT]
+    if any(url and url != LOCAL_DATABASE_URL for url in deployed_databases):
+        completed.append('neon')
+    else:
+        result.missing['neon'] = ["POSTGRES_URL in .env.prod or .env.preview"]
+    for step, variables in STEP_VARIABLES.items():
+        missing = [name for name in variables if name not in result.imported]
+        if missing:
+            result.missing[step] = missing
+        else:
+            completed.append(step)
+    _complete_configs(progress)
+
+    order = [name for name, *_ in SETUP_GRAPH]
+    progress.completed_steps = sorted(completed, key=order.index)
+    progress.completed_services = list(progress.completed_steps)
+    progress.current_step = resume_step(setup_steps(dict.fromkeys(order)), progress.completed_steps)
+    return result
+
+def _complete_configs(progress: SetupProgress):
+    """Fill in the service config fields the wizard stores next to the credentials"""
+    vercel = progress.service_configs.get('vercel')
+    if vercel:
+        vercel.update(name='Vercel Project', url=vercel['credentials'].get('project_url', ""))
+    polar = progress.service_configs.get('polar')
+    if polar:
+        credentials = polar['credentials']
+        credentials.setdefault('environment', 'sandbox')
+        org_slug = credentials.get('organization_slug', "")
+        dashboard_url = f"{POLAR_DASHBOARDS[credentials['environment']]}/{org_slug}"
+        if org_slug:
+            credentials['dashboard_url'] = dashboard_url
+        progress.service_configs['polar'] = ServiceConfig(
+            name="Polar Billing", url=dashboard_url, credentials=credentials,
+            webhook_urls=[f"https://{progress.project_name}.vercel.app/api/billing/webhook"],
+        ).to_dict()
+
+def print_env_import(result: EnvImport):
+    """Print what was imported and which steps are left"""
+    progress = result.progress
+    print(f"\n{Colors.BOLD}📥 Imported {len(result.imported)} variables from {', '.join(result.files)}"
+          f"{Colors.ENDC}")
+    for name, file_name in sorted(result.imported.items()):
+        print(f"   {Colors.OKGREEN}✓{Colors.ENDC} {name:<36} {Colors.OKCYAN}{file_name}{Colors.ENDC}")
+    done = ', '.join(progress.completed_steps) or "none"
+    print_info(f"Project: {progress.project_name or '(asked next)'}; steps completed: {done}")
+    for step, needs in result.missing.items():
+        print_info(f"Step {step} runs again: missing {', '.join(needs)}")
+    print_info("Step vercel-env runs again so the variables reach Vercel")
+    if result.conflicts:
+        print_warning(f"Files disagree on {', '.join(result.conflicts)}; the deployed value was taken")
+    if result.rejected:
+        print_warning(f"Skipped, not in the expected format: {', '.join(result.rejected)}")
+    if result.unmanaged:
+        print_warning(f"Not written by the setup, so dropped when the env files are rewritten: "
+                      f"{', '.join(result.unmanaged)}")
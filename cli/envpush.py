@@ -0,0 +1,142 @@
+"""
+Automated push of a project's environment variables to Vercel.
+
+The desired variables come from the env registry (preview and production
+targets). The push first reads what Vercel already has, then creates missing
+variables in batched requests and patches only the ones whose value changed,
+so re-running it against an up-to-date project sends nothing.
+"""
+
+import os
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from console import Colors
+from tracing import propagate
+from progress import SetupProgress
+from envfiles import ENV_VARS_BY_NAME, PREVIEW, PRODUCTION, get_renderer
+from services import VercelService
+
+logger = logging.getLogger(__name__)
+
+PUSH_TARGETS = (PREVIEW, PRODUCTION)
+BATCH_SIZE = 50
+UPDATE_WORKERS = 4
+
+@dataclass
+class EnvPushPlan:
+    """Changes needed to bring a Vercel project in line with the registry"""
+    creates: List[Dict] = field(default_factory=list)
+    updates: List[Tuple[str, str, Dict]] = field(default_factory=list)  # (key, env id, changes)
+    unchanged: List[str] = field(default_factory=list)
+
+    @property
+    def empty(self) -> bool:
+        return not self.creates and not self.updates
+
+@dataclass
+class EnvPushResult:
+    """Outcome of a push"""
+    project: str
+    created: List[str] = field(default_factory=list)
+    updated: List[str] = field(default_factory=list)
+    unchanged: List[str] = field(default_factory=list)
+
+def desired_env(progress: SetupProgress, targets=PUSH_TARGETS) -> Dict[str, Dict[str, str]]:
+    """{key: {target: value}} for every configured variable, skipping placeholders"""
+    renderer = get_renderer()
+    desired: Dict[str, Dict[str, str]] = {}
+    for target in targets:
+        for key, value in renderer.values(progress, target, configured_only=True).items():
+            desired.setdefault(key, {})[target] = value
+    return desired
+
+def _targets(entry: Dict) -> set:
+    target = entry.get('target') or []
+    return {target} if isinstance(target, str) else set(target)
+
+class VercelEnvPush:
+    """Upserts the registry's variables into one Vercel project"""
+
+    def __init__(self, vercel: VercelService, project: str, force: bool = False):
+        self.vercel = vercel
+        self.project = project
+        # Sensitive variables cannot be read back, so they are only rewritten when forced
+        self.force = force
+
+    def plan(self, progress: SetupProgress) -> EnvPushPlan:
+        """Compare the desired variables with what Vercel has"""
+        existing: Dict[str, List[Dict]] = {}
+        for entry in self.vercel.list_env(self.project):
+            existing.setdefault(entry['key'], []).append(entry)
+
+        plan = EnvPushPlan()
+        for key, per_target in sorted(desired_env(progress).items()):
+            env_type = 'encrypted' if ENV_VARS_BY_NAME[key].secret else 'plain'
+            # Targets that share a value are pushed as one variable
+            groups: Dict[str, set] = {}
+            for target, value in per_target.items():
+                groups.setdefault(value, set()).add(target)
+
+            changed = False
+            for value, targets in groups.items():
+                uncovered = set(targets)
+                for entry in existing.get(key, []):
+                    overlap = _targets(entry) & targets
+                    if not overlap:
+                        continue
+                    uncovered -= overlap
+                    readable = entry.get('type') != 'sensitive'
+                    if (readable and entry.get('value') != value) or (not readable and self.force):
+                        plan.updates.append((key, entry['id'], {'value': value, 'type': env_type}))
+                        changed = True
+                if uncovered:
+                    plan.creates.append({'key': key, 'value': value, 'type': env_type, 'target': sorted(uncovered)})
+                    changed = True
+            if not changed:
+                plan.unchanged.append(key)
+        return plan
+
+    def apply(self, plan: EnvPushPlan) -> EnvPushResult:
+        """Send the planned creates in batches and the updates concurrently"""
+        result = EnvPushResult(self.project, unchanged=list(plan.unchanged))
+        for i in range(0, len(plan.creates), BATCH_SIZE):
+            batch = plan.creates[i:i + BATCH_SIZE]
+            self.vercel.create_env(self.project, batch)
+            result.created.extend(v['key'] for v in batch)
+
+        if plan.updates:
+            with ThreadPoolExecutor(max_workers=UPDATE_WORKERS) as pool:
+                futures = [pool.submit(propagate(self.vercel.update_env), self.project, env_id, changes)
+                           for _, env_id, changes in plan.updates]
+                for (key, _, _), future in zip(plan.updates, futures):
+                    future.result()
+                    result.updated.append(key)
+        return result
+
+    def push(self, progress: SetupProgress) -> EnvPushResult:
+        """Plan and apply in one go"""
+        return self.apply(self.plan(progress))
+
+def vercel_client(progress: SetupProgress, session=None, **kwargs) -> Optional[VercelService]:
+    """Vercel client for a project's saved token (or $VERCEL_TOKEN), None without one"""
+    token = progress.api_keys.get('vercel_token') or os.environ.get('VERCEL_TOKEN')
+    if not token:
+        return None
+    team_id = progress.service_configs.get('vercel', {}).get('credentials', {}).get('team_id', '')
+    return VercelService(token, os.environ.get('VERCEL_TEAM_ID', team_id), session=session, max_retries=4, **kwargs)
+
+def push_progress(progress: SetupProgress, token: str, team_id: str = "", session=None,
+                  force: bool = False) -> EnvPushResult:
+    """Push a project's variables to the Vercel project with the same name"""
+    vercel = VercelService(token, team_id, session=session)
+    return VercelEnvPush(vercel, progress.project_name, force).push(progress)
+
+def print_push_result(result: EnvPushResult):
+    """Print a one-line summary per change type"""
+    print(f"\n{Colors.BOLD}☁️  Vercel environment variables for {result.project}:{Colors.ENDC}")
+    print(f"   • Created:   {Colors.OKGREEN}{len(result.created)}{Colors.ENDC} {', '.join(result.created)}")
+    print(f"   • Updated:   {Colors.WARNING}{len(result.updated)}{Colors.ENDC} {', '.join(result.updated)}")
+    print(f"   • Unchanged: {Colors.OKCYAN}{len(result.unchanged)}{Colors.ENDC}")
@@ -0,0 +1,199 @@
+"""
+Automated fork of the template repository on GitHub.
+
+With a token, the template is forked under the project name, either into the
+token's account or into an organization. GitHub creates forks
+asynchronously: the repository answers at once, but its git data is copied
+afterwards. A fork is ready when its default branch resolves.
+
+Waiting forks are watched together through the template's fork listing, with
+conditional requests. While nothing changes, GitHub answers 304 Not Modified,
+which does not count against the rate limit. So one cheap request per round
+covers every fork still waiting. The branch of a fork is only checked once it
+shows up in the listing, and every few rounds in case the listing lags.
+
+All calls with one token go through one client, one at a time, with writes
+at least a second apart, which keeps clear of GitHub's secondary rate limits.
+A batch run shares one ForkManager per token and organization, however many
+projects it forks. The tests' MockGitHubServer (tests/conftest.py) stands in
+for the endpoints used here; point KOSUKE_GITHUB_API_URL at it to run offline.
+"""
+
+import time
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+
+import requests
+
+from console import Colors
+from services import GitHubService, ServiceError
+from tracing import propagate
+
+logger = logging.getLogger(__name__)
+
+FORK_TIMEOUT = 300.0
+POLL_INTERVAL = 2.0
+# Rounds after which a waiting fork's branch is checked even if the listing has not shown it
+DIRECT_CHECK_ROUNDS = 5
+
+class GitHubSetupError(Exception):
+    """Raised when the repository cannot be forked automatically"""
+
+@dataclass
+class ForkResult:
+    """A fork that is ready to be imported into Vercel"""
+    full_name: str
+    repo_url: str
+    seconds: float = 0.0
+    existed: bool = False
+
+@dataclass
+class _PendingFork:
+    owner: str
+    name: str
+    branch: str
+    ready: threading.Event = field(default_factory=threading.Event)
+    listed: bool = False
+    rounds: int = 0
+    error: str = ""
+
+class ForkManager:
+    """Forks the template for any number of projects, polling all waiting forks together"""
+
+    def __init__(self, token: str, template_owner: str, template_repo: str, organization: str = "",
+                 session: Optional[requests.Session] = None, timeout: float = FORK_TIMEOUT,
+                 poll_interval: float = POLL_INTERVAL, github: Optional[GitHubService] = None):
+        self.github = github or GitHubService(token, session=session)
+        self.template_owner = template_owner
+        self.template_repo = template_repo
+        self.organization = organization
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.polls = 0
+        self.not_modified = 0
+        self._owner = organization
+        self._pending: Dict[str, _PendingFork] = {}
+        self._lock = threading.Lock()
+        self._owner_lock = threading.Lock()
+        self._poller: Optional[threading.Thread] = None
+        self._etag = ""
+        self._listed = set()  # forks in the last listing, still valid while GitHub answers 304
+
+    @property
+    def owner(self) -> str:
+        """Account the forks are created in"""
+        # Its own lock: the lookup is a request, and _lock guards the waiting forks
+        with self._owner_lock:
+            if not self._owner:
+                self._owner = self.github.get_user()['login']
+            return self._owner
+
+    def fork(self, name: str) -> ForkResult:
+        """Fork the template as owner/name and wait until its git data is there"""
+        started = time.monotonic()
+        owner = self.owner
+        existing = self.github.get_repo(owner, name)
+        if existing:
+            parent = (existing.get('parent') or {}).get('full_name', "")
+            if parent.lower() != f"{self.template_owner}/{self.template_repo}".lower():
+                raise GitHubSetupError(f"{owner}/{name} already exists and is not a fork of "
+                                       f"{self.template_owner}/{self.template_repo}")
+            fork, existed = existing, True
+        else:
+            fork, existed = self.github.create_fork(self.template_owner, self.template_repo, name,
+                                                    self.organization), False
+            if fork.get('name', '').lower() != name.lower():
+                # GitHub keeps one fork of a repository per account and hands back the existing one
+                raise GitHubSetupError(f"{owner} already has a fork of the template, {fork.get('full_name')}; "
+                                       "fork into another organization or rename that fork")
+
+        pending = _PendingFork(owner, fork.get('name', name), fork.get('default_branch') or 'main', listed=existed)
+        self._watch(pending)
+        if not pending.ready.wait(self.timeout):
+            with self._lock:
+                self._pending.pop(self._key(pending), None)
+            raise GitHubSetupError(f"Fork {owner}/{name} was not ready after {self.timeout:.0f}s")
+        if pending.error:
+            raise GitHubSetupError(f"Checking fork {owner}/{name} failed: {pending.error}")
+        full_name = f"{pending.owner}/{pending.name}"
+        return ForkResult(full_name, f"https://github.com/{full_name}", time.monotonic() - started, existed)
+
+    @staticmethod
+    def _key(pending: _PendingFork) -> str:
+        return f"{pending.owner}/{pending.name}".lower()
+
+    def _watch(self, pending: _PendingFork):
+        with self._lock:
+            self._pending[self._key(pending)] = pending
+            if self._poller is None or not self._poller.is_alive():
+                self._poller = threading.Thread(target=propagate(self._poll), name='github-forks', daemon=True)
+                self._poller.start()
+
+    def _poll(self):
+        """Poll until no fork is waiting"""
+        while True:
+            with self._lock:
+                waiting = list(self._pending.values())
+                if not waiting:
+                    self._poller = None
+                    return
+            try:
+                self._round(waiting)
+            except (ServiceError, requests.RequestException) as e:
+                logger.debug("GitHub fork poll failed: %s", e)
+                for pending in waiting:
+                    pending.error = str(e)
+                    self._done(pending)
+                continue
+            time.sleep(self.poll_interval)
+
+    def _round(self, waiting):
+        listing, self._etag = self.github.conditional_get(
+            f"/repos/{self.template_owner}/{self.template_repo}/forks", self._etag,
+            params={'sort': 'newest', 'per_page': 100})
+        self.polls += 1
+        if listing is None:
+            self.not_modified += 1
+        else:
+            self._listed = {fork.get('full_name', '').lower() for fork in listing}
+        for pending in waiting:
+            pending.listed = pending.listed or self._key(pending) in self._listed
+            pending.rounds += 1
+            if pending.listed or pending.rounds % DIRECT_CHECK_ROUNDS == 0:
+                if self.github.has_branch(pending.owner, pending.name, pending.branch):
+                    self._done(pending)
+
+    def _done(self, pending: _PendingFork):
+        with self._lock:
+            self._pending.pop(self._key(pending), None)
+        pending.ready.set()
+
+class ForkManagerPool:
+    """One ForkManager per token and organization, shared by every project forked with them"""
+
+    def __init__(self, session: Optional[requests.Session] = None, template_owner: str = "",
+                 template_repo: str = ""):
+        if not template_owner:
+            from wizard import KOSUKE_REPO_OWNER, KOSUKE_REPO_NAME
+            template_owner, template_repo = KOSUKE_REPO_OWNER, KOSUKE_REPO_NAME
+        self.session = session
+        self.template_owner = template_owner
+        self.template_repo = template_repo
+        self._managers: Dict[Tuple[str, str], ForkManager] = {}
+        self._lock = threading.Lock()
+
+    def get(self, token: str, organization: str = "") -> ForkManager:
+        with self._lock:
+            key = (token, organization)
+            if key not in self._managers:
+                self._managers[key] = ForkManager(token, self.template_owner, self.template_repo, organization,
+                                                  session=self.session)
+            return self._managers[key]
+
+def print_fork_result(result: ForkResult, manager: ForkManager):
+    """Print the fork and how much polling it took"""
+    how = "already forked" if result.existed else f"forked in {result.seconds:.1f}s"
+    print(f"   {Colors.OKGREEN}✓{Colors.ENDC} {result.repo_url} ({how}; {manager.polls} polls, "
+          f"{manager.not_modified} answered 304 Not Modified)")
@@ -0,0 +1,238 @@
+"""
+Apply the app's Drizzle migrations to many Postgres databases at once.
+
+`npm run db:migrate` starts the Node toolchain for one database at a time.
+This runner reads the same files, lib/db/migrations/meta/_journal.json and the
+SQL it lists, and migrates any number of databases concurrently on a bounded
+pool. It keeps Drizzle's bookkeeping: the applied migrations are rows of
+drizzle.__drizzle_migrations with the SHA-256 of the migration file and the
+journal's `when`. A migration is pending when it is newer than the last one
+applied. Databases migrated by either tool stay interchangeable.
+
+A database whose applied checksums already match the journal is skipped
+once its migration table has been read. Pending migrations are applied in a single transaction, split
+at the `--> statement-breakpoint` markers, under an advisory lock, so two
+runners on the same database cannot both apply them. A migration file edited
+after it was applied is reported as a checksum mismatch, and that database is
+left alone. Needs psycopg 3, like the other database commands.
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+from urllib.parse import urlsplit
+
+from console import Colors, print_info
+from database import DatabaseError, connect
+from tracing import NETWORK, propagate, span
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'lib', 'db', 'migrations')
+BREAKPOINT = '--> statement-breakpoint'
+MIGRATE_WORKERS = 8
+CONNECT_TIMEOUT = 10
+# Held for the migration transaction so concurrent runners on one database apply each migration once
+MIGRATION_LOCK = 0x6b6f73756b65
+
+class MigrationError(Exception):
+    """Raised when the migrations or the database list cannot be read"""
+
+@dataclass
+class Migration:
+    """One migration file, in journal order"""
+    tag: str
+    when: int  # the journal's timestamp, stored as created_at
+    sql: str
+    breakpoints: bool = True
+
+    @property
+    def hash(self) -> str:
+        # The checksum Drizzle stores: SHA-256 of the whole file
+        return hashlib.sha256(self.sql.encode()).hexdigest()
+
+    @property
+    def statements(self) -> List[str]:
+        chunks = self.sql.split(BREAKPOINT) if self.breakpoints else [self.sql]
+        return [chunk.strip() for chunk in chunks if chunk.strip()]
+
+@dataclass
+class MigrationResult:
+    """What happened to one database, and how long each part took"""
+    name: str
+    status: str = ""  # up-to-date, migrated, pending (dry run), mismatch or error
+    applied: List[str] = field(default_factory=list)
+    pending: List[str] = field(default_factory=list)
+    mismatched: List[str] = field(default_factory=list)
+    connect_seconds: float = 0.0
+    check_seconds: float = 0.0
+    apply_seconds: float = 0.0
+    seconds: float = 0.0
+    error: str = ""
+
+def load_migrations(directory: str = MIGRATIONS_DIR) -> List[Migration]:
+    """The migrations listed in the journal, oldest first"""
+    journal_path = os.path.join(directory, 'meta', '_journal.json')
+    try:
+        with open(journal_path) as f:
+            journal = json.load(f)
+    except (OSError, ValueError) as e:
+        raise MigrationError(f"Cannot read {journal_path}: {e}")
+    if journal.get('dialect') != 'postgresql':
+        raise MigrationError(f"{journal_path} is for {journal.get('dialect')}, not postgresql")
+    migrations = []
+    for entry in sorted(journal.get('entries', []), key=lambda entry: entry['idx']):
+        path = os.path.join(directory, f"{entry['tag']}.sql")
+        try:
+            with open(path, encoding='utf-8', newline='') as f:
+                sql = f.read()
+        except OSError as e:
+            raise MigrationError(f"Migration {entry['tag']} is in the journal but cannot be read: {e}")
+        migrations.append(Migration(entry['tag'], int(entry['when']), sql, entry.get('breakpoints', True)))
+    return migrations
+
+def database_name(url: str) -> str:
+    """host/database, which identifies a database without its credentials"""
+    parts = urlsplit(url)
+    return f"{parts.hostname or 'localhost'}{':' + str(parts.port) if parts.port else ''}{parts.path or '/'}"
+
+def read_database_list(path: str) -> List[Tuple[str, str]]:
+    """(name, url) from a file of `url` or `name url` lines; blank lines and # comments are skipped"""
+    databases = []
+    try:
+        with open(path) as f:
+            lines = f.read().splitlines()
+    except OSError as e:
+        raise MigrationError(f"Cannot read {path}: {e}")
+    for number, line in enumerate(lines, 1):
+        words = line.split('#', 1)[0].split()
+        if not words:
+            continue
+        if len(words) > 2 or '://' not in words[-1]:
+            raise MigrationError(f"{path}:{number}: expected a Postgres URL, optionally after a name")
+        databases.append((words[0] if len(words) == 2 else database_name(words[-1]), words[-1]))
+    return databases
+
+class MigrationRunner:
+    """Brings one database at a time up to the journal"""
+
+    def __init__(self, migrations: List[Migration], dry_run: bool = False):
+        self.migrations = migrations
+        self.dry_run = dry_run
+
+    def migrate(self, name: str, url: str) -> MigrationResult:
+        result = MigrationResult(name)
+        started = time.monotonic()
+        try:
+            with span('migrate connect', NETWORK, **{'kosuke.database': name}):
+                conn = connect(url, connect_timeout=CONNECT_TIMEOUT)
+            result.connect_seconds = time.monotonic() - started
+            import psycopg  # connect succeeded, so the driver is there
+            try:
+                conn.autocommit = True
+                self._migrate(conn, result)
+            except psycopg.Error as e:
+                logger.debug("Migrating %s failed", name, exc_info=True)
+                raise DatabaseError(str(e).strip().splitlines()[0] if str(e).strip() else type(e).__name__)
+            finally:
+                conn.close()
+        except DatabaseError as e:
+            result.status, result.error = 'error', str(e)
+        result.seconds = time.monotonic() - started
+        return result
+
+    @staticmethod
+    def applied(conn) -> List[Tuple[str, int]]:
+        """(hash, created_at) of the applied migrations, oldest first"""
+        exists = conn.execute("SELECT to_regclass('drizzle.__drizzle_migrations') IS NOT NULL").fetchone()[0]
+        if not exists:
+            return []
+        return [(hash, int(created_at or 0)) for hash, created_at in conn.execute(
+            'SELECT hash, created_at FROM drizzle.__drizzle_migrations ORDER BY created_at, id')]
+
+    def plan(self, applied: List[Tuple[str, int]]) -> Tuple[List[Migration], List[str]]:
+        """(pending migrations, tags whose applied checksum differs from the file)"""
+        last = max((created_at for _, created_at in applied), default=None)
+        hashes: Dict[int, str] = {created_at: hash for hash, created_at in applied}
+        pending = [m for m in self.migrations if last is None or m.when > last]
+        mismatched = [m.tag for m in self.migrations
+                      if last is not None and m.when <= last and hashes.get(m.when) != m.hash]
+        return pending, mismatched
+
+    def _migrate(self, conn, result: MigrationResult):
+        checked = time.monotonic()
+        with span('migrate check', NETWORK, **{'kosuke.database': result.name}):
+            pending, result.mismatched = self.plan(self.applied(conn))
+        result.check_seconds = time.monotonic() - checked
+        result.pending = [m.tag for m in pending]
+        if result.mismatched:
+            result.status = 'mismatch'
+            return
+        if not pending:
+            result.status = 'up-to-date'
+            return
+        if self.dry_run:
+            result.status = 'pending'
+            return
+
+        applying = time.monotonic()
+        with span('migrate apply', NETWORK, **{'kosuke.database': result.name, 'kosuke.migrations': len(pending)}):
+            with conn.transaction():
+                conn.execute('SELECT pg_advisory_xact_lock(%s)', (MIGRATION_LOCK,))
+                conn.execute('CREATE SCHEMA IF NOT EXISTS drizzle')
+                conn.execute('CREATE TABLE IF NOT EXISTS drizzle.__drizzle_migrations '
+                             '(id SERIAL PRIMARY KEY, hash text NOT NULL, created_at bigint)')
+                # Another runner may have applied some while this one waited for the lock
+                pending, result.mismatched = self.plan(self.applied(conn))
+                for migration in pending:
+                    for statement in migration.statements:
+                        conn.execute(statement)
+                    conn.execute('INSERT INTO drizzle.__drizzle_migrations (hash, created_at) VALUES (%s, %s)',
+                                 (migration.hash, migration.when))
+        result.apply_seconds = time.monotonic() - applying
+        result.applied = [m.tag for m in pending]
+        result.pending = []
+        result.status = 'migrated' if pending else 'up-to-date'
+
+def migrate_databases(databases: List[Tuple[str, str]], migrations: List[Migration],
+                      workers: int = MIGRATE_WORKERS, dry_run: bool = False) -> List[MigrationResult]:
+    """Migrate (name, url) pairs concurrently, in the given order"""
+    runner = MigrationRunner(migrations, dry_run)
+    workers = max(1, min(workers, len(databases)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(propagate(runner.migrate), name, url) for name, url in databases]
+        return [future.result() for future in futures]
+
+def print_migration_results(results: List[MigrationResult], seconds: float):
+    """One line per database with its timing, then a summary"""
+    colors = {'up-to-date': Colors.OKGREEN, 'migrated': Colors.OKCYAN, 'pending': Colors.WARNING,
+              'mismatch': Colors.FAIL, 'error': Colors.FAIL}
+    width = max([len(result.name) for result in results] + [8])
+    print(f"\n{Colors.BOLD}🗃️  Migrations{Colors.ENDC}")
+    for result in results:
+        if result.error:
+            detail = result.error.splitlines()[0]
+        elif result.mismatched:
+            detail = f"checksum differs from the applied migration: {', '.join(result.mismatched)}"
+        elif result.applied:
+            detail = f"applied {', '.join(result.applied)}"
+        elif result.pending:
+            detail = f"pending {', '.join(result.pending)}"
+        else:
+            detail = ""
+        timing = (f"{result.seconds * 1000:7.0f}ms (connect {result.connect_seconds * 1000:.0f}, "
+                  f"check {result.check_seconds * 1000:.0f}, apply {result.apply_seconds * 1000:.0f})")
+        print(f"   {result.name:<{width}}  {colors.get(result.status, '')}{result.status:<10}{Colors.ENDC} "
+              f"{timing}  {detail}".rstrip())
+
+    counts = {status: sum(result.status == status for result in results) for status in colors}
+    print(f"\n{Colors.BOLD}{len(results)} databases in {seconds:.2f}s: {counts['migrated']} migrated, "
+          f"{counts['up-to-date']} up to date, {counts['pending']} pending, "
+          f"{counts['mismatch'] + counts['error']} failed{Colors.ENDC}")
+    if counts['mismatch']:
+        print_info("A migration file changed after it was applied; restore it or add a new migration instead")
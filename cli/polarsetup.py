@@ -0,0 +1,261 @@
+"""
+Automated Polar billing setup.
+
+With an organization access token, the Pro and Business subscription products
+and the /api/billing/webhook endpoint are looked up and only created when
+missing, so re-running against an organization that is already set up changes
+nothing. Lookups run concurrently, and so do the creates that follow them.
+The product and webhook ids found are cached locally per environment and
+token, so a re-run only re-reads those objects instead of listing the whole
+catalog. Point KOSUKE_POLAR_API_URL at a mock API to run it offline.
+"""
+
+import os
+import json
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from console import Colors
+from progress import ServiceConfig, SetupProgress
+from tracing import propagate
+from services import PolarService
+
+CATALOG_CACHE_FILE = ".kosuke-polar-catalog.json"
+DASHBOARD_URLS = {
+    'sandbox': "https://sandbox.polar.sh/dashboard",
+    'production': "https://polar.sh/dashboard",
+}
+
+@dataclass(frozen=True)
+class PlanSpec:
+    """A subscription product the template's billing code expects"""
+    key: str
+    name: str
+    description: str
+    price_cents: int
+
+PLANS = (
+    PlanSpec('pro', "Pro Plan", "Professional subscription with advanced features", 2000),
+    PlanSpec('business', "Business Plan", "Business subscription with premium features and priority support", 20000),
+)
+
+# Events handled by app/api/billing/webhook/route.ts
+WEBHOOK_EVENTS = [
+    'subscription.created',
+    'subscription.updated',
+    'subscription.active',
+    'subscription.canceled',
+    'subscription.uncanceled',
+    'checkout.created',
+    'checkout.updated',
+    'customer.created',
+]
+
+class PolarSetupError(Exception):
+    """Raised when the billing setup cannot be completed automatically"""
+
+@dataclass
+class PolarSetupResult:
+    """Ids and secret produced by a Polar setup run"""
+    environment: str
+    organization_id: str
+    organization_slug: str
+    product_ids: Dict[str, str]
+    webhook_endpoint_id: str
+    webhook_secret: str
+    created: List[str] = field(default_factory=list)
+
+    @property
+    def dashboard_url(self) -> str:
+        return f"{DASHBOARD_URLS[self.environment]}/{self.organization_slug}"
+
+def webhook_url(project_name: str) -> str:
+    return f"https://{project_name}.vercel.app/api/billing/webhook"
+
+def product_payload(plan: PlanSpec) -> Dict:
+    return {
+        'name': plan.name,
+        'description': plan.description,
+        'recurring_interval': 'month',
+        'prices': [{'amount_type': 'fixed', 'price_amount': plan.price_cents, 'price_currency': 'usd'}],
+    }
+
+class CatalogCache:
+    """Product and webhook ids per environment and token, kept in a local JSON file"""
+
+    _lock = threading.Lock()
+
+    def __init__(self, path: str = CATALOG_CACHE_FILE):
+        self.path = path
+
+    @staticmethod
+    def key(environment: str, access_token: str) -> str:
+        # Never store the token itself
+        return f"{environment}:{hashlib.sha256(access_token.encode('utf-8')).hexdigest()[:16]}"
+
+    def _read(self) -> Dict:
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def get(self, key: str) -> Dict:
+        with self._lock:
+            return self._read().get(key, {})
+
+    def put(self, key: str, entry: Dict):
+        with self._lock:
+            data = self._read()
+            data[key] = entry
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+
+_organization_locks: Dict[str, threading.Lock] = {}
+_organization_locks_guard = threading.Lock()
+
+def _organization_lock(key: str) -> threading.Lock:
+    with _organization_locks_guard:
+        return _organization_locks.setdefault(key, threading.Lock())
+
+class PolarProvisioner:
+    """Creates or finds the billing products and webhook for one project"""
+
+    def __init__(self, polar: PolarService, project_name: str, access_token: str,
+                 cache: Optional[CatalogCache] = None, known_webhook_secret: str = ""):
+        self.polar = polar
+        self.project_name = project_name
+        self.cache = cache or CatalogCache()
+        self.cache_key = CatalogCache.key(polar.environment, access_token)
+        # Polar may not return the secret of an existing endpoint, so keep the one we already have
+        self.known_webhook_secret = known_webhook_secret
+
+    def provision(self) -> PolarSetupResult:
+        """Find or create the products and webhook; runs for one organization at a time"""
+        # Batch projects sharing a token would otherwise both miss the products and create them twice
+        with _organization_lock(self.cache_key):
+            return self._provision()
+
+    def _provision(self) -> PolarSetupResult:
+        # Look everything up concurrently, then create what is missing concurrently
+        url = webhook_url(self.project_name)
+        cached = self.cache.get(self.cache_key)
+        cached_products = cached.get('products', {})
+        cached_webhook = cached.get('webhooks', {}).get(url)
+
+        with ThreadPoolExecutor(max_workers=len(PLANS) + 2) as pool:
+            organizations = pool.submit(propagate(self.polar.organizations))
+            if all(plan.key in cached_products for plan in PLANS):
+                product_lookups = {plan.key: pool.submit(propagate(self.polar.get_product), cached_products[plan.key])
+                                   for plan in PLANS}
+                listing = None
+            else:
+                product_lookups = {}
+                listing = pool.submit(propagate(self.polar.list_products))
+            webhook_lookup = (pool.submit(propagate(self.polar.get_webhook_endpoint), cached_webhook)
+                              if cached_webhook else pool.submit(propagate(self._find_webhook), url))
+
+            products = {key: future.result() for key, future in product_lookups.items()}
+            if any(product is None or product.get('is_archived') for product in products.values()):
+                # A cached product was deleted or archived; fall back to a full listing
+                products, listing = {}, pool.submit(propagate(self.polar.list_products))
+            if listing is not None:
+                by_name = {p.get('name'): p for p in listing.result() if not p.get('is_archived')}
+                products = {plan.key: by_name.get(plan.name) for plan in PLANS}
+            webhook = webhook_lookup.result()
+            if cached_webhook and webhook is None:
+                webhook = self._find_webhook(url)
+            organization = self._organization(organizations.result())
+
+            created = []
+            product_creates = {plan.key: pool.submit(propagate(self.polar.create_product), product_payload(plan))
+                               for plan in PLANS if not products.get(plan.key)}
+            webhook_change = None
+            if webhook is None:
+                webhook_change = pool.submit(propagate(self.polar.create_webhook_endpoint),
+                                             {'url': url, 'format': 'raw', 'events': WEBHOOK_EVENTS})
+                created.append('webhook')
+            elif set(WEBHOOK_EVENTS) - set(webhook.get('events') or []):
+                events = sorted(set(webhook.get('events') or []) | set(WEBHOOK_EVENTS))
+                webhook_change = pool.submit(propagate(self.polar.update_webhook_endpoint), webhook['id'],
+                                             {'events': events})
+            for key, future in product_creates.items():
+                products[key] = future.result()
+                created.append(f"{key} product")
+            if webhook_change is not None:
+                webhook = {**webhook, **webhook_change.result()} if webhook else webhook_change.result()
+
+        secret = webhook.get('secret') or self.known_webhook_secret
+        if not secret:
+            raise PolarSetupError(f"Polar did not return the signing secret of the existing webhook for {url}; "
+                                  "copy it from the Polar dashboard")
+
+        product_ids = {key: product['id'] for key, product in products.items()}
+        self.cache.put(self.cache_key, {
+            'products': product_ids,
+            'webhooks': {**self.cache.get(self.cache_key).get('webhooks', {}), url: webhook['id']},
+        })
+        return PolarSetupResult(
+            environment=self.polar.environment,
+            organization_id=organization.get('id', ''),
+            organization_slug=organization.get('slug', ''),
+            product_ids=product_ids,
+            webhook_endpoint_id=webhook['id'],
+            webhook_secret=secret,
+            created=created,
+        )
+
+    def _find_webhook(self, url: str) -> Optional[Dict]:
+        return next((e for e in self.polar.list_webhook_endpoints() if e.get('url') == url), None)
+
+    @staticmethod
+    def _organization(organizations: List[Dict]) -> Dict:
+        # Organization access tokens are scoped to exactly one organization
+        if len(organizations) != 1:
+            raise PolarSetupError(f"Expected an organization access token for one organization, "
+                                  f"it can see {len(organizations)}")
+        return organizations[0]
+
+def apply_to_progress(progress: SetupProgress, result: PolarSetupResult, access_token: str):
+    """Record the setup in the same shape the manual wizard step produces"""
+    service_config = ServiceConfig(
+        name="Polar Billing",
+        url=result.dashboard_url,
+        credentials={
+            "organization_slug": result.organization_slug,
+            "organization_id": result.organization_id,
+            "pro_product_id": result.product_ids['pro'],
+            "business_product_id": result.product_ids['business'],
+            "webhook_endpoint_id": result.webhook_endpoint_id,
+            "environment": result.environment,
+            "dashboard_url": result.dashboard_url,
+        },
+        webhook_urls=[webhook_url(progress.project_name)]
+    )
+    progress.service_configs['polar'] = service_config.to_dict()
+    progress.api_keys['polar_access_token'] = access_token
+    progress.api_keys['polar_webhook_secret'] = result.webhook_secret
+
+def provision_polar(progress: SetupProgress, access_token: str, environment: str = 'sandbox', session=None,
+                    cache_path: str = CATALOG_CACHE_FILE) -> PolarSetupResult:
+    """Set up billing for the progress' project and record it in the progress"""
+    polar = PolarService(environment, access_token=access_token, session=session, max_retries=4)
+    provisioner = PolarProvisioner(polar, progress.project_name, access_token, CatalogCache(cache_path),
+                                   progress.api_keys.get('polar_webhook_secret', ''))
+    result = provisioner.provision()
+    apply_to_progress(progress, result, access_token)
+    return result
+
+def print_polar_result(result: PolarSetupResult):
+    """Print what was created and what already existed"""
+    print(f"\n{Colors.BOLD}💳 Polar billing ({result.environment}) for {result.organization_slug}:{Colors.ENDC}")
+    for plan in PLANS:
+        state = "created" if f"{plan.key} product" in result.created else "found"
+        print(f"   • {plan.name}: {Colors.OKCYAN}{result.product_ids[plan.key]}{Colors.ENDC} ({state})")
+    state = "created" if 'webhook' in result.created else "found"
+    print(f"   • Webhook: {Colors.OKCYAN}{result.webhook_endpoint_id}{Colors.ENDC} ({state})")
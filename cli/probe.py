@@ -0,0 +1,282 @@
+"""
+Post-deploy warm-up probe and cold-start latency profiler.
+
+After a deploy the probe polls `/` with adaptive backoff until the app
+answers, then hits the key routes concurrently. The first request to each
+route after a deploy starts a fresh serverless function, so its latency is
+kept apart as the cold start. The requests that follow give the warm latency
+percentiles. Protected routes answer 401 without credentials, which still
+starts their function, so any answer below 500 counts as up.
+
+Each project gets a JSON report. The previous report is kept next to it, so
+every run is compared with the deploy before. `keep_warm` pings the routes on
+an interval so the functions are not recycled. The URL is a template, so the
+probe also runs against a local server.
+"""
+
+import os
+import json
+import time
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+import requests
+
+from console import Colors, print_info
+from services import ServiceManager, create_session
+from tracing import propagate, span
+from webhookload import percentile
+
+logger = logging.getLogger(__name__)
+
+PROBE_ROUTES = ('/', '/home', '/api/billing/subscription-status', '/api/cron/sync-subscriptions')
+PROBE_REPORT_DIR = ".kosuke-probe"
+WARM_SAMPLES = 10
+READY_TIMEOUT = 300.0
+WARM_INTERVAL = 240.0
+BACKOFF_START = 0.5
+BACKOFF_MAX = 10.0
+# A latency has changed since the last deploy only past both of these
+REGRESSION_RATIO = 0.2
+REGRESSION_MIN_MS = 50.0
+
+class Backoff:
+    """Delays growing by half on every retry, with jitter, and honoring Retry-After"""
+
+    def __init__(self, start: float = BACKOFF_START, limit: float = BACKOFF_MAX):
+        self.start = start
+        self.limit = limit
+        self.delay = start
+
+    def wait(self, response: Optional[requests.Response] = None):
+        delay = self.delay
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, float(retry_after))
+        time.sleep(min(self.limit, delay) * random.uniform(0.8, 1.2))
+        self.delay = min(self.limit, self.delay * 1.5)
+
+    def reset(self):
+        self.delay = self.start
+
+def is_up(status: int) -> bool:
+    # vercel.app answers 404 while a deployment does not exist yet
+    return status < 500 and status != 404
+
+@dataclass
+class RouteLatency:
+    """First-hit and warm latencies of one route, in milliseconds"""
+    path: str
+    cold_ms: Optional[float] = None
+    cold_status: Optional[int] = None
+    warm_ms: List[float] = field(default_factory=list)
+    statuses: Dict[str, int] = field(default_factory=dict)
+    errors: int = 0
+
+    def record(self, status: int, ms: Optional[float] = None):
+        self.statuses[str(status)] = self.statuses.get(str(status), 0) + 1
+        if ms is not None:
+            self.warm_ms.append(ms)
+
+    def summary(self) -> Dict:
+        warm = sorted(self.warm_ms)
+        p50 = percentile(warm, 50)
+        return {
+            'path': self.path,
+            'cold_ms': self.cold_ms,
+            'cold_status': self.cold_status,
+            'warm_p50_ms': p50,
+            'warm_p95_ms': percentile(warm, 95),
+            'warm_max_ms': warm[-1] if warm else 0.0,
+            'cold_penalty_ms': self.cold_ms - p50 if self.cold_ms is not None and warm else None,
+            'samples': len(warm),
+            'statuses': self.statuses,
+            'errors': self.errors,
+        }
+
+@dataclass
+class ProbeReport:
+    """Latency of every route of one deployment"""
+    project: str
+    url: str
+    started_at: str
+    ready_seconds: Optional[float] = None
+    routes: List[RouteLatency] = field(default_factory=list)
+    error: str = ""
+
+    def to_dict(self) -> Dict:
+        return {
+            'project': self.project,
+            'url': self.url,
+            'started_at': self.started_at,
+            'ready_seconds': self.ready_seconds,
+            'routes': [route.summary() for route in self.routes],
+            'error': self.error,
+        }
+
+class DeploymentProbe:
+    """Waits for one deployment, then measures cold and warm latency of its routes"""
+
+    def __init__(self, project: str, url: str, routes: Tuple[str, ...] = PROBE_ROUTES, samples: int = WARM_SAMPLES,
+                 ready_timeout: float = READY_TIMEOUT, session: Optional[requests.Session] = None):
+        self.project = project
+        self.routes = routes
+        self.samples = samples
+        self.ready_timeout = ready_timeout
+        self.app = ServiceManager('app', url, session=session)
+
+    def timed(self, path: str) -> Tuple[Optional[requests.Response], float]:
+        """One GET, with its latency in milliseconds (the response is None on a network error)"""
+        started = time.perf_counter()
+        try:
+            response = self.app.request('GET', path, allow_redirects=False)
+        except requests.RequestException as e:
+            logger.debug(f"{self.project}: GET {path} failed: {e}")
+            response = None
+        return response, (time.perf_counter() - started) * 1000
+
+    def run(self) -> ProbeReport:
+        report = ProbeReport(self.project, self.app.base_url, datetime.now(timezone.utc).isoformat(timespec='seconds'))
+        routes = {path: RouteLatency(path) for path in self.routes}
+        report.routes = list(routes.values())
+
+        # The response that ends the wait is the first hit of `/`
+        started = time.monotonic()
+        backoff = Backoff()
+        while True:
+            response, ms = self.timed('/')
+            if response is not None and is_up(response.status_code):
+                break
+            if time.monotonic() - started > self.ready_timeout:
+                report.error = f"not up after {self.ready_timeout:.0f}s"
+                return report
+            backoff.wait(response)
+        report.ready_seconds = time.monotonic() - started
+        if '/' in routes:
+            routes['/'].cold_ms, routes['/'].cold_status = ms, response.status_code
+
+        with ThreadPoolExecutor(max_workers=len(routes)) as pool:
+            cold = [path for path in routes if routes[path].cold_ms is None]
+            for path, (response, ms) in zip(cold, pool.map(propagate(self.timed), cold)):
+                if response is None:
+                    routes[path].errors += 1
+                else:
+                    routes[path].cold_ms, routes[path].cold_status = ms, response.status_code
+            list(pool.map(propagate(self.sample), routes.values()))
+        return report
+
+    def sample(self, route: RouteLatency):
+        """Warm samples of one route, backing off while it is rate limited or failing"""
+        backoff = Backoff()
+        for _ in range(self.samples * 3):
+            if len(route.warm_ms) >= self.samples:
+                return
+            response, ms = self.timed(route.path)
+            if response is None:
+                route.errors += 1
+                backoff.wait()
+            elif response.status_code == 429 or response.status_code >= 500:
+                # Throttled or failing answers say nothing about warm latency
+                route.record(response.status_code)
+                backoff.wait(response)
+            else:
+                route.record(response.status_code, ms)
+                backoff.reset()
+
+    def keep_warm(self, duration: float, interval: float = WARM_INTERVAL, stop: Optional[threading.Event] = None):
+        """Hit every route once per interval until the duration is over"""
+        stop = stop or threading.Event()
+        deadline = time.monotonic() + duration
+        while not stop.is_set() and time.monotonic() < deadline:
+            for path in self.routes:
+                self.timed(path)
+            stop.wait(min(interval, max(0.0, deadline - time.monotonic())))
+
+def compare(previous: Dict, current: Dict) -> List[Tuple[str, str, float, float]]:
+    """(path, metric, before, after) for every latency that changed noticeably"""
+    before = {route['path']: route for route in previous.get('routes', [])}
+    changes = []
+    for route in current['routes']:
+        old = before.get(route['path'])
+        if not old:
+            continue
+        for metric in ('cold_ms', 'warm_p50_ms', 'warm_p95_ms'):
+            a, b = old.get(metric), route.get(metric)
+            if a and b and abs(b - a) > REGRESSION_MIN_MS and abs(b - a) / a > REGRESSION_RATIO:
+                changes.append((route['path'], metric, a, b))
+    return changes
+
+def save_report(report: ProbeReport, report_dir: str = PROBE_REPORT_DIR) -> Optional[Dict]:
+    """Write the report as <project>.json, keeping the one it replaces, which is returned"""
+    os.makedirs(report_dir, exist_ok=True)
+    path = os.path.join(report_dir, f"{report.project}.json")
+    previous = None
+    try:
+        with open(path, 'r') as f:
+            previous = json.load(f)
+        os.replace(path, os.path.join(report_dir, f"{report.project}.previous.json"))
+    except (OSError, ValueError):
+        pass
+    with open(path, 'w') as f:
+        json.dump(report.to_dict(), f, indent=2)
+    return previous
+
+def probe_projects(targets: List[Tuple[str, str]], routes: Tuple[str, ...] = PROBE_ROUTES, samples: int = WARM_SAMPLES,
+                   ready_timeout: float = READY_TIMEOUT, workers: int = 8,
+                   report_dir: Optional[str] = PROBE_REPORT_DIR) -> List[Tuple[ProbeReport, Optional[Dict]]]:
+    """Probe (project, url) pairs concurrently, returning each report with the previous one"""
+    workers = max(1, min(workers, len(targets)))
+    session = create_session(workers * len(routes))
+
+    def run(project: str, url: str) -> Tuple[ProbeReport, Optional[Dict]]:
+        with span('probe', **{'kosuke.project': project}):
+            report = DeploymentProbe(project, url, routes, samples, ready_timeout, session).run()
+        previous = save_report(report, report_dir) if report_dir else None
+        return report, previous
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(propagate(run), project, url) for project, url in targets]
+        return [future.result() for future in futures]
+
+def keep_warm(targets: List[Tuple[str, str]], duration: float, interval: float = WARM_INTERVAL,
+              routes: Tuple[str, ...] = PROBE_ROUTES):
+    """Keep every (project, url) warm for `duration` seconds, or until Ctrl+C"""
+    session = create_session(max(1, len(targets)))
+    probes = [DeploymentProbe(project, url, routes, session=session) for project, url in targets]
+    print_info(f"Keeping {len(probes)} deployments warm for {duration / 60:g} minutes (Ctrl+C to stop)")
+    stop = threading.Event()
+    with ThreadPoolExecutor(max_workers=max(1, len(probes))) as pool:
+        futures = [pool.submit(propagate(probe.keep_warm), duration, interval, stop) for probe in probes]
+        try:
+            for future in futures:
+                future.result()
+        except KeyboardInterrupt:
+            stop.set()
+
+def _ms(value: Optional[float]) -> str:
+    return f"{value:.0f}ms" if value is not None else "-"
+
+def print_probe_report(report: ProbeReport, previous: Optional[Dict] = None):
+    """Print cold and warm latency per route, and what changed since the previous report"""
+    if report.error:
+        print(f"\n{Colors.FAIL}✗ {report.project} ({report.url}): {report.error}{Colors.ENDC}")
+        return
+    print(f"\n{Colors.BOLD}🌡️  {report.project}{Colors.ENDC} ({report.url}, up after {report.ready_seconds:.1f}s)")
+    print(f"   {'route':<34} {'status':>6} {'cold':>8} {'warm p50':>9} {'warm p95':>9}")
+    for summary in report.to_dict()['routes']:
+        status = summary['cold_status'] or '-'
+        color = Colors.OKGREEN if summary['cold_status'] and is_up(summary['cold_status']) else Colors.FAIL
+        print(f"   {summary['path']:<34} {color}{status:>6}{Colors.ENDC} {_ms(summary['cold_ms']):>8} "
+              f"{_ms(summary['warm_p50_ms']):>9} {_ms(summary['warm_p95_ms']):>9}")
+    if previous:
+        changes = compare(previous, report.to_dict())
+        for path, metric, before, after in changes:
+            color = Colors.WARNING if after > before else Colors.OKGREEN
+            print(f"   {color}{path} {metric}: {before:.0f}ms -> {after:.0f}ms{Colors.ENDC}")
+        if not changes:
+            print_info(f"No latency changed noticeably since {previous.get('started_at')}")
@@ -0,0 +1,435 @@
+"""
+Setup progress model and persistence.
+"""
+
+import os
+import json
+import time
+import atexit
+import logging
+import threading
+from dataclasses import dataclass, asdict, fields
+from typing import Dict, List, Optional
+
+from tracing import span, DISK
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_FILE = ".kosuke-setup-progress.json"
+JOURNAL_FILE = ".kosuke-setup-progress.journal"
+
+_MISSING = object()
+
+@dataclass
+class ServiceConfig:
+    """Configuration for a created service"""
+    name: str
+    url: str
+    credentials: Dict[str, str]
+    webhook_urls: List[str] = None
+
+    def to_dict(self):
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+def _plain(value):
+    """Deep copy of JSON-like data as plain dicts and lists"""
+    if isinstance(value, dict):
+        return {key: _plain(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_plain(item) for item in value]
+    return value
+
+class TrackedDict(dict):
+    """A dict that records which of its keys changed, including edits inside nested dicts
+
+    Dict values are stored as nested TrackedDicts that report an edit as a
+    change of the top-level key they sit under. Changes are recorded under a
+    lock, so worker threads can add keys while a save collects them.
+    """
+
+    def __init__(self, data=(), owner=None):
+        super().__init__(data)
+        # (root, top-level key) for nested dicts, None for the root
+        self._owner = owner
+        self._lock = threading.RLock() if owner is None else owner[0]._lock
+        self._changed = set()
+        for key, value in dict.items(self):
+            if isinstance(value, dict):
+                # Replacing the value of an existing key is safe while iterating
+                dict.__setitem__(self, key, self._wrap(key, value))
+
+    def _wrap(self, key, value):
+        if isinstance(value, dict):
+            return TrackedDict(value, self._owner or (self, key))
+        return value
+
+    def _touch(self, key):
+        root, top = self._owner or (self, key)
+        root._changed.add(top)
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            dict.__setitem__(self, key, self._wrap(key, value))
+            self._touch(key)
+
+    def __delitem__(self, key):
+        with self._lock:
+            dict.__delitem__(self, key)
+            self._touch(key)
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def setdefault(self, key, default=None):
+        with self._lock:
+            if key not in self:
+                self[key] = default
+            return dict.__getitem__(self, key)
+
+    def update(self, *args, **kwargs):
+        with self._lock:
+            for key, value in dict(*args, **kwargs).items():
+                self[key] = value
+
+    def pop(self, key, *default):
+        with self._lock:
+            if key in self:
+                self._touch(key)
+            return dict.pop(self, key, *default)
+
+    def popitem(self):
+        with self._lock:
+            key, value = dict.popitem(self)
+            self._touch(key)
+            return key, value
+
+    def clear(self):
+        with self._lock:
+            for key in list(self):
+                self._touch(key)
+            dict.clear(self)
+
+    def plain(self) -> Dict:
+        """A plain deep copy, consistent with respect to concurrent writers"""
+        with self._lock:
+            return _plain(self)
+
+    def take_changes(self) -> Dict:
+        """{key: plain copy of the value, or _MISSING if deleted} for keys changed since the last call"""
+        with self._lock:
+            changed, self._changed = self._changed, set()
+            return {key: _plain(dict.get(self, key, _MISSING)) for key in changed}
+
+@dataclass
+class SetupProgress:
+    """Tracks setup progress"""
+    current_step: int = 1
+    project_name: str = ""
+    completed_services: List[str] = None
+    api_keys: Dict[str, str] = None
+    service_configs: Dict[str, Dict] = None
+    completed_steps: List[str] = None
+
+    def __post_init__(self):
+        if self.completed_services is None:
+            self.completed_services = []
+        if self.completed_steps is None:
+            self.completed_steps = []
+        if self.api_keys is None:
+            self.api_keys = {}
+        if self.service_configs is None:
+            self.service_configs = {}
+
+    def __setattr__(self, name, value):
+        # The dict fields record their changes, so a journal save only looks at what changed
+        if name in ('api_keys', 'service_configs') and value is not None and not (
+                isinstance(value, TrackedDict) and value._owner is None):
+            value = TrackedDict(value)
+        super().__setattr__(name, value)
+
+    def to_dict(self):
+        return {f.name: (value.plain() if isinstance(value, TrackedDict) else _plain(value))
+                for f in fields(self) for value in (getattr(self, f.name),)}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+class ProgressJournal:
+    """Append-only journal of progress events on top of a compacted snapshot
+
+    Each save appends only the fields that changed since the previous save.
+    The progress' dicts record which of their keys changed, so a save looks at
+    those keys only and its cost does not grow with the size of the progress.
+    Compaction writes the journal's own copy of the state, never the live
+    object that worker threads may be changing. Events carry a
+    sequence number and the snapshot records the last sequence it contains, so
+    replay is idempotent even if a crash lands between writing a snapshot and
+    truncating the journal. A torn trailing line is ignored and cut off on load.
+    """
+
+    def __init__(self, snapshot_path: str = PROGRESS_FILE, journal_path: str = JOURNAL_FILE,
+                 fsync_every: int = 16, fsync_interval: float = 1.0, compact_every: int = 512):
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.compact_every = compact_every
+        self._lock = threading.Lock()
+        self._file = None
+        self._state = None
+        # The TrackedDicts whose changes the state follows, per field
+        self._sources: Dict[str, TrackedDict] = {}
+        self._seq = 0
+        self._snapshot_seq = 0
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def load(self) -> Optional[SetupProgress]:
+        """Rebuild progress from the snapshot plus any journaled events"""
+        with self._lock:
+            state = self._load()
+            if self._seq - self._snapshot_seq >= self.compact_every:
+                self._compact(self._state)
+            if state is None:
+                return None
+            # The dicts are copied as they are wrapped; the lists must not be shared with the state
+            return SetupProgress.from_dict({**state, 'completed_services': list(state['completed_services']),
+                                            'completed_steps': list(state['completed_steps'])})
+
+    def save(self, progress: SetupProgress):
+        """Append the changes since the last save to the journal"""
+        with self._lock:
+            if self._state is None:
+                # Diff against what is already on disk so sequence numbers keep increasing
+                self._load()
+            events = self._diff(progress)
+            if not events:
+                return
+            if self._file is None:
+                self._file = open(self.journal_path, 'ab')
+            for event in events:
+                self._seq += 1
+                event['seq'] = self._seq
+                self._file.write(json.dumps(event, separators=(',', ':')).encode('utf-8') + b'\n')
+            # Flushing to the OS survives a killed process; fsync is batched for power loss
+            self._file.flush()
+            self._unsynced += len(events)
+            if self._unsynced >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_interval:
+                self._sync()
+            if self._seq - self._snapshot_seq >= self.compact_every:
+                self._compact(self._state)
+
+    def flush(self):
+        """Force pending journal writes to disk"""
+        with self._lock:
+            if self._file is not None and self._unsynced:
+                self._sync()
+
+    def compact(self, progress: SetupProgress):
+        """Fold the journal and any unsaved changes into a fresh snapshot"""
+        with self._lock:
+            if self._state is None:
+                self._load()
+            # The snapshot covers these changes, so they need no journal events
+            self._diff(progress)
+            self._compact(self._state)
+
+    def clear(self):
+        """Remove the snapshot and the journal"""
+        with self._lock:
+            self._close()
+            for path in (self.snapshot_path, self.journal_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            self._state = None
+            self._sources = {}
+            self._seq = self._snapshot_seq = 0
+
+    def _load(self) -> Optional[Dict]:
+        self._close()
+        state, seq = self._read_snapshot()
+        self._snapshot_seq = seq
+        found = state is not None
+        if state is None:
+            state = SetupProgress().to_dict()
+
+        if os.path.exists(self.journal_path):
+            good_offset = 0
+            with open(self.journal_path, 'rb') as f:
+                for line in f:
+                    if not line.endswith(b'\n'):
+                        break
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        break
+                    good_offset += len(line)
+                    if event['seq'] > seq:
+                        self._apply(state, event)
+                        seq = event['seq']
+                        found = True
+            if good_offset != os.path.getsize(self.journal_path):
+                logger.warning("Discarding torn tail of progress journal")
+                with open(self.journal_path, 'r+b') as f:
+                    f.truncate(good_offset)
+
+        self._seq = seq
+        self._state = state
+        self._sources = {}
+        return state if found else None
+
+    def _read_snapshot(self):
+        if not os.path.exists(self.snapshot_path):
+            return None, 0
+        with open(self.snapshot_path, 'r') as f:
+            data = json.load(f)
+        seq = data.pop('_journal_seq', 0)
+        # Snapshots written before a field existed get its default
+        return {**SetupProgress().to_dict(), **data}, seq
+
+    def _compact(self, state: Dict):
+        tmp_path = f"{self.snapshot_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({**state, '_journal_seq': self._seq}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        self._fsync_dir()
+        self._snapshot_seq = self._seq
+        # Events up to _seq are now in the snapshot; replay skips them even if truncation is lost
+        self._close()
+        with open(self.journal_path, 'wb') as f:
+            os.fsync(f.fileno())
+
+    def _sync(self):
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def _close(self):
+        if self._file is not None:
+            self._file.flush()
+            if self._unsynced:
+                os.fsync(self._file.fileno())
+                self._unsynced = 0
+            self._file.close()
+            self._file = None
+
+    def _fsync_dir(self):
+        try:
+            fd = os.open(os.path.dirname(os.path.abspath(self.snapshot_path)), os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+    def _diff(self, progress: SetupProgress) -> List[Dict]:
+        """Events for what changed since the last save, applied to the journal's state"""
+        last = self._state
+        events = []
+        for name in ('current_step', 'project_name'):
+            value = getattr(progress, name)
+            if value != last[name]:
+                events.append({'op': 'set', 'field': name, 'value': value})
+                last[name] = value
+
+        # A handful of step names; comparing them whole stays cheap
+        for name in ('completed_services', 'completed_steps'):
+            current = list(getattr(progress, name))
+            done = last[name]
+            if current[:len(done)] == done:
+                for item in current[len(done):]:
+                    events.append({'op': 'append', 'field': name, 'value': item})
+            else:
+                events.append({'op': 'set', 'field': name, 'value': current})
+            last[name] = current
+
+        for name in ('api_keys', 'service_configs'):
+            current = getattr(progress, name)
+            known = last[name]
+            if self._sources.get(name) is current:
+                changes = current.take_changes()
+            else:
+                # A progress object this journal has not followed yet: compare everything once
+                current.take_changes()
+                snapshot = current.plain()
+                changes = {key: snapshot.get(key, _MISSING) for key in set(known) | set(snapshot)}
+                self._sources[name] = current
+            for key in sorted(changes):
+                value = changes[key]
+                if value is _MISSING:
+                    if key in known:
+                        events.append({'op': 'del', 'field': name, 'key': key})
+                        del known[key]
+                elif known.get(key, _MISSING) != value:
+                    events.append({'op': 'put', 'field': name, 'key': key, 'value': value})
+                    known[key] = value
+        return events
+
+    @staticmethod
+    def _apply(state: Dict, event: Dict):
+        op, name = event['op'], event['field']
+        if op == 'set':
+            state[name] = event['value']
+        elif op == 'append':
+            state[name].append(event['value'])
+        elif op == 'put':
+            state[name][event['key']] = event['value']
+        elif op == 'del':
+            state[name].pop(event['key'], None)
+
+_backend = None
+
+def get_backend():
+    """Persistence backend used by ProgressManager, the working directory's journal by default"""
+    global _backend
+    if _backend is None:
+        _backend = ProgressJournal()
+        atexit.register(_backend.flush)
+    return _backend
+
+class ProgressManager:
+    """Manages setup progress saving and loading"""
+
+    @staticmethod
+    def use_backend(backend):
+        """Persist progress somewhere other than the working directory journal"""
+        global _backend
+        _backend = backend
+
+    @staticmethod
+    def save_progress(progress: SetupProgress):
+        """Append progress changes to the journal"""
+        try:
+            with span('progress.save', DISK):
+                get_backend().save(progress)
+        except Exception as e:
+            logger.error(f"Failed to save progress: {e}")
+
+    @staticmethod
+    def load_progress() -> Optional[SetupProgress]:
+        """Load progress from the snapshot and journal"""
+        try:
+            with span('progress.load', DISK):
+                return get_backend().load()
+        except Exception as e:
+            logger.error(f"Failed to load progress: {e}")
+        return None
+
+    @staticmethod
+    def clear_progress():
+        """Clear progress files"""
+        try:
+            get_backend().clear()
+        except Exception as e:
+            logger.error(f"Failed to clear progress: {e}")
@@ -0,0 +1,269 @@
+"""
+Subscription reconciliation between Polar and the app's database.
+
+Polar's subscriptions are fetched page by page. Up to `window` pages are in
+flight at once, and pages are handled in order while the next ones load. A page is
+sorted by subscription id and merge-joined against the matching
+`user_subscriptions` rows, which are read in the same order with one query
+per page. Every subscription therefore falls into one of these cases:
+
+- missing: in Polar but not in the database
+- status: both sides exist but the status differs
+- stale: the status matches but the product or billing period differs
+- orphaned: in the database but no longer in Polar
+
+Orphans are found at the end. The ids seen in Polar are collected in a
+temporary table on the database side, and the subscriptions absent from it are
+streamed through a server-side cursor. Memory therefore depends on the page
+size and window, not on the number of subscriptions.
+
+With `apply`, fixes are written in batches using the webhook handlers'
+semantics. Missing and drifted rows are upserted on subscription_id, and
+orphans are marked canceled the way the sync cron does when Polar answers 404.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from console import Colors, print_info
+from progress import SetupProgress
+from tracing import propagate
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WINDOW = 4
+APPLY_BATCH = 500
+SAMPLE_LIMIT = 10
+ORPHAN_FETCH = 1000
+KINDS = ('missing', 'status', 'stale', 'orphaned')
+
+SELECT_PAGE = ("SELECT subscription_id, clerk_user_id, product_id, status, tier, current_period_start, "
+               "current_period_end FROM user_subscriptions WHERE subscription_id = ANY(%s) "
+               # Byte order, to match Python's sort of the page whatever the database collation
+               'ORDER BY subscription_id COLLATE "C"')
+UPSERT = ("INSERT INTO user_subscriptions (clerk_user_id, subscription_id, product_id, status, tier, "
+          "current_period_start, current_period_end, canceled_at, created_at, updated_at) "
+          "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, now() AT TIME ZONE 'utc', now() AT TIME ZONE 'utc') "
+          "ON CONFLICT (subscription_id) DO UPDATE SET product_id = EXCLUDED.product_id, status = EXCLUDED.status, "
+          "tier = EXCLUDED.tier, current_period_start = EXCLUDED.current_period_start, "
+          "current_period_end = EXCLUDED.current_period_end, canceled_at = EXCLUDED.canceled_at, "
+          "updated_at = EXCLUDED.updated_at")
+CANCEL = ("UPDATE user_subscriptions SET status = 'canceled', canceled_at = now() AT TIME ZONE 'utc', "
+          "updated_at = now() AT TIME ZONE 'utc' WHERE subscription_id = ANY(%s)")
+
+class ReconcileError(Exception):
+    """Raised when the saved setup cannot be reconciled"""
+
+@dataclass
+class Difference:
+    """One subscription on which Polar and the database disagree"""
+    kind: str
+    subscription_id: str
+    detail: str = ""
+
+@dataclass
+class ReconcileReport:
+    """Counts per kind, with the first few differences of each kind as samples"""
+    polar_subscriptions: int = 0
+    pages: int = 0
+    counts: Dict[str, int] = field(default_factory=lambda: dict.fromkeys(KINDS, 0))
+    samples: Dict[str, List[Difference]] = field(default_factory=lambda: {kind: [] for kind in KINDS})
+    unfixable: int = 0
+    applied: int = 0
+    seconds: float = 0.0
+
+    def add(self, difference: Difference):
+        self.counts[difference.kind] += 1
+        if len(self.samples[difference.kind]) < SAMPLE_LIMIT:
+            self.samples[difference.kind].append(difference)
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+def _timestamp(value: Optional[str]) -> Optional[datetime]:
+    """Polar's ISO timestamps as the naive UTC values stored in the database, to the second"""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed.replace(microsecond=0)
+
+def _second(value: Optional[datetime]) -> Optional[datetime]:
+    return value.replace(microsecond=0) if value else None
+
+class SubscriptionReconciler:
+    """Compares Polar's subscriptions with user_subscriptions, optionally fixing the database"""
+
+    def __init__(self, polar, conn, product_tiers: Dict[str, str], window: int = DEFAULT_WINDOW,
+                 apply: bool = False, batch_size: int = APPLY_BATCH):
+        self.polar = polar
+        self.conn = conn
+        self.product_tiers = product_tiers
+        self.window = max(1, window)
+        self.apply = apply
+        self.batch_size = batch_size
+        self.report = ReconcileReport()
+        self._upserts: List[Tuple] = []
+        self._cancels: List[str] = []
+
+    def pages(self) -> Iterator[List[Dict]]:
+        """Polar subscription pages in order, with up to `window` later pages loading meanwhile"""
+        first, max_page = self.polar.subscriptions_page(1)
+        yield first
+        with ThreadPoolExecutor(max_workers=self.window) as pool:
+            fetch = propagate(lambda page: self.polar.subscriptions_page(page)[0])
+            pending = {}
+            next_page = 2
+            while next_page <= max_page or pending:
+                # Keep the window full; only `window` pages are ever held in memory
+                while next_page <= max_page and len(pending) < self.window:
+                    pending[next_page] = pool.submit(fetch, next_page)
+                    next_page += 1
+                page = min(pending)
+                yield pending.pop(page).result()
+
+    def run(self) -> ReconcileReport:
+        """Reconcile every subscription, returning counts and samples of each difference"""
+        self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS reconcile_seen (subscription_id text PRIMARY KEY)")
+        self.conn.execute("TRUNCATE reconcile_seen")
+        for page in self.pages():
+            self.report.pages += 1
+            self.report.polar_subscriptions += len(page)
+            self.merge_page(sorted(page, key=lambda s: s['id']))
+        self.find_orphans()
+        self.flush(force=True)
+        self.conn.execute("DROP TABLE reconcile_seen")
+        self.conn.commit()
+        return self.report
+
+    def merge_page(self, subscriptions: List[Dict]):
+        """Merge-join one page, sorted by id, against the rows with the same ids"""
+        ids = [s['id'] for s in subscriptions]
+        with self.conn.cursor() as cur:
+            cur.executemany("INSERT INTO reconcile_seen VALUES (%s) ON CONFLICT DO NOTHING", [(i,) for i in ids])
+        rows = self.conn.execute(SELECT_PAGE, (ids,)).fetchall()
+
+        r = 0
+        for subscription in subscriptions:
+            while r < len(rows) and rows[r][0] < subscription['id']:
+                r += 1
+            if r < len(rows) and rows[r][0] == subscription['id']:
+                self.compare(subscription, rows[r])
+                r += 1
+            else:
+                self.missing(subscription)
+        self.flush()
+
+    def compare(self, subscription: Dict, row: Tuple):
+        _, clerk_user_id, product_id, status, tier, period_start, period_end = row
+        if subscription.get('status') != status:
+            kind, detail = 'status', f"database {status}, Polar {subscription.get('status')}"
+        elif (subscription.get('product_id') != product_id
+              or _timestamp(subscription.get('current_period_start')) != _second(period_start)
+              or _timestamp(subscription.get('current_period_end')) != _second(period_end)):
+            kind, detail = 'stale', "product or billing period differs"
+        else:
+            return
+        self.report.add(Difference(kind, subscription['id'], detail))
+        self.queue_upsert(subscription, clerk_user_id, tier)
+
+    def missing(self, subscription: Dict):
+        metadata = subscription.get('metadata') or {}
+        clerk_user_id = metadata.get('userId') or ((subscription.get('customer') or {}).get('metadata') or {}).get('userId')
+        self.report.add(Difference('missing', subscription['id'],
+                                   f"user {clerk_user_id}" if clerk_user_id else "no userId in metadata"))
+        if clerk_user_id:
+            self.queue_upsert(subscription, clerk_user_id, metadata.get('tier'))
+        else:
+            # Without the Clerk user the row cannot be created, only reported
+            self.report.unfixable += 1
+
+    def queue_upsert(self, subscription: Dict, clerk_user_id: str, tier: Optional[str]):
+        tier = self.product_tiers.get(subscription.get('product_id')) or tier
+        if not tier:
+            self.report.unfixable += 1
+            return
+        self._upserts.append((
+            clerk_user_id, subscription['id'], subscription.get('product_id'), subscription.get('status'), tier,
+            _timestamp(subscription.get('current_period_start')), _timestamp(subscription.get('current_period_end')),
+            _timestamp(subscription.get('canceled_at')),
+        ))
+
+    def find_orphans(self):
+        """Stream database subscriptions Polar no longer has"""
+        query = ("SELECT s.subscription_id FROM user_subscriptions s WHERE s.subscription_id IS NOT NULL "
+                 "AND s.status <> 'canceled' AND NOT EXISTS "
+                 "(SELECT 1 FROM reconcile_seen p WHERE p.subscription_id = s.subscription_id)")
+        with self.conn.cursor(name='reconcile_orphans') as cur:
+            cur.itersize = ORPHAN_FETCH
+            cur.execute(query)
+            for (subscription_id,) in cur:
+                self.report.add(Difference('orphaned', subscription_id, "not in Polar"))
+                self._cancels.append(subscription_id)
+                self.flush()
+
+    def flush(self, force: bool = False):
+        """Write queued fixes once a batch is full (or at the end), or drop them on a dry run"""
+        if not self.apply:
+            self._upserts.clear()
+            self._cancels.clear()
+            return
+        if force or len(self._upserts) >= self.batch_size:
+            if self._upserts:
+                with self.conn.cursor() as cur:
+                    cur.executemany(UPSERT, self._upserts)
+                self.report.applied += len(self._upserts)
+                self._upserts.clear()
+        if self._cancels and (force or len(self._cancels) >= self.batch_size):
+            self.conn.execute(CANCEL, (self._cancels,))
+            self.report.applied += len(self._cancels)
+            self._cancels.clear()
+
+def product_tiers(progress: SetupProgress) -> Dict[str, str]:
+    """Polar product id -> tier, from the products recorded during setup"""
+    credentials = progress.service_configs.get('polar', {}).get('credentials', {})
+    return {credentials[f"{tier}_product_id"]: tier for tier in ('pro', 'business')
+            if credentials.get(f"{tier}_product_id")}
+
+def reconcile_progress(progress: SetupProgress, database_url: str, window: int = DEFAULT_WINDOW,
+                       apply: bool = False, session=None) -> ReconcileReport:
+    """Reconcile the saved setup's Polar organization with its database"""
+    import time
+    from database import connect
+    from services import PolarService
+
+    token = progress.api_keys.get('polar_access_token')
+    if not token:
+        raise ReconcileError("The saved setup has no Polar access token")
+    environment = progress.service_configs.get('polar', {}).get('credentials', {}).get('environment', 'sandbox')
+    polar = PolarService(environment, access_token=token, session=session, max_retries=4)
+
+    started = time.monotonic()
+    with connect(database_url) as conn:
+        report = SubscriptionReconciler(polar, conn, product_tiers(progress), window, apply).run()
+    report.seconds = time.monotonic() - started
+    return report
+
+def print_report(report: ReconcileReport, applied: bool):
+    """Print counts and sample differences per kind"""
+    print(f"\n{Colors.BOLD}Reconciled {report.polar_subscriptions:,} Polar subscriptions "
+          f"({report.pages} pages) in {report.seconds:.2f}s{Colors.ENDC}")
+    for kind in KINDS:
+        count = report.counts[kind]
+        color = Colors.WARNING if count else Colors.OKGREEN
+        print(f"   {color}{kind:<9} {count:>8,}{Colors.ENDC}")
+        for difference in report.samples[kind]:
+            print(f"      {difference.subscription_id}  {difference.detail}")
+        if count > len(report.samples[kind]):
+            print(f"      ... and {count - len(report.samples[kind]):,} more")
+    if report.unfixable:
+        print_info(f"{report.unfixable:,} differences need a Clerk user or tier that Polar does not provide")
+    if applied:
+        print_info(f"Applied {report.applied:,} fixes")
+    elif report.total:
+        print_info("Dry run; pass --apply to write the fixes")
@@ -0,0 +1,245 @@
+"""
+Fleet-wide rotation of CRON_SECRET and the Polar webhook secret.
+
+Each project is rotated as one unit:
+
+1. a new CRON_SECRET is generated and Polar is asked for a new webhook secret
+2. the progress and the env files are updated, keeping the previous
+   CRON_SECRET so it can be restored
+3. the variables are pushed to Vercel and the production deployment is rebuilt
+   so it picks them up, then aliased
+4. the cron endpoint is called live: the new secret must be accepted, then
+   the old one rejected
+
+If pushing, deploying or verifying fails, the project is rolled back to its
+previous CRON_SECRET the same way. Polar only keeps the latest webhook secret,
+so a rolled back project keeps the new one everywhere. `rotate --rollback`
+restores the previous CRON_SECRET of projects rotated earlier.
+
+Projects run with bounded concurrency, and the Vercel and Polar clients of all
+projects share one rate limiter per provider. Clerk webhook secrets can only be
+rolled in the Clerk dashboard and are not rotated here.
+"""
+
+import os
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional, Tuple
+
+import requests
+
+from console import Colors
+from envfiles import generate_cron_secret, write_env_files
+from envpush import VercelEnvPush, vercel_client
+from progress import SetupProgress
+from services import (
+    APP_URL_TEMPLATE, PolarService, RateLimiter, ServiceError, ServiceManager, VercelService, create_session,
+)
+from tracing import propagate, span
+
+logger = logging.getLogger(__name__)
+
+ROTATABLE = ('cron', 'polar')
+PREVIOUS_CRON_SECRET = 'previous_cron_secret'
+CRON_PATH = "/api/cron/sync-subscriptions"
+ROTATION_WORKERS = 4
+DEPLOY_POLL_SECONDS = 5.0
+VERIFY_POLL_SECONDS = 3.0
+# A call with the right secret runs a full subscription sync
+CRON_TIMEOUT = (3.05, 120)
+
+class RotationError(Exception):
+    """Raised when a rotation step cannot be completed"""
+
+@dataclass
+class RotationSettings:
+    """Options shared by every project of a rotation run"""
+    secrets: Tuple[str, ...] = ROTATABLE
+    app_url: str = APP_URL_TEMPLATE
+    deploy_timeout: float = 600.0
+    verify_timeout: float = 60.0
+    vercel_rate: float = 10.0
+    polar_rate: float = 3.0
+
+@dataclass
+class RotationResult:
+    """Outcome of rotating (or restoring) one project"""
+    project: str
+    status: str  # 'rotated', 'restored', 'rolled back', 'skipped' or 'failed'
+    rotated: List[str] = field(default_factory=list)
+    detail: str = ""
+    seconds: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.status in ('rotated', 'restored', 'skipped')
+
+class SecretRotator:
+    """Rotates one project's secrets, or restores its previous CRON_SECRET"""
+
+    def __init__(self, progress: SetupProgress, project_dir: str, save: Callable[[SetupProgress], None],
+                 vercel: VercelService, app: ServiceManager, polar: Optional[PolarService] = None,
+                 settings: Optional[RotationSettings] = None):
+        self.progress = progress
+        self.project = progress.project_name
+        self.project_dir = project_dir
+        self.save = save
+        self.vercel = vercel
+        self.app = app
+        self.polar = polar
+        self.settings = settings or RotationSettings()
+
+    def rotate(self) -> RotationResult:
+        api_keys = self.progress.api_keys
+        old_cron = api_keys.get('cron_secret', '')
+        changes, notes = {}, []
+        if 'cron' in self.settings.secrets:
+            changes['cron_secret'] = generate_cron_secret()
+        if 'polar' in self.settings.secrets:
+            endpoint_id = self.progress.service_configs.get('polar', {}).get('credentials', {}).get('webhook_endpoint_id')
+            if self.polar is None or not endpoint_id:
+                notes.append("Polar webhook secret skipped: no access token or webhook endpoint id saved")
+            else:
+                secret = self.polar.reset_webhook_secret(endpoint_id).get('secret')
+                if not secret:
+                    raise RotationError("Polar did not return the new webhook secret")
+                changes['polar_webhook_secret'] = secret
+        if not changes:
+            return RotationResult(self.project, 'skipped', detail="; ".join(notes))
+
+        rotated = [name for name, key in (('cron', 'cron_secret'), ('polar', 'polar_webhook_secret')) if key in changes]
+        if 'cron_secret' in changes and old_cron:
+            api_keys[PREVIOUS_CRON_SECRET] = old_cron
+        api_keys.update(changes)
+        # Saved before anything is pushed, so an interrupted run still knows both secrets
+        self.persist()
+        cron_secret = api_keys.get('cron_secret', '')
+        try:
+            self.deploy()
+            self.verify(cron_secret, old_cron if old_cron != cron_secret else None)
+        except (RotationError, ServiceError, requests.RequestException) as e:
+            if 'cron_secret' not in changes or not old_cron:
+                return RotationResult(self.project, 'failed', rotated, str(e))
+            logger.info(f"{self.project}: rotation failed ({e}), restoring the previous CRON_SECRET")
+            api_keys['cron_secret'] = api_keys.pop(PREVIOUS_CRON_SECRET)
+            self.persist()
+            try:
+                self.deploy()
+                self.verify(old_cron, changes['cron_secret'])
+            except (RotationError, ServiceError, requests.RequestException) as rollback_error:
+                return RotationResult(self.project, 'failed', rotated, f"{e}; rollback failed too: {rollback_error}")
+            kept = " (the new Polar webhook secret is kept)" if 'polar' in rotated else ""
+            return RotationResult(self.project, 'rolled back', rotated, f"{e}{kept}")
+        return RotationResult(self.project, 'rotated', rotated, "; ".join(notes))
+
+    def restore(self) -> RotationResult:
+        """Put the CRON_SECRET from before the last rotation back"""
+        api_keys = self.progress.api_keys
+        previous = api_keys.get(PREVIOUS_CRON_SECRET)
+        if not previous:
+            return RotationResult(self.project, 'skipped', detail="no previous CRON_SECRET saved")
+        current = api_keys.get('cron_secret', '')
+        api_keys['cron_secret'] = api_keys.pop(PREVIOUS_CRON_SECRET)
+        self.persist()
+        self.deploy()
+        self.verify(previous, current)
+        return RotationResult(self.project, 'restored', ['cron'])
+
+    def persist(self):
+        """Record the current secrets in the progress and the env files"""
+        self.save(self.progress)
+        os.makedirs(self.project_dir, exist_ok=True)
+        write_env_files(self.progress, self.project_dir)
+
+    def deploy(self):
+        """Push the variables and rebuild the production deployment so it uses them"""
+        # Forced, so the rotated values also replace variables stored as sensitive
+        VercelEnvPush(self.vercel, self.project, force=True).push(self.progress)
+        latest = self.vercel.latest_deployment(self.project)
+        if not latest:
+            raise RotationError("no ready production deployment to rebuild")
+        deployment = self.vercel.redeploy(self.project, latest.get('uid') or latest.get('id'))
+        deadline = time.monotonic() + self.settings.deploy_timeout
+        # Until the production alias points at the rebuild, the app still runs with the old variables
+        while deployment.get('readyState') != 'READY' or not deployment.get('aliasAssigned'):
+            if deployment.get('readyState') in ('ERROR', 'CANCELED'):
+                raise RotationError(f"redeployment {deployment.get('id')} ended in {deployment['readyState']}")
+            if deployment.get('aliasError'):
+                raise RotationError(f"redeployment {deployment.get('id')} was not aliased: "
+                                    f"{deployment['aliasError'].get('message', deployment['aliasError'])}")
+            if time.monotonic() > deadline:
+                raise RotationError(f"redeployment {deployment.get('id')} not ready and aliased after "
+                                    f"{self.settings.deploy_timeout:.0f}s")
+            time.sleep(DEPLOY_POLL_SECONDS)
+            deployment = self.vercel.get_deployment(deployment['id'])
+
+    def verify(self, accepted: str, rejected: Optional[str] = None):
+        """Call the cron endpoint live: `accepted` must get through, then `rejected` must get a 401"""
+        # Polled with the secret that should work: while the old deployment still answers, the call is
+        # rejected and does nothing; the first call that gets through runs the sync once
+        deadline = time.monotonic() + self.settings.verify_timeout
+        while self._cron_status(accepted) == 401:
+            if time.monotonic() > deadline:
+                raise RotationError("the cron endpoint rejects the new secret")
+            time.sleep(VERIFY_POLL_SECONDS)
+        if rejected and self._cron_status(rejected) != 401:
+            raise RotationError("the cron endpoint still accepts the previous secret")
+
+    def _cron_status(self, secret: str) -> int:
+        return self.app.request('GET', CRON_PATH, params={'secret': secret}, timeout=CRON_TIMEOUT).status_code
+
+def rotate_projects(projects: List[Tuple[SetupProgress, str]], save: Callable[[SetupProgress], None],
+                    settings: Optional[RotationSettings] = None, workers: int = ROTATION_WORKERS,
+                    rollback: bool = False) -> List[RotationResult]:
+    """Rotate (or restore) (progress, project directory) pairs concurrently, in the given order"""
+    settings = settings or RotationSettings()
+    workers = max(1, min(workers, len(projects)))
+    session = create_session(workers * 3)
+    vercel_limiter = RateLimiter(settings.vercel_rate)
+    polar_limiter = RateLimiter(settings.polar_rate)
+
+    def run(progress: SetupProgress, project_dir: str) -> RotationResult:
+        started = time.monotonic()
+        with span('rotate', **{'kosuke.project': progress.project_name}):
+            try:
+                project = rotator(progress, project_dir)
+                result = project.restore() if rollback else project.rotate()
+            except (RotationError, ServiceError, requests.RequestException, OSError) as e:
+                logger.debug("Rotation of %s failed", progress.project_name, exc_info=True)
+                result = RotationResult(progress.project_name, 'failed', detail=str(e))
+        result.seconds = time.monotonic() - started
+        return result
+
+    def rotator(progress: SetupProgress, project_dir: str) -> SecretRotator:
+        vercel = vercel_client(progress, session, rate_limiter=vercel_limiter)
+        if vercel is None:
+            raise RotationError("no Vercel token saved; set VERCEL_TOKEN")
+        polar = None
+        token = progress.api_keys.get('polar_access_token')
+        if token:
+            environment = progress.service_configs.get('polar', {}).get('credentials', {}).get('environment', 'sandbox')
+            polar = PolarService(environment, access_token=token, session=session, max_retries=4,
+                                 rate_limiter=polar_limiter)
+        app = ServiceManager('app', settings.app_url.format(project=progress.project_name), session=session,
+                             max_retries=2)
+        return SecretRotator(progress, project_dir, save, vercel, app, polar, settings)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(propagate(run), progress, project_dir) for progress, project_dir in projects]
+        return [future.result() for future in futures]
+
+def print_rotation_results(results: List[RotationResult]):
+    """Print one line per project and a summary"""
+    colors = {'rotated': Colors.OKGREEN, 'restored': Colors.OKGREEN, 'skipped': Colors.OKCYAN,
+              'rolled back': Colors.WARNING, 'failed': Colors.FAIL}
+    print()
+    for result in results:
+        secrets = f" [{', '.join(result.rotated)}]" if result.rotated else ""
+        detail = f"  {result.detail}" if result.detail else ""
+        print(f"   {colors[result.status]}{result.status:<11}{Colors.ENDC} {result.project}{secrets} "
+              f"({result.seconds:.1f}s){detail}")
+    counts = {status: sum(r.status == status for r in results) for status in colors}
+    summary = ", ".join(f"{count} {status}" for status, count in counts.items() if count)
+    print(f"\n{Colors.BOLD}{len(results)} projects: {summary}{Colors.ENDC}")
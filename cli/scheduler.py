@@ -0,0 +1,187 @@
+"""
+Dependency-graph step scheduler.
+
+Each setup step declares the values it reads and the values it produces. The
+scheduler links every input to the step that outputs it, and runs a step as
+soon as all of its dependencies are done: automated steps run concurrently
+in a worker pool, while interactive steps (which prompt on the console) run
+one at a time on the calling thread in step-number order. Completion is
+tracked per step name, so a resumed setup skips exactly the steps that
+finished, whatever order they finished in.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from tracing import span, propagate, STEP
+
+DEFAULT_WORKERS = 8
+
+# The kosuke setup graph: (name, step number, inputs, outputs). Resend, Sentry and
+# Polar only need the project name; Clerk needs the Vercel URL for its webhook.
+SETUP_GRAPH = (
+    ('github', 1, ('project_name',), ('github_repo_url',)),
+    ('vercel', 2, ('project_name', 'github_repo_url'), ('vercel_project',)),
+    ('neon', 3, ('vercel_project',), ('database',)),
+    ('polar', 4, ('project_name',), ('polar_credentials',)),
+    ('clerk', 5, ('vercel_project',), ('clerk_credentials',)),
+    ('resend', 6, ('project_name',), ('resend_credentials',)),
+    ('sentry', 7, ('project_name',), ('sentry_credentials',)),
+    ('vercel-env', 8, ('vercel_project', 'database', 'polar_credentials', 'clerk_credentials',
+                       'resend_credentials', 'sentry_credentials'), ('vercel_env',)),
+)
+
+@dataclass
+class Step:
+    """One node of the setup graph"""
+    name: str
+    number: int
+    run: Callable[[], None]
+    inputs: Tuple[str, ...] = ()
+    outputs: Tuple[str, ...] = ()
+    interactive: bool = False
+
+def setup_steps(handlers: Dict[str, Callable[[], None]], interactive: bool = False) -> List[Step]:
+    """Bind the setup graph to one handler per step name"""
+    return [Step(name, number, handlers[name], inputs, outputs, interactive)
+            for name, number, inputs, outputs in SETUP_GRAPH]
+
+def legacy_completed_steps(steps: List[Step], current_step: int) -> List[str]:
+    """Steps finished by progress saved before per-step tracking, which only kept a step number"""
+    return [step.name for step in sorted(steps, key=lambda s: s.number) if step.number < current_step]
+
+def resume_step(steps: List[Step], completed: Iterable[str]) -> int:
+    """Lowest step number still to run, past the last step once everything is done"""
+    done = set(completed)
+    remaining = [step.number for step in steps if step.name not in done]
+    return min(remaining) if remaining else max((step.number for step in steps), default=0) + 1
+
+class StepScheduler:
+    """Runs steps in dependency order, overlapping independent automated work"""
+
+    def __init__(self, steps: List[Step], completed: Iterable[str] = (),
+                 on_complete: Optional[Callable[[Step], None]] = None, workers: int = DEFAULT_WORKERS):
+        self.steps = {step.name: step for step in steps}
+        if len(self.steps) != len(steps):
+            raise ValueError("Step names must be unique")
+        self.completed: Set[str] = set(completed) & set(self.steps)
+        self.on_complete = on_complete
+        self.workers = workers
+        self.dependencies = self._build_graph()
+        self._lock = threading.Lock()
+
+    def _build_graph(self) -> Dict[str, Set[str]]:
+        producers: Dict[str, str] = {}
+        for step in self.steps.values():
+            for output in step.outputs:
+                if output in producers:
+                    raise ValueError(f"'{output}' is produced by both {producers[output]} and {step.name}")
+                producers[output] = step.name
+        # Inputs nobody produces are external (e.g. the project name) and always available
+        graph = {
+            step.name: {producers[i] for i in step.inputs if i in producers and producers[i] != step.name}
+            for step in self.steps.values()
+        }
+        self._check_acyclic(graph)
+        return graph
+
+    @staticmethod
+    def _check_acyclic(graph: Dict[str, Set[str]]):
+        visiting, done = set(), set()
+
+        def visit(name: str, path: List[str]):
+            if name in done:
+                return
+            if name in visiting:
+                raise ValueError(f"Step dependency cycle: {' -> '.join(path + [name])}")
+            visiting.add(name)
+            for dep in graph[name]:
+                visit(dep, path + [name])
+            visiting.discard(name)
+            done.add(name)
+
+        for name in graph:
+            visit(name, [])
+
+    def ready(self, pending: Set[str]) -> List[Step]:
+        """Pending steps whose dependencies are complete, in step-number order"""
+        return sorted((self.steps[name] for name in pending if self.dependencies[name] <= self.completed),
+                      key=lambda step: step.number)
+
+    def critical_path(self, durations: Optional[Dict[str, float]] = None) -> Tuple[List[str], float]:
+        """Longest chain of dependent steps by duration (1 per step if no durations are given)"""
+        durations = durations or {}
+        best: Dict[str, Tuple[float, List[str]]] = {}
+
+        def longest(name: str) -> Tuple[float, List[str]]:
+            if name not in best:
+                tail = max((longest(dep) for dep in self.dependencies[name]), default=(0.0, []))
+                best[name] = (tail[0] + durations.get(name, 1.0), tail[1] + [name])
+            return best[name]
+
+        length, path = max((longest(name) for name in self.steps), default=(0.0, []))
+        return path, length
+
+    def run(self):
+        """Run every incomplete step, raising the first step failure after in-flight steps finish"""
+        pending = set(self.steps) - self.completed
+        running = {}
+        error = None
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            try:
+                while pending or running:
+                    if error is None:
+                        for step in self.ready(pending):
+                            if not step.interactive:
+                                pending.discard(step.name)
+                                running[pool.submit(propagate(self._run), step)] = step
+
+                    interactive = [s for s in self.ready(pending) if s.interactive] if error is None else []
+                    if interactive:
+                        # Prompts stay on this thread while automated steps keep running in the pool
+                        step = interactive[0]
+                        pending.discard(step.name)
+                        self._run(step)
+                        self._complete(step)
+                    elif running:
+                        finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                        failure = self._collect(running, finished)
+                        error = error or failure
+                    else:
+                        break
+            finally:
+                # An interactive step that raised (Ctrl-C included) still records the automated work in flight
+                if running:
+                    self._collect(running, wait(list(running))[0])
+
+        if error is not None:
+            raise error
+        if pending:
+            raise RuntimeError(f"Steps could not run: {', '.join(sorted(pending))}")
+
+    def _collect(self, running: Dict, finished) -> Optional[Exception]:
+        """Record the finished steps that succeeded, returning the first failure"""
+        error = None
+        for future in finished:
+            step = running.pop(future)
+            try:
+                future.result()
+            except Exception as e:
+                error = error or e
+                continue
+            self._complete(step)
+        return error
+
+    @staticmethod
+    def _run(step: Step):
+        with span(f"step {step.name}", STEP, **{'kosuke.step': step.name, 'kosuke.step_number': step.number,
+                                                'kosuke.interactive': step.interactive}):
+            step.run()
+
+    def _complete(self, step: Step):
+        with self._lock:
+            self.completed.add(step.name)
+            if self.on_complete:
+                self.on_complete(step)
@@ -0,0 +1,341 @@
+"""
+Synthetic data for the local Postgres, and a benchmark of the subscription sync cron.
+
+`seed_database` streams generated rows into `users`, `user_subscriptions` and
+`activity_logs` (the tables of lib/db/schema.ts) with COPY. Rows are produced
+one at a time by generators and handed to psycopg's COPY writer, so memory
+stays flat whether a run seeds ten users or several million. Every value is
+derived from the row number and a seed, so two runs with the same SeedSpec
+produce the same data.
+
+How stale the subscriptions are is what drives the sync cron: a share of
+`stale_ratio` of them gets an `updated_at` older than the cron's 6 hour
+threshold, spread uniformly or exponentially up to `max_age_hours`.
+
+`benchmark_sync` then calls /api/cron/sync-subscriptions of a running app
+with the project's CRON_SECRET while serving a mock Polar subscriptions API.
+Start the app with POLAR_API_URL pointing at the mock so no real Polar calls
+are made. It reports rows synced per second, how long the remaining stale
+backlog would take at that rate, and the query plans of the two lookups the
+sync runs per batch and per row.
+"""
+
+import json
+import time
+import random
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from console import Colors, print_info
+from database import connect
+
+SYNC_PATH = "/api/cron/sync-subscriptions"
+SYNC_STALE_HOURS = 6
+SYNC_BATCH = 50
+SYNC_TIMEOUT = (3.05, 600)
+TABLES = ('users', 'user_subscriptions', 'activity_logs')
+ACTIVITY_ACTIONS = ('sign_in', 'sign_out', 'update_profile', 'update_preferences', 'subscription_updated')
+SUBSCRIPTION_STATUSES = (('active', 0.85), ('canceled', 0.1), ('past_due', 0.05))
+
+# The two queries syncStaleSubscriptions issues, as drizzle renders them
+STALE_QUERY = ("SELECT * FROM user_subscriptions WHERE updated_at < now() AT TIME ZONE 'utc' - make_interval(hours => %s) "
+               f"LIMIT {SYNC_BATCH}")
+USER_QUERY = ("SELECT * FROM user_subscriptions WHERE clerk_user_id = %s ORDER BY created_at DESC LIMIT 1")
+
+class SeedError(Exception):
+    """Raised when a seed spec is invalid or the sync cron fails"""
+
+@dataclass
+class SeedSpec:
+    """Sizes and shape of the generated data"""
+    users: int = 10000
+    subscribed_ratio: float = 0.7
+    activity_per_user: float = 5.0
+    stale_ratio: float = 0.5
+    max_age_hours: float = 24 * 30
+    age_distribution: str = 'uniform'  # or 'exponential'
+    seed: int = 0
+
+    def validate(self):
+        if self.users < 0 or self.activity_per_user < 0:
+            raise SeedError("Row counts cannot be negative")
+        for name in ('subscribed_ratio', 'stale_ratio'):
+            if not 0 <= getattr(self, name) <= 1:
+                raise SeedError(f"{name} must be between 0 and 1")
+        if self.max_age_hours <= SYNC_STALE_HOURS:
+            raise SeedError(f"max_age_hours must be above the sync threshold of {SYNC_STALE_HOURS} hours")
+        if self.age_distribution not in ('uniform', 'exponential'):
+            raise SeedError("age_distribution must be 'uniform' or 'exponential'")
+
+def clerk_user_id(index: int) -> str:
+    return f"user_seed_{index}"
+
+def subscription_age(spec: SeedSpec, rng: random.Random) -> timedelta:
+    """How long ago a subscription was last synced"""
+    if rng.random() >= spec.stale_ratio:
+        return timedelta(hours=rng.uniform(0, SYNC_STALE_HOURS))
+    span = spec.max_age_hours - SYNC_STALE_HOURS
+    if spec.age_distribution == 'exponential':
+        # Most stale rows just missed a sync; a long tail was never synced (mean a quarter of the range)
+        extra = min(rng.expovariate(4 / span), span)
+    else:
+        extra = rng.uniform(0, span)
+    return timedelta(hours=SYNC_STALE_HOURS + extra)
+
+def user_rows(spec: SeedSpec, now: datetime) -> Iterator[Tuple]:
+    rng = random.Random(f"{spec.seed}:users")
+    for i in range(spec.users):
+        created = now - timedelta(hours=rng.uniform(0, spec.max_age_hours))
+        yield (clerk_user_id(i), f"seed-{i}@example.com", f"Seed User {i}",
+               f"https://img.clerk.com/seed/{i}", None, created, created, created)
+
+def subscription_rows(spec: SeedSpec, now: datetime) -> Iterator[Tuple]:
+    rng = random.Random(f"{spec.seed}:subscriptions")
+    statuses, weights = zip(*SUBSCRIPTION_STATUSES)
+    for i in range(spec.users):
+        if rng.random() >= spec.subscribed_ratio:
+            continue
+        tier = 'business' if rng.random() < 0.2 else 'pro'
+        status = rng.choices(statuses, weights)[0]
+        updated = now - subscription_age(spec, rng)
+        period_start = updated - timedelta(days=rng.uniform(0, 30))
+        yield (clerk_user_id(i), f"sub_seed_{i}", f"prod_seed_{tier}", status, tier, period_start,
+               period_start + timedelta(days=30), updated if status == 'canceled' else None,
+               period_start, updated)
+
+def activity_rows(spec: SeedSpec, now: datetime) -> Iterator[Tuple]:
+    rng = random.Random(f"{spec.seed}:activity")
+    max_age = spec.max_age_hours * 3600
+    for i in range(spec.users):
+        user = clerk_user_id(i)
+        # Roughly activity_per_user per user on average, without materializing a distribution
+        for _ in range(int(rng.uniform(0, 2 * spec.activity_per_user) + 0.5)):
+            # This is the largest table; one random draw per address keeps generation off the critical path
+            address = rng.getrandbits(24)
+            yield (user, rng.choice(ACTIVITY_ACTIONS), now - timedelta(seconds=rng.random() * max_age),
+                   f"10.{address >> 16}.{(address >> 8) & 255}.{address & 255}", None)
+
+# table -> (columns, column types, row generator); binary COPY with declared types skips
+# per-value type inference and text formatting
+COPY_TABLES = {
+    'users': (('clerk_user_id', 'email', 'display_name', 'profile_image_url', 'notification_settings',
+               'last_synced_at', 'created_at', 'updated_at'),
+              ('text', 'text', 'text', 'text', 'text', 'timestamp', 'timestamp', 'timestamp'), user_rows),
+    'user_subscriptions': (('clerk_user_id', 'subscription_id', 'product_id', 'status', 'tier',
+                            'current_period_start', 'current_period_end', 'canceled_at', 'created_at', 'updated_at'),
+                           ('text', 'text', 'text', 'text', 'text', 'timestamp', 'timestamp', 'timestamp',
+                            'timestamp', 'timestamp'), subscription_rows),
+    'activity_logs': (('clerk_user_id', 'action', 'timestamp', 'ip_address', 'metadata'),
+                      ('text', 'text', 'timestamp', 'varchar', 'text'), activity_rows),
+}
+
+@dataclass
+class TableLoad:
+    """Rows copied into one table"""
+    table: str
+    rows: int
+    seconds: float
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+def seed_database(database_url: str, spec: SeedSpec, truncate: bool = False) -> List[TableLoad]:
+    """Stream generated rows into every table, one COPY per table"""
+    spec.validate()
+    # Timestamp columns are `timestamp without time zone` holding UTC, as the app writes them
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    loads = []
+    with connect(database_url) as conn:
+        if truncate:
+            conn.execute(f"TRUNCATE {', '.join(TABLES)} RESTART IDENTITY")
+        for table in TABLES:
+            columns, types, rows = COPY_TABLES[table]
+            started = time.perf_counter()
+            count = 0
+            with conn.cursor() as cur, cur.copy(f"COPY {table} ({', '.join(columns)}) FROM STDIN (FORMAT BINARY)") as copy:
+                copy.set_types(types)
+                for row in rows(spec, now):
+                    copy.write_row(row)
+                    count += 1
+            conn.commit()
+            loads.append(TableLoad(table, count, time.perf_counter() - started))
+        # Fresh statistics so the plans reported by the sync benchmark match a settled database
+        conn.execute(f"ANALYZE {', '.join(TABLES)}")
+        conn.commit()
+    return loads
+
+def stale_count(conn, hours: int = SYNC_STALE_HOURS) -> int:
+    query = "SELECT count(*) FROM user_subscriptions WHERE updated_at < now() AT TIME ZONE 'utc' - make_interval(hours => %s)"
+    return conn.execute(query, (hours,)).fetchone()[0]
+
+def explain(conn, query: str, params: Tuple) -> Dict:
+    """Top plan node and execution time of one query"""
+    plan = conn.execute(f"EXPLAIN (ANALYZE, FORMAT JSON) {query}", params).fetchone()[0][0]
+    node = plan['Plan']
+    # LIMIT and sort nodes wrap the scan that actually decides the cost
+    while node.get('Node Type') in ('Limit', 'Sort', 'Incremental Sort') and node.get('Plans'):
+        node = node['Plans'][0]
+    return {'scan': node.get('Node Type'), 'index': node.get('Index Name', ''),
+            'execution_ms': round(plan.get('Execution Time', 0.0), 3)}
+
+def polar_subscription(subscription_id: str) -> Dict:
+    """A Polar subscription object as returned by GET /v1/subscriptions/{id}"""
+    now = datetime.now(timezone.utc)
+    index = subscription_id.rsplit('_', 1)[-1]
+    return {
+        'id': subscription_id,
+        'created_at': (now - timedelta(days=30)).isoformat(),
+        'modified_at': now.isoformat(),
+        'amount': 2000,
+        'currency': 'usd',
+        'recurring_interval': 'month',
+        'status': 'active',
+        'current_period_start': (now - timedelta(days=1)).isoformat(),
+        'current_period_end': (now + timedelta(days=29)).isoformat(),
+        'cancel_at_period_end': False,
+        'canceled_at': None,
+        'started_at': (now - timedelta(days=30)).isoformat(),
+        'ends_at': None,
+        'ended_at': None,
+        'customer_id': f"cus_seed_{index}",
+        'product_id': "prod_seed_pro",
+        'discount_id': None,
+        'checkout_id': None,
+        'metadata': {'userId': f"user_seed_{index}"},
+    }
+
+class MockPolarServer:
+    """Serves GET /v1/subscriptions/{id} from a background thread"""
+
+    def __init__(self, port: int = 0, latency: float = 0.0):
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and body are written separately; without this, keep-alive calls wait out delayed ACKs
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                with server._lock:
+                    server.requests += 1
+                if server.latency:
+                    time.sleep(server.latency)
+                path = self.path.split('?', 1)[0].rstrip('/')
+                if path.startswith('/v1/subscriptions/'):
+                    code, body = 200, polar_subscription(path.rsplit('/', 1)[1])
+                else:
+                    code, body = 404, {'detail': 'Not found'}
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='mock-polar', daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+        return False
+
+@dataclass
+class SyncBenchmark:
+    """Outcome of repeated sync cron calls"""
+    calls: List[Dict] = field(default_factory=list)
+    stale_before: int = 0
+    stale_after: int = 0
+    polar_requests: int = 0
+    plans: Dict[str, Dict] = field(default_factory=dict)
+
+    @property
+    def synced(self) -> int:
+        return sum(call.get('syncedCount', 0) for call in self.calls)
+
+    @property
+    def seconds(self) -> float:
+        return sum(call['seconds'] for call in self.calls)
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.synced / self.seconds if self.seconds else 0.0
+
+    def backlog_hours(self) -> Optional[float]:
+        """Time to sync the remaining stale rows at the measured rate"""
+        if not self.rows_per_second:
+            return None
+        return self.stale_after / self.rows_per_second / 3600
+
+def benchmark_sync(app_url: str, cron_secret: str, database_url: str, calls: int = 3,
+                   polar_port: int = 0, polar_latency: float = 0.0, session=None) -> SyncBenchmark:
+    """Call the sync cron `calls` times against a mock Polar and measure what it gets through"""
+    if session is None:
+        from services import create_session
+        session = create_session(1)
+    result = SyncBenchmark()
+    with connect(database_url) as conn:
+        result.stale_before = stale_count(conn)
+        sample = conn.execute("SELECT clerk_user_id FROM user_subscriptions LIMIT 1").fetchone()
+        result.plans['stale batch'] = explain(conn, STALE_QUERY, (SYNC_STALE_HOURS,))
+        result.plans['per-user lookup'] = explain(conn, USER_QUERY, (sample[0] if sample else '',))
+
+        with MockPolarServer(polar_port, polar_latency) as polar:
+            print_info(f"Mock Polar API at {polar.url} (start the app with POLAR_API_URL={polar.url})")
+            for _ in range(calls):
+                started = time.perf_counter()
+                response = session.get(f"{app_url.rstrip('/')}{SYNC_PATH}", params={'secret': cron_secret},
+                                       timeout=SYNC_TIMEOUT)
+                seconds = time.perf_counter() - started
+                try:
+                    body = response.json()
+                except ValueError:
+                    body = {}
+                if response.status_code != 200 or not body.get('success'):
+                    raise SeedError(f"Sync cron returned {response.status_code}: "
+                                    f"{body.get('error') or response.text[:200]}")
+                result.calls.append({**body, 'seconds': seconds})
+            result.polar_requests = polar.requests
+        result.stale_after = stale_count(conn)
+    return result
+
+def print_seed_result(loads: List[TableLoad]):
+    print(f"\n{Colors.BOLD}{'table':<22} {'rows':>12} {'seconds':>9} {'rows/s':>12}{Colors.ENDC}")
+    for load in loads:
+        print(f"{load.table:<22} {load.rows:>12,} {load.seconds:>9.2f} {load.rows_per_second:>12,.0f}")
+
+def print_sync_result(result: SyncBenchmark):
+    print(f"\n{Colors.BOLD}Sync cron: {len(result.calls)} calls{Colors.ENDC}")
+    for i, call in enumerate(result.calls, 1):
+        print(f"   call {i}: {call.get('syncedCount', 0)} synced, {call.get('errorCount', 0)} errors "
+              f"in {call['seconds']:.2f}s")
+    print(f"   {result.synced} rows in {result.seconds:.2f}s = {Colors.OKCYAN}{result.rows_per_second:.1f} rows/s"
+          f"{Colors.ENDC} ({result.polar_requests} Polar requests)")
+    print(f"   stale subscriptions: {result.stale_before:,} before, {result.stale_after:,} after")
+    hours = result.backlog_hours()
+    if hours is not None:
+        print(f"   remaining backlog at this rate: {Colors.WARNING}{hours:,.1f} hours{Colors.ENDC} "
+              f"(the cron runs every {SYNC_STALE_HOURS} hours)")
+    print(f"\n{Colors.BOLD}Query plans{Colors.ENDC}")
+    for name, plan in result.plans.items():
+        index = f" using {plan['index']}" if plan['index'] else ''
+        print(f"   {name:<16} {plan['scan']}{index}, {plan['execution_ms']:.2f}ms")
@@ -0,0 +1,491 @@
+"""
+HTTP clients for the external services configured by the setup.
+
+Every client is a ServiceManager that shares one pooled, keep-alive
+`requests.Session` so concurrent calls reuse connections instead of paying a
+TLS handshake per request. Base URLs are constructor arguments (or
+KOSUKE_<SERVICE>_API_URL environment variables) so the clients can be pointed
+at local stub servers.
+"""
+
+import os
+import time
+import random
+import base64
+import logging
+import threading
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from tracing import span, NETWORK
+
+logger = logging.getLogger(__name__)
+
+# (connect, read) timeout applied to every call unless overridden
+DEFAULT_TIMEOUT = (3.05, 10)
+POOL_SIZE = 32
+
+CLERK_API_URL = "https://api.clerk.com"
+POLAR_API_URLS = {
+    'sandbox': "https://sandbox-api.polar.sh",
+    'production': "https://api.polar.sh",
+}
+RESEND_API_URL = "https://api.resend.com"
+VERCEL_API_URL = "https://api.vercel.com"
+GITHUB_API_URL = "https://api.github.com"
+# Where a project's production deployment is served
+APP_URL_TEMPLATE = "https://{project}.vercel.app"
+
+POLAR_PAGE_SIZE = 100
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+MAX_BACKOFF = 30.0
+
+def api_url(service: str, default: str) -> str:
+    """Default base URL for a service, overridable with KOSUKE_<SERVICE>_API_URL"""
+    return os.environ.get(f"KOSUKE_{service.upper()}_API_URL", default)
+
+def create_session(pool_size: int = POOL_SIZE) -> requests.Session:
+    """Create a keep-alive session with a connection pool sized for concurrent calls"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers['User-Agent'] = 'kosuke-cli'
+    return session
+
+class RateLimiter:
+    """Spaces calls out to at most `rate` per second across every client holding it"""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_at = 0.0
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            at = max(time.monotonic(), self._next_at)
+            self._next_at = at + self.interval
+        delay = at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+@dataclass
+class VerificationResult:
+    """Outcome of checking one credential against its provider"""
+    service: str
+    check: str
+    status: str  # 'valid', 'invalid', 'error' or 'skipped'
+    detail: str = ""
+    elapsed: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.status in ('valid', 'skipped')
+
+class ServiceError(Exception):
+    """Raised when a service answers a write or lookup with an error"""
+
+    def __init__(self, service: str, response: requests.Response):
+        self.status_code = response.status_code
+        try:
+            detail = response.json()
+        except ValueError:
+            detail = response.text[:200]
+        super().__init__(f"{service} API returned {response.status_code}: {detail}")
+
+class ServiceManager:
+    """Base class for service managers
+
+    Requests that hit a rate limit or a transient server error are retried with
+    exponential backoff, waiting as long as Retry-After or X-RateLimit-Reset ask
+    for. When a response reports that the rate limit window is exhausted, later
+    calls wait for the window to reset instead of spending a request on a 429.
+    Clients of one provider can also share a RateLimiter, which paces them
+    below the provider's limit before they hit it.
+    """
+
+    max_retries = 0
+
+    def __init__(self, name: str, base_url: str = "", session: Optional[requests.Session] = None,
+                 timeout: Tuple[float, float] = DEFAULT_TIMEOUT, max_retries: Optional[int] = None,
+                 rate_limiter: Optional[RateLimiter] = None):
+        self.name = name
+        self.base_url = base_url.rstrip('/')
+        self.session = session or create_session()
+        self.timeout = timeout
+        # Per-client headers, kept off the session so clients can share it
+        self.headers: Dict[str, str] = {}
+        if max_retries is not None:
+            self.max_retries = max_retries
+        self.rate_limiter = rate_limiter
+        self._rate_lock = threading.Lock()
+        self._rate_reset_at = 0.0
+
+    def request(self, method: str, path: str, **kwargs) -> requests.Response:
+        """Send a request relative to the service base URL"""
+        url = path if path.startswith(('http://', 'https://')) else f"{self.base_url}{path}"
+        kwargs.setdefault('timeout', self.timeout)
+        kwargs['headers'] = {**self.headers, **(kwargs.get('headers') or {})}
+        parts = urlsplit(url)
+        with span(f"{method} {self.name}", NETWORK, 'client', **{
+            'http.request.method': method, 'server.address': parts.netloc,
+            'url.path': parts.path, 'kosuke.service': self.name,
+        }) as current:
+            response = self._send(method, url, path, current, **kwargs)
+            current.set('http.response.status_code', response.status_code)
+            return response
+
+    def _send(self, method: str, url: str, path: str, current, **kwargs) -> requests.Response:
+        attempt = 0
+        while True:
+            self._wait_for_rate_limit()
+            if self.rate_limiter is not None:
+                self.rate_limiter.wait()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= self.max_retries:
+                    raise
+                time.sleep(self._backoff(attempt))
+                attempt += 1
+                current.set('kosuke.retries', attempt)
+                continue
+            self._track_rate_limit(response)
+            if not self.should_retry(response) or attempt >= self.max_retries:
+                return response
+            delay = self._retry_delay(response, attempt)
+            logger.info(f"{self.name}: {response.status_code} on {method} {path}, retrying in {delay:.1f}s")
+            time.sleep(delay)
+            attempt += 1
+            current.set('kosuke.retries', attempt)
+
+    def json(self, method: str, path: str, ok_statuses=(200, 201), **kwargs):
+        """Send a request and return the decoded body, raising ServiceError otherwise"""
+        response = self.request(method, path, **kwargs)
+        if response.status_code not in ok_statuses:
+            raise ServiceError(self.name, response)
+        return response.json() if response.content else {}
+
+    def should_retry(self, response: requests.Response) -> bool:
+        """Whether a response is a rate limit or transient error worth retrying"""
+        return response.status_code in RETRY_STATUSES
+
+    @staticmethod
+    def _backoff(attempt: int) -> float:
+        return min(MAX_BACKOFF, 0.5 * 2 ** attempt) * random.uniform(0.8, 1.2)
+
+    def _retry_delay(self, response: requests.Response, attempt: int) -> float:
+        retry_after = response.headers.get('Retry-After')
+        if retry_after:
+            try:
+                return min(MAX_BACKOFF, max(0.0, float(retry_after)))
+            except ValueError:
+                try:
+                    return min(MAX_BACKOFF, max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time()))
+                except (TypeError, ValueError):
+                    pass
+        reset = response.headers.get('X-RateLimit-Reset')
+        if reset and reset.isdigit():
+            return min(MAX_BACKOFF, max(0.0, int(reset) - time.time()))
+        return self._backoff(attempt)
+
+    def _track_rate_limit(self, response: requests.Response):
+        remaining = response.headers.get('X-RateLimit-Remaining')
+        reset = response.headers.get('X-RateLimit-Reset')
+        if remaining == '0' and reset and reset.isdigit():
+            with self._rate_lock:
+                self._rate_reset_at = max(self._rate_reset_at, min(float(reset), time.time() + MAX_BACKOFF))
+
+    def _wait_for_rate_limit(self):
+        delay = self._rate_reset_at - time.time()
+        if delay > 0:
+            time.sleep(delay)
+
+    def result(self, check: str, response: requests.Response, ok_statuses=(200,)) -> VerificationResult:
+        """Map an HTTP response to a verification result"""
+        if response.status_code in ok_statuses:
+            return VerificationResult(self.name, check, 'valid')
+        if response.status_code in (401, 403):
+            return VerificationResult(self.name, check, 'invalid', f"rejected ({response.status_code})")
+        return VerificationResult(self.name, check, 'error', f"unexpected status {response.status_code}")
+
+class ClerkService(ServiceManager):
+    """Clerk Backend and Frontend API checks"""
+
+    def __init__(self, base_url: Optional[str] = None, frontend_url: Optional[str] = None, **kwargs):
+        super().__init__('clerk', base_url or api_url('clerk', CLERK_API_URL), **kwargs)
+        self.frontend_url = frontend_url
+
+    def verify_secret_key(self, secret_key: str) -> VerificationResult:
+        response = self.request('GET', '/v1/users', params={'limit': 1},
+                                headers={'Authorization': f"Bearer {secret_key}"})
+        return self.result('secret_key', response)
+
+    def verify_publishable_key(self, publishable_key: str) -> VerificationResult:
+        # pk_<env>_<base64("<frontend-api-host>$")> encodes the instance's Frontend API host
+        encoded = publishable_key.split('_', 2)[-1]
+        try:
+            host = base64.b64decode(encoded + '=' * (-len(encoded) % 4)).decode('utf-8')
+        except ValueError:
+            host = ''
+        if not host.endswith('$'):
+            return VerificationResult(self.name, 'publishable_key', 'invalid', "key does not encode a Frontend API host")
+        frontend_url = self.frontend_url or f"https://{host[:-1]}"
+        response = self.request('GET', f"{frontend_url.rstrip('/')}/v1/environment")
+        return self.result('publishable_key', response)
+
+class PolarService(ServiceManager):
+    """Polar API checks and the product/webhook calls used to provision billing"""
+
+    def __init__(self, environment: str = 'sandbox', base_url: Optional[str] = None, access_token: str = "",
+                 **kwargs):
+        super().__init__('polar', base_url or api_url('polar', POLAR_API_URLS.get(environment, POLAR_API_URLS['sandbox'])),
+                         **kwargs)
+        self.environment = environment
+        if access_token:
+            self.headers['Authorization'] = f"Bearer {access_token}"
+
+    def verify_access_token(self, access_token: str, organization_slug: str = "") -> VerificationResult:
+        response = self.request('GET', '/v1/organizations/', params={'limit': 10},
+                                headers={'Authorization': f"Bearer {access_token}"})
+        result = self.result('access_token', response)
+        if result.status == 'valid' and organization_slug:
+            slugs = [org.get('slug') for org in response.json().get('items', [])]
+            if organization_slug not in slugs:
+                return VerificationResult(self.name, 'access_token', 'invalid',
+                                          f"token has no access to organization '{organization_slug}'")
+        return result
+
+    def page(self, path: str, page: int, params: Optional[Dict] = None, limit: int = POLAR_PAGE_SIZE) -> Tuple[List[Dict], int]:
+        """One page of a list endpoint, with the number of the last page"""
+        body = self.json('GET', path, params={**(params or {}), 'limit': limit, 'page': page})
+        return body.get('items', []), (body.get('pagination') or {}).get('max_page', 1)
+
+    def _list(self, path: str, params: Optional[Dict] = None) -> List[Dict]:
+        """Every item of a paginated list endpoint"""
+        items, page = [], 1
+        while True:
+            page_items, max_page = self.page(path, page, params)
+            items.extend(page_items)
+            if page >= max_page:
+                return items
+            page += 1
+
+    def organizations(self) -> List[Dict]:
+        return self._list('/v1/organizations/')
+
+    def list_products(self) -> List[Dict]:
+        return self._list('/v1/products/', {'is_archived': 'false'})
+
+    def get_product(self, product_id: str) -> Optional[Dict]:
+        """A product by id, or None if it no longer exists"""
+        response = self.request('GET', f"/v1/products/{product_id}")
+        if response.status_code == 404:
+            return None
+        if response.status_code != 200:
+            raise ServiceError(self.name, response)
+        return response.json()
+
+    def create_product(self, product: Dict) -> Dict:
+        return self.json('POST', '/v1/products/', json=product)
+
+    def list_webhook_endpoints(self) -> List[Dict]:
+        return self._list('/v1/webhooks/endpoints')
+
+    def get_webhook_endpoint(self, endpoint_id: str) -> Optional[Dict]:
+        """A webhook endpoint by id, or None if it no longer exists"""
+        response = self.request('GET', f"/v1/webhooks/endpoints/{endpoint_id}")
+        if response.status_code == 404:
+            return None
+        if response.status_code != 200:
+            raise ServiceError(self.name, response)
+        return response.json()
+
+    def create_webhook_endpoint(self, endpoint: Dict) -> Dict:
+        return self.json('POST', '/v1/webhooks/endpoints', json=endpoint)
+
+    def update_webhook_endpoint(self, endpoint_id: str, changes: Dict) -> Dict:
+        return self.json('PATCH', f"/v1/webhooks/endpoints/{endpoint_id}", json=changes)
+
+    def reset_webhook_secret(self, endpoint_id: str) -> Dict:
+        """Replace an endpoint's signing secret; Polar signs with the new one right away"""
+        return self.json('PATCH', f"/v1/webhooks/endpoints/{endpoint_id}/secret")
+
+    def subscriptions_page(self, page: int) -> Tuple[List[Dict], int]:
+        """One page of the organization's subscriptions, active or not"""
+        return self.page('/v1/subscriptions/', page)
+
+class ResendService(ServiceManager):
+    """Resend API checks"""
+
+    def __init__(self, base_url: Optional[str] = None, **kwargs):
+        super().__init__('resend', base_url or api_url('resend', RESEND_API_URL), **kwargs)
+
+    def verify_api_key(self, api_key: str) -> VerificationResult:
+        response = self.request('GET', '/domains', headers={'Authorization': f"Bearer {api_key}"})
+        if response.status_code == 401 and 'restricted_api_key' in response.text:
+            # Sending-only keys cannot list domains but are otherwise valid
+            return VerificationResult(self.name, 'api_key', 'valid', "sending access only")
+        return self.result('api_key', response)
+
+class SentryService(ServiceManager):
+    """Sentry ingest checks"""
+
+    def __init__(self, base_url: Optional[str] = None, **kwargs):
+        super().__init__('sentry', base_url or "", **kwargs)
+
+    def verify_dsn(self, dsn: str) -> VerificationResult:
+        parts = urlsplit(dsn)
+        project_id = parts.path.strip('/').split('/')[-1]
+        if not parts.username or not project_id:
+            return VerificationResult(self.name, 'dsn', 'invalid', "DSN is missing the public key or project id")
+        ingest_url = self.base_url or f"{parts.scheme}://{parts.hostname}"
+        auth = f"Sentry sentry_version=7, sentry_key={parts.username}, sentry_client=kosuke-cli/1.0"
+        # An envelope with only a header is accepted by Sentry without recording an event
+        response = self.request('POST', f"{ingest_url}/api/{project_id}/envelope/",
+                                data=b'{}\n', headers={'X-Sentry-Auth': auth,
+                                                       'Content-Type': 'application/x-sentry-envelope'})
+        return self.result('dsn', response)
+
+class VercelService(ServiceManager):
+    """Vercel project environment variable API"""
+
+    max_retries = 4
+
+    def __init__(self, token: str, team_id: str = "", base_url: Optional[str] = None, **kwargs):
+        super().__init__('vercel', base_url or api_url('vercel', VERCEL_API_URL), **kwargs)
+        self.headers['Authorization'] = f"Bearer {token}"
+        self.team_id = team_id
+
+    def params(self, **extra) -> Dict[str, str]:
+        params = {k: v for k, v in extra.items() if v is not None}
+        if self.team_id:
+            params['teamId'] = self.team_id
+        return params
+
+    def list_env(self, project: str, decrypt: bool = True) -> List[Dict]:
+        """Environment variables of a project, with decrypted values unless asked not to"""
+        data = self.json('GET', f"/v10/projects/{project}/env",
+                         params=self.params(decrypt='true' if decrypt else None))
+        return data.get('envs', [])
+
+    def get_env(self, project: str, env_id: str) -> Dict:
+        """One variable with its decrypted value"""
+        return self.json('GET', f"/v1/projects/{project}/env/{env_id}", params=self.params())
+
+    def create_env(self, project: str, variables: List[Dict]) -> Dict:
+        """Create (or overwrite) many variables in one request"""
+        return self.json('POST', f"/v10/projects/{project}/env", params=self.params(upsert='true'), json=variables)
+
+    def update_env(self, project: str, env_id: str, changes: Dict) -> Dict:
+        """Update one existing variable"""
+        return self.json('PATCH', f"/v9/projects/{project}/env/{env_id}", params=self.params(), json=changes)
+
+    def latest_deployment(self, project: str, target: str = 'production', state: Optional[str] = 'READY',
+                          since: Optional[int] = None) -> Optional[Dict]:
+        """The project's most recent deployment for a target, if any: ready ones unless `state` is None"""
+        data = self.json('GET', "/v6/deployments", params=self.params(app=project, target=target, state=state,
+                                                                      since=since, limit=1))
+        deployments = data.get('deployments', [])
+        return deployments[0] if deployments else None
+
+    def redeploy(self, project: str, deployment_id: str, target: str = 'production') -> Dict:
+        """Rebuild an existing deployment, picking up the current environment variables"""
+        return self.json('POST', "/v13/deployments", params=self.params(),
+                         json={'name': project, 'deploymentId': deployment_id, 'target': target})
+
+    def get_deployment(self, deployment_id: str) -> Dict:
+        return self.json('GET', f"/v13/deployments/{deployment_id}", params=self.params())
+
+    def deployment_events(self, deployment_id: str, follow: bool = True, **kwargs) -> requests.Response:
+        """Build log events of a deployment; followed, the response streams until the build ends"""
+        return self.request('GET', f"/v3/deployments/{deployment_id}/events",
+                            params=self.params(builds=1, follow=1 if follow else None), stream=follow, **kwargs)
+
+class GitHubService(ServiceManager):
+    """GitHub repository API
+
+    GitHub's secondary rate limits punish concurrent requests with one token
+    and writes less than a second apart, so a client sends one request at a
+    time and spaces its writes.
+    """
+
+    max_retries = 4
+    # GitHub asks for at least a second between writes; the margin absorbs network jitter
+    write_interval = 1.1
+
+    def __init__(self, token: str, base_url: Optional[str] = None, **kwargs):
+        super().__init__('github', base_url or api_url('github', GITHUB_API_URL), **kwargs)
+        self.headers.update({
+            'Authorization': f"Bearer {token}",
+            'Accept': 'application/vnd.github+json',
+            'X-GitHub-Api-Version': '2022-11-28',
+        })
+        self._serial = threading.Lock()
+        self._writes = RateLimiter(1.0 / self.write_interval)
+
+    def request(self, method: str, path: str, **kwargs) -> requests.Response:
+        with self._serial:
+            if method not in ('GET', 'HEAD'):
+                self._writes.wait()
+            return super().request(method, path, **kwargs)
+
+    def should_retry(self, response: requests.Response) -> bool:
+        # Secondary rate limits answer 403 with Retry-After or an exhausted X-RateLimit-Remaining
+        return super().should_retry(response) or (response.status_code == 403 and (
+            'Retry-After' in response.headers or response.headers.get('X-RateLimit-Remaining') == '0'))
+
+    def conditional_get(self, path: str, etag: str = "", **kwargs) -> Tuple[Optional[object], str]:
+        """(body, ETag) of a GET, or (None, etag) when unchanged; a 304 does not count against the rate limit"""
+        headers = {'If-None-Match': etag} if etag else {}
+        response = self.request('GET', path, headers=headers, **kwargs)
+        if response.status_code == 304:
+            return None, etag
+        if response.status_code != 200:
+            raise ServiceError(self.name, response)
+        return response.json(), response.headers.get('ETag', "")
+
+    def get_user(self) -> Dict:
+        """The account the token belongs to"""
+        return self.json('GET', "/user")
+
+    def get_repo(self, owner: str, name: str) -> Optional[Dict]:
+        response = self.request('GET', f"/repos/{owner}/{name}")
+        if response.status_code == 404:
+            return None
+        if response.status_code != 200:
+            raise ServiceError(self.name, response)
+        return response.json()
+
+    def create_fork(self, owner: str, repo: str, name: str, organization: str = "") -> Dict:
+        """Ask for a fork named `name`; GitHub creates it asynchronously"""
+        body = {'name': name, 'default_branch_only': True}
+        if organization:
+            body['organization'] = organization
+        return self.json('POST', f"/repos/{owner}/{repo}/forks", ok_statuses=(200, 202), json=body)
+
+    def find_pull(self, owner: str, name: str, head: str, base: str) -> Optional[Dict]:
+        """The open pull request from `head` (owner:branch) into `base`, if any"""
+        pulls = self.json('GET', f"/repos/{owner}/{name}/pulls", params={'head': head, 'base': base, 'state': 'open'})
+        return pulls[0] if pulls else None
+
+    def create_pull(self, owner: str, name: str, head: str, base: str, title: str, body: str = "") -> Dict:
+        return self.json('POST', f"/repos/{owner}/{name}/pulls",
+                         json={'head': head, 'base': base, 'title': title, 'body': body})
+
+    def has_branch(self, owner: str, name: str, branch: str) -> bool:
+        """Whether a branch resolves, i.e. a new fork's git data has been copied"""
+        response = self.request('GET', f"/repos/{owner}/{name}/branches/{branch}")
+        if response.status_code in (404, 409):
+            return False
+        if response.status_code != 200:
+            raise ServiceError(self.name, response)
+        return True
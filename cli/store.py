@@ -0,0 +1,250 @@
+"""
+SQLite-backed progress store for many projects.
+
+Every SetupProgress is stored under its project name, with its completed
+services and service configs in indexed side tables, so fleet questions such
+as "which projects are stuck at step 5" or "which projects have no Sentry"
+are answered by an index lookup instead of parsing one JSON file per project.
+The database runs in WAL mode with a busy timeout and every write happens in
+an immediate transaction, so concurrent threads and processes can write safely.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Iterable, List, Optional
+
+from console import Colors
+from progress import SetupProgress
+from tracing import span, DISK
+
+logger = logging.getLogger(__name__)
+
+STORE_FILE = ".kosuke-projects.db"
+STORE_ENV_VAR = "KOSUKE_PROGRESS_DB"
+BUSY_TIMEOUT_MS = 10000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS projects (
+    project_name TEXT PRIMARY KEY,
+    current_step INTEGER NOT NULL,
+    api_keys TEXT NOT NULL,
+    completed_steps TEXT NOT NULL DEFAULT '[]',
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS completed_services (
+    project_name TEXT NOT NULL REFERENCES projects(project_name) ON DELETE CASCADE,
+    service TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (project_name, service)
+);
+CREATE TABLE IF NOT EXISTS service_configs (
+    project_name TEXT NOT NULL REFERENCES projects(project_name) ON DELETE CASCADE,
+    service TEXT NOT NULL,
+    config TEXT NOT NULL,
+    PRIMARY KEY (project_name, service)
+);
+CREATE INDEX IF NOT EXISTS idx_projects_step ON projects (current_step, project_name);
+CREATE INDEX IF NOT EXISTS idx_completed_service ON completed_services (service, project_name);
+"""
+
+def default_store_path() -> str:
+    return os.environ.get(STORE_ENV_VAR, STORE_FILE)
+
+@dataclass
+class ProjectSummary:
+    """Row returned by store queries"""
+    project_name: str
+    current_step: int
+    completed_services: List[str]
+    updated_at: float
+
+class ProgressStore:
+    """Progress records for many projects keyed by project name"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or default_store_path()
+        self._local = threading.local()
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(projects)")}
+        if 'completed_steps' not in columns:
+            # Stores created before per-step resume existed
+            conn.execute("ALTER TABLE projects ADD COLUMN completed_steps TEXT NOT NULL DEFAULT '[]'")
+
+    def _connect(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared between threads, so keep one per thread
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+            conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            conn.execute("PRAGMA foreign_keys = ON")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._connect()
+        # Take the write lock up front so concurrent writers queue on busy_timeout instead of failing
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def save(self, progress: SetupProgress):
+        """Insert or replace a project's progress"""
+        self.save_many([progress])
+
+    def save_many(self, records: Iterable[SetupProgress]):
+        """Insert or replace many projects in one transaction"""
+        now = time.time()
+        with span('store.save', DISK), self._transaction() as conn:
+            for progress in records:
+                if not progress.project_name:
+                    raise ValueError("Cannot store progress without a project name")
+                name = progress.project_name
+                conn.execute(
+                    "INSERT INTO projects (project_name, current_step, api_keys, completed_steps, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT(project_name) DO UPDATE SET current_step = excluded.current_step, "
+                    "api_keys = excluded.api_keys, completed_steps = excluded.completed_steps, "
+                    "updated_at = excluded.updated_at",
+                    # Copies: in batch mode, steps still running on the pool add keys while this saves
+                    (name, progress.current_step, json.dumps(dict(progress.api_keys)),
+                     json.dumps(list(progress.completed_steps)), now),
+                )
+                conn.execute("DELETE FROM completed_services WHERE project_name = ?", (name,))
+                conn.executemany(
+                    "INSERT OR IGNORE INTO completed_services (project_name, service, position) VALUES (?, ?, ?)",
+                    [(name, service, i) for i, service in enumerate(list(progress.completed_services))],
+                )
+                conn.execute("DELETE FROM service_configs WHERE project_name = ?", (name,))
+                conn.executemany(
+                    "INSERT INTO service_configs (project_name, service, config) VALUES (?, ?, ?)",
+                    [(name, service, json.dumps(config))
+                     for service, config in list(progress.service_configs.items())],
+                )
+
+    def load(self, project_name: str) -> Optional[SetupProgress]:
+        """Load one project's progress"""
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT current_step, api_keys, completed_steps FROM projects WHERE project_name = ?", (project_name,)
+        ).fetchone()
+        if row is None:
+            return None
+        services = [r[0] for r in conn.execute(
+            "SELECT service FROM completed_services WHERE project_name = ? ORDER BY position", (project_name,)
+        )]
+        configs = {r[0]: json.loads(r[1]) for r in conn.execute(
+            "SELECT service, config FROM service_configs WHERE project_name = ?", (project_name,)
+        )}
+        return SetupProgress(
+            current_step=row[0],
+            project_name=project_name,
+            completed_services=services,
+            api_keys=json.loads(row[1]),
+            service_configs=configs,
+            completed_steps=json.loads(row[2]),
+        )
+
+    def updated_at(self, project_name: str) -> Optional[float]:
+        """When a project was last saved, without loading it"""
+        row = self._connect().execute(
+            "SELECT updated_at FROM projects WHERE project_name = ?", (project_name,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def delete(self, project_name: str):
+        """Remove a project and its side records"""
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM projects WHERE project_name = ?", (project_name,))
+
+    def query(self, step: Optional[int] = None, with_service: Optional[str] = None,
+              without_service: Optional[str] = None, limit: Optional[int] = None) -> List[ProjectSummary]:
+        """Find projects by current step and completed services"""
+        sql = "SELECT p.project_name, p.current_step, p.updated_at FROM projects p"
+        clauses, params = [], []
+        if with_service:
+            sql += " JOIN completed_services w ON w.project_name = p.project_name AND w.service = ?"
+            params.append(with_service)
+        if step is not None:
+            clauses.append("p.current_step = ?")
+            params.append(step)
+        if without_service:
+            clauses.append("NOT EXISTS (SELECT 1 FROM completed_services c "
+                           "WHERE c.service = ? AND c.project_name = p.project_name)")
+            params.append(without_service)
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY p.project_name"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        conn = self._connect()
+        rows = conn.execute(sql, params).fetchall()
+        services = {}
+        names = [r[0] for r in rows]
+        # Fetch completed services in chunks to stay under SQLite's bound parameter limit
+        for i in range(0, len(names), 500):
+            chunk = names[i:i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            for name, service in conn.execute(
+                f"SELECT project_name, service FROM completed_services WHERE project_name IN ({placeholders}) "
+                "ORDER BY project_name, position", chunk
+            ):
+                services.setdefault(name, []).append(service)
+        return [ProjectSummary(r[0], r[1], services.get(r[0], []), r[2]) for r in rows]
+
+    def close(self):
+        """Close this thread's connection"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+class StoreBackend:
+    """Adapts ProgressStore to the ProgressManager backend interface for one project"""
+
+    def __init__(self, store: ProgressStore, project_name: str):
+        self.store = store
+        self.project_name = project_name
+
+    def save(self, progress: SetupProgress):
+        if not progress.project_name:
+            progress.project_name = self.project_name
+        self.store.save(progress)
+
+    def load(self) -> Optional[SetupProgress]:
+        return self.store.load(self.project_name)
+
+    def clear(self):
+        # Finished projects stay in the store so fleet queries can see them
+        pass
+
+    def flush(self):
+        pass
+
+def print_projects(projects: List[ProjectSummary], elapsed: Optional[float] = None):
+    """Print query results as a table"""
+    if not projects:
+        print(f"{Colors.WARNING}No matching projects{Colors.ENDC}")
+    width = max([len(p.project_name) for p in projects] + [7])
+    for p in projects:
+        updated = time.strftime('%Y-%m-%d %H:%M', time.localtime(p.updated_at))
+        print(f"   {p.project_name:<{width}}  step {p.current_step:<2}  {updated}  {', '.join(p.completed_services)}")
+    summary = f"{len(projects)} projects"
+    if elapsed is not None:
+        summary += f" in {elapsed*1000:.1f}ms"
+    print(f"\n{Colors.BOLD}{summary}{Colors.ENDC}")
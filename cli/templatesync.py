@@ -0,0 +1,309 @@
+"""
+Bulk check of forked projects against the upstream template.
+
+Every project starts as a fork of kosuke-template, and from then on the
+project and the template change separately. This command checks all of them
+at once. A single bare repository, .kosuke-template-cache.git, holds the
+objects of the template and of every fork. History they share is stored and
+transferred once. Upstream is fetched first, then the forks in parallel,
+each bringing only its own commits, and only then are the forks analysed. Fork heads are kept as
+refs/forks/<project>.
+
+For each fork the check counts how far it is behind and ahead of the
+upstream branch. It then checks whether upstream merges cleanly
+(`git merge-tree --write-tree`, no checkout). When both sides have their own
+commits, it also checks whether the fork's commits rebase cleanly onto
+upstream, in a throwaway worktree of the cache. Results are kept in
+.kosuke-template-sync.json with the upstream and fork commits they were
+worked out for. A fork is only analysed again when its head or upstream
+has moved.
+
+With a GitHub token, a pull request from the template's branch is opened in
+every fork that is behind and merges cleanly, unless one is already open.
+Upstream and fork URLs can point at local bare repositories, so everything
+runs offline.
+"""
+
+import os
+import re
+import json
+import shutil
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field, fields
+from typing import Dict, List, Optional, Tuple
+
+from console import Colors
+from tracing import DISK, NETWORK, propagate, span
+
+SYNC_CACHE_DIR = ".kosuke-template-cache.git"
+SYNC_STATE_FILE = ".kosuke-template-sync.json"
+SYNC_WORKERS = 8
+DEFAULT_BRANCH = "main"
+# merge-tree --write-tree, which checks a merge without a worktree
+MIN_GIT_VERSION = (2, 38)
+# Rebases commit, and need an identity even though nothing is kept
+GIT_IDENTITY = ('-c', 'user.name=kosuke-sync', '-c', 'user.email=kosuke-sync@localhost')
+_GITHUB_REPO = re.compile(r'^https://github\.com/([^/]+)/([^/]+?)/?$')
+
+class SyncError(Exception):
+    """Raised when a git command fails"""
+
+@dataclass
+class ForkSync:
+    """How one fork stands against upstream"""
+    project: str
+    repo_url: str
+    status: str = ""  # up-to-date, fast-forward, mergeable, conflicts, unrelated or error
+    upstream: str = ""
+    head: str = ""
+    behind: int = 0
+    ahead: int = 0
+    conflicts: List[str] = field(default_factory=list)  # files a merge conflicts in
+    rebase: str = ""  # clean or conflicts, when both sides have their own commits
+    rebase_stops_at: str = ""  # the fork commit a rebase stops at
+    pull_request: str = ""
+    error: str = ""
+    reused: bool = False
+
+    @property
+    def needs_sync(self) -> bool:
+        return self.status in ('fast-forward', 'mergeable', 'conflicts')
+
+def git_version() -> Tuple[int, ...]:
+    output = subprocess.run(['git', '--version'], capture_output=True, text=True).stdout
+    match = re.search(r'(\d+)\.(\d+)', output)
+    return tuple(int(part) for part in match.groups()) if match else (0, 0)
+
+def _first_line(result: subprocess.CompletedProcess) -> str:
+    output = (result.stderr.strip() or result.stdout.strip()).splitlines()
+    return output[0] if output else f"exit status {result.returncode}"
+
+class TemplateCache:
+    """The shared bare repository holding upstream and every fork"""
+
+    def __init__(self, upstream_url: str, path: str = SYNC_CACHE_DIR, branch: str = DEFAULT_BRANCH):
+        self.upstream_url = upstream_url
+        self.path = path
+        self.branch = branch
+
+    def git(self, *args: str, check: bool = True, cwd: Optional[str] = None,
+            config: Tuple[str, ...] = ()) -> subprocess.CompletedProcess:
+        """Run git on the cache, or on one of its worktrees"""
+        location = ['-C', cwd] if cwd else ['--git-dir', self.path]
+        # Automatic gc would repack under parallel fetches
+        command = ['git', *location, '-c', 'gc.auto=0', *config, *args]
+        with span(f"git {args[0]}", NETWORK if args[0] == 'fetch' else DISK):
+            result = subprocess.run(command, capture_output=True, text=True)
+        if check and result.returncode != 0:
+            raise SyncError(f"git {args[0]} failed: {_first_line(result)}")
+        return result
+
+    def open(self):
+        """Create the cache on first use"""
+        if git_version() < MIN_GIT_VERSION:
+            raise SyncError(f"git {'.'.join(map(str, MIN_GIT_VERSION))} or newer is required")
+        if not os.path.isdir(self.path):
+            subprocess.run(['git', 'init', '--quiet', '--bare', self.path], check=True, capture_output=True)
+
+    def fetch(self, url: str, ref: str) -> str:
+        """Fetch the branch of a repository into `ref`, returning its commit"""
+        self.git('fetch', '--quiet', '--no-tags', '--no-write-fetch-head', url,
+                 f"+refs/heads/{self.branch}:{ref}")
+        return self.git('rev-parse', ref).stdout.strip()
+
+    def fetch_upstream(self) -> str:
+        return self.fetch(self.upstream_url, f"refs/upstream/{self.branch}")
+
+    def fetch_fork(self, project: str, url: str) -> str:
+        return self.fetch(url, f"refs/forks/{project}")
+
+    def related(self, upstream: str, head: str) -> bool:
+        return self.git('merge-base', upstream, head, check=False).returncode == 0
+
+    def counts(self, upstream: str, head: str) -> Tuple[int, int]:
+        """(behind, ahead) of the fork head against upstream"""
+        behind, ahead = self.git('rev-list', '--left-right', '--count', f"{upstream}...{head}").stdout.split()
+        return int(behind), int(ahead)
+
+    def merge_conflicts(self, upstream: str, head: str) -> List[str]:
+        """Files that conflict when upstream is merged into the fork, without a checkout"""
+        result = self.git('merge-tree', '--write-tree', '--name-only', '--no-messages', head, upstream, check=False)
+        if result.returncode == 0:
+            return []
+        if result.returncode != 1:
+            raise SyncError(f"git merge-tree failed: {_first_line(result)}")
+        # The first line is the tree written; conflicted files follow
+        return sorted(set(result.stdout.split('\n')[1:]) - {''})
+
+    def rebase_stop(self, upstream: str, head: str) -> str:
+        """The fork commit a rebase onto upstream stops at, or '' when it replays cleanly"""
+        worktree = tempfile.mkdtemp(prefix='kosuke-sync-')
+        try:
+            self.git('worktree', 'add', '--quiet', '--detach', worktree, head)
+            result = self.git('rebase', '--quiet', upstream, check=False, cwd=worktree, config=GIT_IDENTITY)
+            if result.returncode == 0:
+                return ""
+            stopped = self.git('rev-parse', '--verify', '--quiet', 'REBASE_HEAD', check=False, cwd=worktree)
+            self.git('rebase', '--abort', check=False, cwd=worktree)
+            return stopped.stdout.strip() or "unknown"
+        finally:
+            self.git('worktree', 'remove', '--force', worktree, check=False)
+            shutil.rmtree(worktree, ignore_errors=True)
+
+class SyncState:
+    """Results of earlier checks per project, with the commits they were computed for"""
+
+    def __init__(self, path: str = SYNC_STATE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path, 'r') as f:
+                self.projects: Dict[str, Dict] = json.load(f).get('projects', {})
+        except (OSError, ValueError):
+            self.projects = {}
+
+    def get(self, project: str) -> Optional[ForkSync]:
+        with self._lock:
+            entry = self.projects.get(project)
+        if not entry:
+            return None
+        known = {f.name for f in fields(ForkSync)}
+        return ForkSync(**{key: value for key, value in entry.items() if key in known})
+
+    def put(self, result: ForkSync):
+        entry = asdict(result)
+        entry.pop('reused')
+        with self._lock:
+            self.projects[result.project] = entry
+
+    def save(self):
+        with self._lock:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump({'projects': self.projects}, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+
+def fork_git_url(repo_url: str, template: str = "{url}.git") -> str:
+    """Git URL of a fork; the template's {url}, {owner} and {repo} come from its GitHub URL"""
+    match = _GITHUB_REPO.match(repo_url)
+    owner, repo = match.groups() if match else ("", "")
+    return template.format(url=repo_url.rstrip('/'), owner=owner, repo=repo)
+
+class TemplateSync:
+    """Checks every fork against upstream in parallel, reusing results whose commits have not moved"""
+
+    def __init__(self, cache: TemplateCache, state: SyncState, workers: int = SYNC_WORKERS,
+                 remote_template: str = "{url}.git"):
+        self.cache = cache
+        self.state = state
+        self.workers = max(1, workers)
+        self.remote_template = remote_template
+
+    def run(self, forks: List[Tuple[str, str]]) -> List[ForkSync]:
+        """Check (project, GitHub repository URL) pairs, returning results in the same order"""
+        self.cache.open()
+        upstream = self.cache.fetch_upstream()
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(forks) or 1)) as pool:
+            # Every fetch finishes before the first rebase worktree is added: a fetch walks all
+            # refs, and a worktree being added has a HEAD that does not name a commit yet
+            fetched = list(pool.map(propagate(lambda fork: self.fetch(*fork, upstream)), forks))
+            results = list(pool.map(propagate(self.check), fetched))
+        self.state.save()
+        return results
+
+    def fetch(self, project: str, repo_url: str, upstream: str) -> ForkSync:
+        result = ForkSync(project, repo_url, upstream=upstream)
+        try:
+            with span('sync.fetch', **{'kosuke.project': project}):
+                result.head = self.cache.fetch_fork(project, fork_git_url(repo_url, self.remote_template))
+        except SyncError as e:
+            result.status, result.error = 'error', str(e)
+        return result
+
+    def check(self, result: ForkSync) -> ForkSync:
+        if result.error:
+            self.state.put(result)
+            return result
+        previous = self.state.get(result.project)
+        if previous and not previous.error and (previous.upstream, previous.head) == (result.upstream, result.head):
+            previous.reused = True
+            return previous
+        try:
+            with span('sync.fork', **{'kosuke.project': result.project}):
+                self.analyse(result)
+        except SyncError as e:
+            result.status, result.error = 'error', str(e)
+        self.state.put(result)
+        return result
+
+    def analyse(self, result: ForkSync):
+        upstream, head = result.upstream, result.head
+        if not self.cache.related(upstream, head):
+            result.status = 'unrelated'
+            return
+        result.behind, result.ahead = self.cache.counts(upstream, head)
+        if not result.behind:
+            result.status = 'up-to-date'
+            return
+        if not result.ahead:
+            result.status = 'fast-forward'
+            return
+        result.conflicts = self.cache.merge_conflicts(upstream, head)
+        result.status = 'conflicts' if result.conflicts else 'mergeable'
+        result.rebase_stops_at = self.cache.rebase_stop(upstream, head)
+        result.rebase = 'conflicts' if result.rebase_stops_at else 'clean'
+
+def open_pull_requests(results: List[ForkSync], github, upstream_owner: str, branch: str = DEFAULT_BRANCH,
+                       state: Optional[SyncState] = None) -> List[ForkSync]:
+    """Open a pull request from upstream in each fork that is behind and merges cleanly"""
+    opened = []
+    for result in results:
+        if result.status not in ('fast-forward', 'mergeable') or result.pull_request:
+            continue
+        match = _GITHUB_REPO.match(result.repo_url)
+        if not match:
+            continue
+        owner, repo = match.groups()
+        head = f"{upstream_owner}:{branch}"
+        existing = github.find_pull(owner, repo, head, branch)
+        if existing:
+            result.pull_request = existing.get('html_url', "")
+        else:
+            commits = f"{result.behind} upstream commit{'s' if result.behind != 1 else ''}"
+            pull = github.create_pull(owner, repo, head, branch, f"Sync with the upstream template ({result.upstream[:7]})",
+                                      f"Brings in {commits}. Checked to merge without conflicts.")
+            result.pull_request = pull.get('html_url', "")
+            opened.append(result)
+        if state:
+            state.put(result)
+    if state:
+        state.save()
+    return opened
+
+def print_sync_results(results: List[ForkSync]):
+    """One line per fork, then a summary"""
+    colors = {'up-to-date': Colors.OKGREEN, 'fast-forward': Colors.OKGREEN, 'mergeable': Colors.OKCYAN,
+              'conflicts': Colors.WARNING, 'unrelated': Colors.FAIL, 'error': Colors.FAIL}
+    print(f"\n{Colors.BOLD}🔀 Template sync ({results[0].upstream[:7] if results else '-'} upstream){Colors.ENDC}")
+    width = max([len(result.project) for result in results] + [7])
+    for result in results:
+        color = colors.get(result.status, "")
+        detail = result.error
+        if result.status in ('fast-forward', 'mergeable', 'conflicts'):
+            detail = f"{result.behind} behind, {result.ahead} ahead"
+            if result.conflicts:
+                detail += f"; merge conflicts in {', '.join(result.conflicts)}"
+            if result.rebase:
+                stop = f" at {result.rebase_stops_at[:7]}" if result.rebase_stops_at else ""
+                detail += f"; rebase {'clean' if result.rebase == 'clean' else 'stops' + stop}"
+        if result.pull_request:
+            detail += f"; {result.pull_request}"
+        if result.reused:
+            detail += " (cached)"
+        print(f"   {result.project:<{width}}  {color}{result.status:<12}{Colors.ENDC} {detail.lstrip('; ')}".rstrip())
+    behind = sum(result.needs_sync for result in results)
+    print(f"\n{Colors.BOLD}{behind}/{len(results)} forks behind upstream, "
+          f"{sum(result.reused for result in results)} results reused{Colors.ENDC}")
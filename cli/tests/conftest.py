@@ -0,0 +1,334 @@
+"""
+Shared fixtures for the CLI tests.
+
+The CLI modules import each other by name, as main.py runs them, so the CLI
+directory goes on sys.path. Tests never touch the real progress files: each
+one runs in its own temporary working directory. `stub` is a local HTTP
+server for the provider clients, answering with the responses a test queues.
+`traced` turns tracing on, so thread hand-offs run the way `--trace` runs them.
+MockGitHubServer stands in for the GitHub endpoints the fork manager uses, and
+MockVercelServer for a Vercel deployment and its streamed build log.
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+import pytest
+
+CLI_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if CLI_DIR not in sys.path:
+    sys.path.insert(0, CLI_DIR)
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    """A fresh working directory, with no saved setup and no provider URL overrides"""
+    monkeypatch.chdir(tmp_path)
+    for name in list(os.environ):
+        if name.startswith('KOSUKE_') or name in ('POSTGRES_URL', 'GITHUB_TOKEN'):
+            monkeypatch.delenv(name)
+    return tmp_path
+
+@pytest.fixture
+def traced(tmp_path, monkeypatch):
+    """Tracing on for one test, returning the spans written so far"""
+    import tracing
+    exporter = tracing.JsonLinesExporter(str(tmp_path / 'trace.jsonl'))
+    monkeypatch.setattr(tracing, '_exporter', exporter)
+    yield lambda: tracing.load_spans([exporter.path])
+    exporter.close()
+
+class StubServer:
+    """Answers each method and path with queued (status, body, headers) responses, recording every request"""
+
+    def __init__(self):
+        self.responses = {}
+        self.requests = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def handle_any(self):
+                path = self.path.split('?', 1)[0]
+                length = int(self.headers.get('Content-Length') or 0)
+                body = json.loads(self.rfile.read(length)) if length else None
+                stub.requests.append((self.command, self.path, body, dict(self.headers)))
+                status, payload, headers = stub.answer(self.command, path, body)
+                data = json.dumps(payload).encode() if payload is not None else b''
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST = do_PATCH = do_PUT = do_DELETE = handle_any
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def answer(self, method: str, path: str, body):
+        """(status, body, headers) for a request; subclasses with state override this"""
+        queued = self.responses.get((method, path)) or [(404, {'detail': 'Not found'}, {})]
+        return queued.pop(0) if len(queued) > 1 else queued[0]
+
+    def add(self, method: str, path: str, status: int = 200, body=None, headers=None):
+        """Queue a response; the last one queued for a path keeps answering"""
+        self.responses.setdefault((method, path), []).append((status, body, headers or {}))
+
+    def calls(self, method: str, path: str) -> int:
+        return sum(1 for m, p, _, _ in self.requests if m == method and p.split('?', 1)[0] == path)
+
+def serve(server: StubServer):
+    """Run a stub server for the duration of a test"""
+    thread = threading.Thread(target=server.server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield server
+    server.server.shutdown()
+    server.server.server_close()
+
+@pytest.fixture
+def stub():
+    """A local HTTP server answering with the responses the test queues"""
+    yield from serve(StubServer())
+
+class MockGitHubServer:
+    """Serves the user, repository, fork and branch endpoints ForkManager uses, from a background thread"""
+
+    # A new fork is listed after `list_delay` seconds and its branch resolves after `copy_delay`
+    def __init__(self, template: str = 'acme/template', login: str = 'me', list_delay: float = 0.0,
+                 copy_delay: float = 0.0, port: int = 0):
+        self.template = template
+        self.login = login
+        self.list_delay = list_delay
+        self.copy_delay = copy_delay
+        self.forks: Dict[str, float] = {}  # full name -> created at
+        self.requests: List[Tuple[str, str]] = []
+        self.not_modified = 0
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Keep-alive requests would otherwise wait ~40ms on delayed ACKs
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                path = self.path.split('?', 1)[0].rstrip('/')
+                with server._lock:
+                    server.requests.append(('GET', path))
+                    code, body, headers = server.get(path, self.headers.get('If-None-Match', ""))
+                self.send(code, body, headers)
+
+            def do_POST(self):
+                path = self.path.split('?', 1)[0].rstrip('/')
+                request = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)) or b'{}')
+                with server._lock:
+                    server.requests.append(('POST', path))
+                    code, body = server.post(path, request)
+                self.send(code, body)
+
+            def send(self, code: int, body, headers: Optional[Dict[str, str]] = None):
+                data = b'' if code == 304 else json.dumps(body).encode('utf-8')
+                self.send_response(code)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def count(self, method: str, suffix: str) -> int:
+        return sum(1 for m, path in self.requests if m == method and path.endswith(suffix))
+
+    def repo(self, full_name: str) -> Dict:
+        owner, name = full_name.split('/')
+        repo = {'name': name, 'full_name': full_name, 'owner': {'login': owner}, 'default_branch': 'main',
+                'html_url': f"https://github.com/{full_name}"}
+        if full_name in self.forks:
+            repo['parent'] = {'full_name': self.template}
+        return repo
+
+    def get(self, path: str, etag: str) -> Tuple[int, object, Dict[str, str]]:
+        parts = path.strip('/').split('/')
+        if parts == ['user']:
+            return 200, {'login': self.login}, {}
+        if parts[0] != 'repos' or len(parts) < 3:
+            return 404, {'message': 'Not Found'}, {}
+        full_name = f"{parts[1]}/{parts[2]}"
+        now = time.time()
+        if parts[3:] == ['forks'] and full_name == self.template:
+            listed = sorted(name for name, created in self.forks.items() if now - created >= self.list_delay)
+            current = '"' + hashlib.sha1(','.join(listed).encode()).hexdigest() + '"'
+            if etag == current:
+                self.not_modified += 1
+                return 304, None, {'ETag': current}
+            return 200, [self.repo(name) for name in listed], {'ETag': current}
+        if full_name != self.template and full_name not in self.forks:
+            return 404, {'message': 'Not Found'}, {}
+        if not parts[3:]:
+            return 200, self.repo(full_name), {}
+        if parts[3:4] == ['branches']:
+            copied = full_name == self.template or now - self.forks[full_name] >= self.copy_delay
+            return (200, {'name': parts[4]}, {}) if copied else (404, {'message': 'Branch not found'}, {})
+        return 404, {'message': 'Not Found'}, {}
+
+    def post(self, path: str, request: Dict) -> Tuple[int, object]:
+        parts = path.strip('/').split('/')
+        if len(parts) != 4 or parts[3] != 'forks' or f"{parts[1]}/{parts[2]}" != self.template:
+            return 404, {'message': 'Not Found'}
+        full_name = f"{request.get('organization') or self.login}/{request.get('name') or parts[2]}"
+        self.forks.setdefault(full_name, time.time())
+        return 202, self.repo(full_name)
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, args=(0.05,), name='mock-github', daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+        return False
+
+# Build log of MockVercelServer, one line per phase and a few in between
+MOCK_BUILD_LOG = (
+    'Cloning github.com/acme/app (Branch: main, Commit: 1a2b3c4)',
+    'Cloning completed: 412ms',
+    'Installing dependencies...',
+    'added 812 packages in 9s',
+    'Running "npm run build"',
+    'Compiled successfully',
+    'Deploying outputs...',
+    'Deployment completed',
+)
+
+class MockVercelServer:
+    """Serves one deployment, its state and its streamed build log, from a background thread"""
+
+    # QUEUED for `queued` seconds, BUILDING while the log is written one line every `line_interval`
+    # seconds, then `final_state`. With `drop_after`, the followed stream breaks off after that many lines.
+    def __init__(self, deployment_id: str = 'dpl_mock', final_state: str = 'READY', queued: float = 0.0,
+                 line_interval: float = 0.0, drop_after: Optional[int] = None,
+                 log: Tuple[str, ...] = MOCK_BUILD_LOG, port: int = 0):
+        self.deployment_id = deployment_id
+        self.final_state = final_state
+        self.queued = queued
+        self.line_interval = line_interval
+        self.drop_after = drop_after
+        self.log = log
+        self.requests: List[str] = []
+        self.created = time.time()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Keep-alive polls would otherwise wait ~40ms on delayed ACKs
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                path = self.path.split('?', 1)[0].rstrip('/')
+                server.requests.append(path)
+                if path == f"/v13/deployments/{server.deployment_id}":
+                    return self.send_json(200, server.deployment())
+                if path == f"/v3/deployments/{server.deployment_id}/events":
+                    if 'follow=1' in self.path:
+                        return self.stream()
+                    return self.send_json(200, server.events(time.time()))
+                self.send_json(404, {'error': {'code': 'not_found'}})
+
+            def send_json(self, code: int, body):
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def stream(self):
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/stream+json')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                for index, event in enumerate(server.events(float('inf'))):
+                    if server.drop_after is not None and index >= server.drop_after:
+                        self.close_connection = True
+                        return
+                    delay = event['created'] / 1000 - time.time()
+                    if delay > 0:
+                        time.sleep(delay)
+                    line = json.dumps(event).encode('utf-8') + b'\n'
+                    self.wfile.write(f"{len(line):x}\r\n".encode() + line + b'\r\n')
+                    self.wfile.flush()
+                # Like Vercel's, the stream ends with the build
+                time.sleep(max(0.0, server.ready_at - time.time()))
+                self.wfile.write(b'0\r\n\r\n')
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', port), Handler)
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    @property
+    def building_at(self) -> float:
+        return self.created + self.queued
+
+    @property
+    def ready_at(self) -> float:
+        return self.building_at + len(self.log) * self.line_interval
+
+    def events(self, until: float) -> List[Dict]:
+        """Log lines written by `until`"""
+        return [{'type': 'stdout', 'created': int((self.building_at + index * self.line_interval) * 1000),
+                 'payload': {'text': text}}
+                for index, text in enumerate(self.log) if self.building_at + index * self.line_interval <= until]
+
+    def deployment(self) -> Dict:
+        now = time.time()
+        state = 'QUEUED' if now < self.building_at else 'BUILDING' if now < self.ready_at else self.final_state
+        deployment = {'id': self.deployment_id, 'uid': self.deployment_id, 'url': 'app-mock.vercel.app',
+                      'readyState': state, 'createdAt': int(self.created * 1000)}
+        if state != 'QUEUED':
+            deployment['buildingAt'] = int(self.building_at * 1000)
+        if state == self.final_state:
+            deployment['ready'] = int(self.ready_at * 1000)
+        if state == 'ERROR':
+            deployment['errorMessage'] = 'Command "npm run build" exited with 1'
+        return deployment
+
+    def __enter__(self):
+        self.created = time.time()
+        self._thread = threading.Thread(target=self._server.serve_forever, args=(0.05,), name='mock-vercel', daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+        return False
@@ -0,0 +1,103 @@
+"""Headless batch provisioning from a manifest"""
+
+import os
+import sys
+import json
+
+import pytest
+
+from batch import REPORT_FILE, BatchProvisioner, ManifestError, load_manifest, project_spec
+from progress import PROGRESS_FILE
+from store import ProgressStore
+
+def credentials(name):
+    """Manifest entry with every credential a project needs in a valid format"""
+    return {
+        'project_name': name,
+        'repo_url': f"https://github.com/acme/{name}",
+        'polar': {'organization_slug': f"{name}-org", 'pro_product_id': 'pro', 'business_product_id': 'business',
+                  'access_token': 'polar_oat_1', 'webhook_secret': 'polar_whsec'},
+        'clerk': {'publishable_key': 'pk_test_1', 'secret_key': 'sk_test_1', 'webhook_secret': 'whsec_1'},
+        'resend': {'api_key': 're_1'},
+        'sentry': {'dsn': 'https://key@o1.ingest.sentry.io/1'},
+    }
+
+def write_manifest(workdir, data, name='manifest.json'):
+    path = workdir / name
+    path.write_text(json.dumps(data))
+    return str(path)
+
+def test_defaults_are_merged_one_level_deep(workdir):
+    path = write_manifest(workdir, {
+        'defaults': {'polar': {'environment': 'production'}, 'resend': {'from_email': 'team@acme.com'}},
+        'projects': [{'project_name': 'Acme Portal', 'polar': {'access_token': 'polar_oat_1'}},
+                     {'project_name': 'beta', 'resend': {'from_email': 'beta@acme.com'}}],
+    })
+    acme, beta = load_manifest(path)
+    assert acme['project_name'] == 'acme-portal'
+    assert acme['polar'] == {'environment': 'production', 'access_token': 'polar_oat_1'}
+    assert acme['resend'] == {'from_email': 'team@acme.com'}
+    assert beta['resend'] == {'from_email': 'beta@acme.com'}
+
+def test_yaml_manifest(workdir):
+    pytest.importorskip('yaml')
+    path = workdir / 'manifest.yaml'
+    path.write_text("projects:\n  - project_name: acme\n    sentry: {dsn: 'https://k@o1.ingest.sentry.io/1'}\n")
+    assert load_manifest(str(path)) == [{'project_name': 'acme', 'sentry': {'dsn': 'https://k@o1.ingest.sentry.io/1'}}]
+
+def test_yaml_manifest_without_pyyaml(workdir, monkeypatch):
+    monkeypatch.setitem(sys.modules, 'yaml', None)
+    path = workdir / 'manifest.yml'
+    path.write_text("projects: []\n")
+    with pytest.raises(ManifestError, match="require PyYAML"):
+        load_manifest(str(path))
+
+@pytest.mark.parametrize('data, message', [
+    ({'projects': {}}, "'projects' list"),
+    ([], "'projects' list"),
+    ({'projects': [{'project_name': 'acme'}, {'project_name': 'ACME'}]}, "Duplicate project name: acme"),
+    ({'projects': ['acme']}, "must be an object"),
+    ({'projects': [{'project_name': '!!!'}]}, "Invalid project name"),
+])
+def test_invalid_manifests(workdir, data, message):
+    with pytest.raises(ManifestError, match=message):
+        load_manifest(write_manifest(workdir, data))
+
+def test_project_spec_keeps_raw_values_over_defaults():
+    spec = project_spec({'project_name': 'my_app', 'vercel': 'none'}, {'vercel': {'token': 't'}, 'region': 'eu'})
+    assert spec == {'project_name': 'my-app', 'vercel': 'none', 'region': 'eu'}
+    with pytest.raises(ManifestError, match="Invalid project name"):
+        project_spec({})
+
+def test_one_failing_project_does_not_stop_the_others(workdir, stub, monkeypatch):
+    monkeypatch.setenv('KOSUKE_VERCEL_API_URL', stub.url)
+    for name in ('alpha', 'bravo'):
+        stub.add('GET', f'/v10/projects/{name}/env', body={'envs': []})
+        stub.add('POST', f'/v10/projects/{name}/env', body={'created': []})
+    stub.add('GET', '/v10/projects/charlie/env', 403, {'error': {'message': 'Forbidden'}})
+    projects = [credentials(name) for name in ('alpha', 'bravo', 'charlie', 'delta')]
+    for project in projects[:3]:
+        project['vercel'] = {'token': 'vercel_token'}
+    projects[3]['clerk']['secret_key'] = 'not-a-key'
+    output = workdir / 'out'
+    store = ProgressStore(str(workdir / 'projects.db'))
+
+    results = BatchProvisioner(write_manifest(workdir, {'projects': projects}), str(output), workers=4,
+                               store=store).run()
+
+    by_name = {result.project_name: result for result in results}
+    assert [by_name[name].status for name in ('alpha', 'bravo', 'charlie', 'delta')] == ['ok', 'ok', 'failed', 'failed']
+    assert by_name['delta'].error == "Invalid format for clerk.secret_key"
+    assert 'clerk' not in by_name['delta'].completed_services
+    assert 'github' in by_name['charlie'].completed_services
+    for name in ('alpha', 'bravo'):
+        assert stub.calls('POST', f'/v10/projects/{name}/env') == 1
+        for env_file in ('.env', '.env.preview', '.env.prod', PROGRESS_FILE):
+            assert os.path.exists(output / name / env_file)
+    assert not os.path.exists(output / 'delta' / '.env')
+
+    report = json.loads((output / REPORT_FILE).read_text())
+    assert (report['total'], report['succeeded'], report['failed']) == (4, 2, 2)
+    assert [p.project_name for p in store.query(with_service='vercel-env')] == ['alpha', 'bravo']
+    assert 'vercel-env' not in store.load('charlie').completed_steps
+    store.close()
@@ -0,0 +1,40 @@
+"""The Clerk and Polar stubs the billing load test runs the app against, and scenario files"""
+
+import sys
+
+import pytest
+import requests
+
+from billingload import LoadTestError, StubServices, load_scenarios
+
+def test_stubs_answer_and_count_each_call():
+    with StubServices(port=0) as stub, requests.Session() as session:
+        user = session.get(f"{stub.url}/v1/users/user_seed_3").json()
+        assert user['id'] == 'user_seed_3' and user['email_addresses']
+        updated = session.patch(f"{stub.url}/v1/subscriptions/sub_seed_3", json={'cancel_at_period_end': True}).json()
+        assert updated['cancel_at_period_end'] is True
+        canceled = session.delete(f"{stub.url}/v1/subscriptions/sub_seed_3").json()
+        assert canceled['status'] == 'canceled' and canceled['ended_at']
+        first = session.post(f"{stub.url}/v1/checkouts/", json={'products': ['prod_pro']})
+        second = session.post(f"{stub.url}/v1/checkouts/", json={'product_id': 'prod_business'})
+        assert first.status_code == 201
+        assert (first.json()['id'], second.json()['id']) == ('chk_loadtest_1', 'chk_loadtest_2')
+        assert second.json()['product_id'] == 'prod_business'
+        assert session.get(f"{stub.url}/v1/customers/").status_code == 404
+    assert stub.calls == {
+        'clerk users.get': 1, 'polar subscriptions.patch': 1, 'polar subscriptions.delete': 1,
+        'polar checkouts.create': 2, 'unhandled GET /v1/customers': 1,
+    }
+
+def test_yaml_scenarios_without_pyyaml(workdir, monkeypatch):
+    monkeypatch.setitem(sys.modules, 'yaml', None)
+    (workdir / 'journeys.yaml').write_text("journeys: {}\n")
+    with pytest.raises(LoadTestError, match=r"require PyYAML \(pip install pyyaml\)"):
+        load_scenarios(str(workdir / 'journeys.yaml'))
+
+def test_yaml_scenarios(workdir):
+    pytest.importorskip('yaml')
+    (workdir / 'journeys.yaml').write_text(
+        "journeys:\n  browse:\n    - {method: GET, path: /, think: 1.0}\nmix: {browse: 2}\n")
+    journeys, mix = load_scenarios(str(workdir / 'journeys.yaml'))
+    assert [step.path for step in journeys['browse']] == ['/'] and mix == {'browse': 2}
@@ -0,0 +1,126 @@
+"""The daemon's job API: who may call it, overwrite protection and per-project ordering"""
+
+import os
+import json
+import stat
+import time
+import threading
+import http.client
+
+import pytest
+
+from daemon import ProvisioningDaemon, create_server, load_token
+from progress import SetupProgress
+from store import ProgressStore
+
+TOKEN = "test-token"
+
+@pytest.fixture
+def store(workdir):
+    store = ProgressStore(str(workdir / 'projects.db'))
+    progress = SetupProgress(project_name='acme')
+    progress.api_keys['cron_secret'] = 'kept'
+    store.save(progress)
+    return store
+
+@pytest.fixture
+def daemon(store, workdir):
+    daemon = ProvisioningDaemon(store, str(workdir / 'out'), workers=2, queue_size=8, token=TOKEN)
+    server = create_server(daemon, port=0)
+    daemon.start()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    daemon.port = server.server_address[1]
+    yield daemon
+    server.shutdown()
+    server.server_close()
+    daemon.stop()
+
+def call(daemon, method, path, body=None, **headers):
+    headers = {'Authorization': f"Bearer {TOKEN}", 'Content-Type': 'application/json', **headers}
+    headers = {name.replace('_', '-'): value for name, value in headers.items() if value is not None}
+    conn = http.client.HTTPConnection('127.0.0.1', daemon.port, timeout=10)
+    try:
+        conn.request(method, path, json.dumps(body) if body is not None else None, headers)
+        response = conn.getresponse()
+        return response.status, json.loads(response.read())
+    finally:
+        conn.close()
+
+def test_token_file_is_private(workdir):
+    path = str(workdir / 'token')
+    token = load_token(path)
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    assert load_token(path) == token
+    os.chmod(path, 0o644)
+    with pytest.raises(OSError):
+        load_token(path)
+
+@pytest.mark.parametrize('headers, status', [
+    ({'Authorization': None}, 401),
+    ({'Authorization': "Bearer wrong"}, 401),
+    ({'Origin': "http://evil.example"}, 403),
+    ({'Host': "evil.example:8787"}, 403),
+    ({'Content_Type': "text/plain"}, 415),
+])
+def test_refuses_untrusted_posts(daemon, store, headers, status):
+    code, _ = call(daemon, 'POST', '/jobs', {'kind': 'provision', 'project': {'project_name': 'victim'}}, **headers)
+    assert code == status
+    assert store.updated_at('victim') is None
+
+def test_get_needs_the_token(daemon):
+    assert call(daemon, 'GET', '/health', Authorization=None)[0] == 401
+    assert call(daemon, 'GET', '/health')[0] == 200
+
+def test_provision_does_not_replace_a_stored_project(daemon, store):
+    code, body = call(daemon, 'POST', '/jobs', {'kind': 'provision', 'project': {'project_name': 'acme'}})
+    assert code == 409
+    assert 'overwrite' in body['error']
+    assert store.load('acme').api_keys['cron_secret'] == 'kept'
+
+def test_render_of_unknown_project_creates_nothing(daemon, workdir):
+    code, job = call(daemon, 'POST', '/jobs', {'kind': 'render', 'project': 'ghost'})
+    assert code == 202
+    _, job = call(daemon, 'GET', f"/jobs/{job['id']}?wait=5")
+    assert job['status'] == 'failed'
+    assert not os.path.exists(workdir / 'out' / 'ghost')
+
+def test_render_writes_env_files(daemon, workdir):
+    _, job = call(daemon, 'POST', '/jobs', {'kind': 'render', 'project': 'acme'})
+    _, job = call(daemon, 'GET', f"/jobs/{job['id']}?wait=5")
+    assert job['status'] == 'ok'
+    assert os.path.exists(workdir / 'out' / 'acme' / '.env')
+
+def test_busy_project_does_not_hold_up_others(daemon):
+    order, release = [], threading.Event()
+
+    def slow(job):
+        order.append(job.project)
+        if job.project == 'acme':
+            release.wait(5)
+        return {}
+    daemon.handlers['render'] = slow
+
+    burst = [daemon.submit({'kind': 'render', 'project': 'acme'}) for _ in range(4)]
+    other = daemon.submit({'kind': 'render', 'project': 'other'})
+    assert other.done.wait(2), "a job of another project waited behind the busy one"
+    assert daemon.health()['running'] == 1
+    release.set()
+    for job in burst:
+        assert job.done.wait(5)
+    assert [job.started_at for job in burst] == sorted(job.started_at for job in burst)
+    assert order.count('acme') == 4
+
+def test_refuses_jobs_beyond_capacity(daemon):
+    release = threading.Event()
+    daemon.handlers['render'] = lambda job: release.wait(5)
+    try:
+        daemon.submit({'kind': 'render', 'project': 'acme'})
+        while daemon.health()['running'] != 1:
+            time.sleep(0.01)
+        for _ in range(daemon.capacity):
+            daemon.submit({'kind': 'render', 'project': 'acme'})
+        code, _ = call(daemon, 'POST', '/jobs', {'kind': 'render', 'project': 'acme'})
+        assert code == 503
+    finally:
+        release.set()
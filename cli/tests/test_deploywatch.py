@@ -0,0 +1,67 @@
+"""Following a deployment against the local Vercel mock"""
+
+import pytest
+import requests
+
+import deploywatch
+from conftest import MOCK_BUILD_LOG, MockVercelServer
+from deploywatch import DeploymentWatcher, log_phases
+from services import VercelService
+
+@pytest.fixture(autouse=True)
+def fast_polling(monkeypatch):
+    monkeypatch.setattr(deploywatch, 'POLL_MIN', 0.02)
+    monkeypatch.setattr(deploywatch, 'POLL_MAX', 0.05)
+
+def follow(mock: MockVercelServer, echo=None):
+    vercel = VercelService('token', base_url=mock.url)
+    return DeploymentWatcher(vercel, echo, timeout=10).follow({'uid': mock.deployment_id})
+
+def test_streamed_ready():
+    lines = []
+    with MockVercelServer(queued=0.05, line_interval=0.02) as mock:
+        report = follow(mock, lines.append)
+    assert report.ready and report.streamed
+    assert report.polls == 0
+    assert lines == list(MOCK_BUILD_LOG)
+    assert [phase for phase, _ in report.phases] == ['clone', 'install', 'build', 'deploy']
+    assert report.queued == pytest.approx(0.05, abs=0.01)
+    assert report.building == pytest.approx(len(lines) * 0.02, abs=0.01)
+
+def test_dropped_stream_falls_back_to_polling():
+    with MockVercelServer(line_interval=0.05, drop_after=2) as mock:
+        report = follow(mock)
+    assert report.ready
+    assert not report.streamed
+    assert report.polls > 0
+    assert report.log_lines == 2
+
+def test_unavailable_stream_polls_and_fetches_the_log(monkeypatch):
+    with MockVercelServer(line_interval=0.02) as mock:
+        monkeypatch.setattr(VercelService, 'deployment_events', fail_when_followed(VercelService.deployment_events))
+        report = follow(mock)
+    assert report.ready and not report.streamed
+    assert report.log_lines == len(MOCK_BUILD_LOG)
+    assert [phase for phase, _ in report.phases] == ['clone', 'install', 'build', 'deploy']
+
+def fail_when_followed(events):
+    def deployment_events(self, deployment_id, follow=True, **kwargs):
+        if follow:
+            raise requests.ConnectionError("stream refused")
+        return events(self, deployment_id, follow, **kwargs)
+    return deployment_events
+
+def test_error_state():
+    with MockVercelServer(final_state='ERROR', line_interval=0.01) as mock:
+        report = follow(mock)
+    assert report.state == 'ERROR' and not report.ready
+    assert 'exited with 1' in report.error_message
+
+def test_log_phases():
+    lines = [(1000, 'Cloning github.com/acme/app'), (1500, 'Installing dependencies...'),
+             (2000, 'noise'), (4000, 'Running "vercel build"'), (4500, 'Running "npm run build"'),
+             (9000, 'Deploying outputs...'), (9500, 'Cloning again')]
+    assert log_phases(lines, 10000) == [('clone', 0.5), ('install', 3.0), ('build', 4.5), ('deploy', 1.0)]
+
+def test_log_phases_without_an_end():
+    assert log_phases([(1000, 'Cloning x'), (3000, 'Installing dependencies')], None) == [('clone', 2.0)]
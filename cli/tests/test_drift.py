@@ -0,0 +1,139 @@
+"""Drift between the saved setup, its env files and Vercel, and the fingerprint cache behind re-checks"""
+
+import os
+
+import pytest
+
+import drift
+from drift import UNREADABLE, Change, DriftCache, DriftChecker, _misplaced, check_projects, diff
+from envfiles import write_env_files
+from envpush import desired_env
+from progress import SetupProgress
+from services import VercelService
+
+ENV_PATH = '/v10/projects/acme/env'
+
+def test_diff_plans_adds_updates_and_removals():
+    changes = diff('.env', {'A': 'a1', 'B': 'b1', 'C': 'c1'}, {'B': 'b2', 'C': 'c1', 'D': 'd1'})
+    assert changes == [Change('.env', 'A', 'add', expected='a1'), Change('.env', 'B', 'update', 'b1', 'b2'),
+                       Change('.env', 'D', 'remove', actual='d1')]
+
+def test_diff_skips_unreadable_values_and_keeps_what_is_not_removable():
+    changes = diff('vercel:production', {'A': 'a1'}, {'A': UNREADABLE, 'B': 'b1'}, removable=lambda key: False)
+    assert changes == []
+
+def test_misplaced_only_removes_registry_variables_of_other_environments():
+    production = _misplaced('production')
+    assert production('POSTGRES_PASSWORD')
+    assert production('POLAR_SUCCESS_URL')
+    assert not production('NODE_ENV') and not production('CRON_SECRET')
+    assert not production('BLOB_READ_WRITE_TOKEN')
+
+@pytest.fixture
+def progress():
+    progress = SetupProgress(project_name='acme')
+    progress.api_keys.update({'clerk_secret_key': 'sk_test_1', 'cron_secret': 'cron'})
+    progress.service_configs['vercel'] = {'credentials': {'project_url': 'https://acme.vercel.app'}}
+    return progress
+
+@pytest.fixture
+def reads(monkeypatch):
+    """Paths of the env files the checker actually reads"""
+    paths = []
+    read = drift.read_env_file
+
+    def counting(path):
+        paths.append(os.path.basename(path))
+        return read(path)
+
+    monkeypatch.setattr(drift, 'read_env_file', counting)
+    return paths
+
+def test_unchanged_files_are_not_read_again(workdir, progress, reads):
+    write_env_files(progress, str(workdir))
+    cache = DriftCache(str(workdir / 'cache.json'))
+    first = DriftChecker(cache).check(progress, str(workdir))
+    assert first.clean and first.reused == 0 and len(reads) == 3
+
+    second = DriftChecker(cache).check(progress, str(workdir))
+    assert second.clean and second.reused == 3 and len(reads) == 3
+
+    with open(workdir / '.env.prod', 'a') as f:
+        f.write("CRON_SECRET=edited\nEXTRA=1\n")
+    third = DriftChecker(cache).check(progress, str(workdir))
+    assert reads[3:] == ['.env.prod'] and third.reused == 2
+    assert {(c.target, c.key, c.action) for c in third.changes} == {('.env.prod', 'CRON_SECRET', 'update'),
+                                                                   ('.env.prod', 'EXTRA', 'remove')}
+
+def test_missing_file_is_planned_as_created(workdir, progress):
+    write_env_files(progress, str(workdir))
+    os.remove(workdir / '.env.preview')
+    result = DriftChecker(DriftCache(str(workdir / 'cache.json'))).check(progress, str(workdir))
+    assert result.changes == [Change('.env.preview', '', 'create')]
+
+def vercel_listing(progress, **overrides):
+    """Vercel's value-less listing of every desired variable, encrypted, plus one sensitive and one unmanaged"""
+    envs = []
+    for key, per_target in desired_env(progress).items():
+        for target, value in per_target.items():
+            envs.append({'id': f"env_{key}_{target}", 'key': key, 'type': 'encrypted', 'target': [target],
+                         'updatedAt': 1, 'value': overrides.get(key, value)})
+    for env in envs:
+        if env['key'] == 'CLERK_SECRET_KEY':
+            env.update(type='sensitive', value='')
+    envs.append({'id': 'env_blob', 'key': 'BLOB_READ_WRITE_TOKEN', 'type': 'encrypted', 'target': ['production'],
+                 'updatedAt': 1, 'value': 'blob'})
+    return envs
+
+def decrypt_calls(stub):
+    return sum(1 for method, path, _, _ in stub.requests if method == 'GET' and path.startswith('/v1/projects/'))
+
+def serve_listing(stub, envs):
+    stub.responses.clear()
+    stub.add('GET', ENV_PATH, body={'envs': envs})
+    for env in envs:
+        stub.add('GET', f"/v1/projects/acme/env/{env['id']}", body={'value': env['value']})
+
+def test_remote_values_are_decrypted_only_when_updated(workdir, progress, stub):
+    write_env_files(progress, str(workdir))
+    cache = DriftCache(str(workdir / 'cache.json'))
+    checker = DriftChecker(cache, VercelService('token', base_url=stub.url))
+    envs = vercel_listing(progress)
+    serve_listing(stub, envs)
+
+    first = checker.check(progress, str(workdir))
+    assert first.clean and first.remote_checked
+    assert first.unreadable == ['preview CLERK_SECRET_KEY', 'production CLERK_SECRET_KEY']
+    assert first.unmanaged == ['BLOB_READ_WRITE_TOKEN']
+    # More than DECRYPT_ONE_BY_ONE stale variables: one decrypted listing instead of a request each
+    assert stub.calls('GET', ENV_PATH) == 2 and decrypt_calls(stub) == 0
+
+    second = checker.check(progress, str(workdir))
+    assert second.clean and stub.calls('GET', ENV_PATH) == 3 and decrypt_calls(stub) == 0
+    assert second.reused == 3 + sum(env['type'] == 'encrypted' for env in envs)
+
+    cron = next(env for env in envs if env['key'] == 'CRON_SECRET' and env['target'] == ['production'])
+    cron.update(updatedAt=2, value='changed')
+    serve_listing(stub, envs)
+    third = checker.check(progress, str(workdir))
+    assert decrypt_calls(stub) == 1
+    assert [(c.target, c.key, c.action) for c in third.changes] == [('vercel:production', 'CRON_SECRET', 'update')]
+
+def test_misplaced_remote_variable_is_removed(workdir, progress, stub):
+    write_env_files(progress, str(workdir))
+    envs = vercel_listing(progress)
+    envs.append({'id': 'env_pg', 'key': 'POSTGRES_PASSWORD', 'type': 'plain', 'target': ['preview'], 'value': 'pg'})
+    serve_listing(stub, envs)
+    result = DriftChecker(DriftCache(str(workdir / 'cache.json')),
+                          VercelService('token', base_url=stub.url)).check(progress, str(workdir))
+    assert [(c.target, c.key, c.action) for c in result.changes] == [('vercel:preview', 'POSTGRES_PASSWORD', 'remove')]
+
+def test_cache_keeps_fingerprints_and_salt_never_values(workdir, progress):
+    write_env_files(progress, str(workdir))
+    path = str(workdir / 'cache.json')
+    check_projects([(progress, str(workdir))], cache_path=path, remote=False)
+    saved = (workdir / 'cache.json').read_text()
+    assert 'sk_test_1' not in saved and 'acme.vercel.app' not in saved
+    reloaded = DriftCache(path)
+    assert reloaded.salt == DriftCache(path).salt
+    assert DriftChecker(reloaded).check(progress, str(workdir)).reused == 3
@@ -0,0 +1,79 @@
+"""Rendering env files from the variable registry"""
+
+import os
+
+import pytest
+
+from envfiles import (
+    DEVELOPMENT, ENV_FILES, ENVIRONMENTS, PREVIEW, PRODUCTION, EnvRenderer, EnvSection, EnvVar, read_env_file,
+    write_env_files,
+)
+from progress import SetupProgress
+
+@pytest.fixture
+def progress():
+    progress = SetupProgress(project_name='acme')
+    progress.api_keys.update({'clerk_secret_key': 'sk_test_1', 'cron_secret': 'cron', 'resend_from_name': 'Acme'})
+    progress.service_configs['vercel'] = {'credentials': {'project_url': 'https://acme.vercel.app'}}
+    progress.service_configs['polar'] = {'credentials': {'organization_slug': 'acme-org', 'environment': 'production'}}
+    return progress
+
+def test_each_environment_gets_its_own_values(progress, workdir):
+    write_env_files(progress, str(workdir))
+    dev, preview, prod = (read_env_file(str(workdir / ENV_FILES[env])) for env in ENVIRONMENTS)
+    assert dev['NEXT_PUBLIC_APP_URL'] == 'http://localhost:3000'
+    assert preview['NEXT_PUBLIC_APP_URL'] == prod['NEXT_PUBLIC_APP_URL'] == 'https://acme.vercel.app'
+    assert dev['POSTGRES_URL'].startswith('postgres://') and 'POSTGRES_URL' not in prod
+    assert 'NODE_ENV' not in dev and prod['NODE_ENV'] == 'production'
+    assert 'POLAR_ORGANIZATION_ID' not in dev and preview['POLAR_ORGANIZATION_ID'] == 'acme-org'
+    assert {dev['CLERK_SECRET_KEY'], prod['CLERK_SECRET_KEY'], prod['CRON_SECRET']} == {'sk_test_1', 'cron'}
+    assert dev['POLAR_ENVIRONMENT'] == prod['POLAR_ENVIRONMENT'] == 'production'
+    assert dev['RESEND_FROM_NAME'] == prod['RESEND_FROM_NAME'] == 'Acme'
+
+def test_unset_values_fall_back_to_per_environment_defaults():
+    renderer = EnvRenderer()
+    empty = SetupProgress(project_name='acme')
+    dev = renderer.values(empty, DEVELOPMENT)
+    prod = renderer.values(empty, PRODUCTION)
+    assert dev['RESEND_FROM_NAME'] == 'Kosuke Template' and prod['RESEND_FROM_NAME'] == 'Your App Name'
+    assert 'RESEND_REPLY_TO' not in dev
+    assert "# RESEND_REPLY_TO=support@yourdomain.com\n" in renderer.render(empty, DEVELOPMENT)
+    assert 'CLERK_SECRET_KEY' not in renderer.values(empty, PRODUCTION, configured_only=True)
+
+def test_render_all_matches_rendering_one_at_a_time(progress):
+    renderer = EnvRenderer()
+    assert renderer.render_all(progress) == {env: renderer.render(progress, env) for env in ENVIRONMENTS}
+    assert renderer.render(progress, PREVIEW).startswith("# ===")
+
+def test_unchanged_files_are_not_rewritten(progress, workdir):
+    first = write_env_files(progress, str(workdir))
+    assert list(first.values()) == [True, True, True]
+    for path in first:
+        os.utime(path, ns=(0, 0))
+
+    assert list(write_env_files(progress, str(workdir)).values()) == [False, False, False]
+    assert all(os.stat(path).st_mtime_ns == 0 for path in first)
+
+    # Same size, different bytes: CRON_SECRET is in every file
+    progress.api_keys['cron_secret'] = 'CRON'
+    assert list(write_env_files(progress, str(workdir)).values()) == [True, True, True]
+    assert read_env_file(str(workdir / '.env'))['CRON_SECRET'] == 'CRON'
+
+SECTIONS = [EnvSection('app', "App", "APP")]
+
+@pytest.mark.parametrize('registry, message', [
+    ([EnvVar('A', 'app'), EnvVar('A', 'app')], "A is declared twice"),
+    ([EnvVar('A', 'billing')], "unknown section 'billing'"),
+    ([EnvVar('A', 'app', environments=())], "applies to no environment"),
+    ([EnvVar('A', 'app', environments=('staging',))], r"unknown environments \['staging'\]"),
+    ([EnvVar('A', 'app', 'cron_secret')], "must be '<group>.<key>'"),
+])
+def test_invalid_registry_is_rejected(registry, message):
+    with pytest.raises(ValueError, match=message):
+        EnvRenderer(registry, SECTIONS)
+
+def test_custom_registry_renders_only_its_variables(progress):
+    renderer = EnvRenderer([EnvVar('CRON', 'app', 'api_keys.cron_secret'),
+                            EnvVar('ONLY_PROD', 'app', value='1', environments=(PRODUCTION,))], SECTIONS)
+    assert renderer.values(progress, DEVELOPMENT) == {'CRON': 'cron'}
+    assert renderer.values(progress, PRODUCTION) == {'CRON': 'cron', 'ONLY_PROD': '1'}
@@ -0,0 +1,84 @@
+"""Planning and applying a push of the env registry to a Vercel project"""
+
+import pytest
+
+from envpush import VercelEnvPush, desired_env
+from progress import SetupProgress
+from services import VercelService
+
+ENV_PATH = '/v10/projects/acme/env'
+
+@pytest.fixture
+def progress():
+    progress = SetupProgress(project_name='acme')
+    progress.api_keys['cron_secret'] = 'secret'
+    return progress
+
+@pytest.fixture
+def push(stub):
+    return VercelEnvPush(VercelService('token', base_url=stub.url), 'acme')
+
+def existing(progress, **overrides):
+    """Vercel's listing of a project that already has every desired variable"""
+    envs = []
+    for key, per_target in desired_env(progress).items():
+        value = overrides.get(key, per_target['production'])
+        envs.append({'id': f"env_{key}", 'key': key, 'value': value, 'type': 'plain',
+                     'target': sorted(per_target)})
+    return envs
+
+def test_empty_project_creates_everything(stub, push, progress):
+    stub.add('GET', ENV_PATH, body={'envs': []})
+    plan = push.plan(progress)
+    assert not plan.updates and not plan.unchanged
+    created = {variable['key']: variable for variable in plan.creates}
+    assert set(created) == set(desired_env(progress))
+    assert created['CRON_SECRET'] == {'key': 'CRON_SECRET', 'value': 'secret', 'type': 'encrypted',
+                                      'target': ['preview', 'production']}
+    assert created['NODE_ENV']['type'] == 'plain'
+
+def test_up_to_date_project_sends_nothing(stub, push, progress):
+    stub.add('GET', ENV_PATH, body={'envs': existing(progress)})
+    result = push.push(progress)
+    assert not result.created and not result.updated
+    assert sorted(result.unchanged) == sorted(desired_env(progress))
+    assert stub.calls('POST', ENV_PATH) == 0
+    assert not [request for request in stub.requests if request[0] == 'PATCH']
+
+def test_changed_value_is_patched(stub, push, progress):
+    stub.add('GET', ENV_PATH, body={'envs': existing(progress, CRON_SECRET='old')})
+    plan = push.plan(progress)
+    assert plan.updates == [('CRON_SECRET', 'env_CRON_SECRET', {'value': 'secret', 'type': 'encrypted'})]
+    assert not plan.creates and 'CRON_SECRET' not in plan.unchanged
+
+def test_missing_target_is_created(stub, push, progress):
+    envs = existing(progress)
+    for entry in envs:
+        if entry['key'] == 'NODE_ENV':
+            entry['target'] = ['production']
+    stub.add('GET', ENV_PATH, body={'envs': envs})
+    plan = push.plan(progress)
+    assert plan.creates == [{'key': 'NODE_ENV', 'value': 'production', 'type': 'plain', 'target': ['preview']}]
+    assert not plan.updates
+
+def test_sensitive_values_are_only_rewritten_when_forced(stub, progress):
+    envs = existing(progress)
+    for entry in envs:
+        if entry['key'] == 'CRON_SECRET':
+            entry.update(type='sensitive', value='')
+    stub.add('GET', ENV_PATH, body={'envs': envs})
+    vercel = VercelService('token', base_url=stub.url)
+    assert VercelEnvPush(vercel, 'acme').plan(progress).empty
+    forced = VercelEnvPush(vercel, 'acme', force=True).plan(progress)
+    assert [key for key, _, _ in forced.updates] == ['CRON_SECRET']
+
+def test_apply_batches_creates_and_patches_updates(stub, push, progress):
+    stub.add('GET', ENV_PATH, body={'envs': [entry for entry in existing(progress, NODE_ENV='development')
+                                             if entry['key'] != 'CRON_SECRET']})
+    stub.add('POST', ENV_PATH, body={'created': []})
+    stub.add('PATCH', "/v9/projects/acme/env/env_NODE_ENV", body={})
+    result = push.push(progress)
+    assert result.created == ['CRON_SECRET'] and result.updated == ['NODE_ENV']
+    assert stub.calls('POST', ENV_PATH) == 1
+    body = next(request[2] for request in stub.requests if request[0] == 'POST')
+    assert [variable['key'] for variable in body] == ['CRON_SECRET']
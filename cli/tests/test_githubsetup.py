@@ -0,0 +1,103 @@
+"""Forking the template against the local GitHub stand-in"""
+
+import time
+import threading
+
+import pytest
+
+from conftest import MockGitHubServer
+from githubsetup import ForkManager, GitHubSetupError, _PendingFork
+import services
+from services import GitHubService
+
+POLL_INTERVAL = 0.05
+
+class FastGitHub(GitHubService):
+    # The real spacing protects GitHub's secondary limits, which the stand-in does not have
+    write_interval = 0.01
+
+def manager(mock: MockGitHubServer, organization: str = "") -> ForkManager:
+    owner, repo = mock.template.split('/')
+    return ForkManager('token', owner, repo, organization, poll_interval=POLL_INTERVAL, timeout=10,
+                       github=FastGitHub('token', base_url=mock.url))
+
+def test_fork_waits_for_the_branch():
+    with MockGitHubServer(copy_delay=0.2) as mock:
+        forks = manager(mock)
+        result = forks.fork('acme-portal')
+    assert result.full_name == 'me/acme-portal' and not result.existed
+    assert result.seconds >= 0.2
+    assert mock.count('GET', '/branches/main') >= 2  # a 404 before the copy finished, then 200
+
+def test_concurrent_forks_share_one_listing_poll():
+    names = [f"project-{index}" for index in range(6)]
+    with MockGitHubServer(list_delay=0.1, copy_delay=0.3) as mock:
+        forks = manager(mock, organization='acme-org')
+        results = {}
+        started = time.monotonic()
+        threads = [threading.Thread(target=lambda name=name: results.update({name: forks.fork(name)}))
+                   for name in names]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+    assert sorted(result.full_name for result in results.values()) == [f"acme-org/{name}" for name in names]
+    listings = mock.count('GET', '/forks')
+    assert listings == forks.polls
+    # One listing per round however many forks wait, instead of one per fork per round
+    assert listings <= elapsed / POLL_INTERVAL + 2
+    assert forks.not_modified == mock.not_modified > 0
+
+def test_existing_fork_is_reused():
+    with MockGitHubServer() as mock:
+        manager(mock).fork('acme-portal')
+        result = manager(mock).fork('acme-portal')
+    assert result.existed
+    assert mock.count('POST', '/forks') == 1
+
+def test_existing_repository_that_is_not_a_fork():
+    with MockGitHubServer(login='acme') as mock:
+        with pytest.raises(GitHubSetupError, match="not a fork"):
+            manager(mock).fork('template')
+
+def test_owner_lookup_does_not_block_waiting_forks():
+    with MockGitHubServer() as mock:
+        forks = manager(mock)
+        looking_up, release = threading.Event(), threading.Event()
+        get_user = forks.github.get_user
+
+        def slow_get_user():
+            looking_up.set()
+            release.wait(5)
+            return get_user()
+        forks.github.get_user = slow_get_user
+        lookup = threading.Thread(target=lambda: forks.owner)
+        lookup.start()
+        assert looking_up.wait(5)
+        watched = threading.Thread(target=forks._done, args=(_PendingFork('me', 'x', 'main'),))
+        watched.start()
+        watched.join(1)
+        assert not watched.is_alive(), "_done waited for the owner lookup"
+        release.set()
+        lookup.join()
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    delays = []
+    monkeypatch.setattr(services.time, 'sleep', delays.append)
+    return delays
+
+def test_github_secondary_limit_403_is_retried(stub, sleeps):
+    github = GitHubService('token', base_url=stub.url)
+    stub.add('GET', '/user', 403, {'message': 'secondary rate limit'}, {'Retry-After': '1'})
+    stub.add('GET', '/user', 200, {'login': 'me'})
+    assert github.get_user() == {'login': 'me'}
+    assert 1.0 in sleeps
+
+def test_github_forbidden_is_not_retried(stub, sleeps):
+    github = GitHubService('token', base_url=stub.url)
+    stub.add('GET', '/user', 403, {'message': 'Resource not accessible'})
+    with pytest.raises(services.ServiceError):
+        github.get_user()
+    assert stub.calls('GET', '/user') == 1
@@ -0,0 +1,120 @@
+"""Polar billing setup against a stateful stand-in for the Polar API"""
+
+import threading
+
+import pytest
+from conftest import StubServer, serve
+
+from polarsetup import PLANS, WEBHOOK_EVENTS, CatalogCache, provision_polar, webhook_url
+from progress import SetupProgress
+
+class PolarCatalog(StubServer):
+    """Organizations, products and webhook endpoints that remember what was created"""
+
+    def __init__(self):
+        super().__init__()
+        self.products, self.webhooks = {}, {}
+        self._lock = threading.Lock()
+
+    def answer(self, method, path, body):
+        parts = path.strip('/').split('/')[1:]
+        with self._lock:
+            if parts == ['organizations']:
+                return 200, self.listing([{'id': 'org_1', 'slug': 'acme-org'}]), {}
+            if parts[0] == 'products':
+                return self.collection(self.products, 'prod', method, parts[1:], body)
+            if parts[:2] == ['webhooks', 'endpoints']:
+                return self.collection(self.webhooks, 'wh', method, parts[2:], body)
+        return 404, {'detail': 'Not found'}, {}
+
+    @staticmethod
+    def listing(items):
+        return {'items': items, 'pagination': {'total_count': len(items), 'max_page': 1}}
+
+    def collection(self, items, prefix, method, rest, body):
+        if not rest and method == 'GET':
+            return 200, self.listing([{k: v for k, v in item.items() if k != 'secret'} for item in items.values()]), {}
+        if not rest and method == 'POST':
+            item = {**body, 'id': f"{prefix}_{len(items) + 1}", 'is_archived': False}
+            if prefix == 'wh':
+                item['secret'] = f"whsec_{len(items) + 1}"
+            items[item['id']] = item
+            return 201, item, {}
+        if len(rest) == 1 and rest[0] in items:
+            if method == 'PATCH':
+                items[rest[0]].update(body)
+            # Like Polar, an existing endpoint's secret is not read back
+            return 200, {k: v for k, v in items[rest[0]].items() if k != 'secret'}, {}
+        return 404, {'detail': 'Not found'}, {}
+
+@pytest.fixture
+def polar(monkeypatch):
+    for server in serve(PolarCatalog()):
+        monkeypatch.setenv('KOSUKE_POLAR_API_URL', server.url)
+        yield server
+
+def provision(progress, workdir):
+    return provision_polar(progress, 'polar_oat_test', cache_path=str(workdir / 'catalog.json'))
+
+def posts(polar):
+    return [path for method, path, _, _ in polar.requests if method == 'POST']
+
+def test_first_run_creates_products_and_webhook(polar, workdir):
+    progress = SetupProgress(project_name='acme')
+    result = provision(progress, workdir)
+    assert sorted(result.created) == ['business product', 'pro product', 'webhook']
+    assert sorted(product['name'] for product in polar.products.values()) == sorted(plan.name for plan in PLANS)
+    (webhook,) = polar.webhooks.values()
+    assert webhook['url'] == webhook_url('acme') and webhook['events'] == WEBHOOK_EVENTS
+    assert progress.api_keys['polar_webhook_secret'] == webhook['secret']
+    assert progress.service_configs['polar']['credentials']['pro_product_id'] == result.product_ids['pro']
+
+def test_rerun_creates_nothing_and_reads_cached_ids(polar, workdir):
+    progress = SetupProgress(project_name='acme')
+    first = provision(progress, workdir)
+    del polar.requests[:]
+    second = provision(progress, workdir)
+    assert second.created == [] and not posts(polar)
+    assert (second.product_ids, second.webhook_endpoint_id) == (first.product_ids, first.webhook_endpoint_id)
+    assert second.webhook_secret == first.webhook_secret
+    # The cached ids are read back one by one instead of listing the catalog
+    assert polar.calls('GET', '/v1/products/') == 0
+    assert len(polar.products) == len(PLANS) and len(polar.webhooks) == 1
+
+def test_rerun_without_cache_finds_everything_by_listing(polar, workdir):
+    progress = SetupProgress(project_name='acme')
+    first = provision(progress, workdir)
+    (workdir / 'catalog.json').unlink()
+    del polar.requests[:]
+    second = provision(progress, workdir)
+    assert second.created == [] and not posts(polar)
+    assert second.product_ids == first.product_ids
+    assert polar.calls('GET', '/v1/products/') == 1
+
+def test_archived_product_is_created_again(polar, workdir):
+    progress = SetupProgress(project_name='acme')
+    first = provision(progress, workdir)
+    polar.products[first.product_ids['pro']]['is_archived'] = True
+    second = provision(progress, workdir)
+    assert second.created == ['pro product']
+    assert second.product_ids['pro'] != first.product_ids['pro']
+    assert second.product_ids['business'] == first.product_ids['business']
+
+def test_missing_webhook_events_are_added(polar, workdir):
+    progress = SetupProgress(project_name='acme')
+    first = provision(progress, workdir)
+    polar.webhooks[first.webhook_endpoint_id]['events'] = ['checkout.created']
+    provision(progress, workdir)
+    assert sorted(polar.webhooks[first.webhook_endpoint_id]['events']) == sorted(WEBHOOK_EVENTS)
+    assert len(polar.webhooks) == 1
+
+def test_projects_sharing_a_token_create_products_once(polar, workdir):
+    projects = [SetupProgress(project_name=f"app{i}") for i in range(4)]
+    threads = [threading.Thread(target=provision, args=(progress, workdir)) for progress in projects]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(polar.products) == len(PLANS)
+    assert len(polar.webhooks) == len(projects)
+    assert len(CatalogCache(str(workdir / 'catalog.json'))._read()) == 1
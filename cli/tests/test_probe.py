@@ -0,0 +1,79 @@
+"""The post-deploy probe against a local app"""
+
+import pytest
+
+import probe
+from probe import DeploymentProbe, compare, probe_projects
+
+ROUTES = ('/', '/home', '/api/billing/subscription-status')
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    delays = []
+    monkeypatch.setattr(probe.time, 'sleep', delays.append)
+    return delays
+
+@pytest.fixture
+def app(stub):
+    stub.add('GET', '/', 200, {})
+    stub.add('GET', '/home', 200, {})
+    stub.add('GET', '/api/billing/subscription-status', 401, {'error': 'Unauthorized'})
+    return stub
+
+def test_waits_for_the_deployment_then_samples_every_route(stub, sleeps):
+    stub.add('GET', '/', 404, {})
+    stub.add('GET', '/', 404, {})
+    stub.add('GET', '/', 200, {})
+    stub.add('GET', '/home', 200, {})
+    stub.add('GET', '/api/billing/subscription-status', 401, {})
+    report = DeploymentProbe('acme', stub.url, ROUTES, samples=3).run()
+    assert not report.error and report.ready_seconds is not None
+    assert len(sleeps) == 2 and sleeps[1] > sleeps[0]
+    routes = {route.path: route for route in report.routes}
+    # The answer that ended the wait is the cold hit of /, so / is not requested cold again
+    assert stub.calls('GET', '/') == 3 + 3
+    assert stub.calls('GET', '/home') == 1 + 3
+    assert routes['/'].cold_status == 200
+    assert routes['/api/billing/subscription-status'].cold_status == 401
+    assert all(len(route.warm_ms) == 3 and route.cold_ms is not None for route in report.routes)
+    assert routes['/api/billing/subscription-status'].statuses == {'401': 3}
+
+def test_gives_up_when_the_deployment_never_answers(stub, sleeps):
+    stub.add('GET', '/', 404, {})
+    report = DeploymentProbe('acme', stub.url, ROUTES, ready_timeout=0).run()
+    assert report.error == "not up after 0s"
+    assert report.ready_seconds is None
+    assert stub.calls('GET', '/home') == 0
+
+def test_throttled_answers_are_not_warm_samples(app, sleeps):
+    app.responses[('GET', '/home')] = []
+    for status in (200, 429, 503, 200, 200):
+        app.add('GET', '/home', status, {}, {'Retry-After': '2'} if status == 429 else {})
+    report = DeploymentProbe('acme', app.url, ROUTES, samples=3).run()
+    home = next(route for route in report.routes if route.path == '/home')
+    assert home.statuses == {'429': 1, '503': 1, '200': 3}
+    assert len(home.warm_ms) == 3
+    assert 2.0 * 0.8 <= max(sleeps)
+
+def test_unreachable_deployment_is_an_error(sleeps):
+    report = DeploymentProbe('acme', "http://127.0.0.1:9", ROUTES, ready_timeout=0).run()
+    assert report.error and not any(route.cold_ms for route in report.routes)
+
+def test_reports_are_kept_and_compared_with_the_previous_deploy(app, workdir, sleeps):
+    ((first, previous),) = probe_projects([('acme', app.url)], ROUTES, samples=2, report_dir=str(workdir / 'probe'))
+    assert previous is None
+    ((_, previous),) = probe_projects([('acme', app.url)], ROUTES, samples=2, report_dir=str(workdir / 'probe'))
+    assert previous == first.to_dict()
+    assert (workdir / 'probe' / 'acme.previous.json').exists()
+
+def test_compare_flags_only_noticeable_changes():
+    before = {'routes': [{'path': '/', 'cold_ms': 900.0, 'warm_p50_ms': 40.0, 'warm_p95_ms': 60.0}]}
+    after = {'routes': [{'path': '/', 'cold_ms': 1500.0, 'warm_p50_ms': 70.0, 'warm_p95_ms': 200.0},
+                        {'path': '/home', 'cold_ms': 10.0}]}
+    assert compare(before, after) == [('/', 'cold_ms', 900.0, 1500.0), ('/', 'warm_p95_ms', 60.0, 200.0)]
+
+def test_probe_under_tracing(app, traced, sleeps):
+    report = DeploymentProbe('acme', app.url, ROUTES, samples=3).run()
+    assert not report.error and all(len(route.warm_ms) == 3 for route in report.routes)
+    # The cold hits and warm samples run on pool threads, each in its own copy of the context
+    assert sum(record['name'] == 'GET app' for record in traced()) == len(app.requests)
@@ -0,0 +1,147 @@
+"""The progress journal: replay, torn tails, snapshots and change tracking"""
+
+import json
+import threading
+
+import pytest
+
+from progress import ProgressJournal, SetupProgress, TrackedDict
+
+@pytest.fixture
+def paths(workdir):
+    return str(workdir / 'progress.json'), str(workdir / 'progress.journal')
+
+def journal(paths, **kwargs):
+    return ProgressJournal(*paths, **kwargs)
+
+def events(paths):
+    with open(paths[1]) as f:
+        return [json.loads(line) for line in f]
+
+def sample():
+    progress = SetupProgress(project_name='acme', current_step=3)
+    progress.api_keys['github_token'] = 'ghp_1'
+    progress.service_configs['vercel'] = {'name': 'Vercel', 'credentials': {'project_url': 'https://acme.app'}}
+    progress.completed_steps.append('github')
+    return progress
+
+def test_replay_rebuilds_the_progress(paths):
+    writer = journal(paths)
+    progress = sample()
+    writer.save(progress)
+    progress.api_keys['clerk_secret_key'] = 'sk_1'
+    del progress.api_keys['github_token']
+    progress.completed_steps.append('vercel')
+    writer.save(progress)
+    writer.flush()
+    assert journal(paths).load().to_dict() == progress.to_dict()
+
+def test_save_writes_only_what_changed(paths):
+    writer = journal(paths)
+    progress = sample()
+    for i in range(2000):
+        progress.api_keys[f"extra_{i}"] = str(i)
+    writer.save(progress)
+    before = len(events(paths))
+    progress.api_keys['extra_7'] = 'changed'
+    progress.service_configs['vercel']['credentials']['team_id'] = 'team_1'
+    writer.save(progress)
+    assert [(event['op'], event.get('key')) for event in events(paths)[before:]] == [
+        ('put', 'extra_7'), ('put', 'vercel')]
+    writer.save(progress)
+    assert len(events(paths)) == before + 2
+
+def test_torn_tail_is_cut_off(paths):
+    writer = journal(paths)
+    progress = sample()
+    writer.save(progress)
+    writer.flush()
+    size = len(open(paths[1], 'rb').read())
+    with open(paths[1], 'ab') as f:
+        f.write(b'{"op":"put","field":"api_keys","key":"half')
+    loaded = journal(paths).load()
+    assert loaded.to_dict() == progress.to_dict()
+    assert len(open(paths[1], 'rb').read()) == size
+
+def test_snapshot_plus_journal(paths):
+    writer = journal(paths)
+    progress = sample()
+    writer.save(progress)
+    writer.compact(progress)
+    assert open(paths[1], 'rb').read() == b''
+    progress.api_keys['resend_api_key'] = 're_1'
+    writer.save(progress)
+    writer.flush()
+    assert journal(paths).load().to_dict() == progress.to_dict()
+
+def test_replay_skips_events_already_in_the_snapshot(paths):
+    # A crash after the snapshot was renamed into place but before the journal was truncated
+    writer = journal(paths)
+    progress = sample()
+    writer.save(progress)
+    progress.completed_steps.append('vercel')
+    writer.save(progress)
+    writer.flush()
+    stale = open(paths[1], 'rb').read()
+    writer.compact(progress)
+    with open(paths[1], 'wb') as f:
+        f.write(stale)
+    assert journal(paths).load().completed_steps == ['github', 'vercel']
+
+def test_periodic_compaction_keeps_every_change(paths):
+    writer = journal(paths, compact_every=5)
+    progress = sample()
+    for i in range(12):
+        progress.api_keys[f"key_{i}"] = str(i)
+        writer.save(progress)
+    writer.flush()
+    with open(paths[0]) as f:
+        assert json.load(f)['_journal_seq'] >= 5
+    assert journal(paths).load().to_dict() == progress.to_dict()
+
+def test_saves_while_workers_add_keys(paths):
+    writer = journal(paths, compact_every=50)
+    progress = sample()
+    writer.save(progress)
+
+    def worker(n):
+        for i in range(300):
+            progress.api_keys[f"w{n}_{i}"] = str(i)
+            progress.service_configs.setdefault(f"svc{n}", {})[str(i)] = i
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    while any(thread.is_alive() for thread in threads):
+        writer.save(progress)
+    writer.save(progress)
+    writer.flush()
+    loaded = journal(paths).load()
+    assert loaded.to_dict() == progress.to_dict()
+    assert len(loaded.api_keys) == 1 + 4 * 300
+
+def test_a_new_progress_object_is_compared_whole(paths):
+    writer = journal(paths)
+    writer.save(sample())
+    replacement = sample()
+    replacement.api_keys['github_token'] = 'ghp_2'
+    writer.save(replacement)
+    writer.flush()
+    assert journal(paths).load().api_keys == {'github_token': 'ghp_2'}
+
+def test_tracked_dict_reports_nested_edits_under_the_top_level_key():
+    configs = TrackedDict({'polar': {'credentials': {'id': '1'}}})
+    assert configs.take_changes() == {}
+    configs['polar']['credentials']['id'] = '2'
+    configs.setdefault('vercel', {}).setdefault('credentials', {})['team_id'] = 't'
+    configs.pop('missing', None)
+    assert configs.take_changes() == {'polar': {'credentials': {'id': '2'}},
+                                      'vercel': {'credentials': {'team_id': 't'}}}
+    configs.clear()
+    assert set(configs.take_changes()) == {'polar', 'vercel'}
+
+def test_progress_fields_are_always_tracked():
+    progress = SetupProgress.from_dict({**SetupProgress().to_dict(), 'api_keys': {'a': '1'}})
+    assert isinstance(progress.api_keys, TrackedDict)
+    progress.api_keys = {'b': '2'}
+    assert isinstance(progress.api_keys, TrackedDict)
+    assert type(progress.to_dict()['service_configs']) is dict
@@ -0,0 +1,126 @@
+"""Merge-joining Polar subscription pages against user_subscriptions"""
+
+import time
+from datetime import datetime
+
+import pytest
+
+from reconcile import APPLY_BATCH, SubscriptionReconciler
+
+START, END = "2026-01-01T00:00:00Z", "2026-02-01T00:00:00.250000+00:00"
+TIERS = {'prod_pro': 'pro', 'prod_business': 'business'}
+
+class FakeConnection:
+    """Answers the page query from rows kept in memory and records the writes"""
+
+    def __init__(self, rows):
+        self.rows = {row[0]: row for row in rows}
+        self.writes = []
+
+    def execute(self, sql, params=()):
+        if sql.startswith('SELECT subscription_id'):
+            ids = set(params[0])
+            return FakeResult(sorted(row for key, row in self.rows.items() if key in ids))
+        self.writes.append((sql, params))
+        return FakeResult([])
+
+    def cursor(self, name=None):
+        return FakeCursor(self)
+
+class FakeResult(list):
+    def fetchall(self):
+        return list(self)
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def executemany(self, sql, rows):
+        self.conn.writes.append((sql, list(rows)))
+
+def subscription(id, status='active', product_id='prod_pro', user='user_1', **fields):
+    return {'id': id, 'status': status, 'product_id': product_id, 'current_period_start': START,
+            'current_period_end': END, 'metadata': {'userId': user}, **fields}
+
+def row(id, status='active', product_id='prod_pro', start=datetime(2026, 1, 1), end=datetime(2026, 2, 1)):
+    return (id, 'user_1', product_id, status, 'pro', start, end)
+
+def reconciler(rows, apply=False, batch_size=APPLY_BATCH):
+    return SubscriptionReconciler(None, FakeConnection(rows), TIERS, apply=apply, batch_size=batch_size)
+
+def differences(reconciler):
+    return {kind: [d.subscription_id for d in samples] for kind, samples in reconciler.report.samples.items() if samples}
+
+def test_matching_page_has_no_differences():
+    r = reconciler([row('sub_a'), row('sub_b')])
+    r.merge_page([subscription('sub_a'), subscription('sub_b')])
+    assert r.report.total == 0
+
+def test_each_kind_of_difference():
+    r = reconciler([row('sub_b', status='canceled'), row('sub_c', product_id='prod_business'),
+                    row('sub_d', end=datetime(2026, 3, 1)), row('sub_e')])
+    r.merge_page([subscription(id) for id in ('sub_a', 'sub_b', 'sub_c', 'sub_d', 'sub_e')])
+    assert differences(r) == {'missing': ['sub_a'], 'status': ['sub_b'], 'stale': ['sub_c', 'sub_d']}
+
+def test_rows_of_other_subscriptions_are_skipped_in_the_join():
+    # Rows the page does not ask for never come back, but gaps on either side must not shift the join
+    r = reconciler([row('sub_b'), row('sub_d')])
+    r.merge_page([subscription('sub_a'), subscription('sub_b'), subscription('sub_c'), subscription('sub_d')])
+    assert differences(r) == {'missing': ['sub_a', 'sub_c']}
+
+def test_timestamps_compare_to_the_second():
+    r = reconciler([row('sub_a', start=datetime(2026, 1, 1, 0, 0, 0, 900000))])
+    r.merge_page([subscription('sub_a')])
+    assert r.report.total == 0
+
+def test_missing_without_user_is_unfixable():
+    r = reconciler([], apply=True)
+    r.merge_page([subscription('sub_a', user=None), subscription('sub_b', product_id='prod_unknown')])
+    assert r.report.counts['missing'] == 2
+    assert r.report.unfixable == 2
+    r.flush(force=True)
+    assert r.report.applied == 0
+
+def test_apply_upserts_once_a_batch_is_full():
+    r = reconciler([row('sub_b', status='canceled')], apply=True, batch_size=2)
+    r.merge_page([subscription('sub_a'), subscription('sub_b'), subscription('sub_c', product_id='prod_business')])
+    upserts = [params for sql, params in r.conn.writes if sql.startswith('INSERT INTO user_subscriptions')]
+    assert len(upserts) == 1 and len(upserts[0]) == 3
+    by_id = {values[1]: values for values in upserts[0]}
+    assert by_id['sub_b'][3] == 'active'
+    assert by_id['sub_c'][4] == 'business'
+    assert by_id['sub_a'][6] == datetime(2026, 2, 1)
+    assert r.report.applied == 3
+
+def test_dry_run_writes_only_the_seen_ids():
+    r = reconciler([], apply=False)
+    r.merge_page([subscription('sub_a')])
+    assert [sql.split(' (')[0] for sql, _ in r.conn.writes] == ['INSERT INTO reconcile_seen VALUES']
+    assert r.report.applied == 0
+
+class FakePolar:
+    def __init__(self, pages, latency=0.0):
+        self.pages = pages
+        self.latency = latency
+
+    def subscriptions_page(self, page):
+        time.sleep(self.latency)
+        return self.pages[page - 1], len(self.pages)
+
+@pytest.mark.parametrize('window', [1, 3])
+def test_pages_arrive_in_order(window):
+    pages = [[subscription(f"sub_{page}_{i}") for i in range(2)] for page in range(7)]
+    r = SubscriptionReconciler(FakePolar(pages), None, TIERS, window=window)
+    assert list(r.pages()) == pages
+
+def test_pages_load_concurrently_under_tracing(traced):
+    # One propagated fetch is submitted up to `window` times at once
+    pages = [[subscription(f"sub_{page}")] for page in range(9)]
+    r = SubscriptionReconciler(FakePolar(pages, latency=0.02), None, TIERS, window=4)
+    assert list(r.pages()) == pages
@@ -0,0 +1,74 @@
+"""ServiceManager retries with backoff that respect Retry-After and rate limit headers"""
+
+import time
+from email.utils import formatdate
+
+import pytest
+import requests
+
+import services
+from services import ServiceManager
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Delays the clients asked for, without waiting for them"""
+    delays = []
+    monkeypatch.setattr(services.time, 'sleep', delays.append)
+    monkeypatch.setattr(services.random, 'uniform', lambda low, high: 1.0)
+    return delays
+
+def client(stub, max_retries=3) -> ServiceManager:
+    return ServiceManager('test', stub.url, max_retries=max_retries)
+
+def test_retry_after_seconds(stub, sleeps):
+    stub.add('GET', '/items', 429, {}, {'Retry-After': '2'})
+    stub.add('GET', '/items', 200, {'ok': True})
+    assert client(stub).json('GET', '/items') == {'ok': True}
+    assert stub.calls('GET', '/items') == 2
+    assert sleeps == [2.0]
+
+def test_retry_after_http_date(stub, sleeps):
+    stub.add('GET', '/items', 503, {}, {'Retry-After': formatdate(time.time() + 5, usegmt=True)})
+    stub.add('GET', '/items', 200, {})
+    client(stub).request('GET', '/items')
+    assert len(sleeps) == 1 and 3.5 < sleeps[0] <= 5.0
+
+def test_retry_after_is_capped(stub, sleeps):
+    stub.add('GET', '/items', 429, {}, {'Retry-After': '3600'})
+    stub.add('GET', '/items', 200, {})
+    client(stub).request('GET', '/items')
+    assert sleeps == [services.MAX_BACKOFF]
+
+def test_rate_limit_reset_without_retry_after(stub, sleeps):
+    stub.add('GET', '/items', 429, {}, {'X-RateLimit-Reset': str(int(time.time()) + 4)})
+    stub.add('GET', '/items', 200, {})
+    client(stub).request('GET', '/items')
+    assert len(sleeps) == 1 and 2.5 < sleeps[0] <= 4.0
+
+def test_exponential_backoff_then_gives_up(stub, sleeps):
+    stub.add('GET', '/items', 502, {})
+    response = client(stub, max_retries=3).request('GET', '/items')
+    assert response.status_code == 502
+    assert stub.calls('GET', '/items') == 4
+    assert sleeps == [0.5, 1.0, 2.0]
+
+def test_client_errors_are_not_retried(stub, sleeps):
+    stub.add('POST', '/items', 422, {'detail': 'invalid'})
+    with pytest.raises(services.ServiceError, match="422"):
+        client(stub).json('POST', '/items', json={})
+    assert stub.calls('POST', '/items') == 1 and not sleeps
+
+def test_exhausted_window_waits_before_the_next_call(stub, sleeps):
+    reset = int(time.time()) + 10
+    stub.add('GET', '/items', 200, {}, {'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': str(reset)})
+    manager = client(stub)
+    manager.request('GET', '/items')
+    assert not sleeps
+    manager.request('GET', '/items')
+    assert len(sleeps) == 1 and 8 < sleeps[0] <= 10
+
+def test_connection_errors_are_retried_then_raised(sleeps):
+    manager = ServiceManager('test', "http://127.0.0.1:9", max_retries=2, timeout=(0.5, 0.5))
+    with pytest.raises(requests.ConnectionError):
+        manager.request('GET', '/items')
+    assert sleeps == [0.5, 1.0]
@@ -0,0 +1,166 @@
+"""Secret rotation against stand-ins for Vercel and the deployed app"""
+
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+import rotate
+from conftest import StubServer, serve
+from progress import SetupProgress
+from rotate import CRON_PATH, DEPLOY_POLL_SECONDS, PREVIOUS_CRON_SECRET, VERIFY_POLL_SECONDS, SecretRotator
+from services import PolarService, ServiceManager, VercelService
+
+ENV_PATH = '/v10/projects/acme/env'
+
+class FakeVercel(StubServer):
+    """Keeps the pushed variables and builds each redeploy with them; `builds` lists the outcomes in order"""
+
+    def __init__(self, builds=()):
+        super().__init__()
+        self.builds = list(builds)
+        self.env = {}
+        self.deployments = {}
+        self.live = None
+
+    def answer(self, method, path, body):
+        if path == ENV_PATH:
+            if method == 'POST':
+                self.env.update((variable['key'], variable['value']) for variable in body)
+                return 201, {'created': body}, {}
+            return 200, {'envs': []}, {}
+        if path == '/v6/deployments':
+            return 200, {'deployments': [{'uid': 'dpl_0'}]}, {}
+        if path == '/v13/deployments' and method == 'POST':
+            deployment_id = f"dpl_{len(self.deployments) + 1}"
+            outcome = self.builds.pop(0) if self.builds else 'ok'
+            self.deployments[deployment_id] = (outcome, self.env.get('CRON_SECRET'))
+            return 200, {'id': deployment_id, 'readyState': 'BUILDING'}, {}
+        deployment_id = path.rsplit('/', 1)[-1]
+        if deployment_id in self.deployments:
+            outcome, secret = self.deployments[deployment_id]
+            if outcome == 'error':
+                return 200, {'id': deployment_id, 'readyState': 'ERROR'}, {}
+            if outcome == 'alias error':
+                return 200, {'id': deployment_id, 'readyState': 'READY', 'aliasError': {'message': 'alias taken'}}, {}
+            self.live = secret
+            return 200, {'id': deployment_id, 'readyState': 'READY', 'aliasAssigned': True}, {}
+        return super().answer(method, path, body)
+
+class FakeApp(StubServer):
+    """The deployed app's cron route, still answering from the old deployment for `stale` calls after an alias"""
+
+    def __init__(self, vercel: FakeVercel, secret: str, stale: int = 0):
+        super().__init__()
+        self.vercel = vercel
+        self.serving = secret
+        self.stale = stale
+        self.syncs = 0
+
+    def answer(self, method, path, body):
+        if path != CRON_PATH:
+            return super().answer(method, path, body)
+        secret = parse_qs(urlsplit(self.requests[-1][1]).query)['secret'][0]
+        if self.vercel.live and self.vercel.live != self.serving:
+            if self.stale:
+                self.stale -= 1
+            else:
+                self.serving = self.vercel.live
+        if secret != self.serving:
+            return 401, {'error': 'Unauthorized'}, {}
+        self.syncs += 1
+        return 200, {'synced': 3}, {}
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    delays = []
+    monkeypatch.setattr(rotate.time, 'sleep', delays.append)
+    return delays
+
+@pytest.fixture
+def progress():
+    progress = SetupProgress(project_name='acme')
+    progress.api_keys['cron_secret'] = 'old'
+    return progress
+
+def rotator(progress, workdir, vercel, app, saved, polar=None, secrets=('cron',)):
+    settings = rotate.RotationSettings(secrets=secrets)
+    return SecretRotator(progress, str(workdir / 'acme'), saved.append, VercelService('token', base_url=vercel.url),
+                         ServiceManager('app', app.url), polar, settings)
+
+def secrets_sent(app):
+    return [parse_qs(urlsplit(path).query)['secret'][0] for _, path, _, _ in app.requests]
+
+@pytest.fixture
+def servers():
+    """Starts a Vercel stand-in and an app serving the 'old' secret"""
+    running = []
+
+    def start(builds=(), stale=0):
+        vercel = FakeVercel(builds)
+        app = FakeApp(vercel, 'old', stale)
+        for server in (vercel, app):
+            running.append(serve(server))
+            next(running[-1])
+        return vercel, app
+
+    yield start
+    for server in running:
+        next(server, None)
+
+def test_rotated(workdir, progress, servers, sleeps, stub):
+    vercel, app = servers(stale=2)
+    stub.add('PATCH', '/v1/webhooks/endpoints/wh_1/secret', body={'secret': 'polar_new'})
+    progress.service_configs['polar'] = {'credentials': {'webhook_endpoint_id': 'wh_1'}}
+    polar = PolarService(base_url=stub.url, access_token='polar_oat_1')
+    saved = []
+
+    result = rotator(progress, workdir, vercel, app, saved, polar, ('cron', 'polar')).rotate()
+
+    new = progress.api_keys['cron_secret']
+    assert (result.status, result.rotated) == ('rotated', ['cron', 'polar'])
+    assert new != 'old' and progress.api_keys[PREVIOUS_CRON_SECRET] == 'old'
+    assert progress.api_keys['polar_webhook_secret'] == 'polar_new'
+    assert vercel.env['CRON_SECRET'] == new and app.serving == new
+    assert f"CRON_SECRET={new}" in (workdir / 'acme' / '.env').read_text()
+    assert saved and saved[0] is progress
+    assert sleeps == [DEPLOY_POLL_SECONDS] + [VERIFY_POLL_SECONDS] * 2
+
+def test_verify_polls_run_the_sync_once(workdir, progress, servers, sleeps):
+    # While the old deployment still answers, polls with the new secret are rejected and run nothing
+    vercel, app = servers(stale=3)
+    rotator(progress, workdir, vercel, app, []).rotate()
+    assert secrets_sent(app) == [progress.api_keys['cron_secret']] * 4 + ['old']
+    assert app.syncs == 1
+
+def test_failed_build_is_rolled_back(workdir, progress, servers, sleeps):
+    vercel, app = servers(builds=['error'])
+    saved = []
+    result = rotator(progress, workdir, vercel, app, saved).rotate()
+    assert result.status == 'rolled back' and 'ended in ERROR' in result.detail
+    assert progress.api_keys['cron_secret'] == 'old' and PREVIOUS_CRON_SECRET not in progress.api_keys
+    assert vercel.env['CRON_SECRET'] == 'old' and app.serving == 'old'
+    assert len(saved) == 2
+    assert "CRON_SECRET=old" in (workdir / 'acme' / '.env').read_text()
+
+def test_rollback_that_fails_too(workdir, progress, servers, sleeps):
+    vercel, app = servers(builds=['alias error', 'error'])
+    result = rotator(progress, workdir, vercel, app, []).rotate()
+    assert result.status == 'failed' and not result.ok
+    assert "was not aliased: alias taken" in result.detail and "rollback failed too" in result.detail
+    assert progress.api_keys['cron_secret'] == 'old'
+
+def test_restore_puts_the_previous_secret_back(workdir, servers, sleeps):
+    vercel, app = servers()
+    progress = SetupProgress(project_name='acme')
+    progress.api_keys.update({'cron_secret': 'old', PREVIOUS_CRON_SECRET: 'older'})
+    app.serving = 'old'
+    result = rotator(progress, workdir, vercel, app, []).restore()
+    assert (result.status, result.rotated) == ('restored', ['cron'])
+    assert progress.api_keys == {'cron_secret': 'older'}
+    assert app.serving == 'older'
+    assert secrets_sent(app) == ['older', 'old']
+
+def test_restore_without_a_previous_secret_is_skipped(workdir, progress, servers):
+    vercel, app = servers()
+    result = rotator(progress, workdir, vercel, app, []).restore()
+    assert result.status == 'skipped' and not vercel.requests
@@ -0,0 +1,115 @@
+"""Dependency-graph step scheduling"""
+
+import threading
+import time
+
+import pytest
+
+from scheduler import SETUP_GRAPH, Step, StepScheduler, resume_step, setup_steps
+
+def graph_steps(log, **overrides):
+    """The setup graph with handlers that record their name, replaced per step by overrides"""
+    def record(name):
+        return lambda: log.append(name)
+    return setup_steps({name: overrides.get(name, record(name)) for name, *_ in SETUP_GRAPH})
+
+def test_cycle_is_rejected_with_its_path():
+    steps = [Step('a', 1, lambda: None, ('y',), ('x',)), Step('b', 2, lambda: None, ('x',), ('y',))]
+    with pytest.raises(ValueError, match="cycle: a -> b -> a"):
+        StepScheduler(steps)
+
+def test_output_produced_twice_is_rejected():
+    steps = [Step('a', 1, lambda: None, (), ('x',)), Step('b', 2, lambda: None, (), ('x',))]
+    with pytest.raises(ValueError, match="produced by both a and b"):
+        StepScheduler(steps)
+
+def test_steps_run_after_their_dependencies():
+    log = []
+    StepScheduler(graph_steps(log), workers=1).run()
+    assert sorted(log) == sorted(name for name, *_ in SETUP_GRAPH)
+    assert log.index('github') < log.index('vercel') < log.index('neon') < log.index('vercel-env')
+    assert log.index('vercel') < log.index('clerk')
+    assert log[-1] == 'vercel-env'
+
+def test_completed_steps_are_skipped():
+    log, done = [], []
+    StepScheduler(graph_steps(log), completed=['github', 'polar'], on_complete=lambda s: done.append(s.name)).run()
+    assert 'github' not in log and 'polar' not in log
+    assert sorted(done) == sorted(log)
+
+def test_interactive_steps_run_one_at_a_time_in_number_order():
+    log = []
+    threads = set()
+
+    def record(name):
+        def run():
+            threads.add(threading.current_thread())
+            log.append(name)
+        return run
+
+    steps = setup_steps({name: record(name) for name, *_ in SETUP_GRAPH}, interactive=True)
+    StepScheduler(steps).run()
+    assert log == [name for name, *_ in sorted(SETUP_GRAPH, key=lambda node: node[1])]
+    assert threads == {threading.current_thread()}
+
+def test_independent_automated_steps_overlap():
+    barrier = threading.Barrier(4)
+
+    def independent():
+        # Resend, Sentry, Polar and GitHub only need the project name, so all four are in flight at once
+        barrier.wait(5)
+
+    log = []
+    StepScheduler(graph_steps(log, github=independent, polar=independent, resend=independent,
+                              sentry=independent)).run()
+    assert log[-1] == 'vercel-env'
+
+def test_failure_stops_dependents_but_records_finished_steps():
+    log, done = [], []
+    release = threading.Event()
+
+    def github():
+        release.wait(5)
+        raise RuntimeError("fork failed")
+
+    def polar():
+        log.append('polar')
+        release.set()
+
+    with pytest.raises(RuntimeError, match="fork failed"):
+        StepScheduler(graph_steps(log, github=github, polar=polar),
+                      on_complete=lambda s: done.append(s.name)).run()
+    assert 'polar' in done
+    assert not {'vercel', 'neon', 'clerk', 'vercel-env'} & set(log)
+    assert resume_step(graph_steps([]), done) == 1
+
+def test_interrupted_prompt_still_records_automated_steps_in_flight():
+    done = []
+    started = threading.Event()
+
+    def automated():
+        started.set()
+        time.sleep(0.2)
+
+    def prompt():
+        started.wait(5)
+        raise KeyboardInterrupt
+
+    steps = [Step('automated', 1, automated, (), ('a',)), Step('prompt', 2, prompt, (), ('b',), interactive=True)]
+    with pytest.raises(KeyboardInterrupt):
+        StepScheduler(steps, on_complete=lambda s: done.append(s.name)).run()
+    assert done == ['automated']
+
+def test_steps_finishing_after_a_failure_are_still_recorded():
+    done = []
+
+    def fails():
+        raise RuntimeError("boom")
+
+    def slow():
+        time.sleep(0.1)
+
+    steps = [Step('fails', 1, fails, (), ('a',)), Step('slow', 2, slow, (), ('b',))]
+    with pytest.raises(RuntimeError, match="boom"):
+        StepScheduler(steps, on_complete=lambda s: done.append(s.name)).run()
+    assert done == ['slow']
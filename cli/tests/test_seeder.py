@@ -0,0 +1,23 @@
+"""The mock Polar API the sync cron benchmark runs against"""
+
+import time
+
+import requests
+
+from seeder import MockPolarServer
+
+def test_serves_subscriptions_and_counts_requests():
+    with MockPolarServer() as polar, requests.Session() as session:
+        subscription = session.get(f"{polar.url}/v1/subscriptions/sub_seed_7").json()
+        assert subscription['id'] == 'sub_seed_7' and subscription['status'] == 'active'
+        assert session.get(f"{polar.url}/v1/products/prod_1").status_code == 404
+        assert polar.requests == 2
+
+def test_keep_alive_requests_are_not_delayed():
+    # One connection, as the app's fetch reuses it; delayed ACKs would add ~40ms to every request
+    with MockPolarServer() as polar, requests.Session() as session:
+        session.get(f"{polar.url}/v1/subscriptions/sub_seed_0")
+        started = time.perf_counter()
+        for i in range(20):
+            session.get(f"{polar.url}/v1/subscriptions/sub_seed_{i}")
+        assert (time.perf_counter() - started) / 20 < 0.02
@@ -0,0 +1,21 @@
+"""Startup budget of the commands scripts call many times a day"""
+
+import pytest
+
+from benchmarks import CHEAP_COMMANDS, HEAVY_MODULES, STARTUP_BUDGET_MS, measure_startup
+
+RUNS = 5
+
+@pytest.fixture(scope='module')
+def startup():
+    return measure_startup(RUNS)
+
+@pytest.mark.parametrize('command', [' '.join(args) for args in CHEAP_COMMANDS])
+def test_within_budget(startup, command):
+    elapsed, _ = startup[command]
+    assert elapsed <= STARTUP_BUDGET_MS, f"{command} took {elapsed:.1f}ms"
+
+@pytest.mark.parametrize('command', [' '.join(args) for args in CHEAP_COMMANDS])
+def test_no_heavy_imports(startup, command):
+    _, modules = startup[command]
+    assert not modules, f"{command} imports {', '.join(modules)} (none of {', '.join(HEAVY_MODULES)} allowed)"
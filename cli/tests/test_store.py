@@ -0,0 +1,157 @@
+"""The SQLite project store: concurrent writers, side-table queries and the ProgressManager backend"""
+
+import sys
+import sqlite3
+import threading
+import time
+
+import pytest
+
+import progress as progress_module
+from progress import ProgressManager, SetupProgress
+from store import ProgressStore, StoreBackend
+
+@pytest.fixture
+def store(workdir):
+    store = ProgressStore(str(workdir / 'projects.db'))
+    yield store
+    store.close()
+
+def project(name, step=1, services=()):
+    progress = SetupProgress(project_name=name, current_step=step, completed_services=list(services))
+    for service in services:
+        progress.service_configs[service] = {'name': service.title(), 'credentials': {'id': f'{name}-{service}'}}
+    progress.api_keys[f'{name}_token'] = 'secret'
+    progress.completed_steps.extend(services)
+    return progress
+
+def test_round_trip(store):
+    saved = project('acme', 3, ['github', 'vercel'])
+    store.save(saved)
+    assert store.load('acme').to_dict() == saved.to_dict()
+    assert store.load('missing') is None
+    assert store.updated_at('acme') is not None
+
+def test_resave_replaces_the_side_rows(store):
+    store.save(project('acme', 3, ['github', 'vercel']))
+    store.save(project('acme', 2, ['github']))
+    loaded = store.load('acme')
+    assert loaded.completed_services == ['github'] and list(loaded.service_configs) == ['github']
+    store.delete('acme')
+    assert store.load('acme') is None
+    assert store.query(with_service='github') == []
+
+def test_query_by_step_and_service(store):
+    store.save_many([
+        project('alpha', 5, ['github', 'vercel', 'neon', 'polar']),
+        project('bravo', 5, ['github', 'vercel', 'neon', 'polar', 'sentry']),
+        project('charlie', 8, ['github', 'vercel', 'neon', 'polar', 'clerk', 'resend', 'sentry']),
+    ])
+    assert [p.project_name for p in store.query(step=5)] == ['alpha', 'bravo']
+    assert [p.project_name for p in store.query(with_service='sentry')] == ['bravo', 'charlie']
+    assert [p.project_name for p in store.query(without_service='sentry')] == ['alpha']
+    assert [p.project_name for p in store.query(step=5, without_service='sentry')] == ['alpha']
+    assert [p.project_name for p in store.query(limit=2)] == ['alpha', 'bravo']
+    assert store.query(step=5)[1].completed_services == ['github', 'vercel', 'neon', 'polar', 'sentry']
+
+def test_service_and_step_queries_use_their_indexes(store):
+    conn = store._connect()
+    by_service = conn.execute(
+        "EXPLAIN QUERY PLAN SELECT project_name FROM completed_services WHERE service = ?", ('sentry',)
+    ).fetchall()
+    by_step = conn.execute(
+        "EXPLAIN QUERY PLAN SELECT project_name FROM projects WHERE current_step = ?", (5,)
+    ).fetchall()
+    assert 'idx_completed_service' in str(by_service)
+    assert 'idx_projects_step' in str(by_step)
+
+def test_failed_batch_is_rolled_back(store):
+    with pytest.raises(ValueError, match="without a project name"):
+        store.save_many([project('acme'), SetupProgress()])
+    assert store.load('acme') is None
+
+def test_concurrent_writers(store, workdir):
+    other = ProgressStore(store.path)
+    errors = []
+
+    def write(target, prefix):
+        try:
+            for i in range(25):
+                target.save(project(f'{prefix}-{i:02d}', i % 8 + 1, ['github']))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write, args=(target, f'{n}'))
+               for n, target in enumerate([store, store, other, other])]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    other.close()
+    assert errors == []
+    assert len(store.query(with_service='github')) == 100
+
+def test_writer_waits_for_the_lock_instead_of_failing(store):
+    store.save(project('acme'))
+    holder = sqlite3.connect(store.path, isolation_level=None, check_same_thread=False)
+    holder.execute("BEGIN IMMEDIATE")
+    threading.Timer(0.3, holder.execute, ("COMMIT",)).start()
+    start = time.perf_counter()
+    store.save(project('acme', 4))
+    assert time.perf_counter() - start >= 0.25
+    assert store.load('acme').current_step == 4
+    holder.close()
+
+def test_stores_from_before_per_step_resume_gain_the_column(workdir):
+    path = str(workdir / 'legacy.db')
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE projects (project_name TEXT PRIMARY KEY, current_step INTEGER NOT NULL, "
+                 "api_keys TEXT NOT NULL, updated_at REAL NOT NULL)")
+    conn.execute("INSERT INTO projects VALUES ('acme', 4, '{}', 0)")
+    conn.commit()
+    conn.close()
+    store = ProgressStore(path)
+    assert store.load('acme').completed_steps == []
+    store.close()
+
+def test_progress_manager_round_trip(store, monkeypatch):
+    monkeypatch.setattr(progress_module, '_backend', None)
+    ProgressManager.use_backend(StoreBackend(store, 'acme'))
+    saved = project('', 4, ['github', 'vercel', 'neon'])
+    ProgressManager.save_progress(saved)
+    loaded = ProgressManager.load_progress()
+    assert loaded.project_name == 'acme'
+    assert loaded.to_dict() == saved.to_dict()
+    ProgressManager.clear_progress()
+    assert store.load('acme') is not None
+
+def test_save_while_steps_still_add_keys(store):
+    # Batch steps on the pool keep editing the progress while the main thread saves it
+    live = project('acme', 2, ['github'])
+    stop = threading.Event()
+
+    def edit():
+        i = 0
+        while not stop.is_set():
+            name = f'service_{i % 50}'
+            live.api_keys[name] = 'v'
+            live.service_configs[name] = {'credentials': {'n': i}}
+            if i % 50 == 49:
+                live.api_keys.clear()
+                live.service_configs.clear()
+            i += 1
+
+    # Switch threads as often as possible so the edits land mid-save
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    editor = threading.Thread(target=edit)
+    editor.start()
+    try:
+        for _ in range(200):
+            store.save(live)
+    finally:
+        stop.set()
+        editor.join()
+        sys.setswitchinterval(interval)
+    store.save(live)
+    assert store.load('acme').to_dict() == live.to_dict()
@@ -0,0 +1,132 @@
+"""Template sync against local bare repositories"""
+
+import subprocess
+
+import pytest
+
+from templatesync import MIN_GIT_VERSION, SyncState, TemplateCache, TemplateSync, git_version, open_pull_requests
+
+pytestmark = pytest.mark.skipif(git_version() < MIN_GIT_VERSION, reason="needs git merge-tree --write-tree")
+
+REMOTE = "{root}/forks/{{repo}}.git"
+
+def git(cwd, *args):
+    identity = ['-c', 'user.name=test', '-c', 'user.email=test@localhost', '-c', 'init.defaultBranch=main']
+    return subprocess.run(['git', *identity, *args], cwd=cwd, check=True, capture_output=True, text=True).stdout
+
+def commit(work, path, text, message):
+    (work / path).write_text(text)
+    git(work, 'add', path)
+    git(work, 'commit', '-q', '-m', message)
+
+def fork(root, name, changes=()):
+    """Clone upstream as a bare fork, with the fork's own commits on top"""
+    git(root, 'clone', '-q', '--bare', 'upstream.git', f"forks/{name}.git")
+    if changes:
+        work = root / f"work-{name}"
+        git(root, 'clone', '-q', f"forks/{name}.git", work.name)
+        for path, text in changes:
+            commit(work, path, text, f"{name} change")
+        git(work, 'push', '-q', 'origin', 'main')
+
+@pytest.fixture
+def repos(tmp_path):
+    """upstream.git and five forks, each in a different relation to upstream"""
+    (tmp_path / 'forks').mkdir()
+    work = tmp_path / 'work'
+    work.mkdir()
+    git(work, 'init', '-q')
+    commit(work, 'app.txt', "a\nb\nc\n", "base")
+    commit(work, 'other.txt', "x\n", "other")
+    git(tmp_path, 'init', '-q', '--bare', 'upstream.git')
+    git(work, 'push', '-q', '../upstream.git', 'main')
+
+    fork(tmp_path, 'behind')
+    fork(tmp_path, 'diverged', [('new.txt', "fork\n")])
+    fork(tmp_path, 'conflicting', [('app.txt', "Z\nb\nc\n")])
+    commit(work, 'other.txt', "x\nmore\n", "upstream change")
+    commit(work, 'app.txt', "A\nb\nc\n", "upstream edit")
+    git(work, 'push', '-q', '../upstream.git', 'main')
+    fork(tmp_path, 'current')
+
+    unrelated = tmp_path / 'unrelated'
+    unrelated.mkdir()
+    git(unrelated, 'init', '-q')
+    commit(unrelated, 'u.txt', "u\n", "unrelated")
+    git(tmp_path, 'init', '-q', '--bare', 'forks/unrelated.git')
+    git(unrelated, 'push', '-q', '../forks/unrelated.git', 'main')
+    return tmp_path
+
+FORKS = [(name, f"https://github.com/acme/{name}")
+         for name in ('current', 'behind', 'diverged', 'conflicting', 'unrelated')]
+
+def sync(root, forks=FORKS):
+    cache = TemplateCache(str(root / 'upstream.git'), str(root / 'cache.git'))
+    state = SyncState(str(root / 'state.json'))
+    return {result.project: result for result in TemplateSync(cache, state, 4, REMOTE.format(root=root)).run(forks)}
+
+def test_every_relation_to_upstream(repos):
+    results = sync(repos)
+    assert {name: result.status for name, result in results.items()} == {
+        'current': 'up-to-date', 'behind': 'fast-forward', 'diverged': 'mergeable',
+        'conflicting': 'conflicts', 'unrelated': 'unrelated'}
+    assert (results['behind'].behind, results['behind'].ahead) == (2, 0)
+    assert (results['diverged'].behind, results['diverged'].ahead) == (2, 1)
+    assert results['diverged'].rebase == 'clean'
+    assert results['conflicting'].conflicts == ['app.txt']
+    assert results['conflicting'].rebase == 'conflicts'
+    assert results['conflicting'].rebase_stops_at == results['conflicting'].head
+    assert not any(result.reused for result in results.values())
+
+def test_forks_share_the_cache(repos):
+    sync(repos)
+    refs = git(repos / 'cache.git', 'for-each-ref', '--format=%(refname)')
+    assert 'refs/upstream/main' in refs
+    assert all(f"refs/forks/{name}" in refs for name, _ in FORKS)
+
+def test_rerun_reuses_results_until_a_side_moves(repos):
+    sync(repos)
+    assert all(result.reused for result in sync(repos).values())
+
+    commit(repos / 'work-diverged', 'new.txt', "fork 2\n", "another fork change")
+    git(repos / 'work-diverged', 'push', '-q', 'origin', 'main')
+    results = sync(repos)
+    assert not results['diverged'].reused and results['diverged'].ahead == 2
+    assert results['behind'].reused
+
+    commit(repos / 'work', 'later.txt', "z\n", "upstream later")
+    git(repos / 'work', 'push', '-q', '../upstream.git', 'main')
+    results = sync(repos)
+    assert not any(result.reused for result in results.values())
+    assert results['current'].status == 'fast-forward'
+
+def test_missing_fork_is_an_error_for_that_fork_only(repos):
+    results = sync(repos, FORKS + [('gone', "https://github.com/acme/gone")])
+    assert results['gone'].status == 'error'
+    assert 'git fetch failed' in results['gone'].error
+    assert results['behind'].status == 'fast-forward'
+
+class FakeGitHub:
+    def __init__(self):
+        self.created = []
+
+    def find_pull(self, owner, name, head, base):
+        return {'html_url': f"https://github.com/{owner}/{name}/pull/1"} if name == 'behind' else None
+
+    def create_pull(self, owner, name, head, base, title, body=""):
+        self.created.append((owner, name, head, base))
+        return {'html_url': f"https://github.com/{owner}/{name}/pull/2"}
+
+def test_pull_requests_only_where_upstream_merges_cleanly(repos):
+    results = sync(repos)
+    github = FakeGitHub()
+    open_pull_requests(list(results.values()), github, 'kosuke', state=SyncState(str(repos / 'state.json')))
+    assert github.created == [('acme', 'diverged', 'kosuke:main', 'main')]
+    assert results['behind'].pull_request.endswith('/pull/1')
+    assert not results['conflicting'].pull_request
+
+def test_sync_under_tracing(repos, traced):
+    # Fetches and checks run through one propagated wrapper each, on several threads at once
+    results = sync(repos)
+    assert not any(result.error for result in results.values())
+    assert sum(record['name'] == 'sync.fetch' for record in traced()) == len(FORKS)
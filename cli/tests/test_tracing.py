@@ -0,0 +1,42 @@
+"""Spans across thread hand-offs, and the trace summary"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from tracing import NETWORK, propagate, span, summarize
+
+def test_propagate_without_tracing_is_the_function_itself():
+    def work():
+        pass
+    assert propagate(work) is work
+
+def test_one_wrapper_runs_on_many_threads_at_once(traced):
+    barrier = threading.Barrier(4)
+
+    def work(i):
+        # Every call holds its context until all four are inside it
+        barrier.wait(5)
+        with span('work', NETWORK, item=i):
+            return i * 2
+
+    with span('parent'):
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            assert list(pool.map(propagate(work), range(8))) == [i * 2 for i in range(8)]
+    spans = traced()
+    parent = next(record for record in spans if record['name'] == 'parent')
+    children = [record for record in spans if record['name'] == 'work']
+    assert len(children) == 8
+    assert all(record['parentSpanId'] == parent['spanId'] for record in children)
+
+def test_summarize_by_category_and_name(traced):
+    with span('outer'):
+        with span('call', NETWORK):
+            pass
+        try:
+            with span('call', NETWORK):
+                raise ValueError("boom")
+        except ValueError:
+            pass
+    summary = summarize(traced())
+    assert summary['name']['call']['count'] == 2 and summary['name']['call']['errors'] == 1
+    assert summary['category'][NETWORK]['count'] == 2
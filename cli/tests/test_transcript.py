@@ -0,0 +1,68 @@
+"""Recording wizard answers and replaying them through console.ask"""
+
+import os
+import stat
+
+import pytest
+
+from console import ask
+from envfiles import ensure_cron_secret, write_env_files
+from progress import SetupProgress
+from transcript import (
+    Exchange, Recorder, Replayer, Transcript, TranscriptError, answering, changed_outputs, output_fingerprints,
+)
+
+def wizard(directory):
+    """A two-prompt setup writing env files with a generated CRON_SECRET"""
+    progress = SetupProgress(project_name=ask("\x1b[96mEnter your project name: \x1b[0m").strip())
+    progress.api_keys['sentry_dsn'] = ask("Enter your Sentry DSN: ")
+    ensure_cron_secret(progress)
+    os.makedirs(directory, exist_ok=True)
+    write_env_files(progress, directory)
+
+def test_record_then_replay(workdir, capsys):
+    typed = iter(['acme', 'https://key@o1.ingest.sentry.io/1'])
+    recorder = Recorder(seed=7, prompter=lambda prompt: next(typed))
+    with answering(recorder, recorder.transcript.seed):
+        wizard(str(workdir / 'recorded'))
+    recorder.transcript.outputs = output_fingerprints(str(workdir / 'recorded'))
+    path = str(workdir / 'setup.transcript')
+    recorder.transcript.save(path)
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+
+    transcript = Transcript.load(path)
+    assert [exchange.prompt for exchange in transcript.exchanges] == ["Enter your project name:",
+                                                                      "Enter your Sentry DSN:"]
+    replayer = Replayer(transcript)
+    with answering(replayer, transcript.seed):
+        wizard(str(workdir / 'replayed'))
+    replayer.finish()
+    # The seeded CRON_SECRET makes the replay write the same bytes
+    assert len(transcript.outputs) == 3
+    assert changed_outputs(transcript.outputs, str(workdir / 'replayed')) == []
+    assert "Enter your Sentry DSN: https://key@o1.ingest.sentry.io/1" in capsys.readouterr().out
+
+    # Without the seed the CRON_SECRET differs, and so does every file
+    with answering(Replayer(transcript), seed=None):
+        wizard(str(workdir / 'unseeded'))
+    assert changed_outputs(transcript.outputs, str(workdir / 'unseeded')) == sorted(transcript.outputs)
+
+def test_reworded_prompt_stops_the_replay():
+    replayer = Replayer(Transcript(exchanges=[Exchange("Enter your project name:", 'acme')]))
+    with pytest.raises(TranscriptError, match="Prompt 1: the wizard asked 'Project name\\?'"):
+        replayer("Project name? ")
+
+def test_extra_and_unused_answers():
+    transcript = Transcript(exchanges=[Exchange("First:", '1'), Exchange("Second:", '2')])
+    replayer = Replayer(transcript)
+    assert replayer("First: ") == '1'
+    with pytest.raises(TranscriptError, match="1 transcript answers unused"):
+        replayer.finish()
+    replayer("Second: ")
+    with pytest.raises(TranscriptError, match="after the transcript ended"):
+        replayer("Third: ")
+
+def test_other_versions_are_refused(workdir):
+    (workdir / 'old.transcript').write_text('{"version": 0, "exchanges": []}')
+    with pytest.raises(TranscriptError, match="not a version 1 transcript"):
+        Transcript.load(str(workdir / 'old.transcript'))
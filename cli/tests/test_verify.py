@@ -0,0 +1,110 @@
+"""Concurrent credential verification against local provider stand-ins"""
+
+import time
+import base64
+
+import pytest
+from conftest import StubServer, serve
+
+from progress import SetupProgress
+from verify import CredentialVerifier
+
+PROVIDER_LATENCY = 0.3
+
+class SlowStub(StubServer):
+    """Every answer takes PROVIDER_LATENCY, like a provider across the internet"""
+
+    def answer(self, method, path, body):
+        time.sleep(PROVIDER_LATENCY)
+        return super().answer(method, path, body)
+
+@pytest.fixture
+def slow():
+    yield from serve(SlowStub())
+
+def publishable_key(host: str) -> str:
+    return "pk_test_" + base64.b64encode(f"{host}$".encode()).decode().rstrip('=')
+
+def progress(**keys):
+    progress = SetupProgress(project_name='acme')
+    progress.api_keys.update({
+        'clerk_secret_key': 'sk_test_1', 'clerk_publishable_key': publishable_key('clerk.acme.dev'),
+        'polar_access_token': 'polar_oat_1', 'resend_api_key': 're_1',
+        'sentry_dsn': 'https://public@o1.ingest.sentry.io/42', **keys,
+    })
+    progress.service_configs['polar'] = {'credentials': {'organization_slug': 'acme-org'}}
+    return progress
+
+def verifier(stub):
+    return CredentialVerifier(endpoints={'clerk': stub.url, 'clerk_frontend': stub.url, 'polar': stub.url,
+                                         'resend': stub.url, 'sentry': stub.url})
+
+def accept_everything(stub):
+    stub.add('GET', '/v1/users', 200, [])
+    stub.add('GET', '/v1/environment', 200, {})
+    stub.add('GET', '/v1/organizations/', 200, {'items': [{'slug': 'acme-org'}]})
+    stub.add('GET', '/domains', 200, {'data': []})
+    stub.add('POST', '/api/42/envelope/', 200, {})
+
+def statuses(results):
+    return {f"{r.service}.{r.check}": r.status for r in results}
+
+def test_valid_credentials(stub):
+    accept_everything(stub)
+    setup = progress()
+    assert set(statuses(verifier(stub).verify(setup)).values()) == {'valid'}
+    auth = {path.split('?')[0]: headers.get('Authorization') for _, path, _, headers in stub.requests}
+    assert auth['/v1/users'] == "Bearer sk_test_1" and auth['/domains'] == "Bearer re_1"
+    sentry = next(headers for _, path, _, headers in stub.requests if path.startswith('/api/42'))
+    assert 'sentry_key=public' in sentry['X-Sentry-Auth']
+
+def test_invalid_credentials(stub):
+    stub.add('GET', '/v1/users', 401, {})
+    stub.add('GET', '/v1/environment', 200, {})
+    stub.add('GET', '/v1/organizations/', 200, {'items': [{'slug': 'someone-else'}]})
+    stub.add('GET', '/domains', 403, {})
+    stub.add('POST', '/api/42/envelope/', 401, {})
+    setup = progress(clerk_publishable_key='pk_test_not-base64!')
+    results = {f"{r.service}.{r.check}": r for r in verifier(stub).verify(setup)}
+    assert {name: r.status for name, r in results.items()} == {
+        'clerk.secret_key': 'invalid', 'clerk.publishable_key': 'invalid', 'polar.access_token': 'invalid',
+        'resend.api_key': 'invalid', 'sentry.dsn': 'invalid'}
+    assert "acme-org" in results['polar.access_token'].detail
+
+def test_restricted_resend_key_is_valid(stub):
+    accept_everything(stub)
+    stub.responses[('GET', '/domains')] = [(401, {'name': 'restricted_api_key'}, {})]
+    setup = progress()
+    results = {f"{r.service}.{r.check}": r for r in verifier(stub).verify(setup)}
+    assert results['resend.api_key'].status == 'valid'
+
+def test_provider_errors_and_unreachable_providers(stub):
+    accept_everything(stub)
+    stub.responses[('GET', '/v1/users')] = [(500, {}, {})]
+    setup = progress()
+    endpoints = verifier(stub).endpoints
+    endpoints['resend'] = "http://127.0.0.1:9"
+    results = {f"{r.service}.{r.check}": r for r in CredentialVerifier(endpoints=endpoints).verify(setup)}
+    assert results['clerk.secret_key'].status == 'error' and '500' in results['clerk.secret_key'].detail
+    assert results['resend.api_key'].status == 'error'
+    assert results['polar.access_token'].status == 'valid'
+
+def test_missing_credentials_are_skipped(stub):
+    accept_everything(stub)
+    setup = SetupProgress(project_name='acme')
+    setup.api_keys['resend_api_key'] = 're_1'
+    results = statuses(verifier(stub).verify(setup))
+    assert results.pop('resend.api_key') == 'valid'
+    assert set(results.values()) == {'skipped'}
+    assert [path for _, path, _, _ in stub.requests] == ['/domains']
+
+def test_checks_overlap(slow):
+    accept_everything(slow)
+    setup = progress()
+    started = time.monotonic()
+    results = verifier(slow).verify(setup)
+    elapsed = time.monotonic() - started
+    assert set(statuses(results).values()) == {'valid'}
+    # Five checks of PROVIDER_LATENCY each: close to one of them, far from the sum
+    assert all(r.elapsed >= PROVIDER_LATENCY for r in results)
+    assert elapsed < 2 * PROVIDER_LATENCY
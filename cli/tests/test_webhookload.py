@@ -0,0 +1,101 @@
+"""Signed webhook deliveries, checked by a receiver that verifies them the way the app's routes do"""
+
+import json
+import hmac
+import time
+import base64
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from conftest import serve
+from webhookload import (
+    CLERK_WEBHOOK_PATH, INVALID_SUFFIX, POLAR_WEBHOOK_PATH, WebhookLoadGenerator, build_sources, parse_event_mix,
+    percentile,
+)
+
+POLAR_SECRET = "polar_webhook_secret_1"
+CLERK_SECRET = "whsec_" + base64.b64encode(b"clerk-signing-key").decode()
+TOLERANCE = 300
+
+class SigningReceiver:
+    """Answers 202 to deliveries whose signature checks out and 403 to the rest, recording each one"""
+
+    def __init__(self):
+        self.deliveries = []
+        self.lock = threading.Lock()
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers['Content-Length'])).decode('utf-8')
+                ok = receiver.verify(self.path, dict(self.headers), body)
+                with receiver.lock:
+                    receiver.deliveries.append((self.path, json.loads(body)['type'], ok))
+                self.send_response(202 if ok else 403)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    @staticmethod
+    def verify(path, headers, body) -> bool:
+        if path == POLAR_WEBHOOK_PATH:
+            # @polar-sh/sdk hands standardwebhooks the base64 of the raw secret, which decodes back to it
+            prefix, key = 'webhook', base64.b64decode(base64.b64encode(POLAR_SECRET.encode()))
+        elif path == CLERK_WEBHOOK_PATH:
+            # The Clerk route verifies JSON.stringify of the parsed body
+            body = json.dumps(json.loads(body), separators=(',', ':'), ensure_ascii=False)
+            prefix, key = 'svix', base64.b64decode(CLERK_SECRET[len('whsec_'):])
+        else:
+            return False
+        message_id, timestamp = headers[f"{prefix}-id"], headers[f"{prefix}-timestamp"]
+        if abs(time.time() - int(timestamp)) > TOLERANCE:
+            return False
+        expected = base64.b64encode(hmac.new(key, f"{message_id}.{timestamp}.{body}".encode(),
+                                             hashlib.sha256).digest()).decode()
+        return any(part.partition(',')[2] == expected for part in headers[f"{prefix}-signature"].split())
+
+@pytest.fixture
+def receiver():
+    yield from serve(SigningReceiver())
+
+def generator(receiver, mix, **kwargs):
+    sources = build_sources(POLAR_SECRET, CLERK_SECRET)
+    return WebhookLoadGenerator(receiver.url, sources, parse_event_mix(mix), rate=500, concurrency=4, seed=1, **kwargs)
+
+def test_every_delivery_is_signed_for_its_route(receiver):
+    report = generator(receiver, 'subscription.updated,checkout.updated,user.created,user.deleted').run(requests=40)
+    assert len(receiver.deliveries) == 40
+    assert all(ok for _, _, ok in receiver.deliveries)
+    assert {path for path, _, _ in receiver.deliveries} == {POLAR_WEBHOOK_PATH, CLERK_WEBHOOK_PATH}
+    assert report['total']['statuses'] == {'202': 40}
+
+def test_invalid_ratio_only_breaks_polar_signatures(receiver):
+    report = generator(receiver, 'subscription.created,user.updated', invalid_ratio=1.0).run(requests=20)
+    for path, event, ok in receiver.deliveries:
+        assert ok == (path == CLERK_WEBHOOK_PATH), event
+    statuses = {entry['event']: entry['statuses'] for entry in report['events']}
+    assert set(statuses) <= {f"subscription.created{INVALID_SUFFIX}", 'user.updated'}
+    assert statuses.get(f"subscription.created{INVALID_SUFFIX}", {}).keys() <= {'403'}
+
+def test_unknown_event_and_rate_are_rejected(receiver):
+    with pytest.raises(ValueError, match="No template or secret for: order.created"):
+        generator(receiver, 'order.created')
+    with pytest.raises(ValueError, match="Rate must be positive"):
+        WebhookLoadGenerator(receiver.url, build_sources(POLAR_SECRET), {'subscription.created': 1}, rate=0)
+
+def test_event_mix_and_percentiles():
+    assert parse_event_mix("subscription.updated=5, user.created,") == {'subscription.updated': 5.0,
+                                                                        'user.created': 1.0}
+    assert percentile([], 50) == 0.0
+    assert [percentile(list(range(1, 101)), p) for p in (50, 95, 99, 100)] == [50, 95, 99, 100]
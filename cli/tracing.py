@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Structured spans and profiling for setup runs.
+
+Tracing is off until configure() is called (main.py does so for --trace FILE
+or $KOSUKE_TRACE_FILE); until then span() costs one global lookup. When on,
+every finished span is appended to the trace file as one JSON line using the
+OpenTelemetry (OTLP/JSON) span field names, so the file can be read directly
+or converted for an OTel collector. Each span carries a `kosuke.category`
+attribute - step, human, network, disk or internal - so a run's time can be
+split into waiting for the user, waiting for providers and waiting for disk:
+
+    python tracing.py summarize trace.jsonl [more.jsonl ...]
+
+Profiler wraps a run in cProfile (FILE, readable with pstats or snakeviz) and
+samples every thread's stack on the wall clock (FILE.folded, one
+"frame;frame;frame count" line per stack for flamegraph.pl or speedscope).
+"""
+
+import os
+import sys
+import json
+import time
+import atexit
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+TRACE_ENV_VAR = "KOSUKE_TRACE_FILE"
+SAMPLE_INTERVAL = 0.005
+
+HUMAN = 'human'
+NETWORK = 'network'
+DISK = 'disk'
+STEP = 'step'
+INTERNAL = 'internal'
+
+_current = contextvars.ContextVar('kosuke_span', default=None)
+_exporter = None
+
+class Span:
+    """A timed operation; attributes can be added while it runs"""
+    __slots__ = ('trace_id', 'span_id', 'parent_id', 'name', 'kind', 'attributes', 'start', 'end', 'error')
+
+    def __init__(self, trace_id: str, parent_id: Optional[str], name: str, kind: str, attributes: Dict):
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.attributes = attributes
+        self.start = time.time_ns()
+        self.end = None
+        self.error = None
+
+    def set(self, key: str, value):
+        self.attributes[key] = value
+
+    def to_dict(self) -> Dict:
+        record = {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': f"SPAN_KIND_{self.kind.upper()}",
+            'startTimeUnixNano': str(self.start),
+            'endTimeUnixNano': str(self.end),
+            'durationMs': round((self.end - self.start) / 1e6, 3),
+            'attributes': self.attributes,
+            'status': {'code': 'STATUS_CODE_ERROR', 'message': self.error} if self.error else {'code': 'STATUS_CODE_OK'},
+        }
+        if self.parent_id:
+            record['parentSpanId'] = self.parent_id
+        return record
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def set(self, key: str, value):
+        pass
+
+_NOOP = _NoopSpan()
+
+class JsonLinesExporter:
+    """Appends finished spans to a file, one JSON object per line"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.trace_id = os.urandom(16).hex()
+        self._lock = threading.Lock()
+        self._file = open(path, 'a', buffering=1)
+
+    def export(self, span: Span):
+        line = json.dumps(span.to_dict(), separators=(',', ':'), default=str)
+        with self._lock:
+            if self._file is not None:
+                self._file.write(line + '\n')
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+def configure(path: Optional[str] = None) -> bool:
+    """Start writing spans to path (or $KOSUKE_TRACE_FILE), returning whether tracing is on"""
+    global _exporter
+    path = path or os.environ.get(TRACE_ENV_VAR)
+    if not path:
+        return False
+    if _exporter is None:
+        _exporter = JsonLinesExporter(path)
+        atexit.register(_exporter.close)
+    return True
+
+def enabled() -> bool:
+    return _exporter is not None
+
+@contextmanager
+def span(name: str, category: str = INTERNAL, kind: str = 'internal', **attributes):
+    """Time the enclosed block as a child of the current span"""
+    exporter = _exporter
+    if exporter is None:
+        yield _NOOP
+        return
+
+    parent = _current.get()
+    attributes['kosuke.category'] = category
+    current = Span(parent.trace_id if parent else exporter.trace_id,
+                   parent.span_id if parent else None, name, kind, attributes)
+    token = _current.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        if not (isinstance(e, SystemExit) and not e.code):
+            current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current.reset(token)
+        current.end = time.time_ns()
+        exporter.export(current)
+
+def propagate(fn: Callable) -> Callable:
+    """Run fn in the caller's span context, for work handed to another thread"""
+    if _exporter is None:
+        return fn
+    context = contextvars.copy_context()
+    # A context can only be entered by one thread at a time, so each call runs in its own copy
+    return lambda *args, **kwargs: context.copy().run(fn, *args, **kwargs)
+
+class Profiler:
+    """cProfile plus a wall-clock stack sampler for one run"""
+
+    def __init__(self, path: str, interval: float = SAMPLE_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self.samples: Dict[str, int] = {}
+        self._stop = threading.Event()
+        self._thread = None
+        self._profile = None
+
+    def __enter__(self):
+        import cProfile
+        self._profile = cProfile.Profile()
+        self._thread = threading.Thread(target=self._sample, name='kosuke-profiler', daemon=True)
+        self._thread.start()
+        self._profile.enable()
+        return self
+
+    def __exit__(self, *exc):
+        self._profile.disable()
+        self._stop.set()
+        self._thread.join()
+        self._profile.dump_stats(self.path)
+        with open(f"{self.path}.folded", 'w') as f:
+            for stack, count in sorted(self.samples.items()):
+                f.write(f"{stack} {count}\n")
+        return False
+
+    def _sample(self):
+        # Wall-clock samples include time blocked on input, sockets and disk, which cProfile attributes poorly
+        own = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for thread in threading.enumerate():
+                names[thread.ident] = thread.name
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                key = ';'.join(reversed(stack))
+                self.samples[key] = self.samples.get(key, 0) + 1
+
+def load_spans(paths: List[str]) -> List[Dict]:
+    spans = []
+    for path in paths:
+        with open(path, 'r') as f:
+            for line in f:
+                if line.strip():
+                    spans.append(json.loads(line))
+    return spans
+
+def summarize(spans: List[Dict]) -> Dict[str, Dict[str, Dict]]:
+    """Count, total and max duration in ms per category and per span name"""
+    summary = {'category': {}, 'name': {}}
+    for record in spans:
+        duration = record.get('durationMs', 0.0)
+        for group, key in (('category', record['attributes'].get('kosuke.category', INTERNAL)),
+                           ('name', record['name'])):
+            entry = summary[group].setdefault(key, {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'errors': 0})
+            entry['count'] += 1
+            entry['total_ms'] += duration
+            entry['max_ms'] = max(entry['max_ms'], duration)
+            entry['errors'] += record.get('status', {}).get('code') == 'STATUS_CODE_ERROR'
+    return summary
+
+def print_summary(summary: Dict[str, Dict[str, Dict]], top: int = 20):
+    from console import Colors
+    for group, title in (('category', 'By category'), ('name', f'Slowest spans (top {top})')):
+        rows = sorted(summary[group].items(), key=lambda item: item[1]['total_ms'], reverse=True)[:top]
+        if not rows:
+            continue
+        width = max(len(key) for key, _ in rows)
+        print(f"\n{Colors.BOLD}{title}{Colors.ENDC}")
+        for key, entry in rows:
+            errors = f"  {Colors.FAIL}{entry['errors']} errors{Colors.ENDC}" if entry['errors'] else ''
+            print(f"   {key:<{width}}  {entry['count']:>6}x  total {entry['total_ms'] / 1000:9.3f}s  "
+                  f"max {entry['max_ms']:9.1f}ms{errors}")
+
+def main():
+    if len(sys.argv) < 3 or sys.argv[1] != 'summarize':
+        print(__doc__.strip())
+        sys.exit(2)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    print_summary(summarize(load_spans(sys.argv[2:])))
+
+if __name__ == "__main__":
+    main()
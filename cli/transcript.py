@@ -0,0 +1,136 @@
+"""
+Record and replay transcripts of the interactive wizard.
+
+Every prompt of the wizard goes through `console.ask`. A recording answers
+from the keyboard as usual and notes each prompt, its answer and how long it
+took. A replay feeds the answers back in order, instantly or at a scaled
+pace. Each prompt must match the one that was recorded, so a wizard change
+that adds, drops or rewords a prompt stops the replay at that prompt.
+
+With a seed, the generated CRON_SECRET is drawn from a seeded generator
+instead of the system's, so a replay writes byte-identical env files. The
+transcript keeps a SHA-256 of each env file the recording wrote, and a seeded
+replay is checked against them. Never seed a real setup: the secret becomes
+predictable. Transcripts contain every answer typed, API keys included, so
+they are written readable by the owner only.
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Dict, List, Optional
+
+from console import use_prompter
+from envfiles import ENV_FILES, seed_secrets
+
+TRANSCRIPT_VERSION = 1
+_ANSI = re.compile(r'\x1b\[[0-9;]*m')
+
+class TranscriptError(Exception):
+    """Raised when a replay departs from its transcript"""
+
+def clean_prompt(prompt: str) -> str:
+    """A prompt without colors and surrounding whitespace, as stored in transcripts"""
+    return _ANSI.sub('', prompt).strip()
+
+@dataclass
+class Exchange:
+    """One prompt and the answer given to it"""
+    prompt: str
+    answer: str
+    seconds: float = 0.0
+
+@dataclass
+class Transcript:
+    """The prompts and answers of one wizard run, and fingerprints of the files it wrote"""
+    seed: Optional[int] = None
+    exchanges: List[Exchange] = field(default_factory=list)
+    outputs: Dict[str, str] = field(default_factory=dict)
+
+    def save(self, path: str):
+        data = {'version': TRANSCRIPT_VERSION, **asdict(self)}
+        # Answers include API keys
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, indent=2)
+
+    @classmethod
+    def load(cls, path: str) -> 'Transcript':
+        with open(path, 'r') as f:
+            data = json.load(f)
+        if data.get('version') != TRANSCRIPT_VERSION:
+            raise TranscriptError(f"{path} is not a version {TRANSCRIPT_VERSION} transcript")
+        return cls(data.get('seed'), [Exchange(**exchange) for exchange in data.get('exchanges', [])],
+                   data.get('outputs', {}))
+
+class Recorder:
+    """Answers prompts from the keyboard, noting each prompt, answer and time taken"""
+
+    def __init__(self, seed: Optional[int] = None, prompter: Optional[Callable[[str], str]] = None):
+        self.transcript = Transcript(seed)
+        self.prompter = prompter
+
+    def __call__(self, prompt: str) -> str:
+        started = time.monotonic()
+        answer = (self.prompter or input)(prompt)
+        self.transcript.exchanges.append(Exchange(clean_prompt(prompt), answer,
+                                                  round(time.monotonic() - started, 3)))
+        return answer
+
+class Replayer:
+    """Answers prompts from a transcript, checking each prompt is the one recorded"""
+
+    def __init__(self, transcript: Transcript, speed: float = 0.0):
+        self.transcript = transcript
+        self.speed = speed
+        self.position = 0
+
+    def __call__(self, prompt: str) -> str:
+        asked = clean_prompt(prompt)
+        if self.position >= len(self.transcript.exchanges):
+            raise TranscriptError(f"The wizard asked {asked!r} after the transcript ended")
+        exchange = self.transcript.exchanges[self.position]
+        if asked != exchange.prompt:
+            raise TranscriptError(f"Prompt {self.position + 1}: the wizard asked {asked!r}, "
+                                  f"the transcript answers {exchange.prompt!r}")
+        self.position += 1
+        if self.speed:
+            time.sleep(exchange.seconds * self.speed)
+        print(f"{prompt}{exchange.answer}")
+        return exchange.answer
+
+    def finish(self):
+        left = len(self.transcript.exchanges) - self.position
+        if left:
+            raise TranscriptError(f"The wizard finished with {left} transcript answers unused")
+
+def output_fingerprints(directory: str = '.') -> Dict[str, str]:
+    """SHA-256 of each env file in the directory"""
+    fingerprints = {}
+    for name in ENV_FILES.values():
+        try:
+            with open(os.path.join(directory, name), 'rb') as f:
+                fingerprints[name] = hashlib.sha256(f.read()).hexdigest()
+        except FileNotFoundError:
+            pass
+    return fingerprints
+
+def changed_outputs(expected: Dict[str, str], directory: str = '.') -> List[str]:
+    """Env files missing, added or different compared with the recording"""
+    actual = output_fingerprints(directory)
+    return sorted(name for name in expected.keys() | actual.keys() if expected.get(name) != actual.get(name))
+
+@contextmanager
+def answering(prompter: Callable[[str], str], seed: Optional[int] = None):
+    """Route the wizard's prompts to the prompter, with seeded secrets, for the duration"""
+    use_prompter(prompter)
+    seed_secrets(seed)
+    try:
+        yield prompter
+    finally:
+        use_prompter(None)
+        seed_secrets(None)
@@ -0,0 +1,43 @@
+"""
+Input validation shared by the interactive wizard and the headless commands.
+"""
+
+import re
+
+
+def normalize_project_name(raw: str) -> str:
+    """Convert a free-form name to kebab-case, returning '' if nothing is left"""
+    # Convert to kebab-case
+    project_name = raw.strip().lower().replace(' ', '-').replace('_', '-')
+    # Remove special characters except hyphens
+    project_name = re.sub(r'[^a-z0-9-]', '', project_name)
+    # Remove leading/trailing hyphens and multiple consecutive hyphens
+    project_name = re.sub(r'^-+|-+$', '', project_name)
+    project_name = re.sub(r'-+', '-', project_name)
+    return project_name
+
+def validate_github_url(url: str, expected_name: str) -> bool:
+    """Validate GitHub repository URL"""
+    pattern = r'https://github\.com/[^/]+/' + re.escape(expected_name) + r'/?$'
+    return bool(re.match(pattern, url))
+
+def is_github_token(value: str) -> bool:
+    return value.startswith(('ghp_', 'github_pat_', 'gho_'))
+
+def is_clerk_publishable_key(value: str) -> bool:
+    return value.startswith('pk_test_') or value.startswith('pk_live_')
+
+def is_clerk_secret_key(value: str) -> bool:
+    return value.startswith('sk_test_') or value.startswith('sk_live_')
+
+def is_clerk_webhook_secret(value: str) -> bool:
+    return value.startswith('whsec_')
+
+def is_polar_token(value: str) -> bool:
+    return value.startswith('polar_oat_')
+
+def is_resend_api_key(value: str) -> bool:
+    return value.startswith('re_')
+
+def is_sentry_dsn(value: str) -> bool:
+    return value.startswith('https://') and '.ingest.sentry.io' in value
@@ -0,0 +1,88 @@
+"""
+Concurrent credential verification.
+
+Checks every configured Clerk, Polar, Resend and Sentry credential against the
+provider's API at the same time over one pooled session, so a full
+verification takes about as long as the slowest provider.
+"""
+
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import requests
+
+from console import Colors
+from tracing import propagate
+from progress import SetupProgress
+from services import (
+    create_session, VerificationResult, ClerkService, PolarService, ResendService, SentryService,
+    DEFAULT_TIMEOUT,
+)
+
+logger = logging.getLogger(__name__)
+
+class CredentialVerifier:
+    """Verifies the credentials of a SetupProgress against the provider APIs"""
+
+    def __init__(self, session: Optional[requests.Session] = None, endpoints: Optional[Dict[str, str]] = None,
+                 timeout=DEFAULT_TIMEOUT):
+        """`endpoints` overrides base URLs by key: clerk, clerk_frontend, polar, resend, sentry"""
+        self.session = session or create_session()
+        self.endpoints = endpoints or {}
+        self.timeout = timeout
+
+    def checks(self, progress: SetupProgress) -> List[tuple]:
+        """Build the (service, check, value, callable) list for the configured credentials"""
+        keys = progress.api_keys
+        polar_config = progress.service_configs.get('polar', {}).get('credentials', {})
+        shared = {'session': self.session, 'timeout': self.timeout}
+
+        clerk = ClerkService(self.endpoints.get('clerk'), self.endpoints.get('clerk_frontend'), **shared)
+        polar = PolarService(polar_config.get('environment', 'sandbox'), self.endpoints.get('polar'), **shared)
+        resend = ResendService(self.endpoints.get('resend'), **shared)
+        sentry = SentryService(self.endpoints.get('sentry'), **shared)
+
+        return [
+            ('clerk', 'secret_key', keys.get('clerk_secret_key'), clerk.verify_secret_key),
+            ('clerk', 'publishable_key', keys.get('clerk_publishable_key'), clerk.verify_publishable_key),
+            ('polar', 'access_token', keys.get('polar_access_token'),
+             lambda token: polar.verify_access_token(token, polar_config.get('organization_slug', ''))),
+            ('resend', 'api_key', keys.get('resend_api_key'), resend.verify_api_key),
+            ('sentry', 'dsn', keys.get('sentry_dsn'), sentry.verify_dsn),
+        ]
+
+    def verify(self, progress: SetupProgress) -> List[VerificationResult]:
+        """Run every check concurrently and return the results in a stable order"""
+        checks = self.checks(progress)
+        with ThreadPoolExecutor(max_workers=len(checks)) as pool:
+            futures = [pool.submit(propagate(self.run_check), service, check, value, fn)
+                       for service, check, value, fn in checks]
+            return [future.result() for future in futures]
+
+    @staticmethod
+    def run_check(service: str, check: str, value: Optional[str],
+                  fn: Callable[[str], VerificationResult]) -> VerificationResult:
+        """Run one check, turning missing values and network failures into results"""
+        if not value:
+            return VerificationResult(service, check, 'skipped', "not configured")
+        started = time.monotonic()
+        try:
+            result = fn(value)
+        except requests.Timeout:
+            result = VerificationResult(service, check, 'error', "timed out")
+        except (requests.RequestException, ValueError) as e:
+            result = VerificationResult(service, check, 'error', str(e))
+        result.elapsed = time.monotonic() - started
+        return result
+
+def print_results(results: List[VerificationResult], total: Optional[float] = None):
+    """Print the verification results as a single table"""
+    colors = {'valid': Colors.OKGREEN, 'invalid': Colors.FAIL, 'error': Colors.WARNING, 'skipped': Colors.OKCYAN}
+    print(f"\n{Colors.BOLD}🔑 Credential Verification:{Colors.ENDC}")
+    for r in results:
+        name = f"{r.service}.{r.check}"
+        print(f"   {name:<24} {colors.get(r.status, '')}{r.status:<8}{Colors.ENDC} {r.elapsed*1000:7.0f}ms  {r.detail}")
+    if total is not None:
+        print(f"   {'total':<24} {'':<8} {total*1000:7.0f}ms")
@@ -0,0 +1,326 @@
+"""
+Signed webhook load generator.
+
+Fires correctly signed Polar and Clerk webhook deliveries at a running app
+(e.g. a local `next start`) at a fixed open-loop rate, and reports throughput
+and p50/p95/p99 latency per event type:
+
+    python main.py webhook-load --url http://localhost:3000 --rate 200 --duration 30
+
+Polar deliveries follow the Standard Webhooks scheme (webhook-id,
+webhook-timestamp and webhook-signature headers, keyed with the raw secret the
+way @polar-sh/sdk's validateEvent does); Clerk deliveries follow Svix
+(svix-* headers, keyed with the base64 part of the whsec_ secret). Each
+delivery is rendered from a JSON template in which $seq, $uuid, $user_id, $now
+and $period_end are substituted, so every request refers to its own
+subscription or user. Built-in templates cover every event the two routes
+handle; `--templates DIR` loads `<event type>.json` files instead, for
+example payloads copied from Polar's delivery log.
+
+Open loop means requests are scheduled at `--rate` per second whatever the
+app's response time, and latency is measured from the scheduled send time, so
+queueing behind a slow app shows up in the percentiles instead of silently
+lowering the request rate. `--invalid-ratio` sends that share of Polar
+deliveries with a wrong signature; those walk every header variant the billing
+route tries before it answers 403.
+"""
+
+import os
+import json
+import hmac
+import math
+import time
+import uuid
+import base64
+import random
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from string import Template
+from typing import Dict, List, Optional, Tuple
+
+from console import Colors, print_info
+
+POLAR_WEBHOOK_PATH = "/api/billing/webhook"
+CLERK_WEBHOOK_PATH = "/api/clerk/webhook"
+DEFAULT_URL = "http://localhost:3000"
+DEFAULT_RATE = 50.0
+DEFAULT_DURATION = 10.0
+DEFAULT_CONCURRENCY = 32
+REQUEST_TIMEOUT = (3.05, 30)
+INVALID_SUFFIX = " (bad signature)"
+
+def _subscription(status: str, canceled: bool = False) -> Dict:
+    return {
+        'id': "sub_$seq",
+        'created_at': "$now",
+        'modified_at': "$now",
+        'amount': 2000,
+        'currency': 'usd',
+        'recurring_interval': 'month',
+        'status': status,
+        'current_period_start': "$now",
+        'current_period_end': "$period_end",
+        'cancel_at_period_end': canceled,
+        'canceled_at': "$now" if canceled else None,
+        'started_at': "$now",
+        'ends_at': "$period_end" if canceled else None,
+        'ended_at': None,
+        'customer_id': "cus_$seq",
+        'product_id': "prod_pro",
+        'discount_id': None,
+        'checkout_id': "chk_$seq",
+        'metadata': {'userId': "$user_id", 'tier': 'pro'},
+        'customer': {'id': "cus_$seq", 'email': "load-$seq@example.com", 'metadata': {'userId': "$user_id"}},
+    }
+
+def _checkout(status: str) -> Dict:
+    return {
+        'id': "chk_$seq",
+        'created_at': "$now",
+        'modified_at': "$now",
+        'status': status,
+        'product_id': "prod_pro",
+        'amount': 2000,
+        'currency': 'usd',
+        'metadata': {'userId': "$user_id", 'tier': 'pro'},
+    }
+
+def _clerk_user() -> Dict:
+    return {
+        'id': "$user_id",
+        'object': 'user',
+        'email_addresses': [{'id': "idn_$seq", 'email_address': "load-$seq@example.com"}],
+        'first_name': 'Load',
+        'last_name': "Test $seq",
+        'image_url': "https://img.clerk.com/$seq",
+        'created_at': 0,
+        'updated_at': 0,
+    }
+
+# Every event the billing and Clerk webhook routes handle
+POLAR_TEMPLATES = {
+    'subscription.created': _subscription('active'),
+    'subscription.updated': _subscription('active'),
+    'subscription.active': _subscription('active'),
+    'subscription.canceled': _subscription('active', canceled=True),
+    'subscription.uncanceled': _subscription('active'),
+    'checkout.created': _checkout('open'),
+    'checkout.updated': _checkout('succeeded'),
+    'customer.created': {'id': "cus_$seq", 'created_at': "$now", 'email': "load-$seq@example.com",
+                         'metadata': {'userId': "$user_id"}},
+}
+CLERK_TEMPLATES = {
+    'user.created': _clerk_user(),
+    'user.updated': _clerk_user(),
+    'user.deleted': {'id': "$user_id", 'object': 'user', 'deleted': True},
+}
+
+def compact_json(value) -> str:
+    # Matches JSON.stringify, which the Clerk route re-serializes the body with before verifying
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False)
+
+def standard_webhook_signature(key: bytes, message_id: str, timestamp: int, body: str) -> str:
+    """`v1,<base64 HMAC-SHA256 of "id.timestamp.body">`, shared by Standard Webhooks and Svix"""
+    digest = hmac.new(key, f"{message_id}.{timestamp}.{body}".encode('utf-8'), hashlib.sha256).digest()
+    return f"v1,{base64.b64encode(digest).decode('ascii')}"
+
+def polar_key(secret: str) -> bytes:
+    # validateEvent base64-encodes the raw secret before handing it to standardwebhooks
+    return secret.encode('utf-8')
+
+def svix_key(secret: str) -> bytes:
+    return base64.b64decode(secret[len('whsec_'):] if secret.startswith('whsec_') else secret)
+
+@dataclass
+class EventSource:
+    """One webhook route: its path, header prefix, signing key and templates"""
+    name: str
+    path: str
+    header_prefix: str
+    key: bytes
+    templates: Dict[str, Template]
+
+    def sign(self, body: str, valid: bool = True) -> Dict[str, str]:
+        message_id = f"msg_{uuid.uuid4().hex}"
+        timestamp = int(time.time())
+        signature = standard_webhook_signature(self.key if valid else b'not-the-secret', message_id, timestamp, body)
+        return {
+            f"{self.header_prefix}-id": message_id,
+            f"{self.header_prefix}-timestamp": str(timestamp),
+            f"{self.header_prefix}-signature": signature,
+            'Content-Type': 'application/json',
+        }
+
+def load_templates(defaults: Dict[str, Dict], directory: Optional[str] = None) -> Dict[str, Template]:
+    """Event type -> payload template, with `<event type>.json` files in directory taking precedence"""
+    payloads = {event: {'type': event, 'data': data} for event, data in defaults.items()}
+    if directory:
+        for event in payloads:
+            path = os.path.join(directory, f"{event}.json")
+            if os.path.exists(path):
+                with open(path, 'r') as f:
+                    payloads[event] = json.load(f)
+    return {event: Template(compact_json(payload)) for event, payload in payloads.items()}
+
+def render(template: Template, seq: int) -> str:
+    now = datetime.now(timezone.utc)
+    return template.safe_substitute(
+        seq=seq,
+        uuid=uuid.uuid4().hex,
+        user_id=f"user_load_{seq}",
+        now=now.isoformat().replace('+00:00', 'Z'),
+        period_end=(now + timedelta(days=30)).isoformat().replace('+00:00', 'Z'),
+    )
+
+def parse_event_mix(spec: str) -> Dict[str, float]:
+    """`subscription.updated=5,user.created` -> {'subscription.updated': 5.0, 'user.created': 1.0}"""
+    mix = {}
+    for part in filter(None, (p.strip() for p in spec.split(','))):
+        event, _, weight = part.partition('=')
+        mix[event.strip()] = float(weight) if weight else 1.0
+    return mix
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, min(len(sorted_values), math.ceil(p / 100 * len(sorted_values))))
+    return sorted_values[rank - 1]
+
+@dataclass
+class EventStats:
+    """Outcomes for one event type"""
+    event: str
+    latencies: List[float] = field(default_factory=list)
+    statuses: Dict[str, int] = field(default_factory=dict)
+
+    def record(self, status: str, latency: float):
+        self.latencies.append(latency)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    def summary(self) -> Dict:
+        latencies = sorted(self.latencies)
+        return {
+            'event': self.event,
+            'requests': len(latencies),
+            'statuses': dict(sorted(self.statuses.items())),
+            'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+            'max_ms': round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        }
+
+class WebhookLoadGenerator:
+    """Schedules signed deliveries at a fixed rate and records their latency"""
+
+    def __init__(self, url: str, sources: List[EventSource], mix: Dict[str, float], rate: float = DEFAULT_RATE,
+                 concurrency: int = DEFAULT_CONCURRENCY, invalid_ratio: float = 0.0, seed: Optional[int] = None,
+                 session=None):
+        self.url = url.rstrip('/')
+        self.by_event: Dict[str, Tuple[EventSource, Template]] = {}
+        for source in sources:
+            for event, template in source.templates.items():
+                self.by_event[event] = (source, template)
+        unknown = sorted(set(mix) - set(self.by_event))
+        if unknown:
+            raise ValueError(f"No template or secret for: {', '.join(unknown)}")
+        if rate <= 0:
+            raise ValueError("Rate must be positive")
+        self.events = list(mix)
+        self.weights = [mix[event] for event in self.events]
+        self.rate = rate
+        self.concurrency = max(1, concurrency)
+        self.invalid_ratio = invalid_ratio
+        self.random = random.Random(seed)
+        if session is None:
+            from services import create_session
+            session = create_session(self.concurrency)
+        self.session = session
+        self.stats: Dict[str, EventStats] = {}
+        self._lock = threading.Lock()
+        self.elapsed = 0.0
+        self.max_lag = 0.0
+
+    def plan(self, count: int) -> List[Tuple[str, bool]]:
+        """The (event, valid signature) sequence to send, drawn up front so sending stays cheap"""
+        events = self.random.choices(self.events, self.weights, k=count)
+        return [(event, not (self.by_event[event][0].name == 'polar' and self.random.random() < self.invalid_ratio))
+                for event in events]
+
+    def run(self, duration: float = DEFAULT_DURATION, requests: Optional[int] = None) -> Dict:
+        """Send for duration seconds (or exactly `requests` deliveries) and return the report"""
+        count = requests if requests is not None else max(1, int(duration * self.rate))
+        plan = self.plan(count)
+        interval = 1.0 / self.rate
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            for seq, (event, valid) in enumerate(plan):
+                scheduled = started + seq * interval
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    self.max_lag = max(self.max_lag, -delay)
+                pool.submit(self._send, seq, event, valid, scheduled)
+        self.elapsed = time.perf_counter() - started
+        return self.report()
+
+    def _send(self, seq: int, event: str, valid: bool, scheduled: float):
+        source, template = self.by_event[event]
+        body = render(template, seq)
+        try:
+            response = self.session.post(f"{self.url}{source.path}", data=body.encode('utf-8'),
+                                         headers=source.sign(body, valid), timeout=REQUEST_TIMEOUT)
+            status = str(response.status_code)
+        except Exception as e:
+            status = type(e).__name__
+        latency = time.perf_counter() - scheduled
+        key = event if valid else f"{event}{INVALID_SUFFIX}"
+        with self._lock:
+            self.stats.setdefault(key, EventStats(key)).record(status, latency)
+
+    def report(self) -> Dict:
+        total = EventStats('all')
+        for stats in self.stats.values():
+            total.latencies.extend(stats.latencies)
+            for status, n in stats.statuses.items():
+                total.statuses[status] = total.statuses.get(status, 0) + n
+        sent = len(total.latencies)
+        return {
+            'url': self.url,
+            'target_rate': self.rate,
+            'achieved_rate': round(sent / self.elapsed, 2) if self.elapsed else 0.0,
+            'concurrency': self.concurrency,
+            'duration_s': round(self.elapsed, 3),
+            'max_schedule_lag_ms': round(self.max_lag * 1000, 2),
+            'events': [self.stats[key].summary() for key in sorted(self.stats)],
+            'total': total.summary(),
+        }
+
+def build_sources(polar_secret: str = "", clerk_secret: str = "", templates_dir: Optional[str] = None) -> List[EventSource]:
+    """Event sources for the secrets that are available"""
+    sources = []
+    if polar_secret:
+        sources.append(EventSource('polar', POLAR_WEBHOOK_PATH, 'webhook', polar_key(polar_secret),
+                                   load_templates(POLAR_TEMPLATES, templates_dir)))
+    if clerk_secret:
+        sources.append(EventSource('clerk', CLERK_WEBHOOK_PATH, 'svix', svix_key(clerk_secret),
+                                   load_templates(CLERK_TEMPLATES, templates_dir)))
+    return sources
+
+def print_report(report: Dict):
+    """Print the per-event latency table"""
+    print(f"\n{Colors.BOLD}{'event':<40} {'sent':>6}  {'p50':>8}  {'p95':>8}  {'p99':>8}  {'max':>8}  statuses{Colors.ENDC}")
+    for row in report['events'] + [report['total']]:
+        statuses = ', '.join(f"{status}×{n}" for status, n in row['statuses'].items())
+        color = Colors.BOLD if row is report['total'] else ''
+        print(f"{color}{row['event']:<40} {row['requests']:>6}  {row['p50_ms']:>6.1f}ms  {row['p95_ms']:>6.1f}ms  "
+              f"{row['p99_ms']:>6.1f}ms  {row['max_ms']:>6.1f}ms  {statuses}{Colors.ENDC if color else ''}")
+    print_info(f"{report['total']['requests']} requests in {report['duration_s']:.2f}s: "
+               f"{report['achieved_rate']:.1f}/s achieved of {report['target_rate']:.1f}/s target")
+    if report['max_schedule_lag_ms'] > 10:
+        print_info(f"The generator fell up to {report['max_schedule_lag_ms']:.0f}ms behind schedule; "
+                   "latencies include that delay")
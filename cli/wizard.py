@@ -0,0 +1,957 @@
+"""
+Interactive setup wizard.
+
+Walks through each service with manual guidance, prompting for the resulting
+credentials, and saves progress after every step so it can be resumed.
+"""
+
+import time
+import logging
+from typing import List, Optional
+
+from console import Colors, ask, print_success, print_error, print_warning, print_info, print_step
+from progress import ServiceConfig, SetupProgress, ProgressManager
+from scheduler import Step, StepScheduler, setup_steps, legacy_completed_steps, resume_step
+from envfiles import DEVELOPMENT, PREVIEW, PRODUCTION, ensure_cron_secret, write_env_files
+from validation import (
+    normalize_project_name, validate_github_url, is_github_token, is_clerk_publishable_key, is_clerk_secret_key,
+    is_clerk_webhook_secret, is_polar_token, is_resend_api_key, is_sentry_dsn,
+)
+
+logger = logging.getLogger(__name__)
+
+# Constants
+KOSUKE_REPO_URL = "https://github.com/filopedraz/kosuke-template"
+KOSUKE_REPO_OWNER = "filopedraz"
+KOSUKE_REPO_NAME = "kosuke-template"
+
+class InteractiveSetup:
+    """Main interactive setup coordinator"""
+    
+    def __init__(self, project_name: str = ""):
+        self.progress = ProgressManager.load_progress() or SetupProgress()
+        self.total_steps = 8
+        self.project_name = project_name
+    
+    def start(self, resume: Optional[bool] = None):
+        """Start or resume the interactive setup, asking whether to resume unless told"""
+        self.print_banner()
+        
+        # Check if resuming
+        if self.progress.current_step > 1 or self.progress.completed_steps:
+            if resume is None:
+                resume = self.ask_resume()
+            if resume:
+                print_info(f"Resuming from Step {self.progress.current_step}")
+            else:
+                print_info("Starting fresh setup...")
+                self.progress = SetupProgress()
+                ProgressManager.clear_progress()
+        else:
+            self.progress = SetupProgress()
+            ProgressManager.clear_progress()
+        
+        # Get project name if not set
+        if not self.progress.project_name and self.project_name:
+            self.progress.project_name = self.project_name
+            ProgressManager.save_progress(self.progress)
+        if not self.progress.project_name:
+            self.progress.project_name = self.get_project_name()
+            ProgressManager.save_progress(self.progress)
+        
+        # Execute steps in dependency order, skipping the ones already completed
+        steps = self.build_steps()
+        if not self.progress.completed_steps and self.progress.current_step > 1:
+            self.progress.completed_steps = legacy_completed_steps(steps, self.progress.current_step)
+        StepScheduler(steps, self.progress.completed_steps, on_complete=self.complete_step).run()
+        
+        # Generate .env and complete setup
+        self.generate_env_file()
+        self.print_completion_summary()
+        ProgressManager.clear_progress()
+    
+    def build_steps(self) -> List[Step]:
+        """Setup steps with their declared inputs and outputs"""
+        # Every step prompts for its credentials, so the wizard stays serial; batch.py runs them unattended
+        return setup_steps({
+            'github': self.step_1_github_manual,
+            'vercel': self.step_2_vercel_manual,
+            'neon': self.step_3_neon_manual,
+            'polar': self.step_polar_billing,
+            'clerk': self.step_5_clerk_manual,
+            'resend': self.step_6_resend_manual,
+            'sentry': self.step_7_sentry_manual,
+            'vercel-env': self.step_8_vercel_env_vars,
+        }, interactive=True)
+    
+    def complete_step(self, step: Step):
+        """Record a finished step so resume skips it"""
+        self.progress.completed_steps.append(step.name)
+        self.progress.current_step = resume_step(self.build_steps(), self.progress.completed_steps)
+        ProgressManager.save_progress(self.progress)
+    
+    def print_banner(self):
+        """Print the application banner"""
+        banner = f"""
+{Colors.HEADER}{Colors.BOLD}
+╔══════════════════════════════════════════════════════════════╗
+║            🤖 KOSUKE TEMPLATE INTERACTIVE SETUP 🤖           ║
+║                                                              ║
+║  Step-by-step guided setup with progress saving:            ║
+║  1. GitHub Repository (Manual guided fork)                  ║
+║  2. Vercel Project (Manual guided setup)                    ║
+║  3. Neon Database (Manual guided setup)                     ║
+║  4. Polar Billing (Manual product creation)                 ║
+║  5. Clerk Authentication (Manual app creation)              ║
+║  6. Resend Email Service (Manual API key setup)             ║
+║  7. Sentry Error Monitoring (Manual project creation)       ║
+║  8. Vercel Environment Variables (Critical for deployment)  ║
+╚══════════════════════════════════════════════════════════════╝
+{Colors.ENDC}
+        """
+        print(banner)
+    
+    def ask_resume(self) -> bool:
+        """Ask user if they want to resume previous setup"""
+        print_warning(f"Found previous setup in progress (Step {self.progress.current_step})")
+        print_info(f"Project: {self.progress.project_name}")
+        print_info(f"Completed: {', '.join(self.progress.completed_services)}")
+        
+        while True:
+            resume = ask(f"{Colors.OKCYAN}Resume previous setup? (y/n): {Colors.ENDC}").strip().lower()
+            if resume in ['y', 'yes']:
+                return True
+            elif resume in ['n', 'no']:
+                return False
+            print_error("Please enter 'y' or 'n'")
+    
+    def get_project_name(self) -> str:
+        """Get project name from user"""
+        print_info("Let's start by choosing a project name!")
+        print()
+        print(f"{Colors.BOLD}📋 Project name format (kebab-case):{Colors.ENDC}")
+        print(f"   • Use lowercase letters, numbers, and hyphens only")
+        print(f"   • Examples: {Colors.OKCYAN}open-idealista{Colors.ENDC}, {Colors.OKCYAN}my-awesome-app{Colors.ENDC}, {Colors.OKCYAN}startup-mvp{Colors.ENDC}")
+        print(f"   • This will be your GitHub repository name and Vercel project name")
+        print()
+        
+        while True:
+            project_name = ask(f"{Colors.OKCYAN}Enter your project name (kebab-case): {Colors.ENDC}").strip()
+            if project_name:
+                project_name = normalize_project_name(project_name)
+                
+                if project_name and not project_name.startswith('-') and not project_name.endswith('-'):
+                    print_success(f"Project name: {project_name}")
+                    return project_name
+            print_error("Please enter a valid project name in kebab-case format (e.g., 'open-idealista')")
+    
+    def step_1_github_manual(self):
+        """Step 1: Manual GitHub repository fork"""
+        print_step(1, self.total_steps, "GitHub Repository (Manual)")
+
+        if self.fork_automatically():
+            return
+
+        print_info("We'll guide you through forking the Kosuke template repository.")
+        print()
+        
+        print(f"{Colors.BOLD}📋 Instructions:{Colors.ENDC}")
+        print(f"1. Open this URL in your browser: {Colors.OKBLUE}{KOSUKE_REPO_URL}{Colors.ENDC}")
+        print(f"2. Click the {Colors.BOLD}'Fork'{Colors.ENDC} button in the top-right corner")
+        print(f"3. {Colors.WARNING}Important:{Colors.ENDC} Change the repository name to: {Colors.OKCYAN}{self.progress.project_name}{Colors.ENDC}")
+        print(f"4. Click {Colors.BOLD}'Create fork'{Colors.ENDC}")
+        print(f"5. Wait for the fork to complete")
+        
+        ask(f"\n{Colors.OKCYAN}Press Enter when you've completed the fork...{Colors.ENDC}")
+        
+        # Get the forked repository URL
+        while True:
+            repo_url = ask(f"{Colors.OKCYAN}Enter your forked repository URL: {Colors.ENDC}").strip()
+            if self.validate_github_url(repo_url, self.progress.project_name):
+                self.progress.api_keys['github_repo_url'] = repo_url
+                self.progress.completed_services.append('github')
+                print_success(f"GitHub repository configured: {repo_url}")
+                break
+            else:
+                print_error("Invalid repository URL or name doesn't match project name")
+    
+    def fork_automatically(self) -> bool:
+        """Offer to fork the template through the GitHub API, returning whether it worked"""
+        while True:
+            answer = ask(f"\n{Colors.OKCYAN}Fork the template automatically with a GitHub token? (y/n): {Colors.ENDC}").strip().lower()
+            if answer in ['n', 'no']:
+                return False
+            if answer in ['y', 'yes']:
+                break
+            print_error("Please enter 'y' or 'n'")
+
+        # The HTTP stack is only loaded once the user opts in
+        import requests
+        from githubsetup import ForkManager, GitHubSetupError, print_fork_result
+        from services import ServiceError
+
+        print(f"\n{Colors.BOLD}📋 Create a GitHub Token:{Colors.ENDC}")
+        print(f"1. Go to: {Colors.OKBLUE}https://github.com/settings/tokens{Colors.ENDC}")
+        print(f"2. Generate a classic token with the {Colors.OKCYAN}repo{Colors.ENDC} scope")
+        print(f"3. Copy the token (starts with 'ghp_')")
+
+        while True:
+            token = ask(f"\n{Colors.OKCYAN}Enter your GitHub token: {Colors.ENDC}").strip()
+            if is_github_token(token):
+                break
+            print_error("Invalid token format. Token should start with 'ghp_' or 'github_pat_'")
+        organization = ask(f"{Colors.OKCYAN}Fork into organization (Enter for your account): {Colors.ENDC}").strip()
+
+        print_info(f"Forking {KOSUKE_REPO_OWNER}/{KOSUKE_REPO_NAME} as {self.progress.project_name}...")
+        manager = ForkManager(token, KOSUKE_REPO_OWNER, KOSUKE_REPO_NAME, organization)
+        try:
+            result = manager.fork(self.progress.project_name)
+        except (GitHubSetupError, ServiceError, requests.RequestException) as e:
+            print_error(f"Automatic fork failed: {e}")
+            print_info("Falling back to manual setup.")
+            return False
+
+        print_fork_result(result, manager)
+        self.progress.api_keys['github_repo_url'] = result.repo_url
+        self.progress.completed_services.append('github')
+        print_success(f"GitHub repository configured: {result.repo_url}")
+        return True
+
+    def validate_github_url(self, url: str, expected_name: str) -> bool:
+        """Validate GitHub repository URL"""
+        return validate_github_url(url, expected_name)
+    
+    def step_2_vercel_manual(self):
+        """Step 2: Manual Vercel project creation"""
+        print_step(2, self.total_steps, "Vercel Project (Manual)")
+        
+        print_info("We'll guide you through creating your Vercel project manually.")
+        print_info("This ensures everything works correctly and you learn the platform.")
+        print()
+        # Deployments created from here on are the ones this step asks for
+        since = int(time.time() * 1000)
+        
+        print(f"{Colors.BOLD}📋 Create Vercel Project:{Colors.ENDC}")
+        print(f"1. Go to: {Colors.OKBLUE}https://vercel.com/new{Colors.ENDC}")
+        print(f"2. Click {Colors.BOLD}'Import Git Repository'{Colors.ENDC}")
+        print(f"3. Click {Colors.BOLD}'Continue with GitHub'{Colors.ENDC} (if not already connected)")
+        print(f"4. Find your repository: {Colors.OKCYAN}{self.progress.project_name}{Colors.ENDC}")
+        print(f"5. Click {Colors.BOLD}'Import'{Colors.ENDC} next to your repository")
+        print(f"6. In the configuration screen:")
+        print(f"   • Project Name: {Colors.OKCYAN}{self.progress.project_name}{Colors.ENDC}")
+        print(f"   • Framework Preset: {Colors.BOLD}Next.js{Colors.ENDC}")
+        print(f"   • Leave other settings as default")
+        print(f"7. Click {Colors.BOLD}'Deploy'{Colors.ENDC}")
+        print(f"8. {Colors.WARNING}Expected:{Colors.ENDC} The first deployment will fail - this is normal!")
+        print(f"   • Error: 'POSTGRES_URL environment variable is not set'")
+        print(f"   • We'll fix this by setting up the database and storage next")
+        print(f"   • The project will still be created successfully")
+        
+        if not self.follow_first_deployment(since):
+            ask(f"\n{Colors.OKCYAN}Press Enter when the deployment has finished (even if failed)...{Colors.ENDC}")
+        
+        print()
+        print_info("Now we need your Vercel project dashboard URL:")
+        print(f"   • Go to your Vercel dashboard: {Colors.OKBLUE}https://vercel.com{Colors.ENDC}")
+        print(f"   • Find your project: {Colors.OKCYAN}{self.progress.project_name}{Colors.ENDC}")
+        print(f"   • Copy the URL from your browser address bar")
+        
+        # Get the project dashboard URL and construct the deployment URL
+        while True:
+            dashboard_url = ask(f"{Colors.OKCYAN}Enter your Vercel project dashboard URL (e.g., https://vercel.com/username/{self.progress.project_name}): {Colors.ENDC}").strip()
+            if dashboard_url and dashboard_url.startswith('https://vercel.com/'):
+                # Validate URL format
+                if f"{self.progress.project_name}" in dashboard_url:
+                    # Construct the deployment URL (this will work once redeployed)
+                    project_url = f"https://{self.progress.project_name}.vercel.app"
+                    print_info(f"Your app URL will be: {project_url} (after successful redeploy)")
+                    break
+                else:
+                    print_error(f"URL should contain '{self.progress.project_name}'")
+            else:
+                print_error("Please enter a valid Vercel dashboard URL (https://vercel.com/...)")
+        
+        print()
+        print(f"{Colors.BOLD}📋 Set up Blob Storage:{Colors.ENDC}")
+        print(f"1. In your Vercel dashboard, go to your project: {Colors.OKCYAN}{self.progress.project_name}{Colors.ENDC}")
+        print(f"2. Click on {Colors.BOLD}'Storage'{Colors.ENDC} tab")
+        print(f"3. Click {Colors.BOLD}'Create Database'{Colors.ENDC}")
+        print(f"4. Select {Colors.BOLD}'Blob'{Colors.ENDC}")
+        print(f"5. Name it: {Colors.OKCYAN}{self.progress.project_name}-blob{Colors.ENDC}")
+        print(f"6. Click {Colors.BOLD}'Create'{Colors.ENDC}")
+        print(f"7. {Colors.OKGREEN}That's it!{Colors.ENDC} Vercel automatically adds the BLOB_READ_WRITE_TOKEN to your project")
+        
+        ask(f"\n{Colors.OKCYAN}Press Enter when you've created the Blob storage...{Colors.ENDC}")
+        
+        # Store the configuration, keeping a team id given for following the deployment
+        credentials = self.progress.service_configs.get('vercel', {}).get('credentials', {})
+        self.progress.service_configs['vercel'] = {
+            'name': 'Vercel Project',
+            'url': project_url,
+            'credentials': {
+                **credentials,
+                'project_url': project_url
+            }
+        }
+        self.progress.completed_services.append('vercel')
+        
+        print_success(f"Vercel project configured: {project_url}")
+        print_success("Blob storage configured - environment variables added automatically")
+    
+    def ask_vercel_token(self):
+        """Ask for a Vercel API token and team, saving them for the later Vercel steps"""
+        print(f"\n{Colors.BOLD}📋 Create a Vercel API Token:{Colors.ENDC}")
+        print(f"1. Go to: {Colors.OKBLUE}https://vercel.com/account/tokens{Colors.ENDC}")
+        print(f"2. Click {Colors.BOLD}'Create Token'{Colors.ENDC} and scope it to the team that owns {Colors.OKCYAN}{self.progress.project_name}{Colors.ENDC}")
+        print(f"3. Copy the token")
+        
+        while True:
+            token = ask(f"\n{Colors.OKCYAN}Enter your Vercel API token: {Colors.ENDC}").strip()
+            if token:
+                break
+            print_error("Please enter the Vercel API token")
+        team_id = ask(f"{Colors.OKCYAN}Team ID (press Enter for a personal account): {Colors.ENDC}").strip()
+        self.progress.api_keys['vercel_token'] = token
+        if team_id:
+            self.progress.service_configs.setdefault('vercel', {}).setdefault('credentials', {})['team_id'] = team_id
+    
+    def follow_first_deployment(self, since: int) -> bool:
+        """Offer to follow the first deployment through the Vercel API, returning whether it was followed"""
+        while True:
+            answer = ask(f"\n{Colors.OKCYAN}Follow the deployment with a Vercel API token instead of waiting here? (y/n): {Colors.ENDC}").strip().lower()
+            if answer in ['n', 'no']:
+                return False
+            if answer in ['y', 'yes']:
+                break
+            print_error("Please enter 'y' or 'n'")
+        
+        # The HTTP stack is only loaded once the user opts in
+        import requests
+        from deploywatch import DeploymentError, DeploymentWatcher, echo_log_line, print_deployment_report
+        from envpush import vercel_client
+        from services import ServiceError
+        
+        self.ask_vercel_token()
+        watcher = DeploymentWatcher(vercel_client(self.progress), echo_log_line)
+        try:
+            print_info(f"Waiting for the first deployment of {self.progress.project_name}...")
+            report = watcher.follow(watcher.wait_for_new(self.progress.project_name, since))
+        except (DeploymentError, ServiceError, requests.RequestException) as e:
+            print_error(f"Following the deployment failed: {e}")
+            print_info("Falling back to waiting for you.")
+            return False
+        
+        print_deployment_report(report)
+        if not report.ready:
+            print_info("A failed first deployment is expected: the database is set up next")
+        return True
+    
+    def redeploy_and_follow(self):
+        """Offer to rebuild the production deployment with the new variables and follow it, returning its report"""
+        while True:
+            answer = ask(f"{Colors.OKCYAN}Redeploy now and follow the build? (y/n): {Colors.ENDC}").strip().lower()
+            if answer in ['n', 'no']:
+                return None
+            if answer in ['y', 'yes']:
+                break
+            print_error("Please enter 'y' or 'n'")
+        
+        import requests
+        from deploywatch import DeploymentError, DeploymentWatcher, echo_log_line, print_deployment_report, redeploy_latest
+        from envpush import vercel_client
+        from services import ServiceError
+        
+        vercel = vercel_client(self.progress)
+        try:
+            deployment = redeploy_latest(vercel, self.progress.project_name)
+            print_info(f"Redeploying {self.progress.project_name}...")
+            report = DeploymentWatcher(vercel, echo_log_line).follow(deployment)
+        except (DeploymentError, ServiceError, requests.RequestException) as e:
+            print_error(f"Redeploying failed: {e}")
+            print_info("Redeploy your project from the Vercel dashboard instead.")
+            return None
+        
+        print_deployment_report(report)
+        return report
+    
+    def step_3_neon_manual(self):
+        """Step 3: Manual Neon database setup"""
+        print_step(3, self.total_steps, "Neon Database (Manual)")
+        
+        print_info("We'll set up your Neon database through Vercel's project dashboard.")
+        print()
+        
+        print(f"{Colors.BOLD}📋 Set up Neon Database:{Colors.ENDC}")
+        print(f"1. In your Vercel dashboard, go to your project: {Colors.OKCYAN}{self.progress.project_name}{Colors.ENDC}")
+        print(f"2. Click on {Colors.BOLD}'Storage'{Colors.ENDC} tab")
+        print(f"3. Click {Colors.BOLD}'Create Database'{Colors.ENDC}")
+        print(f"4. Select {Colors.BOLD}'Neon'{Colors.ENDC}")
+        print(f"5. Choose {Colors.BOLD}'Create New Neon Account'{Colors.ENDC} or {Colors.BOLD}'Link Existing Account'{Colors.ENDC}")
+        print(f"6. Complete the account setup/linking process")
+        print(f"7. {Colors.OKGREEN}That's it!{Colors.ENDC} Vercel automatically adds the POSTGRES_URL to your project")
+        
+        ask(f"\n{Colors.OKCYAN}Press Enter when you've created the Neon database...{Colors.ENDC}")
+        
+        self.progress.completed_services.append('neon')
+        print_success("Neon database configured - environment variables added automatically")
+    
+    def step_polar_billing(self):
+        """Step 4: Polar Billing Setup (automatic with an access token, or manual)"""
+        print_step(4, self.total_steps, "Polar Billing")
+        print_info("With a Polar access token the products and webhook can be created for you.")
+        print_info("Otherwise we'll guide you through setting them up manually.")
+        
+        # Environment selection
+        while True:
+            environment = ask(f"\n{Colors.OKCYAN}Use sandbox environment for testing? (y/n): {Colors.ENDC}").strip().lower()
+            if environment in ['y', 'yes']:
+                environment = 'sandbox'
+                dashboard_url = "https://sandbox.polar.sh/dashboard"
+                break
+            elif environment in ['n', 'no']:
+                environment = 'production'
+                dashboard_url = "https://polar.sh/dashboard"
+                break
+            print_error("Please enter 'y' or 'n'")
+
+        service_config = self.setup_polar_automatically(environment)
+        if service_config:
+            return service_config
+
+        # Manual setup instructions
+        print(f"\n{Colors.OKBLUE}📋 Create Polar Organization (if you don't have one):{Colors.ENDC}")
+        print(f"1. Go to: {dashboard_url}")
+        print(f"2. If you don't have an organization yet:")
+        print(f"   • Click 'Create Organization'")
+        print(f"   • Name it: {self.progress.project_name}-org")
+        print(f"   • Complete the setup process")
+        print(f"3. If you already have an organization, you can use it")
+        
+        ask(f"\n{Colors.OKCYAN}Press Enter when you have an organization ready...{Colors.ENDC}")
+        
+        print(f"\n{Colors.OKBLUE}📋 Create Products:{Colors.ENDC}")
+        print(f"1. In your Polar dashboard, go to 'Products'")
+        print(f"2. Click 'Create Product'")
+        
+        print(f"\n{Colors.WARNING}Create Product 1 - Pro Plan:{Colors.ENDC}")
+        print(f"   • Name: Pro Plan")
+        print(f"   • Description: Professional subscription with advanced features")
+        print(f"   • Type: Subscription")
+        print(f"   • Price: $20.00 USD per month")
+        print(f"   • Click 'Create Product'")
+        
+        ask(f"\n{Colors.OKCYAN}Press Enter when you've created the Pro Plan...{Colors.ENDC}")
+        
+        print(f"\n{Colors.WARNING}Create Product 2 - Business Plan:{Colors.ENDC}")
+        print(f"   • Name: Business Plan")
+        print(f"   • Description: Business subscription with premium features and priority support")
+        print(f"   • Type: Subscription")
+        print(f"   • Price: $200.00 USD per month")
+        print(f"   • Click 'Create Product'")
+        
+        ask(f"\n{Colors.OKCYAN}Press Enter when you've created the Business Plan...{Colors.ENDC}")
+        
+        # Get organization slug for the dashboard URL
+        while True:
+            org_slug = ask(f"\n{Colors.OKCYAN}Enter your organization slug (from the URL, e.g., 'my-awesome-app-org'): {Colors.ENDC}").strip()
+            if org_slug:
+                break
+            print_error("Please enter your organization slug")
+        
+        # Get product IDs
+        print(f"\n{Colors.OKBLUE}📋 Get Product IDs:{Colors.ENDC}")
+        print(f"1. In your Polar dashboard, go to 'Products'")
+        print(f"2. Click on the 'Pro Plan' product")
+        print(f"3. Copy the Product ID from the URL or product details")
+        
+        while True:
+            pro_product_id = ask(f"\n{Colors.OKCYAN}Enter Pro Plan Product ID: {Colors.ENDC}").strip()
+            if pro_product_id:
+                break
+            print_error("Please enter the Pro Plan Product ID")
+        
+        print(f"\n4. Go back and click on the 'Business Plan' product")
+        print(f"5. Copy the Product ID from the URL or product details")
+        
+        while True:
+            business_product_id = ask(f"\n{Colors.OKCYAN}Enter Business Plan Product ID: {Colors.ENDC}").strip()
+            if business_product_id:
+                break
+            print_error("Please enter the Business Plan Product ID")
+        
+        # Save configuration
+        service_config = ServiceConfig(
+            name="Polar Billing",
+            url=f"{dashboard_url}/{org_slug}",
+            credentials={
+                "organization_slug": org_slug,
+                "pro_product_id": pro_product_id,
+                "business_product_id": business_product_id,
+                "environment": environment,
+                "dashboard_url": f"{dashboard_url}/{org_slug}"
+            },
+            webhook_urls=[f"https://{self.progress.project_name}.vercel.app/api/billing/webhook"]
+        )
+        
+        self.progress.service_configs['polar'] = service_config.to_dict()
+        self.progress.completed_services.append('polar')
+        ProgressManager.save_progress(self.progress)
+        
+        # Get Polar API Token
+        print(f"\n{Colors.BOLD}📋 Create Polar API Token (Required for billing operations):{Colors.ENDC}")
+        print(f"1. In your Polar dashboard, go to 'Settings'")
+        print(f"2. Scroll down to 'API Tokens' section")
+        print(f"3. Click 'Create Token'")
+        print(f"4. Give it a name like: {Colors.OKCYAN}{self.progress.project_name}-api{Colors.ENDC}")
+        print(f"5. Select scopes:")
+        print(f"   • ☑️ products:read")
+        print(f"   • ☑️ products:write")
+        print(f"   • ☑️ checkouts:write")
+        print(f"   • ☑️ subscriptions:read")
+        print(f"   • ☑️ subscriptions:write")
+        print(f"6. Click 'Create'")
+        print(f"7. Copy the token (starts with 'polar_oat_')")
+        
+        while True:
+            polar_token = ask(f"\n{Colors.OKCYAN}Enter your Polar API token: {Colors.ENDC}").strip()
+            if is_polar_token(polar_token):
+                self.progress.api_keys['polar_access_token'] = polar_token
+                break
+            print_error("Invalid token format. Token should start with 'polar_oat_'")
+        
+        # Set up Polar webhook
+        print(f"\n{Colors.BOLD}📋 Set up Polar Webhook (Required for billing events):{Colors.ENDC}")
+        print(f"1. In your Polar dashboard, go to {Colors.BOLD}'Webhooks'{Colors.ENDC}")
+        print(f"2. Click {Colors.BOLD}'Add Endpoint'{Colors.ENDC}")
+        print(f"3. Endpoint URL: {Colors.OKCYAN}https://{self.progress.project_name}.vercel.app/api/billing/webhook{Colors.ENDC}")
+        print(f"4. Select events:")
+        print(f"   • ☑️ subscription.created")
+        print(f"   • ☑️ subscription.updated") 
+        print(f"   • ☑️ subscription.canceled")
+        print(f"5. Click {Colors.BOLD}'Create'{Colors.ENDC}")
+        print(f"6. Copy the {Colors.BOLD}'Signing Secret'{Colors.ENDC}")
+        
+        while True:
+            webhook_secret = ask(f"\n{Colors.OKCYAN}Enter Polar Webhook Signing Secret: {Colors.ENDC}").strip()
+            if webhook_secret:
+                self.progress.api_keys['polar_webhook_secret'] = webhook_secret
+                break
+            print_error("Please enter the webhook signing secret")
+        
+        print_success(f"Polar billing configured: {dashboard_url}/{org_slug}")
+        print_success("Pro Plan ($20/month) and Business Plan ($200/month) products created")
+        print_success("API token configured for billing operations")
+        print_success("Webhook configured for billing events!")
+
+        return service_config
+
+    def setup_polar_automatically(self, environment: str) -> Optional[ServiceConfig]:
+        """Offer to create the products and webhook through the Polar API, returning the config on success"""
+        while True:
+            answer = ask(f"\n{Colors.OKCYAN}Create the products and webhook automatically with a Polar access token? (y/n): {Colors.ENDC}").strip().lower()
+            if answer in ['n', 'no']:
+                return None
+            if answer in ['y', 'yes']:
+                break
+            print_error("Please enter 'y' or 'n'")
+
+        # The HTTP stack is only loaded once the user opts in
+        import requests
+        from polarsetup import PolarSetupError, provision_polar, print_polar_result
+        from services import ServiceError
+
+        dashboard_url = "https://sandbox.polar.sh/dashboard" if environment == 'sandbox' else "https://polar.sh/dashboard"
+        print(f"\n{Colors.BOLD}📋 Create a Polar Organization Access Token:{Colors.ENDC}")
+        print(f"1. Go to: {dashboard_url} and open your organization's 'Settings'")
+        print(f"2. In 'Developers', click 'New Token' and name it {Colors.OKCYAN}{self.progress.project_name}-api{Colors.ENDC}")
+        print(f"3. Select scopes: products:read, products:write, webhooks:read, webhooks:write,")
+        print(f"   checkouts:write, subscriptions:read, subscriptions:write")
+        print(f"4. Copy the token (starts with 'polar_oat_')")
+
+        while True:
+            polar_token = ask(f"\n{Colors.OKCYAN}Enter your Polar access token: {Colors.ENDC}").strip()
+            if is_polar_token(polar_token):
+                break
+            print_error("Invalid token format. Token should start with 'polar_oat_'")
+
+        try:
+            result = provision_polar(self.progress, polar_token, environment)
+        except (PolarSetupError, ServiceError, requests.RequestException) as e:
+            print_error(f"Automatic Polar setup failed: {e}")
+            print_info("Falling back to manual setup.")
+            return None
+
+        print_polar_result(result)
+        self.progress.completed_services.append('polar')
+        ProgressManager.save_progress(self.progress)
+        print_success(f"Polar billing configured: {result.dashboard_url}")
+        return ServiceConfig.from_dict(self.progress.service_configs['polar'])
+
+    def step_5_clerk_manual(self):
+        """Step 5: Manual Clerk authentication setup"""
+        print_step(5, self.total_steps, "Clerk Authentication (Manual)")
+        
+        print_info("We'll guide you through creating your Clerk authentication app.")
+        print()
+        
+        print(f"{Colors.BOLD}📋 Create Clerk Application:{Colors.ENDC}")
+        print(f"1. Go to: {Colors.OKBLUE}https://dashboard.clerk.com{Colors.ENDC}")
+        print(f"2. Click {Colors.BOLD}'Add application'{Colors.ENDC}")
+        print(f"3. Enter application name: {Colors.OKCYAN}{self.progress.project_name}{Colors.ENDC}")
+        print(f"4. Choose {Colors.BOLD}'Next.js'{Colors.ENDC} as your framework")
+        print(f"5. Click {Colors.BOLD}'Create application'{Colors.ENDC}")
+        print(f"6. Copy both API keys from the dashboard")
+        
+        ask(f"\n{Colors.OKCYAN}Press Enter when you've created the Clerk application...{Colors.ENDC}")
+        
+        # Get Clerk API keys
+        while True:
+            publishable_key = ask(f"{Colors.OKCYAN}Enter Clerk Publishable Key (pk_test_...): {Colors.ENDC}").strip()
+            if is_clerk_publishable_key(publishable_key):
+                break
+            print_error("Invalid publishable key format")
+        
+        while True:
+            secret_key = ask(f"{Colors.OKCYAN}Enter Clerk Secret Key (sk_test_...): {Colors.ENDC}").strip()
+            if is_clerk_secret_key(secret_key):
+                break
+            print_error("Invalid secret key format")
+        
+        self.progress.api_keys['clerk_publishable_key'] = publishable_key
+        self.progress.api_keys['clerk_secret_key'] = secret_key
+        
+        # Set up Clerk webhook
+        vercel_config = self.progress.service_configs.get('vercel', {})
+        app_url = vercel_config.get('credentials', {}).get('project_url', 'your-app.vercel.app')
+        
+        print(f"\n{Colors.BOLD}📋 Set up Clerk Webhook (Required for user sync):{Colors.ENDC}")
+        print(f"1. In your Clerk dashboard, go to {Colors.BOLD}'Webhooks'{Colors.ENDC}")
+        print(f"2. Click {Colors.BOLD}'Add Endpoint'{Colors.ENDC}")
+        print(f"3. Endpoint URL: {Colors.OKCYAN}{app_url}/api/clerk/webhook{Colors.ENDC}")
+        print(f"4. Select events:")
+        print(f"   • ☑️ user.created")
+        print(f"   • ☑️ user.updated") 
+        print(f"   • ☑️ user.deleted")
+        print(f"5. Click {Colors.BOLD}'Create'{Colors.ENDC}")
+        print(f"6. Copy the {Colors.BOLD}'Signing Secret'{Colors.ENDC} (starts with 'whsec_')")
+        
+        while True:
+            webhook_secret = ask(f"\n{Colors.OKCYAN}Enter Clerk Webhook Signing Secret: {Colors.ENDC}").strip()
+            if is_clerk_webhook_secret(webhook_secret):
+                self.progress.api_keys['clerk_webhook_secret'] = webhook_secret
+                break
+            print_error("Invalid webhook secret format. Secret should start with 'whsec_'")
+        
+        self.progress.completed_services.append('clerk')
+        
+        print_success("Clerk authentication configured!")
+        print_success("Webhook configured for user synchronization!")
+        print()
+        
+        print(f"{Colors.BOLD}📋 Additional Clerk Setup (Optional - do this after deployment):{Colors.ENDC}")
+        print(f"1. In your Clerk app, go to {Colors.BOLD}'User & Authentication > Social Connections'{Colors.ENDC}")
+        print(f"2. Enable {Colors.BOLD}'Google'{Colors.ENDC} OAuth provider if desired")
+        print(f"3. Configure other authentication methods as needed")
+    
+    def step_6_resend_manual(self):
+        """Step 6: Manual Resend email service setup"""
+        print_step(6, self.total_steps, "Resend Email Service (Manual)")
+        
+        print_info("We'll guide you through setting up Resend for email functionality.")
+        print_info("Resend enables welcome emails, notifications, and other email features.")
+        print()
+        
+        print(f"{Colors.BOLD}📋 Create Resend Account:{Colors.ENDC}")
+        print(f"1. Go to: {Colors.OKBLUE}https://resend.com{Colors.ENDC}")
+        print(f"2. Click {Colors.BOLD}'Sign up'{Colors.ENDC} and create a free account")
+        print(f"3. Verify your email address")
+        print(f"4. Complete the onboarding process")
+        
+        ask(f"\n{Colors.OKCYAN}Press Enter when you've created your Resend account...{Colors.ENDC}")
+        
+        print(f"\n{Colors.BOLD}📋 Get Your API Key:{Colors.ENDC}")
+        print(f"1. In your Resend dashboard, go to: {Colors.OKBLUE}https://resend.com/api-keys{Colors.ENDC}")
+        print(f"2. Click {Colors.BOLD}'Create API Key'{Colors.ENDC}")
+        print(f"3. Give it a name: {Colors.OKCYAN}{self.progress.project_name}-api{Colors.ENDC}")
+        print(f"4. Select {Colors.BOLD}'Full access'{Colors.ENDC} for development")
+        print(f"5. Click {Colors.BOLD}'Create'{Colors.ENDC}")
+        print(f"6. Copy the API key (starts with 're_')")
+        
+        while True:
+            resend_api_key = ask(f"\n{Colors.OKCYAN}Enter your Resend API key: {Colors.ENDC}").strip()
+            if is_resend_api_key(resend_api_key):
+                self.progress.api_keys['resend_api_key'] = resend_api_key
+                break
+            print_error("Invalid API key format. Key should start with 're_'")
+        
+        print(f"\n{Colors.BOLD}📋 Configure Email Settings:{Colors.ENDC}")
+        print(f"For development, you can use the default Resend domain.")
+        print(f"For production, you'll want to verify your own domain.")
+        print()
+        
+        # Get sender email (optional, with default)
+        print(f"Sender email configuration:")
+        from_email = ask(f"{Colors.OKCYAN}From email (press Enter for 'onboarding@resend.dev'): {Colors.ENDC}").strip()
+        if not from_email:
+            from_email = "onboarding@resend.dev"
+        self.progress.api_keys['resend_from_email'] = from_email
+        
+        # Get sender name
+        from_name = ask(f"{Colors.OKCYAN}From name (press Enter for '{self.progress.project_name}'): {Colors.ENDC}").strip()
+        if not from_name:
+            from_name = self.progress.project_name.replace('-', ' ').title()
+        self.progress.api_keys['resend_from_name'] = from_name
+        
+        # Get reply-to email (optional)
+        reply_to = ask(f"{Colors.OKCYAN}Reply-to email (optional, press Enter to skip): {Colors.ENDC}").strip()
+        if reply_to:
+            self.progress.api_keys['resend_reply_to'] = reply_to
+        
+        self.progress.completed_services.append('resend')
+        
+        print_success("Resend email service configured!")
+        print_success("Welcome emails will be sent when users sign up!")
+        print()
+        
+        print(f"{Colors.BOLD}📋 What's Already Implemented:{Colors.ENDC}")
+        print(f"   • ✅ Welcome emails on user signup")
+        print(f"   • ✅ HTML and text email templates")
+        print(f"   • ✅ Error handling that doesn't break user creation")
+        print(f"   • ✅ Email validation and logging")
+        print()
+        
+        print(f"{Colors.BOLD}📋 Next Steps (After Setup):{Colors.ENDC}")
+        print(f"   • For production: Verify your custom domain in Resend dashboard")
+        print(f"   • Add more email templates for different use cases")
+        print(f"   • Configure notification emails based on user preferences")
+    
+    def step_7_sentry_manual(self):
+        """Step 7: Manual Sentry error monitoring setup"""
+        print_step(7, self.total_steps, "Sentry Error Monitoring (Manual)")
+        
+        print_info("We'll guide you through creating your Sentry project for error monitoring.")
+        print()
+        
+        print(f"{Colors.BOLD}📋 Create Sentry Project:{Colors.ENDC}")
+        print(f"1. Go to: {Colors.OKBLUE}https://sentry.io{Colors.ENDC}")
+        print(f"2. Sign up for a free account or log in")
+        print(f"3. Click {Colors.BOLD}'Create Project'{Colors.ENDC}")
+        print(f"4. Select {Colors.BOLD}'Next.js'{Colors.ENDC} as your platform")
+        print(f"5. Enter project name: {Colors.OKCYAN}{self.progress.project_name}{Colors.ENDC}")
+        print(f"6. Select your team (or use default)")
+        print(f"7. Click {Colors.BOLD}'Create Project'{Colors.ENDC}")
+        print(f"8. Copy the DSN from the setup instructions")
+        
+        ask(f"\n{Colors.OKCYAN}Press Enter when you've created the Sentry project...{Colors.ENDC}")
+        
+        # Get Sentry DSN
+        print(f"\n{Colors.BOLD}📋 Get Sentry DSN:{Colors.ENDC}")
+        print(f"1. In your Sentry project dashboard, go to {Colors.BOLD}'Settings > Projects'{Colors.ENDC}")
+        print(f"2. Click on your project: {Colors.OKCYAN}{self.progress.project_name}{Colors.ENDC}")
+        print(f"3. Go to {Colors.BOLD}'Client Keys (DSN)'{Colors.ENDC}")
+        print(f"4. Copy the DSN URL (should start with 'https://' and end with '.ingest.sentry.io')")
+        
+        while True:
+            sentry_dsn = ask(f"\n{Colors.OKCYAN}Enter your Sentry DSN: {Colors.ENDC}").strip()
+            if is_sentry_dsn(sentry_dsn):
+                self.progress.api_keys['sentry_dsn'] = sentry_dsn
+                break
+            print_error("Invalid DSN format. DSN should start with 'https://' and contain '.ingest.sentry.io'")
+        
+        self.progress.completed_services.append('sentry')
+        
+        print_success("Sentry error monitoring configured!")
+        print_success("Your app will now track errors and performance metrics!")
+        print()
+        
+        print(f"{Colors.BOLD}📋 Additional Sentry Features (Optional):{Colors.ENDC}")
+        print(f"1. Performance Monitoring: Already enabled by default")
+        print(f"2. Session Replay: Already enabled for debugging")
+        print(f"3. Alerts: Configure in Sentry dashboard for critical errors")
+        print(f"4. Releases: Track deployments in your Sentry project")
+    
+    def step_8_vercel_env_vars(self):
+        """Step 8: Add environment variables to Vercel project"""
+        print_step(8, self.total_steps, "Vercel Environment Variables (Critical)")
+        
+        print_info("We'll generate a .env.prod file with all your environment variables.")
+        print_info("You can then copy and paste them into your Vercel project settings.")
+        print()
+        
+        # Generate .env.prod file
+        self.generate_env_prod_file()
+        
+        if self.push_env_vars_automatically():
+            self.progress.completed_services.append('vercel-env')
+            print_success("Vercel environment variables configured!")
+            self.finish_deployment()
+            return
+        
+        print(f"{Colors.BOLD}📋 Add Environment Variables to Vercel:{Colors.ENDC}")
+        print(f"1. Go to your Vercel dashboard: {Colors.OKBLUE}https://vercel.com{Colors.ENDC}")
+        print(f"2. Find your project: {Colors.OKCYAN}{self.progress.project_name}{Colors.ENDC}")
+        print(f"3. Click on your project name")
+        print(f"4. Go to {Colors.BOLD}'Settings'{Colors.ENDC} tab")
+        print(f"5. Click {Colors.BOLD}'Environment Variables'{Colors.ENDC} in the sidebar")
+        print(f"6. Open {Colors.BOLD}.env.prod{Colors.ENDC} file and copy each variable:")
+        print(f"   • For each line in .env.prod:")
+        print(f"   • Copy the variable name (before =)")
+        print(f"   • Copy the variable value (after =)")
+        print(f"   • Add to Vercel with Environment: {Colors.BOLD}Production, Preview, Development{Colors.ENDC}")
+        
+        print(f"\n{Colors.BOLD}💡 Important Notes:{Colors.ENDC}")
+        print(f"   • {Colors.OKGREEN}POSTGRES_URL and BLOB_READ_WRITE_TOKEN are already set by Vercel{Colors.ENDC}")
+        print(f"   • Skip these if they already exist in your Vercel environment variables")
+        print(f"   • {Colors.WARNING}CRON_SECRET is required for secure subscription syncing{Colors.ENDC}")
+        print(f"   • Click {Colors.BOLD}'Save'{Colors.ENDC} after adding each variable")
+        
+        ask(f"\n{Colors.OKCYAN}Press Enter when you've added all environment variables to Vercel...{Colors.ENDC}")
+        
+        self.progress.completed_services.append('vercel-env')
+        print_success("Vercel environment variables configured!")
+        self.finish_deployment()
+    
+    def finish_deployment(self):
+        """Redeploy and follow the build when there is a Vercel token, then probe the app"""
+        report = self.redeploy_and_follow() if self.progress.api_keys.get('vercel_token') else None
+        if report is None:
+            self.probe_deployment()
+        elif report.ready:
+            self.probe_deployment(ask_first=False)
+        else:
+            print_warning("The redeployment failed; check the build log above")
+    
+    def probe_deployment(self, ask_first: bool = True):
+        """Offer to check that the redeployed app answers, instead of assuming it does"""
+        while ask_first:
+            answer = ask(f"{Colors.OKCYAN}Probe the deployment once you have redeployed? (y/n): {Colors.ENDC}").strip().lower()
+            if answer in ['n', 'no']:
+                print_success("Your deployment should now work correctly!")
+                return
+            if answer in ['y', 'yes']:
+                break
+            print_error("Please enter 'y' or 'n'")
+        
+        from probe import probe_projects, print_probe_report
+        from services import APP_URL_TEMPLATE
+        
+        url = APP_URL_TEMPLATE.format(project=self.progress.project_name)
+        print_info(f"Waiting for {url} to answer, then measuring each route...")
+        report, previous = probe_projects([(self.progress.project_name, url)])[0]
+        print_probe_report(report, previous)
+        if report.error:
+            print_warning("The deployment did not answer; check the build logs in the Vercel dashboard")
+        else:
+            print_success("Your deployment is up!")
+    
+    def push_env_vars_automatically(self) -> bool:
+        """Offer to push the variables through the Vercel API, returning whether it succeeded"""
+        while True:
+            answer = ask(f"{Colors.OKCYAN}Push the variables to Vercel automatically with an API token? (y/n): {Colors.ENDC}").strip().lower()
+            if answer in ['n', 'no']:
+                return False
+            if answer in ['y', 'yes']:
+                break
+            print_error("Please enter 'y' or 'n'")
+        
+        # The HTTP stack is only loaded once the user opts in
+        import requests
+        from envpush import push_progress, print_push_result
+        from services import ServiceError
+        
+        saved = bool(self.progress.api_keys.get('vercel_token'))
+        if saved:
+            print_info("Using the Vercel API token given in step 2")
+        else:
+            self.ask_vercel_token()
+        token = self.progress.api_keys['vercel_token']
+        team_id = self.progress.service_configs.get('vercel', {}).get('credentials', {}).get('team_id', '')
+        
+        try:
+            result = push_progress(self.progress, token, team_id)
+        except (ServiceError, requests.RequestException) as e:
+            print_error(f"Automatic push failed: {e}")
+            print_info("Falling back to manual setup.")
+            if not saved:
+                self.progress.api_keys.pop('vercel_token')
+            return False
+        
+        print_push_result(result)
+        print_info("POSTGRES_URL and BLOB_READ_WRITE_TOKEN are managed by Vercel and were left untouched")
+        return True
+    
+    def generate_env_prod_file(self):
+        """Generate .env.prod and .env.preview files for Vercel environment variables"""
+        print_info("Generating .env.prod file for Vercel...")
+        
+        # Generate CRON_SECRET for secure cron endpoint
+        if ensure_cron_secret(self.progress):
+            print_success(f"Generated secure CRON_SECRET for subscription syncing")
+        
+        written = write_env_files(self.progress, environments=(PREVIEW, PRODUCTION))
+        if any(written.values()):
+            print_success(".env.prod file generated successfully!")
+        else:
+            print_info(".env.prod is already up to date")
+        print_info("Use this file to copy environment variables to Vercel")
+    
+    def generate_env_file(self):
+        """Generate .env file for local development"""
+        print()
+        print_info("Generating .env file for local development...")
+        
+        if any(write_env_files(self.progress, environments=(DEVELOPMENT,)).values()):
+            print_success(".env file generated for local development!")
+        else:
+            print_info(".env is already up to date")
+        print_info("💡 Note: .env.prod file contains production variables for Vercel")
+    
+    def print_completion_summary(self):
+        """Print setup completion summary"""
+        print("\n" + "="*80)
+        print(f"{Colors.HEADER}{Colors.BOLD}🎉 INTERACTIVE SETUP COMPLETE! 🎉{Colors.ENDC}")
+        print("="*80)
+        
+        print(f"\n{Colors.BOLD}📊 Project Summary:{Colors.ENDC}")
+        print(f"   Project Name: {Colors.OKCYAN}{self.progress.project_name}{Colors.ENDC}")
+        
+        print(f"\n{Colors.BOLD}✅ Completed Setup:{Colors.ENDC}")
+        if 'github' in self.progress.completed_services:
+            print(f"   • GitHub Repository: {Colors.OKBLUE}{self.progress.api_keys.get('github_repo_url', '')}{Colors.ENDC}")
+        if 'vercel' in self.progress.completed_services:
+            vercel_url = self.progress.service_configs.get('vercel', {}).get('url', '')
+            print(f"   • Vercel Project: {Colors.OKBLUE}{vercel_url}{Colors.ENDC}")
+            print(f"   • Blob Storage: {Colors.OKGREEN}Configured automatically{Colors.ENDC}")
+        if 'neon' in self.progress.completed_services:
+            print(f"   • Neon Database: {Colors.OKGREEN}Integrated through Vercel{Colors.ENDC}")
+        if 'polar' in self.progress.completed_services:
+            polar_url = self.progress.service_configs.get('polar', {}).get('url', '')
+            print(f"   • Polar Billing: {Colors.OKBLUE}{polar_url}{Colors.ENDC}")
+        if 'clerk' in self.progress.completed_services:
+            print(f"   • Clerk Authentication: {Colors.OKGREEN}Application created{Colors.ENDC}")
+        if 'resend' in self.progress.completed_services:
+            print(f"   • Resend Email Service: {Colors.OKGREEN}API key configured{Colors.ENDC}")
+        if 'sentry' in self.progress.completed_services:
+            print(f"   • Sentry Error Monitoring: {Colors.OKGREEN}Project created{Colors.ENDC}")
+        if 'vercel-env' in self.progress.completed_services:
+            print(f"   • Vercel Environment Variables: {Colors.OKGREEN}All variables configured{Colors.ENDC}")
+            print(f"   • Subscription Sync Cron: {Colors.OKGREEN}Secure token generated{Colors.ENDC}")
+        
+        print(f"\n{Colors.BOLD}📁 Next Steps:{Colors.ENDC}")
+        repo_url = self.progress.api_keys.get('github_repo_url', '')
+        print(f"   1. {Colors.OKGREEN}Your Vercel project is ready!{Colors.ENDC}")
+        print(f"      • Environment variables are configured in Vercel")
+        print(f"      • Deployment should work automatically")
+        print(f"      • Subscription sync runs automatically every 6 hours")
+        print(f"      • If needed, trigger a redeploy from your dashboard")
+        print(f"   2. Clone your repository: {Colors.OKCYAN}git clone {repo_url}.git{Colors.ENDC}")
+        print(f"   3. Copy environment files: {Colors.OKCYAN}cp ../cli/.env . && cp ../cli/.env.prod .{Colors.ENDC}")
+        print(f"   4. Set up local database: {Colors.OKCYAN}docker-compose up -d postgres{Colors.ENDC}")
+        print(f"   5. Install dependencies: {Colors.OKCYAN}npm install{Colors.ENDC}")
+        print(f"   6. Start development: {Colors.OKCYAN}npm run dev{Colors.ENDC}")
+        print(f"   7. Environment files:")
+        print(f"      • {Colors.OKCYAN}.env{Colors.ENDC} - Local development (localhost, docker-compose)")
+        print(f"      • {Colors.OKCYAN}.env.prod{Colors.ENDC} - Production reference (already in Vercel)")
+        
+        print(f"\n{Colors.BOLD}🚀 Your kosuke template is ready to use!{Colors.ENDC}")
+        print("="*80)
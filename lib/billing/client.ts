@@ -9,6 +9,8 @@ import { Polar } from '@polar-sh/sdk';
 export const polar = new Polar({
   accessToken: process.env.POLAR_ACCESS_TOKEN!,
   server: process.env.POLAR_ENVIRONMENT === 'sandbox' ? 'sandbox' : 'production',
+  // Overrides `server`, e.g. to point local load tests at a mock Polar API
+  ...(process.env.POLAR_API_URL ? { serverURL: process.env.POLAR_API_URL } : {}),
 });
 
 /**